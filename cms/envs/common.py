@@ -146,6 +146,12 @@ BLOCK_STRUCTURES_SETTINGS = dict(
 
     # Backend storage options
     PRUNING_ACTIVE=False,
+
+    # Size of the process-local LRU cache of collected block structures,
+    # used when the block_structure.process_local_cache waffle switch is on.
+    # Bytes are the serialized (compressed) size of the cached structures.
+    LOCAL_CACHE_MAX_ENTRIES=20,
+    LOCAL_CACHE_MAX_BYTES=20 * 1024 * 1024,
 )
 
 ############################ FEATURE CONFIGURATION #############################
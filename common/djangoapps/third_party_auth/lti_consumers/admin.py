@@ -21,6 +21,7 @@ from .models import (
     LTIExternalCourseEnrollmentGrades,
     LTIExternalCourseAssignments,
     LTIExternalCourseAssignmentProblems,
+    LTIGradePostOutbox,
     )
 
 class LTIInternalCourseAdmin(admin.ModelAdmin):
@@ -193,3 +194,24 @@ class LTIExternalCourseAssignmentsAdmin(admin.ModelAdmin):
     readonly_fields=(u'created', u'modified')
 
 admin.site.register(LTIExternalCourseAssignments, LTIExternalCourseAssignmentsAdmin)
+
+class LTIGradePostOutboxAdmin(admin.ModelAdmin):
+    """
+    LTI Grade Sync - grade posts waiting to be replayed
+    """
+    search_fields = ('username', 'usage_id')
+    list_filter = ('status',)
+
+    list_display = (
+        'username',
+        'course_id',
+        'usage_id',
+        'status',
+        'attempts',
+        'last_attempt',
+        'created',
+        'modified'
+    )
+    readonly_fields=(u'created', u'modified')
+
+admin.site.register(LTIGradePostOutbox, LTIGradePostOutboxAdmin)
@@ -7,10 +7,16 @@ API calls:
 willo_api_create_column(ext_wl_outcome_service_url, data, operation="post"):
 willo_api_post_grade(ext_wl_outcome_service_url, data):
 willo_api_get_outcome(url, assignment_id, user_id):
+willo_api_get_column_outcomes(url, assignment_id):
+
+All http traffic goes through api_client.willo_api_request(), which provides
+connection pooling, timeouts and retry/backoff on 429/5xx responses.
 
 Utils:
 ------------------
 willo_api_check_column_should_post():
+willo_api_prefetch_outcomes(url, assignment_id, user_ids=None):
+willo_api_grade_should_post(data, outcomes):
 willo_api_check_column_does_exist(ext_wl_outcome_service_url, data):
 willo_api_column_due_date_has_changed(response, data):
 willo_api_column_point_value_has_changed(response, data):
@@ -43,6 +49,7 @@ from django.core.cache import cache
 # rover stuff
 from .models import LTIExternalCourse
 from .exceptions import LTIBusinessRuleError
+from .api_client import willo_api_request
 
 # module constants
 log = logging.getLogger(__name__)
@@ -128,7 +135,7 @@ def willo_api_post_grade(ext_wl_outcome_service_url, data, cached_results=True):
 
     willo_date=None
     willo_grade=None
-    if willo_outcome is not None and type(willo_outcome) is list:
+    if willo_outcome and type(willo_outcome) is list:
         willo_date=willo_outcome[0].get('timestamp')
         willo_grade=willo_outcome[0].get('score')
 
@@ -152,7 +159,7 @@ def willo_api_post_grade(ext_wl_outcome_service_url, data, cached_results=True):
     headers = willo_api_headers(key='Content-Type', value='application/vnd.willolabs.outcome.result+json')
     data_json = json.dumps(data)
 
-    response = requests.post(url=ext_wl_outcome_service_url, data=data_json, headers=headers)
+    response = willo_api_request('post', url=ext_wl_outcome_service_url, data=data_json, headers=headers)
     if 200 <= response.status_code <= 299:
         if DEBUG: log.info('lti_consumers.willolabs.api.willo_api_post_grade() - successfully posted grade data: {grade_data}'.format(
             grade_data = data_json
@@ -205,8 +212,10 @@ def willo_api_get_outcome(url, assignment_id, user_id, cached_results=True):
     """
     if DEBUG: log.info('lti_consumers.willolabs.api.willo_api_get_outcome()')
     if cached_results:
+        # note: an empty list is a valid cached value. It is seeded by willo_api_prefetch_outcomes()
+        # for students that do not yet have a result in the Willo grade column.
         cached_data = _cache_get(user_id=user_id, activity_id=assignment_id, id=url)
-        if cached_data:
+        if cached_data is not None:
             return cached_data
 
     if not url.endswith('/'):
@@ -224,7 +233,7 @@ def willo_api_get_outcome(url, assignment_id, user_id, cached_results=True):
         value='application/vnd.willolabs.outcome.result+json'
         )
 
-    response = requests.get(url=url, params=params, headers=headers)
+    response = willo_api_request('get', url=url, params=params, headers=headers)
     if response.status_code == 200:
         if DEBUG: log.info('willo_api_get_outcome() - successfully retrieved grade data for user_id: {user_id}, assignment id: {assignment_id}. The response was: {response}'.format(
                 assignment_id = assignment_id,
@@ -245,6 +254,68 @@ def willo_api_get_outcome(url, assignment_id, user_id, cached_results=True):
     return None
 
 
+def willo_api_get_column_outcomes(url, assignment_id):
+    """
+     Willo Grade Sync api.
+     Retrieve the grade records of all students for one assignment, in a single round trip.
+     This is the same request as willo_api_get_outcome() but without the user_id parameter.
+
+     returns a dict of Willo result dicts keyed on LTI user_id, or None if the column
+     could not be read. Example:
+        {
+            "f4fbc0fdf7f64daab7f5e1b09a9ebe55": {
+                "activity_id": "tutorial-avoiding-plagiarism",
+                "user_id": "f4fbc0fdf7f64daab7f5e1b09a9ebe55",
+                "score": 77.0,
+                "timestamp": "2021-01-06T21:40:34Z",
+                "type": "result"
+            }
+        }
+    """
+    if DEBUG: log.info('lti_consumers.willolabs.api.willo_api_get_column_outcomes() - assignment_id: {assignment_id}'.format(
+            assignment_id=assignment_id
+        ))
+
+    if not url.endswith('/'):
+        log.warning('api.willo_api_get_column_outcomes() - grade URL missing final slash: {url}'.format(
+            url=url
+        ))
+        url += '/'
+
+    params = {
+        'id' : assignment_id
+        }
+    headers = willo_api_headers(
+        key='Accept',
+        value='application/vnd.willolabs.outcome.result+json'
+        )
+
+    response = willo_api_request('get', url=url, params=params, headers=headers)
+    if response.status_code != 200:
+        log.error('willo_api_get_column_outcomes() - encountered an error while attempting to retrieve grade data for assignment id: {assignment_id}. The response was: {response}. Msg: {msg} Text: {text}'.format(
+            assignment_id = assignment_id,
+            response = response.status_code,
+            msg=response.reason,
+            text=response.text
+        ))
+        return None
+
+    results = response.json()
+    if type(results) is dict: results = [results]
+    if type(results) is not list:
+        log.error('willo_api_get_column_outcomes() - unexpected response for assignment id: {assignment_id}: {results}'.format(
+            assignment_id = assignment_id,
+            results=results
+        ))
+        return None
+
+    return {
+        result.get('user_id'): result
+        for result in results
+        if type(result) is dict and result.get('user_id')
+        }
+
+
 def willo_api_create_column(ext_wl_outcome_service_url, data, operation="post"):
     """
      Willo Grade Sync api.
@@ -325,11 +396,11 @@ def willo_api_create_column(ext_wl_outcome_service_url, data, operation="post"):
 
     if operation == "post":
         if DEBUG: log.info('willo_api_create_column() - posting grade column')
-        response = requests.post(url=ext_wl_outcome_service_url, data=data_json, headers=headers)
+        response = willo_api_request('post', url=ext_wl_outcome_service_url, data=data_json, headers=headers)
     else:
         if operation == "patch":
             if DEBUG: log.info('willo_api_create_column() - patching grade column')
-            response = requests.patch(url=ext_wl_outcome_service_url, data=data_json, headers=headers)
+            response = willo_api_request('patch', url=ext_wl_outcome_service_url, data=data_json, headers=headers)
 
     if 200 <= response.status_code <= 299:
         if response.status_code == 200:
@@ -420,6 +491,58 @@ def willo_api_check_column_should_post(rover_date, rover_grade, willo_date, will
     if DEBUG: log.info('lti_consumers.willolabs.api.willo_api_check_column_should_post() - No reason to not send the grade, so, returning True.')
     return True
 
+def willo_api_prefetch_outcomes(url, assignment_id, user_ids=None):
+    """
+    Bulk alternative to calling willo_api_get_outcome() once per student.
+
+    Reads every existing result in one Willo grade column with a single api call, then
+    seeds the per-student outcome cache that willo_api_get_outcome() reads. Subsequent
+    calls to willo_api_post_grade() for this column are then answered from memcached
+    rather than making a GET round trip to Willo for each student.
+
+    user_ids: optional list of LTI user_ids. Students in this list without a result in the
+    Willo column are cached as an empty list, so that they do not trigger a GET either.
+
+    returns the dict from willo_api_get_column_outcomes(), or None if the column could not be read,
+    in which case nothing is cached and willo_api_post_grade() falls back to per-student GETs.
+    """
+    if not url.endswith('/'): url += '/'
+
+    outcomes = willo_api_get_column_outcomes(url=url, assignment_id=assignment_id)
+    if outcomes is None:
+        return None
+
+    cached_data = {
+        _cache_pk(user_id=user_id, activity_id=assignment_id, id=url): [result]
+        for user_id, result in outcomes.items()
+        }
+    for user_id in user_ids or []:
+        if user_id not in outcomes:
+            cached_data[_cache_pk(user_id=user_id, activity_id=assignment_id, id=url)] = []
+    cache.set_many(cached_data, timeout=CACHE_DEFAULT_EXPIRATION, version=CACHE_VERSION)
+
+    if DEBUG: log.info('lti_consumers.willolabs.api.willo_api_prefetch_outcomes() - assignment_id: {assignment_id}, cached {n} outcomes, {results} of which have a Willo result.'.format(
+            assignment_id=assignment_id,
+            n=len(cached_data),
+            results=len(outcomes)
+        ))
+    return outcomes
+
+def willo_api_grade_should_post(data, outcomes):
+    """
+    Diff one Rover grade payload (see willo_api_post_grade) against the Willo
+    column outcomes returned by willo_api_get_column_outcomes().
+
+    returns True if the grade should be posted to Willo.
+    """
+    willo_outcome = outcomes.get(data.get('user_id')) or {}
+    return willo_api_check_column_should_post(
+                rover_date=data.get('result_date'),
+                rover_grade=data.get('score'),
+                willo_date=willo_outcome.get('timestamp'),
+                willo_grade=willo_outcome.get('score')
+                )
+
 def willo_api_check_column_does_exist(ext_wl_outcome_service_url, data, cached_results=True):
     """
     Payload:
@@ -494,7 +617,7 @@ def willo_api_check_column_does_exist(ext_wl_outcome_service_url, data, cached_r
         if cached_data:
             return True
 
-    response = requests.get(url=req.url, headers=headers)
+    response = willo_api_request('get', url=req.url, headers=headers)
 
     if 200 <= response.status_code <= 299:
 
@@ -763,7 +886,7 @@ def _cache_get(user_id=None, activity_id=None, id=None):
         cache_key=cache_key
     ))
     cached_data = cache.get(key=cache_key, default=None, version=CACHE_VERSION)
-    if cached_data:
+    if cached_data is not None:
         if DEBUG: log.info('lti_consumers.willolabs.api._cache_get() - cache hit: Yay! :)')
         if type(cached_data) == dict or type(cached_data) == list: return cached_data
         if isinstance(cached_data, str): return json.loads(cached_data)
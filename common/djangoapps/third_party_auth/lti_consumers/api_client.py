@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Shared HTTP session layer for the Willo Labs api.
+
+Every call to the Willo api used to open a fresh connection via requests.post/get,
+paying a TLS handshake to app.willolabs.com each time, and had no timeout.
+This module provides:
+
+- one process-wide requests.Session with keep-alive connection pooling.
+  urllib3 pools are thread-safe, and pool_block=True caps the number of open
+  connections per host at WILLO_API_POOL_MAXSIZE regardless of thread count.
+- (connect, read) timeouts on every request.
+- retry with exponential backoff on 429 and 5xx responses, honoring Retry-After.
+- willo_api_map(), a thread-pool helper that keeps many Willo requests in flight
+  at once for bulk callers like LTIGradeSync and the willo_resync command.
+
+All settings are optional and can be set in rover.env.json.
+"""
+from __future__ import absolute_import
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+from django.db import connections
+
+log = logging.getLogger(__name__)
+DEBUG = settings.ROVER_DEBUG
+
+WILLO_API_POOL_CONNECTIONS = getattr(settings, 'ROVER_WILLO_API_POOL_CONNECTIONS', 10)   # number of hosts to keep pools for
+WILLO_API_POOL_MAXSIZE = getattr(settings, 'ROVER_WILLO_API_POOL_MAXSIZE', 10)           # max open connections per host
+WILLO_API_CONNECT_TIMEOUT = getattr(settings, 'ROVER_WILLO_API_CONNECT_TIMEOUT', 3.05)   # seconds
+WILLO_API_READ_TIMEOUT = getattr(settings, 'ROVER_WILLO_API_READ_TIMEOUT', 30)           # seconds
+WILLO_API_MAX_RETRIES = getattr(settings, 'ROVER_WILLO_API_MAX_RETRIES', 3)
+WILLO_API_BACKOFF_FACTOR = getattr(settings, 'ROVER_WILLO_API_BACKOFF_FACTOR', 0.5)     # sleeps 0.5, 1, 2 ... seconds between retries
+WILLO_API_MAX_WORKERS = getattr(settings, 'ROVER_WILLO_API_MAX_WORKERS', 8)              # default thread count for willo_api_map()
+
+# Willo outcome posts are keyed by result/activity id, so replaying a POST or PATCH is safe.
+WILLO_API_RETRY_METHODS = frozenset(['GET', 'POST', 'PATCH'])
+WILLO_API_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the process-wide Willo api session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def reset_session():
+    """
+    Close the process-wide session and its pooled connections. The next
+    call to get_session() builds a new one, picking up current settings.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def willo_api_request(method, url, **kwargs):
+    """
+    Drop-in replacement for requests.request() that goes through the pooled
+    session and applies the default timeout.
+
+    Returns the final requests.Response. A 429/5xx response that is still failing
+    after WILLO_API_MAX_RETRIES retries is returned rather than raised, so that
+    callers can keep inspecting response.status_code as before.
+    """
+    kwargs.setdefault('timeout', (WILLO_API_CONNECT_TIMEOUT, WILLO_API_READ_TIMEOUT))
+    return get_session().request(method=method, url=url, **kwargs)
+
+
+def willo_api_map(func, items, max_workers=None, close_db_connections=True):
+    """
+    Call func(item) for each item on a thread pool and return the results in
+    the order of items. Up to max_workers Willo requests are in flight at once.
+
+    func must catch its own exceptions if the remaining items should still run;
+    otherwise the first exception is raised here once all items have finished.
+
+    close_db_connections: func typically reads and writes the LTI cache via the
+    Django ORM, which opens one connection per thread. Close it after each call
+    so that worker threads do not leak connections.
+    """
+    if max_workers is None:
+        max_workers = WILLO_API_MAX_WORKERS
+    items = list(items)
+
+    def run(item):
+        try:
+            return func(item)
+        finally:
+            if close_db_connections:
+                connections.close_all()
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, items))
+
+
+def _build_session():
+    """
+    A requests.Session with pooled, retrying adapters mounted for http and https.
+    """
+    retry = Retry(
+        total=WILLO_API_MAX_RETRIES,
+        connect=WILLO_API_MAX_RETRIES,
+        read=WILLO_API_MAX_RETRIES,
+        status=WILLO_API_MAX_RETRIES,
+        backoff_factor=WILLO_API_BACKOFF_FACTOR,
+        status_forcelist=WILLO_API_RETRY_STATUS,
+        method_whitelist=WILLO_API_RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=WILLO_API_POOL_CONNECTIONS,
+        pool_maxsize=WILLO_API_POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    if DEBUG: log.info('lti_consumers.api_client._build_session() - pool_maxsize: {maxsize}, max_retries: {retries}, timeout: {timeout}'.format(
+        maxsize=WILLO_API_POOL_MAXSIZE,
+        retries=WILLO_API_MAX_RETRIES,
+        timeout=(WILLO_API_CONNECT_TIMEOUT, WILLO_API_READ_TIMEOUT)
+    ))
+    return session
@@ -13,3 +13,6 @@ from django.apps import AppConfig
 class LTIGradeSyncConfig(AppConfig):
     name = 'common.djangoapps.third_party_auth.lti_consumers'
     verbose_name = "Querium LTI Grade Sync"
+
+    def ready(self):
+        from . import signals  # pylint: disable=unused-import
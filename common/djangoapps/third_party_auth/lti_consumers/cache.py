@@ -41,7 +41,9 @@ from .utils import find_course_unit, get_course_by_id
 
 from .exceptions import LTIBusinessRuleError
 from .lti_params import LTIParamsFieldMap, LTIParams
-from .utils import get_assignment, get_chapter
+from .utils import willo_id_from_url
+from .course_index import get_course_index_entry, get_course_index_assignment
+from . import model_cache
 from .models import (
     LTIInternalCourse,
     LTIExternalCourse,
@@ -186,6 +188,7 @@ class LTICacheManager(object):
         self._course_enrollment_grades = None
         self._lti_params = None
         self._user = None
+        self._is_faculty = None
         self._course_id = None
 
     def verify(self, quiet=False):
@@ -253,9 +256,6 @@ class LTICacheManager(object):
         # note: self.course_id is a CourseKey
         # structure: openedx.core.djangoapps.content.block_structure.block_structure.BlockStructureBlockData
         structure = get_block_structure_manager(self.course_id).get_collected()
-        course = modulestore().get_course(self.course_id)
-        host = settings.SITE_NAME
-        scheme = u"https" if settings.HTTPS == "on" else u"http"
 
         for block_usage_key in structure.get_block_keys():
             if (block_usage_key.block_type in PROBLEM_BLOCK_TYPES):
@@ -273,28 +273,14 @@ class LTICacheManager(object):
                             end=color.END
                             ))
 
-                    item = None
-                    try:
-                        item = modulestore().get_item(block_usage_key, depth=1, revision=ModuleStoreEnum.RevisionOption.published_only)
-                    except:
+                    index_entry = get_course_index_entry(block_usage_key)
+                    if index_entry is None:
                         print('no item for ' + str(block_usage_key))
-                        pass
-
-                    if item:
-                        assignment = get_assignment(item)
-                        chapter = get_chapter(item)
-                        if assignment is None: return None
-
-                        assignment_url = u'{scheme}://{host}/{url_prefix}/{course_id}/courseware/{chapter_id}/{assignment_id}'.format(
-                            scheme = scheme,
-                            host=host,
-                            url_prefix='courses',
-                            course_id=self.course_id,
-                            chapter_id=chapter.location.block_id,
-                            assignment_id=assignment.location.block_id
-                            )
-                        assignment_display_name = assignment.display_name
-                        due_date = item.due
+
+                    if index_entry:
+                        assignment_url = index_entry['url']
+                        assignment_display_name = index_entry['display_name']
+                        due_date = index_entry['due']
 
                         lti_external_course_assignments = LTIExternalCourseAssignments.objects.filter(
                             course=lti_external_course,
@@ -317,7 +303,7 @@ class LTICacheManager(object):
                             lti_external_course_assignments.save()
                             print('{green}Added new LTIExternalCourseAssignments cache record for assignment {assignment}{end}'.format(
                                 green=color.GREEN,
-                                assignment=str(assignment.location),
+                                assignment=index_entry['assignment_usage_key'],
                                 end=color.END
                             ))
 
@@ -348,8 +334,6 @@ class LTICacheManager(object):
         print('Verifying student grades')
 
         # get all students enrolled in course
-        host = settings.SITE_NAME
-        scheme = u"https" if settings.HTTPS == "on" else u"http"
         now = UTC.localize(datetime.datetime.now())
         enrolled_students = User.objects.filter(
             courseenrollment__course_id=self.course_id,
@@ -412,23 +396,12 @@ class LTICacheManager(object):
                             if 'display_name' in grade: display_name = grade['display_name']
                             else: display_name = ''
 
-                            try:
-                                assignment = modulestore().get_item(location, depth=1)
-                            except:
+                            assignment = get_course_index_entry(location)
+                            if assignment is None:
                                 print('no item for ' + str(location))
-                                pass
 
                             if assignment is not None:
-                                chapter = get_chapter(assignment)
-
-                                assignment_url = u'{scheme}://{host}/{url_prefix}/{course_id}/courseware/{chapter_id}/{assignment_id}'.format(
-                                    scheme = scheme,
-                                    host=host,
-                                    url_prefix='courses',
-                                    course_id=self.course_id,
-                                    chapter_id=chapter.location.block_id,
-                                    assignment_id=assignment.location.block_id
-                                    )
+                                assignment_url = assignment['url']
 
                                 course_assignment = LTIExternalCourseAssignments.objects.filter(
                                     course=self.course,
@@ -523,17 +496,15 @@ class LTICacheManager(object):
 
             if self.course is None:
                 # belt & suspenders. this should have already been set by set_course_id()
-                course = LTIExternalCourse.objects.filter(course_id=self.course_id).first()
+                course = model_cache.get_external_course(self.course_id)
                 if course:
                     self.course = course
 
             if self.course_enrollment is None:
                 # this only covers cases where cache data exists. if user is student
                 # entering Rover for the first time then we'll still be None
-                self.course_enrollment = LTIExternalCourseEnrollment.objects.filter(
-                    course = self.course,
-                    user = self._user
-                    ).first()
+                if self.course is not None:
+                    self.course_enrollment = model_cache.get_external_course_enrollment(self.course, self._user)
 
 
 
@@ -584,11 +555,11 @@ class LTICacheManager(object):
 
         # look for a record based on course_id (our most common use case), if its set
         if course is None and self._course_id is not None:
-            course = LTIExternalCourse.objects.filter(course_id=self._course_id).first()
+            course = model_cache.get_external_course(self._course_id)
 
         # as a fallback, look for a cached record based on context_id, if its set
         if course is None and self._context_id is not None:
-            course = LTIExternalCourse.objects.filter(context_id=self._context_id).first()
+            course = model_cache.get_external_course_by_context_id(self._context_id)
 
         if course:
             if DEBUG: log.info('LTICacheManager.register_course() - found a cached course.')
@@ -705,10 +676,7 @@ class LTICacheManager(object):
             return None
 
         # look for a cached record for this user / context_id
-        enrollment = LTIExternalCourseEnrollment.objects.filter(
-            course = self.course,
-            user = self.user
-            ).first()
+        enrollment = model_cache.get_external_course_enrollment(self.course, self.user)
         if enrollment:
             # if we have a cached enrollment record then we know that we also have the parent course
             # record, where the course_id is stored.
@@ -932,9 +900,7 @@ class LTICacheManager(object):
         ))
 
         # try to find a cached problem record, then return its parent.
-        problem = LTIExternalCourseAssignmentProblems.objects.filter(
-            usage_key=usage_key
-        ).order_by('-created').first()
+        problem = model_cache.get_assignment_problem(self.course_id, usage_key)
         if problem:
             if DEBUG: log.info('LTICacheManager.get_course_assignment() - returning the cached parent assignment object.\n\rproblem: {problem}\n\rassignment: {course_assignment}'.format(
                 problem=problem,
@@ -942,6 +908,17 @@ class LTICacheManager(object):
             ))
             return problem.course_assignment
 
+        # no problem record found, so look up the problem's assignment in the course structure index.
+        index_entry = get_course_index_entry(usage_key)
+        if index_entry:
+            assignment = LTIExternalCourseAssignments.objects.filter(
+                course=self.course,
+                url__in=[index_entry['url'], index_entry['url'] + '/']
+            ).first()
+            if assignment:
+                if DEBUG: log.info('LTICacheManager.get_course_assignment() - returning the cached assignment record from the course structure index.')
+                return assignment
+
         # no problem record found, so look for the most recently-added assignment and
         # assume that this is where the student is currently working.
         #
@@ -986,13 +963,18 @@ class LTICacheManager(object):
 
         # get the due_date for the assignment
         try:
-            rover_course = get_course_by_id(self.course_id)
-            unit = find_course_unit(rover_course, url)
+            index_entry = get_course_index_assignment(self.course_id, willo_id_from_url(url))
+            if index_entry is not None:
+                unit = index_entry['assignment_usage_key']
+                due_date = index_entry['due']
+            else:
+                rover_course = get_course_by_id(self.course_id)
+                unit = find_course_unit(rover_course, url)
+                due_date = unit.due
             log.debug('LTICacheManager.set_course_assignment() - found course unit: {unit}, due date: {due_date}'.format(
                 unit=unit,
-                due_date=unit.due
+                due_date=due_date
             ))
-            due_date = unit.due
             if not due_date:
                 log.info('LTICacheManager.set_course_assignment() - WARNING: no due date for this assignment. Setting to far future.')
                 due_date = datetime.datetime.now() + datetime.timedelta(days=365.25/2)
@@ -1060,9 +1042,7 @@ class LTICacheManager(object):
             course_assignment=course_assignment,
             usage_key=usage_key
         ))
-        problem = LTIExternalCourseAssignmentProblems.objects.filter(
-            usage_key = usage_key
-        )
+        problem = model_cache.get_assignment_problem(self.course_id, usage_key)
         if problem:
             if DEBUG: log.info('LTICacheManager.set_course_assignment_problem() - returning a cached problem record: {problem}'.format(
                 problem=problem
@@ -1248,12 +1228,24 @@ class LTICacheManager(object):
 
         self._user = value
 
-        # initialize properties that depend on user
-        self.is_faculty = is_faculty(self.user)
+        # properties that depend on user are reinitialized on demand. see is_faculty.
+        self._is_faculty = None
 
         # clear, and attempt to reinitialize the enrollment cache.
         self._course_enrollment = None
 
+    @property
+    def is_faculty(self):
+        """is_faculty getter. evaluated lazily because it costs a query, and most
+        grading code paths never need it.
+
+        Returns:
+            bool -- True if the user is a faculty member
+        """
+        if self._is_faculty is None and self._user is not None:
+            self._is_faculty = is_faculty(self._user)
+        return bool(self._is_faculty)
+
     @property
     def course_id(self):
         """course_id getter
@@ -1300,8 +1292,9 @@ class LTICacheManager(object):
         #
         # mcdaniel sep-2020: LTIExternalCourse.course_id is now a fk to LTIInternalCourse
         #
-        lti_internal_course = LTIInternalCourse.objects.filter(course_id=self._course_id).first()
-        self._course = LTIExternalCourse.objects.filter(course_id=lti_internal_course).first()
+        # served from model_cache, which spares both queries on a warm cache.
+        #
+        self._course = model_cache.get_external_course(self._course_id)
         self._course_enrollment = None
 
     @property
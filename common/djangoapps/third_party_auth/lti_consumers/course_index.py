@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed index of the course structure of LTI Grade Sync courses.
+
+Every grade post needs to know the assignment (sequential) and chapter that contain
+the problem that was just graded. Previously this was answered by walking parents
+in the modulestore (utils.get_assignment, utils.get_chapter, utils.get_subsection_chapter),
+and in the case of LTICacheManager.set_course_assignment(), by loading the entire
+course and searching it recursively (utils.find_course_unit).
+
+Instead, the course is read from the modulestore once and every block usage key
+below a sequential is mapped to a small dict describing its assignment and chapter.
+The index is stored in memcached, one entry per usage key, so lookups are a pair of
+cache gets regardless of the size of the course.
+
+The entries of a course live under a version token. When a course is published the
+token is deleted, which invalidates the whole index at once, and the index is rebuilt
+asynchronously (see signals.py and tasks.build_course_index). A lookup that finds no
+token rebuilds the index on the spot.
+
+Example entry:
+    {
+        'usage_key': 'block-v1:ABC+OS9471721_9626+01+type@problem+block@1',
+        'assignment_usage_key': 'block-v1:ABC+OS9471721_9626+01+type@sequential+block@c8bc91313af211e98026b7d76f928163',
+        'assignment_id': 'c8bc91313af211e98026b7d76f928163',
+        'chapter_id': 'c0a9afb73af311e98367b7d76f928163',
+        'display_name': 'Getting to Know Rover Review Assignment',
+        'due': datetime.datetime(2020, 1, 17, 20, 33, 14, tzinfo=<UTC>),
+        'url': 'https://dev.roverbyopenstax.org/courses/course-v1:ABC+OS9471721_9626+01/courseware/c0a9afb73af311e98367b7d76f928163/c8bc91313af211e98026b7d76f928163',
+        'activity_id': 'gettingtoknowroverreviewassignment'
+    }
+"""
+from __future__ import absolute_import
+
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from opaque_keys.edx.keys import UsageKey
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore
+
+from .api import willo_api_activity_id_from_string
+
+log = logging.getLogger(__name__)
+DEBUG = settings.ROVER_DEBUG
+
+COURSE_INDEX_CACHE_VERSION = 1
+COURSE_INDEX_KEY_PREFIX = 'third_party_auth.lti_consumers.course_index'
+COURSE_INDEX_TIMEOUT = 60 * 60 * 24 * 7     # one week. Rebuilt on demand once it expires.
+
+
+def get_course_index_entry(usage_key):
+    """
+    Return the index entry for a block usage key, or None if the block is not
+    inside an assignment of a published course.
+
+    usage_key: a UsageKey, or its string representation
+    """
+    if not isinstance(usage_key, UsageKey):
+        usage_key = UsageKey.from_string(usage_key)
+    usage_key = _version_agnostic(usage_key)
+    course_key = usage_key.course_key
+
+    version = cache.get(_version_key(course_key), version=COURSE_INDEX_CACHE_VERSION)
+    if version is None:
+        version = build_course_index(course_key)
+        if version is None:
+            return None
+
+    return cache.get(_entry_key(version, usage_key), version=COURSE_INDEX_CACHE_VERSION)
+
+
+def get_course_index_assignment(course_key, assignment_id):
+    """
+    Return the index entry of an assignment (sequential), given the block_id
+    that is the right-most segment of its url. See utils.willo_id_from_url().
+    """
+    return get_course_index_entry(course_key.make_usage_key('sequential', assignment_id))
+
+
+def build_course_index(course_key):
+    """
+    Read the published course from the modulestore in one pass and index every
+    block below each of its sequentials, the sequentials included.
+
+    Returns the version token of the new index, or None if the course was not found.
+    """
+    course_key = _version_agnostic(course_key)
+    store = modulestore()
+    with store.branch_setting(ModuleStoreEnum.Branch.published_only, course_key), store.bulk_operations(course_key):
+        course = store.get_course(course_key, depth=None)
+        if course is None:
+            log.warning('lti_consumers.course_index.build_course_index() - course not found: {course_key}'.format(
+                course_key=course_key
+            ))
+            return None
+
+        version = uuid.uuid4().hex
+        entries = {}
+        for chapter in course.get_children():
+            for sequential in chapter.get_children():
+                assignment = _assignment_dict(course_key, chapter, sequential)
+                blocks = [sequential]
+                while blocks:
+                    block = blocks.pop()
+                    location = _version_agnostic(block.location)
+                    entries[_entry_key(version, location)] = dict(assignment, usage_key=str(location))
+                    blocks.extend(block.get_children())
+
+    cache.set_many(entries, timeout=COURSE_INDEX_TIMEOUT, version=COURSE_INDEX_CACHE_VERSION)
+    cache.set(_version_key(course_key), version, timeout=COURSE_INDEX_TIMEOUT, version=COURSE_INDEX_CACHE_VERSION)
+
+    if DEBUG: log.info('lti_consumers.course_index.build_course_index() - indexed {n} blocks for {course_key}'.format(
+        n=len(entries),
+        course_key=course_key
+    ))
+    return version
+
+
+def clear_course_index(course_key):
+    """
+    Invalidate the index of a course. The orphaned entries expire on their own.
+    """
+    cache.delete(_version_key(_version_agnostic(course_key)), version=COURSE_INDEX_CACHE_VERSION)
+
+
+def _assignment_dict(course_key, chapter, sequential):
+    url = u'{scheme}://{host}/{url_prefix}/{course_id}/courseware/{chapter_id}/{assignment_id}'.format(
+        scheme=u"https" if settings.HTTPS == "on" else u"http",
+        host=settings.SITE_NAME,
+        url_prefix=u"courses",
+        course_id=course_key,
+        chapter_id=chapter.location.block_id,
+        assignment_id=sequential.location.block_id
+    )
+    display_name = sequential.display_name or u''
+    return {
+        'assignment_usage_key': str(_version_agnostic(sequential.location)),
+        'assignment_id': sequential.location.block_id,
+        'chapter_id': chapter.location.block_id,
+        'display_name': display_name,
+        'due': sequential.due,
+        'url': url,
+        'activity_id': willo_api_activity_id_from_string(display_name),
+    }
+
+
+def _version_agnostic(key):
+    """
+    Strip branch and version information from a split modulestore key, so that draft,
+    published and versioned keys of the same block share one index entry.
+    """
+    try:
+        return key.for_branch(None).version_agnostic()
+    except (AttributeError, NotImplementedError):
+        return key
+
+
+def _version_key(course_key):
+    return '{prefix}.{course_key}.version'.format(prefix=COURSE_INDEX_KEY_PREFIX, course_key=course_key)
+
+
+def _entry_key(version, usage_key):
+    # usage keys are long and contain characters that memcached dislikes, so we hash them.
+    return '{prefix}.{version}.{digest}'.format(
+        prefix=COURSE_INDEX_KEY_PREFIX,
+        version=version,
+        digest=hashlib.md5(str(usage_key).encode('utf-8')).hexdigest()
+    )
@@ -12,3 +12,10 @@ class DatabaseNotReadyError(IOError):
     the data we're trying to find.
     """
     pass
+
+class LTIGradePostError(IOError):
+    """
+    Raised when the Willo Labs api does not accept a grade column or a grade post,
+    so that the caller retries the post, or parks it in the outbox.
+    """
+    pass
@@ -6,27 +6,33 @@ https://lawrencemcdaniel.com
 
 """
 from __future__ import absolute_import
+import threading
 import traceback
 import datetime
 import pytz
 
 from django.conf import settings
+from django.core.cache import cache
 
 from student.models import CourseEnrollment
 from opaque_keys.edx.keys import CourseKey
-from lms.djangoapps.grades.api.v2.views import InternalCourseGradeView
+from lms.djangoapps.grades.course_grade_factory import CourseGradeFactory
+from lms.djangoapps.querium.grades_api.v1.views import InternalCourseGradeView
+from openedx.core.djangoapps.content.block_structure.api import get_block_structure_manager
 
 from .exceptions import LTIBusinessRuleError
-from .models import LTIExternalCourse
+from .models import LTIExternalCourse, LTIExternalCourseEnrollment
 from .utils import is_valid_course_id, willo_id_from_url
 from .api import (
     willo_api_activity_id_from_string,
     willo_api_date,
     willo_api_post_grade,
+    willo_api_prefetch_outcomes,
     willo_api_create_column,
     willo_canvas_assignment_group,
     WILLO_API_POST_GRADE_SKIPPED
 )
+from .api_client import willo_api_map
 from .lti_params import (
     get_ext_wl_outcome_service_url,
     get_lti_user_id,
@@ -39,6 +45,12 @@ utc=pytz.UTC
 VERBOSE=False
 DEBUG = settings.ROVER_DEBUG
 
+# number of students whose course grades are read together in bulk mode. Progress is
+# checkpointed after each chunk, so this is also the most work that a resumed run repeats.
+GRADESYNC_BULK_CHUNK_SIZE = getattr(settings, 'ROVER_LTI_GRADESYNC_BULK_CHUNK_SIZE', 50)
+GRADESYNC_CHECKPOINT_TIMEOUT = 60 * 60 * 24 * 7     # one week
+GRADESYNC_CHECKPOINT_KEY_PREFIX = 'third_party_auth.lti_consumers.gradesync.checkpoint'
+
 class color:
    PURPLE = '\033[95m'
    CYAN = '\033[96m'
@@ -70,8 +82,19 @@ class LTIGradeSync:
     course_key = None       # a opaque_keys.edx.keys.CourseKey
     context_id = None       # LTI consumer course identifier. Only used in cases where course_id is not unique. Example: e14751571da04dd3a2c71a311dda2e1b
     cached_results = True
-
-    def __init__(self, course_id=None, cached_results=True):
+    max_workers = 1         # number of assignments (or in bulk mode, students) to post to Willo concurrently. See api_client.willo_api_map()
+    bulk = False            # read grades in chunks via CourseGradeFactory().iter() rather than one student at a time
+    chunk_size = GRADESYNC_BULK_CHUNK_SIZE
+    resume = True           # in bulk mode, skip students that were processed by an earlier, interrupted run
+
+    def __init__(self, course_id=None, cached_results=True, max_workers=1, bulk=False, chunk_size=None, resume=True):
+        self.max_workers = max_workers
+        self.prefetched_columns = set()     # (ext_wl_outcome_service_url, activity_id) of Willo grade columns already read in bulk
+        self.prefetch_lock = threading.Lock()
+        self.bulk = bulk
+        self.resume = resume
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
         if course_id is not None:
             self.course_id = course_id
             self.course_key = self.get_validated_coursekey()
@@ -94,11 +117,15 @@ class LTIGradeSync:
             with a CourseKey from a confirmed LTI Consumer supported course
             (since the course came directly from the LTI course cache.)
             """
+            if course.course_id is None: continue
             course_id = "{}".format(course.course_id)
             self.context_id = course.context_id
             self.course_id = course_id
-            self.course_key = course.course_id
-            self.iterate_students()
+            self.course_key = CourseKey.from_string(course_id)
+            if self.bulk:
+                self.iterate_students_bulk()
+            else:
+                self.iterate_students()
 
 
     def iterate_students(self):
@@ -122,11 +149,92 @@ class LTIGradeSync:
 
         return None
 
-    def verify_lti_cache(self, student):
+    def iterate_students_bulk(self):
+        """
+         Bulk variation of iterate_students() for large course sections.
+
+         - the collected course block structure is loaded once and shared by every student.
+         - course grades are read chunk_size students at a time via CourseGradeFactory().iter().
+         - each chunk of students is posted to the LTI Consumer over a thread pool
+           of max_workers (see api_client.willo_api_map).
+         - students are processed in user id order, and the last user id of each completed
+           chunk is checkpointed in the cache. If the run is interrupted then the next run
+           resumes after the checkpoint, unless resume is False.
+        """
+        if not self.course_key: raise LTIBusinessRuleError("course_id has not been set.")
+
+        students = CourseEnrollment.objects.users_enrolled_in(self.course_key).order_by('id')
+        checkpoint = self.get_checkpoint() if self.resume else None
+        if checkpoint is not None:
+            students = students.filter(id__gt=checkpoint)
+            self.console_output(u'Resuming after user id {checkpoint}.'.format(checkpoint=checkpoint), text_style=style.NOTICE)
+
+        self.write_course_banner()
+
+        collected_block_structure = get_block_structure_manager(self.course_key).get_collected()
+        student_ids = list(students.values_list('id', flat=True))
+        for offset in range(0, len(student_ids), self.chunk_size):
+            chunk = list(students.filter(id__in=student_ids[offset:offset + self.chunk_size]))
+            grade_results = list(CourseGradeFactory().iter(
+                users=chunk,
+                course_key=self.course_key,
+                collected_block_structure=collected_block_structure
+            ))
+            willo_api_map(self.verify_lti_cache_bulk, grade_results, max_workers=self.max_workers)
+            self.set_checkpoint(chunk[-1].id)
+            self.console_output(u'    iterate_students_bulk() - processed {processed} of {total} students.'.format(
+                processed=min(offset + self.chunk_size, len(student_ids)),
+                total=len(student_ids)
+            ))
+
+        self.clear_checkpoint()
+        self.write_course_banner(done=True)
+
+        return None
+
+    def verify_lti_cache_bulk(self, grade_result):
+        """
+         Post the grades of one CourseGradeFactory.GradeResult. Runs on a worker thread.
+        """
+        student, course_grade, err = grade_result
+        self.write_student_banner(student.username)
+        if course_grade is None:
+            msg = u'    Could not read the course grade for {username}. Error: {err}'.format(
+                username=student.username,
+                err=err
+            )
+            self.console_output(msg, text_style=style.ERROR)
+            return None
+
+        try:
+            if not is_lti_cached_user(student, self.context_id):
+                self.console_output(u'    No LTI cache data for this user. Skipping.')
+                return None
+
+            results = InternalCourseGradeView().get_from_course_grade(
+                course_id=self.course_id,
+                grade_user=student,
+                course_grade=course_grade
+            )
+            # students are already being posted concurrently, so post each student's
+            # assignments serially rather than nesting a second thread pool.
+            self.verify_lti_cache(student, results=results, max_workers=1)
+        except Exception as err:
+            msg='Exception encountered while processing Rover student {username}. Error: {err}.\r\n{traceback}'.format(
+                username=student.username,
+                err=err,
+                traceback=traceback.format_exc()
+            )
+            self.console_output(msg, text_style=style.ERROR)
+
+    def verify_lti_cache(self, student, results=None, max_workers=None):
         """
          Retrieve a json object of grade data for student.
          Iterate through chapters / assignments for the course.
          Post each assignment grade to LTI Consumer api.
+
+         results: optional, the json object from InternalCourseGradeView if the
+         caller has already retrieved it.
         """
 
         if not self.course_key: raise LTIBusinessRuleError("CourseKey has not been set.")
@@ -139,11 +247,12 @@ class LTIGradeSync:
             self.console_output(u'    No LTI cache data for this user. Skipping.')
             return None
 
-        results = InternalCourseGradeView().get(course_id=self.course_id, username=student.username)
-        self.console_output(u'    verify_lti_cache() - retrieved grades for {username} / {course_id}'.format(
-            username=student.username,
-            course_id=self.course_id
-        ))
+        if results is None:
+            results = InternalCourseGradeView().get(course_id=self.course_id, grade_user=student.username)
+            self.console_output(u'    verify_lti_cache() - retrieved grades for {username} / {course_id}'.format(
+                username=student.username,
+                course_id=self.course_id
+            ))
 
         # only process the course if courses have actually begun.
         enrollment_start = results.get('course_enrollment_start')
@@ -159,19 +268,28 @@ class LTIGradeSync:
         #
         # chapters and chapter sections are both stored as dictionaries of key/value pairs,
         # with the "value" itself being a dictionary.
-        for key, chapter in results['course_chapters'].items():
-            for key, section in chapter['chapter_sections'].items():
-                if self.should_gradesync_assignment(section):
-                    try:
-                        self.prepare_and_post_column(section)
-                        self.prepare_and_post_grade(student, section)
-                    except Exception as err:
-                        msg='Exception encountered while processing Rover student {username}. Error: {err}.\r\n{traceback}'.format(
-                            username=student.username,
-                            err=err,
-                            traceback=traceback.format_exc()
-                        )
-                        self.console_output(msg, text_style=style.ERROR)
+        sections = [
+            section
+            for chapter in results['course_chapters'].values()
+            for section in chapter['chapter_sections'].values()
+            if self.should_gradesync_assignment(section)
+        ]
+
+        def post_section(section):
+            try:
+                self.prepare_and_post_column(section)
+                self.prepare_and_post_grade(student, section)
+            except Exception as err:
+                msg='Exception encountered while processing Rover student {username}. Error: {err}.\r\n{traceback}'.format(
+                    username=student.username,
+                    err=err,
+                    traceback=traceback.format_exc()
+                )
+                self.console_output(msg, text_style=style.ERROR)
+
+        if max_workers is None:
+            max_workers = self.max_workers
+        willo_api_map(post_section, sections, max_workers=max_workers)
 
 
     def prepare_and_post_grade(self, student, section):
@@ -197,6 +315,7 @@ class LTIGradeSync:
             section_due_date=section.get('section_due_date')
         )
 
+        self.prefetch_column_outcomes(url, willo_api_activity_id_from_string(section.get('section_display_name')))
         data = {
             "type": "result",
             "id": willo_id_from_url(section.get('section_url')),
@@ -232,10 +351,25 @@ class LTIGradeSync:
                 section_completed_date=section.get('section_completed_date'),
                 section_due_date=section.get('section_due_date')
             )
-            self.console_output(result_string, text_style=style.ERROR)
+            self.console_output(msg, text_style=style.ERROR)
 
         return (200 <= retval <= 299)
 
+    def prefetch_column_outcomes(self, url, activity_id):
+        """
+         The first time that a grade column is seen, read all of its existing Willo results in
+         one api call. willo_api_post_grade() then diffs each student's grade against memcached
+         instead of making its own GET, and only posts grades that have changed.
+        """
+        if not self.cached_results: return
+        with self.prefetch_lock:
+            if (url, activity_id) in self.prefetched_columns: return
+            self.prefetched_columns.add((url, activity_id))
+            lti_user_ids = LTIExternalCourseEnrollment.objects.filter(
+                course__context_id=self.context_id
+            ).values_list('lti_user_id', flat=True)
+            willo_api_prefetch_outcomes(url=url, assignment_id=activity_id, user_ids=list(lti_user_ids))
+
     def prepare_and_post_column(self, section):
         """
          Transform the section grade data into a Willo Labs Column payload dictionary, then post the column.
@@ -243,7 +377,7 @@ class LTIGradeSync:
         section_grade = section.get('section_grade')
 
         url = get_ext_wl_outcome_service_url(self.course_id, self.context_id)
-        canvas_assignment_group, canvas_assignment_group_weight = willo_canvas_assignment_group(key=lti_cached_assignment.display_name)
+        canvas_assignment_group, canvas_assignment_group_weight = willo_canvas_assignment_group(key=section.get('section_display_name'))
         data = {
             "type": "activity",
             "id": willo_api_activity_id_from_string(section.get('section_display_name')),
@@ -364,6 +498,26 @@ class LTIGradeSync:
             course_id=self.course_id
         ))
 
+    def get_checkpoint(self):
+        """
+         The user id of the last student processed by an interrupted bulk run
+         of this course / context_id, or None.
+        """
+        return cache.get(self._checkpoint_key())
+
+    def set_checkpoint(self, user_id):
+        cache.set(self._checkpoint_key(), user_id, timeout=GRADESYNC_CHECKPOINT_TIMEOUT)
+
+    def clear_checkpoint(self):
+        cache.delete(self._checkpoint_key())
+
+    def _checkpoint_key(self):
+        return '{prefix}.{course_id}.{context_id}'.format(
+            prefix=GRADESYNC_CHECKPOINT_KEY_PREFIX,
+            course_id=self.course_id,
+            context_id=self.context_id
+        )
+
     def get_courses(self):
         if self.context_id is not None:
             return LTIExternalCourse.objects.filter(
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing queue for Willo Labs grade posts.
+
+lms.djangoapps.grades.tasks._update_subsection_grades() runs once for every graded
+problem submission. During exams this produces many grade posts for the same
+(student, assignment) pair within a few seconds, and every one of them recomputes
+the subsection grade and makes a GET + POST round trip to the Willo api.
+
+Instead, each submission is parked in memcached under a key made of
+(username, assignment, context_id). Repeat submissions for the same key within the
+debounce window overwrite the pending entry and are counted as collapsed. One
+Celery task per time bucket then flushes the latest grade for every pending key,
+in batches. Entries are removed only after their grade has been posted.
+
+memcached cannot enumerate keys, so each time bucket keeps an atomic slot counter
+(cache.incr) plus one slot record per pending key. The flush task reads the slot
+records to find the pending keys for its bucket.
+
+The actual scheduling and posting lives in tasks.py. This module only manages the
+memcached bookkeeping so that it does not depend on Celery.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+DEBUG = settings.ROVER_DEBUG
+
+# elapsed seconds that a (user, assignment, context_id) grade post is held back so that
+# rapid successive submissions collapse into a single post. 0 disables the queue.
+GRADESYNC_QUEUE_DEBOUNCE_SECONDS = getattr(settings, 'ROVER_LTI_GRADESYNC_DEBOUNCE_SECONDS', 30)
+
+# max number of pending grade posts processed by a single flush task.
+GRADESYNC_QUEUE_BATCH_SIZE = getattr(settings, 'ROVER_LTI_GRADESYNC_BATCH_SIZE', 50)
+
+GRADESYNC_QUEUE_CACHE_VERSION = 1
+GRADESYNC_QUEUE_KEY_PREFIX = 'third_party_auth.lti_consumers.gradesync_queue'
+GRADESYNC_QUEUE_STATS = ('enqueued', 'collapsed', 'flushed', 'posted', 'failed')
+
+
+def is_gradesync_queue_enabled():
+    """
+    True if grade posts should be debounced through the coalescing queue
+    rather than posted immediately.
+    """
+    return GRADESYNC_QUEUE_DEBOUNCE_SECONDS > 0
+
+
+def pending_key(username, assignment_id, context_id):
+    """
+    memcached key for the pending grade post of one student / assignment / context_id.
+    Usage keys are long and contain characters that memcached dislikes, so we hash them.
+    """
+    raw = u'{username}|{assignment_id}|{context_id}'.format(
+        username=username,
+        assignment_id=assignment_id,
+        context_id=context_id
+    )
+    return '{prefix}.pending.{digest}'.format(
+        prefix=GRADESYNC_QUEUE_KEY_PREFIX,
+        digest=hashlib.md5(raw.encode('utf-8')).hexdigest()
+    )
+
+
+def bucket_id(timestamp=None):
+    """
+    The time bucket into which a new pending entry is placed.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    return int(timestamp // GRADESYNC_QUEUE_DEBOUNCE_SECONDS)
+
+
+def bucket_flush_countdown(bucket, timestamp=None):
+    """
+    Seconds from now until a bucket should be flushed. Entries added anywhere in the
+    bucket are held for at least one full debounce window.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    flush_at = (bucket + 2) * GRADESYNC_QUEUE_DEBOUNCE_SECONDS
+    return max(int(flush_at - timestamp), 0)
+
+
+def add_pending(username, course_id, usage_id, assignment_id, context_id):
+    """
+    Park a grade post in the queue.
+
+    Returns:
+        (bucket, slot) if this is a new pending entry, in which case slot == 1
+        means that the caller is responsible for scheduling the flush of the bucket.
+        None if the submission was collapsed into an existing pending entry.
+    """
+    now = time.time()
+    key = pending_key(username, assignment_id, context_id)
+    timeout = _entry_timeout()
+    entry = {
+        'username': username,
+        'course_id': course_id,
+        'usage_id': usage_id,
+        'assignment_id': assignment_id,
+        'context_id': context_id,
+        'first_seen': now,
+        'last_seen': now,
+        'submissions': 1,
+    }
+
+    # cache.add() is atomic, so exactly one submission wins the race to create the entry.
+    if cache.add(key, entry, timeout=timeout, version=GRADESYNC_QUEUE_CACHE_VERSION):
+        bucket = bucket_id(now)
+        counter_key = _slot_counter_key(bucket)
+        slot = _next_slot(counter_key, timeout)
+        cache.set(_slot_key(bucket, slot), key, timeout=timeout, version=GRADESYNC_QUEUE_CACHE_VERSION)
+        incr_stat('enqueued')
+        if DEBUG: log.info('gradesync_queue.add_pending() - queued username: {username}, assignment_id: {assignment_id}, bucket: {bucket}, slot: {slot}'.format(
+            username=username,
+            assignment_id=assignment_id,
+            bucket=bucket,
+            slot=slot
+        ))
+        return bucket, slot
+
+    pending = cache.get(key, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    if pending is None:
+        # the entry was flushed between add() and get(). Start a new one.
+        return add_pending(username, course_id, usage_id, assignment_id, context_id)
+
+    pending['usage_id'] = usage_id
+    pending['last_seen'] = now
+    pending['submissions'] = pending.get('submissions', 1) + 1
+    cache.set(key, pending, timeout=timeout, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    incr_stat('collapsed')
+    if DEBUG: log.info('gradesync_queue.add_pending() - collapsed username: {username}, assignment_id: {assignment_id}, submissions: {submissions}'.format(
+        username=username,
+        assignment_id=assignment_id,
+        submissions=pending['submissions']
+    ))
+    return None
+
+
+def get_pending(bucket, offset=0, batch_size=None):
+    """
+    Read up to batch_size pending entries from a bucket, starting after slot number
+    offset. The entries are left in place: the caller removes each one with
+    remove_pending() once its grade has been posted, and then the slots with
+    remove_slots(), so that a worker that dies mid-batch leaves the rest of the
+    batch for the redelivered task.
+
+    Returns:
+        (entries, slot_keys, slot_count) -- a dict of pending entry dicts by their
+        pending key, the slot keys that were read, and the total number of slots that
+        were allocated in this bucket.
+    """
+    if batch_size is None:
+        batch_size = GRADESYNC_QUEUE_BATCH_SIZE
+
+    slot_count = cache.get(_slot_counter_key(bucket), default=0, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    last_slot = min(offset + batch_size, slot_count)
+    slot_keys = [_slot_key(bucket, slot) for slot in range(offset + 1, last_slot + 1)]
+    if not slot_keys:
+        return {}, [], slot_count
+
+    keys = list(cache.get_many(slot_keys, version=GRADESYNC_QUEUE_CACHE_VERSION).values())
+    entries = cache.get_many(keys, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    return entries, slot_keys, slot_count
+
+
+def remove_pending(key, entry):
+    """
+    Remove a pending entry read by get_pending() after its grade was posted.
+
+    A submission that collapsed into the entry after it was read may not be
+    reflected in the grade that was posted, so in that case the entry is moved to
+    a new bucket rather than removed.
+
+    Returns:
+        (bucket, slot) if the entry was moved, as for add_pending(), None otherwise.
+    """
+    current = cache.get(key, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    cache.delete(key, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    if current is None or current.get('last_seen') == entry.get('last_seen'):
+        return None
+    return add_pending(
+        username=current['username'],
+        course_id=current['course_id'],
+        usage_id=current['usage_id'],
+        assignment_id=current['assignment_id'],
+        context_id=current['context_id']
+    )
+
+
+def remove_slots(slot_keys):
+    """
+    Remove the slot records of a batch read by get_pending().
+    """
+    cache.delete_many(slot_keys, version=GRADESYNC_QUEUE_CACHE_VERSION)
+
+
+def incr_stat(name, delta=1):
+    """
+    Increment one of the cumulative GRADESYNC_QUEUE_STATS counters.
+    """
+    if delta <= 0:
+        return
+    key = _stat_key(name)
+    cache.add(key, 0, timeout=None, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    try:
+        cache.incr(key, delta, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    except ValueError:
+        # the counter was evicted between add() and incr()
+        cache.set(key, delta, timeout=None, version=GRADESYNC_QUEUE_CACHE_VERSION)
+
+
+def get_stats():
+    """
+    Cumulative queue counters. 'collapsed' is the number of grade posts to Willo
+    that were avoided.
+    """
+    values = cache.get_many([_stat_key(name) for name in GRADESYNC_QUEUE_STATS], version=GRADESYNC_QUEUE_CACHE_VERSION)
+    return {name: values.get(_stat_key(name), 0) for name in GRADESYNC_QUEUE_STATS}
+
+
+def reset_stats():
+    """
+    Zero the cumulative queue counters.
+    """
+    cache.delete_many([_stat_key(name) for name in GRADESYNC_QUEUE_STATS], version=GRADESYNC_QUEUE_CACHE_VERSION)
+
+
+def _next_slot(counter_key, timeout):
+    """
+    Allocate the next slot number of a bucket.
+    """
+    cache.add(counter_key, 0, timeout=timeout, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    try:
+        return cache.incr(counter_key, version=GRADESYNC_QUEUE_CACHE_VERSION)
+    except ValueError:
+        # the counter was evicted between add() and incr(). Start it over, unless
+        # another submission beat us to it.
+        if cache.add(counter_key, 1, timeout=timeout, version=GRADESYNC_QUEUE_CACHE_VERSION):
+            return 1
+        return cache.incr(counter_key, version=GRADESYNC_QUEUE_CACHE_VERSION)
+
+
+def _entry_timeout():
+    """
+    Pending entries and slot records outlive their flush by a comfortable margin
+    so that a slow Celery queue does not cause them to expire unflushed.
+    """
+    return GRADESYNC_QUEUE_DEBOUNCE_SECONDS * 20
+
+
+def _slot_counter_key(bucket):
+    return '{prefix}.bucket.{bucket}.count'.format(prefix=GRADESYNC_QUEUE_KEY_PREFIX, bucket=bucket)
+
+
+def _slot_key(bucket, slot):
+    return '{prefix}.bucket.{bucket}.slot.{slot}'.format(prefix=GRADESYNC_QUEUE_KEY_PREFIX, bucket=bucket, slot=slot)
+
+
+def _stat_key(name):
+    return '{prefix}.stats.{name}'.format(prefix=GRADESYNC_QUEUE_KEY_PREFIX, name=name)
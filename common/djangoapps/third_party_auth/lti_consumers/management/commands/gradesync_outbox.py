@@ -0,0 +1,125 @@
+"""
+  LTI Grade Sync.
+  Command line tool to inspect and replay the outbox of grade posts that did not
+  reach Willo Labs (see outbox.py).
+
+  Usage:
+    sudo -H -u edxapp bash
+    cd ~
+    source edxapp_env
+    source venvs/edxapp/bin/activate
+    cd edx-platform
+    python manage.py lms gradesync_outbox stats
+    python manage.py lms gradesync_outbox list --course_id course-v1:ABC+OS9471721_9626+01
+    python manage.py lms gradesync_outbox replay --rate 2 --batch-size 50
+    python manage.py lms gradesync_outbox replay --username 091bacd864ee84f91e24611c54867a --include-failed
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from opaque_keys.edx.keys import CourseKey
+
+from common.djangoapps.third_party_auth.lti_consumers.outbox import (
+    GRADESYNC_OUTBOX_BATCH_SIZE,
+    GRADESYNC_OUTBOX_MAX_ATTEMPTS,
+    GRADESYNC_OUTBOX_POSTS_PER_SECOND,
+    get_posts,
+    get_stats,
+    replay
+    )
+
+VALID_COMMANDS = ['stats', 'list', 'replay']
+
+
+class Command(BaseCommand):
+    help = u"LTI Grade Sync. Reports on, and replays, grade posts that failed to reach Willo Labs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'command',
+            type=str,
+            help='valid commands: stats, list, replay'
+            )
+        parser.add_argument(
+            u'-c',
+            u'--course_id',
+            type=str,
+            help=u'Only grade posts of this course. Example: course-v1:ABC+OS9471721_9626+01'
+            )
+        parser.add_argument(
+            u'-u',
+            u'--username',
+            type=str,
+            help=u'Only grade posts of this Rover username.'
+            )
+        parser.add_argument(
+            u'--include-failed',
+            action='store_true',
+            help=u'Also replay posts that were given up on after {n} attempts.'.format(n=GRADESYNC_OUTBOX_MAX_ATTEMPTS)
+            )
+        parser.add_argument(
+            u'--limit',
+            type=int,
+            help=u'Replay at most this many posts.'
+            )
+        parser.add_argument(
+            u'--batch-size',
+            type=int,
+            default=GRADESYNC_OUTBOX_BATCH_SIZE,
+            help=u'Number of outbox rows read per query.'
+            )
+        parser.add_argument(
+            u'--rate',
+            type=float,
+            default=GRADESYNC_OUTBOX_POSTS_PER_SECOND,
+            help=u'Maximum grade posts per second. 0 for no limit.'
+            )
+        parser.add_argument(
+            u'--dry-run',
+            action='store_true',
+            help=u'List what would be replayed without posting anything.'
+            )
+
+    def handle(self, *args, **kwargs):
+        cmd = kwargs['command'].lower()
+
+        if cmd not in VALID_COMMANDS:
+            print('Valid commands include: {commands}'.format(
+                commands=json.dumps(VALID_COMMANDS)
+            ))
+            return
+
+        if cmd == 'stats':
+            print(json.dumps(get_stats(), indent=4, sort_keys=True))
+            return
+
+        course_id = CourseKey.from_string(kwargs['course_id']) if kwargs['course_id'] else None
+        posts = get_posts(
+            course_id=course_id,
+            username=kwargs['username'],
+            include_failed=kwargs['include_failed'] or cmd == 'list'
+        )
+
+        if cmd == 'list':
+            for post in posts[:kwargs['limit']] if kwargs['limit'] else posts:
+                print('{status}\t{attempts}\t{modified}\t{username}\t{usage_id}\t{last_error}'.format(
+                    status=post.status,
+                    attempts=post.attempts,
+                    modified=post.modified,
+                    username=post.username,
+                    usage_id=post.usage_id,
+                    last_error=post.last_error
+                ))
+            return
+
+        if kwargs['rate'] < 0:
+            raise CommandError('--rate must be 0 or more.')
+
+        counts = replay(
+            posts,
+            limit=kwargs['limit'],
+            batch_size=kwargs['batch_size'],
+            posts_per_second=kwargs['rate'],
+            dry_run=kwargs['dry_run']
+        )
+        print(json.dumps(counts, indent=4, sort_keys=True))
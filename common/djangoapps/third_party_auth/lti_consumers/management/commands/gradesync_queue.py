@@ -0,0 +1,57 @@
+"""
+  LTI Grade Sync.
+  Command line tool to report on the Willo grade post coalescing queue.
+
+  Usage:
+    sudo -H -u edxapp bash
+    cd ~
+    source edxapp_env
+    source venvs/edxapp/bin/activate
+    cd edx-platform
+    python manage.py lms gradesync_queue stats
+    python manage.py lms gradesync_queue reset
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from common.djangoapps.third_party_auth.lti_consumers.gradesync_queue import (
+    GRADESYNC_QUEUE_BATCH_SIZE,
+    GRADESYNC_QUEUE_DEBOUNCE_SECONDS,
+    get_stats,
+    reset_stats
+    )
+
+VALID_COMMANDS = ['stats', 'reset']
+
+
+class Command(BaseCommand):
+    help = u"LTI Grade Sync. Reports how many Willo grade posts were collapsed by the coalescing queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'command',
+            type=str,
+            help='valid commands: stats, reset'
+            )
+
+    def handle(self, *args, **kwargs):
+        cmd = kwargs['command'].lower()
+
+        if cmd not in VALID_COMMANDS:
+            print('Valid commands include: {commands}'.format(
+                commands=json.dumps(VALID_COMMANDS)
+            ))
+            return
+
+        if cmd == 'reset':
+            reset_stats()
+            print('Grade post queue counters were reset.')
+            return
+
+        stats = get_stats()
+        print('debounce seconds: {debounce}, batch size: {batch_size}'.format(
+            debounce=GRADESYNC_QUEUE_DEBOUNCE_SECONDS,
+            batch_size=GRADESYNC_QUEUE_BATCH_SIZE
+        ))
+        print(json.dumps(stats, indent=4, sort_keys=True))
@@ -16,6 +16,10 @@ u"""
     cd edx-platform
     python manage.py lms --settings production willo_resync --dry-run --course_id course-v1:edX+DemoX+Demo_Course
 
+  Bulk mode recalculates grades from the courseware rather than reposting cached grade data.
+  Grades are read in chunks, and an interrupted run resumes where it stopped:
+    python manage.py lms --settings production willo_resync --bulk --workers 8 --chunk-size 50 --course_id course-v1:edX+DemoX+Demo_Course
+
 
 """
 from django.conf import settings
@@ -25,6 +29,13 @@ from django.core.management.base import BaseCommand
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 
 from common.djangoapps.third_party_auth.lti_consumers.tasks import post_grades
+from common.djangoapps.third_party_auth.lti_consumers.api_client import willo_api_map, WILLO_API_MAX_WORKERS
+from common.djangoapps.third_party_auth.lti_consumers.gradesync import LTIGradeSync, GRADESYNC_BULK_CHUNK_SIZE
+from common.djangoapps.third_party_auth.lti_consumers.api import (
+    willo_api_date,
+    willo_api_grade_should_post,
+    willo_api_prefetch_outcomes
+)
 from common.djangoapps.third_party_auth.lti_consumers.models import (
     LTIInternalCourse,
     LTIExternalCourse,
@@ -34,7 +45,7 @@ from common.djangoapps.third_party_auth.lti_consumers.models import (
 )
 
 
-from ...utils import get_lti_courses
+from ...utils import get_lti_courses, willo_id_from_url
 
 VERBOSE = False
 DEBUG = settings.ROVER_DEBUG
@@ -83,12 +94,56 @@ class Command(BaseCommand):
             action='store_true',
             help='Optional: Forces Willo Grade Sync on grades that were previously sent. That is, the "Sync" date field on LTIExternalCourseEnrollmentGrades is not null.')
 
+        parser.add_argument(
+            u'-w',
+            u'--workers',
+            dest='workers',
+            type=int,
+            default=WILLO_API_MAX_WORKERS,
+            help=u'Optional: number of grades to post to Willo Labs concurrently. Default: {workers}'.format(workers=WILLO_API_MAX_WORKERS))
+
+        parser.add_argument(
+            u'-b',
+            u'--bulk',
+            dest='bulk',
+            action='store_true',
+            help='Optional: Recalculates and posts the grades of every enrolled student via LTIGradeSync, reading course grades in chunks. Resumes an interrupted run.')
+
+        parser.add_argument(
+            u'--chunk-size',
+            dest='chunk_size',
+            type=int,
+            default=GRADESYNC_BULK_CHUNK_SIZE,
+            help=u'Optional: with --bulk, number of students whose grades are read and checkpointed together. Default: {chunk_size}'.format(chunk_size=GRADESYNC_BULK_CHUNK_SIZE))
+
+        parser.add_argument(
+            u'--restart',
+            dest='restart',
+            action='store_true',
+            help='Optional: with --bulk, ignores the checkpoint of an interrupted run and starts from the first student.')
 
     def handle(self, *args, **kwargs):
 
         course_id=kwargs['course_id']
         dry_run=kwargs['dry_run']
         force_resync=kwargs['force_resync']
+        self.workers=kwargs['workers']
+
+        if kwargs['bulk']:
+            if dry_run:
+                print('--dry-run is not supported with --bulk. Exiting.')
+                return None
+            grade_sync = LTIGradeSync(
+                course_id=course_id,
+                cached_results=not force_resync,
+                max_workers=self.workers,
+                bulk=True,
+                chunk_size=kwargs['chunk_size'],
+                resume=not kwargs['restart']
+            )
+            grade_sync.write_console_banner()
+            grade_sync.iterate_courses()
+            return None
 
         course = None
         lti_internal_courses = None
@@ -131,27 +186,50 @@ class Command(BaseCommand):
         self.enrollments=enrollments.count()
         self.write_console_banner()
 
+        # read all cached grades for the course in one query rather than one per enrollment / assignment.
+        grades = {}
+        for grade in LTIExternalCourseEnrollmentGrades.objects.filter(course_enrollment__course=course).order_by('id'):
+            grades.setdefault((grade.course_enrollment_id, grade.course_assignment_id), grade)
+
+        # read the existing Willo results one grade column at a time, so that we only post
+        # the grades that actually differ from Willo, and so that post_grades() does not
+        # need to GET each student's Willo result before posting.
+        outcomes = {}
+        if not force_resync:
+            lti_user_ids = [enrollment.lti_user_id for enrollment in enrollments]
+            for assignment in assignments:
+                outcomes[assignment.id] = willo_api_prefetch_outcomes(
+                    url=course.ext_wl_outcome_service_url,
+                    assignment_id=willo_id_from_url(assignment.url),
+                    user_ids=lti_user_ids
+                )
+
+        jobs = []
+        unchanged = 0
         for enrollment in enrollments:
             for assignment in assignments:
                 username=enrollment.user.username
-                grade = LTIExternalCourseEnrollmentGrades.objects.filter(
-                    course_enrollment=enrollment,
-                    course_assignment=assignment
-                ).first()
+                grade = grades.get((enrollment.id, assignment.id))
 
                 if grade:
                     if grade.synched is None or force_resync:
                         usage_id=str(grade.usage_key)
+                        if not self.grade_has_changed(enrollment, assignment, grade, outcomes.get(assignment.id)):
+                            unchanged += 1
+                            continue
                         self.console_output('Queueing course_id: {course_id}, username: {username}, usage_id: {usage_id}'.format(
                             course_id=course_id,
                             username=enrollment.user.username,
                             usage_id=usage_id
                         ))
 
-                        # send this grade to Celery
-                        if not dry_run: 
-                            cached_results = not force_resync
-                            post_grades(username=username, course_id=course_id, usage_id=usage_id, cached_results=cached_results)
+                        if not dry_run:
+                            jobs.append({
+                                'username': username,
+                                'course_id': course_id,
+                                'usage_id': usage_id,
+                                'cached_results': not force_resync
+                            })
                         else: self.console_output('DRY RUN: Grade data was not sent to Willo Labs.')
                 else:
                     print('No cached grade found for user {username}, assignment {display_name}'.format(
@@ -159,6 +237,42 @@ class Command(BaseCommand):
                         display_name=assignment.display_name
                     ))
 
+        if unchanged:
+            self.console_output('Skipped {unchanged} grades that already match Willo Labs.'.format(unchanged=unchanged))
+
+        # post the queued grades, keeping up to self.workers Willo requests in flight.
+        willo_api_map(self.post_grade, jobs, max_workers=self.workers)
+
+    def grade_has_changed(self, enrollment, assignment, grade, column_outcomes):
+        """
+        Diff a cached grade against the prefetched Willo results for its grade column.
+        True if the grade should be posted, including when the column could not be prefetched.
+        """
+        if column_outcomes is None:
+            return True
+
+        data = {
+            'user_id': enrollment.lti_user_id,
+            'activity_id': willo_id_from_url(assignment.url),
+            'result_date': willo_api_date(grade.created),
+            'score': grade.earned_graded
+        }
+        return willo_api_grade_should_post(data, column_outcomes)
+
+    def post_grade(self, job):
+        """
+        Post one queued grade. Errors are reported and swallowed so that
+        the remaining grades in the course still get posted.
+        """
+        try:
+            post_grades(**job)
+        except Exception as err:
+            self.console_output('Error posting grade for username: {username}, usage_id: {usage_id}. {err}'.format(
+                username=job['username'],
+                usage_id=job['usage_id'],
+                err=err
+            ), text_style=style.ERROR)
+
     def write_console_banner(self):
 
         msg = color.BOLD + u'\r\n'
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.13 on 2021-03-15 18:04
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+import opaque_keys.edx.django.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lti_consumers', '0013_auto_20200824_1643'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LTIGradePostOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('username', models.CharField(db_index=True, max_length=150)),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(db_index=True, max_length=255)),
+                ('usage_id', models.CharField(help_text='Usage key of the problem that was graded. Example: block-v1:ABC+OS9471721_9626+01+type@swxblock+block@c081d7653af211e98379b7d76f928163', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending replay'), ('failed', 'Failed. Gave up after too many replay attempts')], db_index=True, default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of failed posts, including the original Celery task.')),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('last_attempt', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'LTI Grade Post Outbox',
+                'verbose_name_plural': 'LTI Grade Post Outbox',
+                'unique_together': {('username', 'usage_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Layered cache for the LTI cache tables that are read on every LTI launch and
+every grade post.
+
+LTICacheManager used to query LTIInternalCourse, LTIExternalCourse,
+LTIExternalCourseEnrollment and LTIExternalCourseAssignmentProblems separately,
+and repeatedly, each time that it was instantiated. These records change rarely,
+so lookups now go through two cache layers before reaching MySQL:
+
+1. RequestCache, so that a record is read at most once per request or Celery task.
+2. memcached, shared by all processes. Course records are keyed by course_id and by
+   context_id. Enrollment and assignment problem records live under a version token
+   per Rover course, so that one cache.delete() invalidates all of them at once.
+
+Records are loaded with select_related() so that the foreign keys that callers
+walk (course -> LTIInternalCourse, enrollment -> user, problem -> assignment -> course)
+do not cost further queries.
+
+The post_save / post_delete receivers in signals.py call the invalidate_*() functions
+below whenever one of these records is written.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from edx_django_utils.cache import RequestCache
+
+from .models import (
+    LTIExternalCourse,
+    LTIExternalCourseAssignmentProblems,
+    LTIExternalCourseEnrollment
+)
+
+log = logging.getLogger(__name__)
+DEBUG = settings.ROVER_DEBUG
+
+MODEL_CACHE_VERSION = 1
+MODEL_CACHE_TIMEOUT = 60 * 60               # one hour
+MODEL_CACHE_KEY_PREFIX = 'third_party_auth.lti_consumers.model_cache'
+MODEL_CACHE_REQUEST_NAMESPACE = 'third_party_auth.lti_consumers.model_cache'
+
+
+def get_external_course(course_key):
+    """
+    The LTIExternalCourse record for a Rover course, or None.
+
+    course_key: a CourseKey
+    """
+    def load():
+        return LTIExternalCourse.objects.select_related('course_id').filter(course_id=course_key).first()
+
+    return _get_or_load(_external_course_key(course_key), load)
+
+
+def get_external_course_by_context_id(context_id):
+    """
+    The LTIExternalCourse record for an LTI context_id, or None.
+    """
+    def load():
+        return LTIExternalCourse.objects.select_related('course_id').filter(context_id=context_id).first()
+
+    return _get_or_load(_context_key(context_id), load)
+
+
+def get_external_course_enrollment(course, user):
+    """
+    The LTIExternalCourseEnrollment record of a user in an LTIExternalCourse, or None.
+    """
+    def load():
+        return LTIExternalCourseEnrollment.objects.select_related('course__course_id', 'user').filter(
+            course=course,
+            user=user
+        ).first()
+
+    key = _versioned_key(
+        course.course_id_id,
+        'enrollment.{context_id}.{user_id}'.format(context_id=course.context_id, user_id=user.id)
+    )
+    return _get_or_load(key, load)
+
+
+def get_assignment_problem(course_key, usage_key):
+    """
+    The most recent LTIExternalCourseAssignmentProblems record for a problem usage key,
+    with its assignment and course, or None.
+
+    course_key: the CourseKey of the Rover course that contains usage_key
+    """
+    def load():
+        return LTIExternalCourseAssignmentProblems.objects.select_related(
+            'course_assignment__course__course_id'
+        ).filter(
+            usage_key=usage_key
+        ).order_by('-created').first()
+
+    if course_key is None:
+        return load()
+
+    key = _versioned_key(
+        course_key,
+        'problem.{digest}'.format(digest=hashlib.md5(str(usage_key).encode('utf-8')).hexdigest())
+    )
+    return _get_or_load(key, load)
+
+
+def invalidate_external_course(course):
+    """
+    Evict an LTIExternalCourse record, and everything cached under its Rover course.
+    """
+    keys = [_context_key(course.context_id)]
+    if course.course_id_id is not None:
+        keys.append(_external_course_key(course.course_id_id))
+    cache.delete_many(keys, version=MODEL_CACHE_VERSION)
+    invalidate_course(course.course_id_id)
+
+
+def invalidate_course(course_key):
+    """
+    Evict all enrollment and assignment problem records cached for a Rover course.
+    """
+    if course_key is not None:
+        cache.delete(_version_key(course_key), version=MODEL_CACHE_VERSION)
+    RequestCache(MODEL_CACHE_REQUEST_NAMESPACE).clear()
+
+
+def _get_or_load(key, load):
+    """
+    Look in the RequestCache, then memcached, then call load(). None is only
+    cached for the rest of the request, so that a record created by another
+    process is found promptly.
+    """
+    request_cache = RequestCache(MODEL_CACHE_REQUEST_NAMESPACE)
+    cached_response = request_cache.get_cached_response(key)
+    if cached_response.is_found:
+        return cached_response.value
+
+    value = cache.get(key, version=MODEL_CACHE_VERSION)
+    if value is None:
+        value = load()
+        if value is not None:
+            cache.set(key, value, timeout=MODEL_CACHE_TIMEOUT, version=MODEL_CACHE_VERSION)
+        if DEBUG: log.info('lti_consumers.model_cache._get_or_load() - cache miss: {key}'.format(key=key))
+
+    request_cache.set(key, value)
+    return value
+
+
+def _versioned_key(course_key, suffix):
+    """
+    Cache key under the current version token of a Rover course. A new token is
+    issued whenever the previous one is deleted or evicted.
+    """
+    request_cache = RequestCache(MODEL_CACHE_REQUEST_NAMESPACE)
+    version_key = _version_key(course_key)
+    cached_response = request_cache.get_cached_response(version_key)
+    if cached_response.is_found:
+        version = cached_response.value
+    else:
+        version = cache.get(version_key, version=MODEL_CACHE_VERSION)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(version_key, version, timeout=None, version=MODEL_CACHE_VERSION):
+                version = cache.get(version_key, default=version, version=MODEL_CACHE_VERSION)
+        request_cache.set(version_key, version)
+
+    return '{prefix}.{version}.{suffix}'.format(prefix=MODEL_CACHE_KEY_PREFIX, version=version, suffix=suffix)
+
+
+def _version_key(course_key):
+    return '{prefix}.{course_key}.version'.format(prefix=MODEL_CACHE_KEY_PREFIX, course_key=course_key)
+
+
+def _external_course_key(course_key):
+    return '{prefix}.course.{course_key}'.format(prefix=MODEL_CACHE_KEY_PREFIX, course_key=course_key)
+
+
+def _context_key(context_id):
+    return '{prefix}.context.{context_id}'.format(prefix=MODEL_CACHE_KEY_PREFIX, context_id=context_id)
@@ -598,3 +598,48 @@ class LTIExternalCourseEnrollmentGrades(TimeStampedModel):
 
     def __str__(self):
         return str(self.course_enrollment) + ' - ' + self.course_assignment.display_name
+
+
+class LTIGradePostOutbox(TimeStampedModel):
+    """
+    Grade posts that did not reach Willo Labs. A row is added when tasks.post_grades()
+    times out or exhausts its retries, and deleted once the grade is delivered by
+    the gradesync_outbox replay command (see outbox.py).
+
+    One row per student / problem. A later failure of the same grade post
+    updates the existing row, since replay always posts the current grade.
+    """
+    PENDING = 'pending'
+    FAILED = 'failed'
+
+    STATUSES = [
+        (PENDING, 'Pending replay'),
+        (FAILED, 'Failed. Gave up after too many replay attempts'),
+    ]
+
+    username = models.CharField(max_length=150, db_index=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    usage_id = models.CharField(
+        max_length=255,
+        help_text="Usage key of the problem that was graded. Example: block-v1:ABC+OS9471721_9626+01+type@swxblock+block@c081d7653af211e98379b7d76f928163"
+        )
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING, db_index=True)
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of failed posts, including the original Celery task."
+        )
+    last_error = models.TextField(blank=True, default='')
+    last_attempt = models.DateTimeField(null=True, blank=True)
+
+    class Meta(object):
+        verbose_name = "LTI Grade Post Outbox"
+        verbose_name_plural = verbose_name
+        unique_together = [['username', 'usage_id']]
+
+    def __str__(self):
+        return '{username} - {usage_id} ({status})'.format(
+            username=self.username,
+            usage_id=self.usage_id,
+            status=self.status
+        )
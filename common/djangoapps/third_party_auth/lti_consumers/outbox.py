@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+LTI Grade Sync outbox for grade posts that never reached Willo Labs.
+
+tasks.post_grades() gets a single retry. A grade post that times out
+(SoftTimeLimitExceeded), or that fails its retry, used to be dropped and was
+typically only discovered weeks later, and then repaired with a whole-course
+willo_resync. Instead, such posts are parked in the LTIGradePostOutbox table,
+one row per student / problem, together with an attempt count and the last error.
+
+Operators drain the outbox with the gradesync_outbox management command, which
+replays the posts in batches at a controlled rate. Replay always recalculates
+and posts the student's current grade, so a stale row can never overwrite a
+newer grade. Rows are deleted only once Willo Labs accepted the post. A row
+that fails GRADESYNC_OUTBOX_MAX_ATTEMPTS times is marked failed and is skipped
+by subsequent replays unless explicitly requested.
+"""
+from __future__ import absolute_import
+
+import datetime
+import logging
+import time
+
+import pytz
+from django.conf import settings
+from django.db.models import Count, F
+
+from .exceptions import LTIGradePostError
+from .models import LTIGradePostOutbox
+
+log = logging.getLogger(__name__)
+DEBUG = settings.ROVER_DEBUG
+UTC = pytz.UTC
+
+GRADESYNC_OUTBOX_MAX_ATTEMPTS = getattr(settings, 'ROVER_LTI_GRADESYNC_OUTBOX_MAX_ATTEMPTS', 5)
+GRADESYNC_OUTBOX_BATCH_SIZE = getattr(settings, 'ROVER_LTI_GRADESYNC_OUTBOX_BATCH_SIZE', 50)
+GRADESYNC_OUTBOX_POSTS_PER_SECOND = getattr(settings, 'ROVER_LTI_GRADESYNC_OUTBOX_POSTS_PER_SECOND', 2)
+
+
+def record_failed_post(username, course_id, usage_id, error):
+    """
+    Add a grade post to the outbox, or count one more failed attempt if it is
+    already there. Never raises: losing the outbox row must not mask the
+    original error.
+    """
+    try:
+        now = UTC.localize(datetime.datetime.utcnow())
+        post, created = LTIGradePostOutbox.objects.get_or_create(
+            username=username,
+            usage_id=str(usage_id),
+            defaults={
+                'course_id': course_id,
+                'attempts': 1,
+                'last_error': repr(error),
+                'last_attempt': now,
+            }
+        )
+        if not created:
+            LTIGradePostOutbox.objects.filter(pk=post.pk).update(
+                attempts=F('attempts') + 1,
+                last_error=repr(error),
+                last_attempt=now,
+                status=LTIGradePostOutbox.PENDING
+            )
+        log.warning('lti_consumers.outbox.record_failed_post() - username: {username}, usage_id: {usage_id}, error: {error}'.format(
+            username=username,
+            usage_id=usage_id,
+            error=repr(error)
+        ))
+    except Exception as exc:  # pylint: disable=broad-except
+        log.error('lti_consumers.outbox.record_failed_post() - could not save outbox record for username: {username}, usage_id: {usage_id}: {exc}'.format(
+            username=username,
+            usage_id=usage_id,
+            exc=repr(exc)
+        ))
+
+
+def get_posts(course_id=None, username=None, include_failed=False):
+    """
+    Queryset of the outbox rows to replay, oldest first.
+    """
+    posts = LTIGradePostOutbox.objects.all()
+    if not include_failed:
+        posts = posts.filter(status=LTIGradePostOutbox.PENDING)
+    if course_id is not None:
+        posts = posts.filter(course_id=course_id)
+    if username is not None:
+        posts = posts.filter(username=username)
+    return posts.order_by('id')
+
+
+def replay(posts, limit=None, batch_size=None, posts_per_second=None, dry_run=False):
+    """
+    Replay the grade posts of a queryset (see get_posts()), batch_size rows at a
+    time, and at most posts_per_second grade posts per second so that a large
+    backlog does not flood the Willo Labs api or the database.
+
+    Returns a dict of counts: delivered, failed, gave_up.
+    """
+    from .tasks import _sync_grade
+
+    batch_size = batch_size or GRADESYNC_OUTBOX_BATCH_SIZE
+    if posts_per_second is None:
+        posts_per_second = GRADESYNC_OUTBOX_POSTS_PER_SECOND
+    interval = 1.0 / posts_per_second if posts_per_second > 0 else 0
+
+    counts = {'delivered': 0, 'failed': 0, 'gave_up': 0}
+    replayed = 0
+    last_id = 0
+    while limit is None or replayed < limit:
+        batch_limit = batch_size if limit is None else min(batch_size, limit - replayed)
+        batch = list(posts.filter(id__gt=last_id)[:batch_limit])
+        if not batch:
+            break
+
+        for post in batch:
+            last_id = post.id
+            replayed += 1
+            if dry_run:
+                log.info('lti_consumers.outbox.replay() - dry run: {post}'.format(post=post))
+                continue
+
+            started = time.time()
+            try:
+                delivered = _sync_grade(None, username=post.username, course_id=str(post.course_id), usage_id=post.usage_id)
+            except Exception as exc:  # pylint: disable=broad-except
+                _record_failed_replay(post, exc, counts)
+            else:
+                if delivered:
+                    post.delete()
+                    counts['delivered'] += 1
+                else:
+                    _record_failed_replay(post, LTIGradePostError('grade was not posted'), counts)
+
+            elapsed = time.time() - started
+            if elapsed < interval:
+                time.sleep(interval - elapsed)
+
+        if DEBUG: log.info('lti_consumers.outbox.replay() - {replayed} replayed: {counts}'.format(
+            replayed=replayed,
+            counts=counts
+        ))
+
+    return counts
+
+
+def _record_failed_replay(post, error, counts):
+    """
+    Count one more failed attempt of an outbox row, and give up on it after
+    GRADESYNC_OUTBOX_MAX_ATTEMPTS attempts.
+    """
+    post.attempts += 1
+    post.last_error = repr(error)
+    post.last_attempt = UTC.localize(datetime.datetime.utcnow())
+    if post.attempts >= GRADESYNC_OUTBOX_MAX_ATTEMPTS:
+        post.status = LTIGradePostOutbox.FAILED
+        counts['gave_up'] += 1
+    counts['failed'] += 1
+    post.save()
+    log.error('lti_consumers.outbox.replay() - {post} failed: {error}'.format(post=post, error=repr(error)))
+
+
+def get_stats():
+    """
+    Number of outbox rows by status, and by course for the pending rows.
+    """
+    by_status = dict(
+        LTIGradePostOutbox.objects.values_list('status').annotate(n=Count('id')).order_by()
+    )
+    by_course = {
+        str(course_id): n
+        for course_id, n in LTIGradePostOutbox.objects.filter(
+            status=LTIGradePostOutbox.PENDING
+        ).values_list('course_id').annotate(n=Count('id')).order_by()
+    }
+    return {
+        LTIGradePostOutbox.PENDING: by_status.get(LTIGradePostOutbox.PENDING, 0),
+        LTIGradePostOutbox.FAILED: by_status.get(LTIGradePostOutbox.FAILED, 0),
+        'pending_by_course': by_course,
+    }
@@ -0,0 +1,85 @@
+"""
+  LTI Grade Sync
+
+  Signal handlers that keep the course structure index (course_index.py)
+  in step with course publishes, and the model cache (model_cache.py) in step
+  with writes to the LTI cache tables.
+"""
+import six
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from django.dispatch.dispatcher import receiver
+from opaque_keys.edx.locator import LibraryLocator
+
+from xmodule.modulestore.django import SignalHandler
+
+from . import model_cache
+from .course_index import clear_course_index
+from .models import (
+    LTIExternalCourse,
+    LTIExternalCourseAssignmentProblems,
+    LTIExternalCourseAssignments,
+    LTIExternalCourseEnrollment,
+    LTIInternalCourse
+)
+
+# seconds to wait before rebuilding the index, so that the published course has settled.
+COURSE_INDEX_REBUILD_DELAY = 30
+
+
+@receiver(SignalHandler.course_published)
+def rebuild_course_index_on_course_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the course structure index of an LTI Grade Sync course when it is
+    published, then rebuild it asynchronously. Ignores publish signals from content
+    libraries and from courses that are not registered for LTI Grade Sync.
+    """
+    if isinstance(course_key, LibraryLocator):
+        return
+
+    if not LTIInternalCourse.objects.filter(course_id=course_key).exists():
+        return
+
+    clear_course_index(course_key)
+
+    from .tasks import build_course_index
+    build_course_index.apply_async(
+        kwargs=dict(course_id=six.text_type(course_key)),
+        countdown=COURSE_INDEX_REBUILD_DELAY,
+    )
+
+
+@receiver(SignalHandler.course_deleted)
+def clear_course_index_on_course_delete(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    clear_course_index(course_key)
+
+
+@receiver(post_save, sender=LTIExternalCourse)
+@receiver(post_delete, sender=LTIExternalCourse)
+def invalidate_model_cache_course(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    model_cache.invalidate_external_course(instance)
+
+
+@receiver(post_save, sender=LTIExternalCourseEnrollment)
+@receiver(post_delete, sender=LTIExternalCourseEnrollment)
+@receiver(post_save, sender=LTIExternalCourseAssignments)
+@receiver(post_delete, sender=LTIExternalCourseAssignments)
+def invalidate_model_cache_course_records(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Enrollments and assignments both belong to an LTIExternalCourse, and problem records
+    are cached with their assignment, so any change evicts everything cached for the course.
+    """
+    try:
+        model_cache.invalidate_course(instance.course.course_id_id)
+    except ObjectDoesNotExist:
+        # the course itself is being deleted, and its own receiver takes care of this.
+        pass
+
+
+@receiver(post_save, sender=LTIExternalCourseAssignmentProblems)
+@receiver(post_delete, sender=LTIExternalCourseAssignmentProblems)
+def invalidate_model_cache_problem(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    try:
+        model_cache.invalidate_course(instance.course_assignment.course.course_id_id)
+    except ObjectDoesNotExist:
+        pass
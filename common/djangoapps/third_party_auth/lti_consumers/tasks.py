@@ -27,14 +27,17 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.db.utils import DatabaseError
+from edx_django_utils.monitoring import set_custom_metric
 
 from opaque_keys.edx.keys import CourseKey, UsageKey
 
 # for LTI Grade Sync api
-from .exceptions import DatabaseNotReadyError, LTIBusinessRuleError
+from .exceptions import DatabaseNotReadyError, LTIBusinessRuleError, LTIGradePostError
 from .cache import LTICacheManager
+from . import course_index, gradesync_queue, model_cache, outbox
 from .utils import willo_id_from_url, get_subsection_chapter
 from .api import (
+    WILLO_API_POST_GRADE_SKIPPED,
     willo_api_post_grade,
     willo_api_create_column,
     willo_api_activity_id_from_string,
@@ -76,6 +79,7 @@ KNOWN_RETRY_ERRORS = (  # Errors we expect occasionally, should be resolved on r
     DatabaseError,
     ValidationError,
     DatabaseNotReadyError,
+    LTIGradePostError,
 )
 RECALCULATE_GRADE_DELAY_SECONDS = 5  # to prevent excessive _has_db_updated failures. See TNL-6424.
 RETRY_DELAY_SECONDS = 40
@@ -108,6 +112,156 @@ def post_grades(self, username, course_id, usage_id, cached_results=True):
         cached_results=cached_results
     )
 
+def enqueue_grade_post(username, course_id, usage_id, assignment_id):
+    """
+    Called from lms.djangoapps.grades.tasks._update_subsection_grades() each time a
+    learner submits a problem in an LTI Grade Sync-enabled course.
+
+    Parks the grade post in the coalescing queue (see gradesync_queue.py) so that rapid
+    successive submissions for the same (user, assignment, context_id) result in a
+    single post of the latest grade. Falls back to posting immediately if the queue
+    is disabled.
+
+    username: a string representing the User.username of the student
+    course_id: a string identifier for a CourseKey
+    usage_id: a string identifier for the UsageKey of the problem that was just graded.
+    assignment_id: a string identifier for the UsageKey of the subsection containing the problem.
+
+    Returns:
+        [Boolean] -- True if a new grade post was queued, False if it was collapsed
+        into a pending post or posted immediately.
+    """
+    if not gradesync_queue.is_gradesync_queue_enabled():
+        post_grades(
+            username=username,
+            course_id=course_id,
+            usage_id=usage_id
+        )
+        return False
+
+    lti_external_course = model_cache.get_external_course(CourseKey.from_string(course_id))
+    context_id = lti_external_course.context_id if lti_external_course is not None else None
+
+    queued = gradesync_queue.add_pending(
+        username=username,
+        course_id=course_id,
+        usage_id=usage_id,
+        assignment_id=assignment_id,
+        context_id=context_id
+    )
+    if queued is None:
+        return False
+
+    _schedule_flush(queued)
+    return True
+
+
+def _schedule_flush(queued):
+    """
+    Schedule the flush of the bucket of a new pending entry, (bucket, slot) as
+    returned by gradesync_queue.add_pending(), if the entry is the first one in
+    its bucket.
+    """
+    bucket, slot = queued
+    if slot == 1:
+        # first entry in this time bucket, so we own the bucket's flush.
+        flush_grade_posts.apply_async(
+            kwargs={'bucket': bucket},
+            countdown=gradesync_queue.bucket_flush_countdown(bucket),
+        )
+
+
+@task(
+    bind=True,
+    base=LoggedPersistOnFailureTask,
+    time_limit=TIMEOUT_SECONDS,
+    routing_key=settings.RECALCULATE_GRADES_ROUTING_KEY,
+    acks_late=True,
+    )
+def flush_grade_posts(self, bucket, offset=0):
+    """
+    Post the latest grade for each pending (user, assignment, context_id) entry in
+    one time bucket of the coalescing queue, gradesync_queue.GRADESYNC_QUEUE_BATCH_SIZE
+    entries at a time. If the bucket holds more entries then the next batch is
+    chained as a new task.
+
+    A grade that fails to post here is handed to post_grades() so that it gets the
+    usual Celery retry treatment. Each entry is removed from the queue only once its
+    grade was posted or handed off, so that the redelivery of a task whose worker
+    died (acks_late) picks up the entries that it had not processed yet.
+    """
+    pending, slot_keys, slot_count = gradesync_queue.get_pending(bucket, offset=offset)
+    entries = list(pending.values())
+
+    collapsed = 0
+    posted = 0
+    failed = 0
+    for key, entry in pending.items():
+        collapsed += entry.get('submissions', 1) - 1
+        try:
+            if _sync_grade(
+                    self,
+                    username=entry['username'],
+                    course_id=entry['course_id'],
+                    usage_id=entry['usage_id']
+            ):
+                posted += 1
+        except Exception as exc:
+            failed += 1
+            log.error('willolabs.tasks.flush_grade_posts() - failed to post grade for username: {username}, usage_id: {usage_id}. Requeueing. Error: {exc}'.format(
+                username=entry['username'],
+                usage_id=entry['usage_id'],
+                exc=repr(exc)
+            ))
+            post_grades.apply_async(kwargs={
+                'username': entry['username'],
+                'course_id': entry['course_id'],
+                'usage_id': entry['usage_id'],
+            })
+
+        requeued = gradesync_queue.remove_pending(key, entry)
+        if requeued is not None:
+            _schedule_flush(requeued)
+    gradesync_queue.remove_slots(slot_keys)
+
+    gradesync_queue.incr_stat('flushed', len(entries))
+    gradesync_queue.incr_stat('posted', posted)
+    gradesync_queue.incr_stat('failed', failed)
+    set_custom_metric('lti_gradesync_queue_bucket', bucket)
+    set_custom_metric('lti_gradesync_queue_flushed', len(entries))
+    set_custom_metric('lti_gradesync_queue_collapsed', collapsed)
+    set_custom_metric('lti_gradesync_queue_failed', failed)
+    log.info('willolabs.tasks.flush_grade_posts() - bucket: {bucket}, offset: {offset}, flushed: {flushed}, collapsed: {collapsed}, failed: {failed}'.format(
+        bucket=bucket,
+        offset=offset,
+        flushed=len(entries),
+        collapsed=collapsed,
+        failed=failed
+    ))
+
+    next_offset = offset + gradesync_queue.GRADESYNC_QUEUE_BATCH_SIZE
+    if next_offset < slot_count:
+        flush_grade_posts.apply_async(kwargs={'bucket': bucket, 'offset': next_offset})
+
+    return len(entries)
+
+
+@task(
+    bind=True,
+    base=LoggedPersistOnFailureTask,
+    time_limit=TIMEOUT_SECONDS,
+    routing_key=settings.RECALCULATE_GRADES_ROUTING_KEY,
+    )
+def build_course_index(self, course_id):
+    """
+    Rebuild the course structure index (see course_index.py) of an LTI Grade Sync
+    course after it has been published.
+
+    course_id: a string identifier for a CourseKey
+    """
+    course_index.build_course_index(CourseKey.from_string(course_id))
+
+
 def _post_grades(self, username, course_id, usage_id, cached_results=True):
     """
     username: a string representing the User.username of the student
@@ -135,94 +289,18 @@ def _post_grades(self, username, course_id, usage_id, cached_results=True):
     ))
 
     try:
-
-        # re-instantiate our class objects
-        student = User.objects.get(username=username)
-        course_key = CourseKey.from_string(course_id)
-        problem_usage_key = UsageKey.from_string(usage_id)
-        session = LTICacheManager(user=student, course_id=course_id)
-
-        lti_cached_course = session.course
-        if lti_cached_course is None:
-            log.error('Tried to call LTI Consumer api with partially initialized LTI session object. course property is not set. username: {username}, course_id: {course_id}, usage_id: {usage_id}'.format(
-                username=username,
-                course_id=course_id,
-                usage_id=usage_id
-            ))
-            return False
-
-        lti_cached_enrollment = session.course_enrollment
-        if lti_cached_enrollment is None:
-            log.error('Tried to call LTI Consumer api with partially initialized LTI session object. enrollment property is not set. username: {username}, course_id: {course_id}, usage_id: {usage_id}'.format(
-                username=username,
-                course_id=course_id,
-                usage_id=usage_id
-            ))
-            return False
-
-        subsection_grade = get_subsection_grade(student, course_key, problem_usage_key)
-        if subsection_grade is None:
-            return False
-
-        homework_assignment_dict = get_assignment_grade(
-            course_key=course_key,
-            problem_usage_key=problem_usage_key,
-            subsection_grade=subsection_grade
-            )
-
-        # Cache the grade data
-        session.post_grades(
-            usage_key=problem_usage_key,
-            grades_dict=homework_assignment_dict
-            )
-
-        lti_cached_assignment = session.get_course_assignment(problem_usage_key)
-        if lti_cached_assignment is None:
-            log.error('Tried to call LTI Consumer api with partially initialized LTI session object. course assignment property is not set. username: {username}, course_id: {course_id}, usage_id: {usage_id}, problem_usage_key: {problem_usage_key}, homework_assignment_dict: {homework_assignment_dict}'.format(
-                usage_key=problem_usage_key,
-                username=username,
-                course_id=course_id,
-                usage_id=usage_id,
-                homework_assignment_dict=homework_assignment_dict
-            ))
-            return False
-
-        lti_cached_grade = session.get_course_assignment_grade(problem_usage_key)
-        if lti_cached_grade is None:
-            log.error('Tried to call LTI Consumer api with partially initialized LTI session object. grades property is not set for usagekey {usage_key}. username: {username}, course_id: {course_id}, usage_id: {usage_id}, homework_assignment_dict: {homework_assignment_dict}'.format(
-                usage_key=problem_usage_key,
-                username=username,
-                course_id=course_id,
-                usage_id=usage_id,
-                homework_assignment_dict=homework_assignment_dict
-            ))
-            return False
-
-        if not lti_cached_course.enabled:
-            log.info('LTI Consumer API Grade Sync is not enabled for course {coursekey}. Grade was locally cached for problem {usage_key} but it will not be posted to Willo Labs API.'.format(
-                coursekey=lti_cached_course.course_id,
-                usage_key=problem_usage_key
-            ))
-            return True
-
-        # Push grades to LTI Grade Sync
-        retval = create_column(
+        return _sync_grade(
             self,
-            lti_cached_course=lti_cached_course,
-            lti_cached_assignment=lti_cached_assignment,
-            lti_cached_grade=lti_cached_grade
-            )
-        if retval:
-            retval = post_grade(
-                self,
-                lti_cached_course=lti_cached_course,
-                lti_cached_enrollment=lti_cached_enrollment,
-                lti_cached_assignment=lti_cached_assignment,
-                lti_cached_grade=lti_cached_grade,
-                cached_results=cached_results
-                )
+            username=username,
+            course_id=course_id,
+            usage_id=usage_id,
+            cached_results=cached_results
+        )
 
-        return retval
+    except SoftTimeLimitExceeded as exc:
+        # SoftTimeLimitExceeded is itself an Exception, so it has to be caught first.
+        outbox.record_failed_post(username, course_id, usage_id, exc)
+        recover_from_exceeded_time_limit(self)
 
     except Exception as exc:
         if not isinstance(exc, KNOWN_RETRY_ERRORS):
@@ -232,10 +310,117 @@ def _post_grades(self, username, course_id, usage_id, cached_results=True):
             ))
         else:
             log.error('willolabs.tasks.post_grades() - retrying')
+
+        if self.request.retries >= self.max_retries:
+            # out of retries. park the grade post in the outbox for replay.
+            outbox.record_failed_post(username, course_id, usage_id, exc)
         raise self.retry(exc=exc)
 
-    except SoftTimeLimitExceeded:
-        self.recover_from_exceeded_time_limit()
+def _sync_grade(self, username, course_id, usage_id, cached_results=True):
+    """
+    Recalculate the subsection grade for the problem identified by usage_id, cache it
+    in the LTI cache, then post the grade column and the grade to Willo Labs.
+
+    Shared by post_grades() and flush_grade_posts(). Exceptions are left to the caller,
+    which decides whether to retry.
+
+    Returns True if the grade was posted, or did not need to be, and False if it is
+    not to be posted at all. Raises LTIGradePostError if Willo Labs rejected the post.
+    """
+    # re-instantiate our class objects
+    student = User.objects.get(username=username)
+    course_key = CourseKey.from_string(course_id)
+    problem_usage_key = UsageKey.from_string(usage_id)
+    session = LTICacheManager(user=student, course_id=course_id)
+
+    lti_cached_course = session.course
+    if lti_cached_course is None:
+        log.error('Tried to call LTI Consumer api with partially initialized LTI session object. course property is not set. username: {username}, course_id: {course_id}, usage_id: {usage_id}'.format(
+            username=username,
+            course_id=course_id,
+            usage_id=usage_id
+        ))
+        return False
+
+    lti_cached_enrollment = session.course_enrollment
+    if lti_cached_enrollment is None:
+        log.error('Tried to call LTI Consumer api with partially initialized LTI session object. enrollment property is not set. username: {username}, course_id: {course_id}, usage_id: {usage_id}'.format(
+            username=username,
+            course_id=course_id,
+            usage_id=usage_id
+        ))
+        return False
+
+    subsection_grade = get_subsection_grade(student, course_key, problem_usage_key)
+    if subsection_grade is None:
+        return False
+
+    homework_assignment_dict = get_assignment_grade(
+        course_key=course_key,
+        problem_usage_key=problem_usage_key,
+        subsection_grade=subsection_grade
+        )
+
+    # Cache the grade data
+    session.post_grades(
+        usage_key=problem_usage_key,
+        grades_dict=homework_assignment_dict
+        )
+
+    lti_cached_assignment = session.get_course_assignment(problem_usage_key)
+    if lti_cached_assignment is None:
+        log.error('Tried to call LTI Consumer api with partially initialized LTI session object. course assignment property is not set. username: {username}, course_id: {course_id}, usage_id: {usage_id}, problem_usage_key: {problem_usage_key}, homework_assignment_dict: {homework_assignment_dict}'.format(
+            usage_key=problem_usage_key,
+            username=username,
+            course_id=course_id,
+            usage_id=usage_id,
+            homework_assignment_dict=homework_assignment_dict
+        ))
+        return False
+
+    lti_cached_grade = session.get_course_assignment_grade(problem_usage_key)
+    if lti_cached_grade is None:
+        log.error('Tried to call LTI Consumer api with partially initialized LTI session object. grades property is not set for usagekey {usage_key}. username: {username}, course_id: {course_id}, usage_id: {usage_id}, homework_assignment_dict: {homework_assignment_dict}'.format(
+            usage_key=problem_usage_key,
+            username=username,
+            course_id=course_id,
+            usage_id=usage_id,
+            homework_assignment_dict=homework_assignment_dict
+        ))
+        return False
+
+    if not lti_cached_course.enabled:
+        log.info('LTI Consumer API Grade Sync is not enabled for course {coursekey}. Grade was locally cached for problem {usage_key} but it will not be posted to Willo Labs API.'.format(
+            coursekey=lti_cached_course.course_id,
+            usage_key=problem_usage_key
+        ))
+        return True
+
+    # Push grades to LTI Grade Sync
+    response_code = create_column(
+        self,
+        lti_cached_course=lti_cached_course,
+        lti_cached_assignment=lti_cached_assignment,
+        lti_cached_grade=lti_cached_grade
+        )
+    if not response_code:
+        return False
+    if not 200 <= response_code <= 299:
+        raise LTIGradePostError('willolabs.tasks._sync_grade() - Willo Labs api returned {code} for the grade column of username: {username}, usage_id: {usage_id}'.format(
+            code=response_code,
+            username=username,
+            usage_id=usage_id
+        ))
+
+    return post_grade(
+        self,
+        lti_cached_course=lti_cached_course,
+        lti_cached_enrollment=lti_cached_enrollment,
+        lti_cached_assignment=lti_cached_assignment,
+        lti_cached_grade=lti_cached_grade,
+        cached_results=cached_results
+        )
+
 
 def get_subsection_grade(student, course_key, problem_usage_key):
     """the code pattern that follow originates from lms.djangoapps.grades.tasks._update_subsection_grades()
@@ -402,7 +587,11 @@ def post_grade(self, lti_cached_course, lti_cached_enrollment, lti_cached_assign
         grade dict data for one student response to one assignment problem.
 
     Returns:
-        [Boolean] -- returns True if the return code is 200, False otherwise.
+        [Boolean] -- returns True if the grade was posted, or did not need to be,
+        and False if the grade is not to be posted at all.
+
+    Raises:
+        LTIGradePostError -- if the Willo api returned any other code than 2xx.
 
 
     Obsoleted:
@@ -479,10 +668,20 @@ def post_grade(self, lti_cached_course, lti_cached_enrollment, lti_cached_assign
         cached_results=cached_results
         )
 
-    if 200 <= response_code <= 299:
-        now = UTC.localize(datetime.datetime.now())
-        lti_cached_grade.synched = now
-        lti_cached_grade.save()
+    if response_code == WILLO_API_POST_GRADE_SKIPPED:
+        return True
+
+    if not 200 <= response_code <= 299:
+        raise LTIGradePostError('willolabs.tasks.post_grade() - Willo Labs api returned {code} for the grade of lti_username: {lti_username}, assignment: {assignment}'.format(
+            code=response_code,
+            lti_username=lti_username,
+            assignment=lti_cached_assignment.display_name
+        ))
+
+    now = UTC.localize(datetime.datetime.now())
+    lti_cached_grade.synched = now
+    lti_cached_grade.save()
+    return True
 
 def get_assignment_grade(course_key,  problem_usage_key, subsection_grade):
     """
@@ -539,7 +738,11 @@ def get_assignment_grade(course_key,  problem_usage_key, subsection_grade):
         'section_grade_percent': _calc_grade_percentage(subsection_grade.graded_total.earned, subsection_grade.graded_total.possible),
         }
 
-    chapter = get_subsection_chapter(problem_usage_key)
+    index_entry = course_index.get_course_index_entry(problem_usage_key)
+    if index_entry is not None:
+        chapter = index_entry['chapter_id']
+    else:
+        chapter = get_subsection_chapter(problem_usage_key)
     section_url = u'{scheme}://{host}/{url_prefix}/{course_id}/courseware/{chapter}/{section}'.format(
             scheme=u"https" if settings.HTTPS == "on" else u"http",
             host=settings.SITE_NAME,
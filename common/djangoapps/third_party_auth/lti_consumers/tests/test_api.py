@@ -0,0 +1,94 @@
+"""
+Unit tests for the bulk Willo outcome prefetch in api.py
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from mock import MagicMock, patch
+
+from .. import api
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lti_consumers_api',
+    },
+}
+URL = 'https://app.willolabs.com/api/v1/outcomes/DKGSf3/e42f27081648428f8995b1bca2e794ad/'
+ACTIVITY_ID = '249dfef365fd434c9f5b98754f2e2cb3'
+COLUMN = [
+    {
+        'activity_id': ACTIVITY_ID,
+        'user_id': 'student1',
+        'score': 3.0,
+        'timestamp': '2021-01-06T21:40:34Z',
+        'type': 'result'
+    },
+    {
+        'activity_id': ACTIVITY_ID,
+        'user_id': 'student2',
+        'score': 5.0,
+        'timestamp': '2021-01-06T21:40:34Z',
+        'type': 'result'
+    },
+]
+
+
+def willo_response(status_code=200, json_data=None):
+    response = MagicMock(status_code=status_code, reason='', text='')
+    response.json.return_value = json_data
+    return response
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WilloApiPrefetchTestCase(TestCase):
+    """
+    Tests for api.willo_api_prefetch_outcomes() and api.willo_api_grade_should_post()
+    """
+    def setUp(self):
+        super(WilloApiPrefetchTestCase, self).setUp()
+        cache.clear()
+
+    def _data(self, user_id, score):
+        return {
+            'type': 'result',
+            'id': ACTIVITY_ID + ':' + user_id,
+            'activity_id': ACTIVITY_ID,
+            'user_id': user_id,
+            'result_date': '2021-01-06T21:40:34+00:00',
+            'score': score,
+            'points_possible': 5.0
+        }
+
+    @patch.object(api, 'willo_api_request', return_value=willo_response(json_data=COLUMN))
+    def test_prefetch_reads_the_column_once(self, willo_api_request):
+        outcomes = api.willo_api_prefetch_outcomes(URL, ACTIVITY_ID, user_ids=['student1', 'student2', 'student3'])
+
+        self.assertEqual(sorted(outcomes.keys()), ['student1', 'student2'])
+        self.assertEqual(willo_api_request.call_count, 1)
+        self.assertEqual(willo_api_request.call_args[1]['params'], {'id': ACTIVITY_ID})
+
+        # per-student lookups are now answered from the cache, including students without a Willo result.
+        self.assertEqual(api.willo_api_get_outcome(URL, ACTIVITY_ID, 'student1')[0]['score'], 3.0)
+        self.assertEqual(api.willo_api_get_outcome(URL, ACTIVITY_ID, 'student3'), [])
+        self.assertEqual(willo_api_request.call_count, 1)
+
+    @patch.object(api, 'willo_api_request', return_value=willo_response(status_code=502))
+    def test_prefetch_failure_caches_nothing(self, _):
+        self.assertIsNone(api.willo_api_prefetch_outcomes(URL, ACTIVITY_ID, user_ids=['student1']))
+        self.assertIsNone(api._cache_get(user_id='student1', activity_id=ACTIVITY_ID, id=URL))
+
+    def test_grade_should_post_only_for_diffs(self):
+        outcomes = {result['user_id']: result for result in COLUMN}
+
+        self.assertFalse(api.willo_api_grade_should_post(self._data('student1', 3.0), outcomes))
+        self.assertTrue(api.willo_api_grade_should_post(self._data('student1', 4.0), outcomes))
+        self.assertTrue(api.willo_api_grade_should_post(self._data('student3', 1.0), outcomes))
+
+    @patch.object(api, 'willo_api_request', return_value=willo_response(json_data=COLUMN))
+    def test_post_grade_skips_unchanged_grade_without_a_get(self, willo_api_request):
+        api.willo_api_prefetch_outcomes(URL, ACTIVITY_ID)
+        retval = api.willo_api_post_grade(URL, self._data('student2', 5.0))
+
+        self.assertEqual(retval, api.WILLO_API_POST_GRADE_SKIPPED)
+        self.assertEqual(willo_api_request.call_count, 1)
@@ -0,0 +1,127 @@
+"""
+Unit tests for the pooled Willo api session, run against a local stub http server.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+from django.test import SimpleTestCase
+from mock import patch
+
+from .. import api_client
+
+
+class StubWilloServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded http server that returns the next status code from self.statuses,
+    then 200 once the list is exhausted.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StubWilloHandler)
+        self.statuses = []
+        self.delay = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{port}/api/v1/outcomes/DKGSf3/e42f27081648428f8995b1bca2e794ad/'.format(
+            port=self.server_address[1]
+        )
+
+
+class StubWilloHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            status = server.statuses.pop(0) if server.statuses else 200
+        if server.delay:
+            time.sleep(server.delay)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = b'[]'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.in_flight -= 1
+
+    do_GET = _respond
+    do_POST = _respond
+    do_PATCH = _respond
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@patch.object(api_client, 'WILLO_API_BACKOFF_FACTOR', 0)
+class WilloApiClientTestCase(SimpleTestCase):
+    """
+    Tests for api_client.willo_api_request() and api_client.willo_api_map()
+    """
+    def setUp(self):
+        super(WilloApiClientTestCase, self).setUp()
+        api_client.reset_session()
+        self.server = StubWilloServer()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(api_client.reset_session)
+
+    def test_retries_server_errors(self):
+        self.server.statuses = [503, 429]
+        response = api_client.willo_api_request('post', url=self.server.url, data='{}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, 3)
+
+    @patch.object(api_client, 'WILLO_API_MAX_RETRIES', 1)
+    def test_returns_last_response_when_retries_are_exhausted(self):
+        self.server.statuses = [503, 503, 503]
+        response = api_client.willo_api_request('get', url=self.server.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_does_not_retry_client_errors(self):
+        self.server.statuses = [404]
+        response = api_client.willo_api_request('get', url=self.server.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.server.requests, 1)
+
+    @patch.object(api_client, 'WILLO_API_MAX_RETRIES', 0)
+    def test_read_timeout(self):
+        self.server.delay = 0.5
+        with self.assertRaises(requests.exceptions.RequestException):
+            api_client.willo_api_request('get', url=self.server.url, timeout=(1, 0.1))
+
+    def test_session_is_shared(self):
+        self.assertIs(api_client.get_session(), api_client.get_session())
+
+    @patch.object(api_client, 'WILLO_API_POOL_MAXSIZE', 4)
+    def test_map_keeps_requests_in_flight(self):
+        self.server.delay = 0.2
+
+        def get(i):
+            return i, api_client.willo_api_request('get', url=self.server.url).status_code
+
+        results = api_client.willo_api_map(get, range(8), max_workers=8, close_db_connections=False)
+
+        self.assertEqual(results, [(i, 200) for i in range(8)])
+        # more than one request was in flight, but never more than the per-host pool size.
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 4)
@@ -0,0 +1,70 @@
+"""
+Unit tests for the LTI Grade Sync course structure index.
+"""
+from django.core.cache import cache
+from django.test.utils import override_settings
+from mock import patch
+
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+from .. import course_index
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lti_consumers_course_index',
+    },
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CourseIndexTestCase(ModuleStoreTestCase):
+    """
+    Tests for course_index.get_course_index_entry()
+    """
+    def setUp(self):
+        super(CourseIndexTestCase, self).setUp()
+        cache.clear()
+        self.course = CourseFactory.create()
+        self.chapter = ItemFactory.create(parent=self.course, category='chapter', display_name='Chapter 1')
+        self.sequential = ItemFactory.create(parent=self.chapter, category='sequential', display_name='Homework 1.1')
+        self.vertical = ItemFactory.create(parent=self.sequential, category='vertical')
+        self.problem = ItemFactory.create(parent=self.vertical, category='problem')
+
+    def test_problem_maps_to_assignment_and_chapter(self):
+        entry = course_index.get_course_index_entry(self.problem.location)
+
+        self.assertEqual(entry['usage_key'], str(self.problem.location))
+        self.assertEqual(entry['assignment_usage_key'], str(self.sequential.location))
+        self.assertEqual(entry['assignment_id'], self.sequential.location.block_id)
+        self.assertEqual(entry['chapter_id'], self.chapter.location.block_id)
+        self.assertEqual(entry['display_name'], 'Homework 1.1')
+        self.assertEqual(entry['activity_id'], 'homework11')
+        self.assertTrue(entry['url'].endswith('/courseware/{chapter}/{sequential}'.format(
+            chapter=self.chapter.location.block_id,
+            sequential=self.sequential.location.block_id
+        )))
+
+    def test_assignment_lookup_by_block_id(self):
+        entry = course_index.get_course_index_assignment(self.course.id, self.sequential.location.block_id)
+        self.assertEqual(entry['assignment_usage_key'], str(self.sequential.location))
+
+    def test_index_is_built_once(self):
+        with patch.object(course_index, 'build_course_index', wraps=course_index.build_course_index) as build:
+            course_index.get_course_index_entry(self.problem.location)
+            course_index.get_course_index_entry(self.vertical.location)
+            course_index.get_course_index_entry(str(self.sequential.location))
+        self.assertEqual(build.call_count, 1)
+
+    def test_blocks_outside_assignments_are_not_indexed(self):
+        self.assertIsNone(course_index.get_course_index_entry(self.chapter.location))
+
+    def test_clear_course_index_picks_up_new_content(self):
+        course_index.get_course_index_entry(self.problem.location)
+        problem2 = ItemFactory.create(parent=self.vertical, category='problem')
+        self.assertIsNone(course_index.get_course_index_entry(problem2.location))
+
+        course_index.clear_course_index(self.course.id)
+        entry = course_index.get_course_index_entry(problem2.location)
+        self.assertEqual(entry['assignment_usage_key'], str(self.sequential.location))
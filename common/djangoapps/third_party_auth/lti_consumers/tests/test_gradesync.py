@@ -0,0 +1,135 @@
+"""
+Unit tests for LTIGradeSync bulk mode.
+"""
+import datetime
+
+import pytz
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+from mock import MagicMock, patch
+
+from student.tests.factories import UserFactory
+
+from .. import gradesync
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lti_consumers_gradesync',
+    },
+}
+COURSE_ID = 'course-v1:ABC+OS9471721_9626+01'
+CONTEXT_ID = 'e14751571da04dd3a2c71a311dda2e1b'
+
+
+class FakeCourseGradeFactory(object):
+    def iter(self, users, **kwargs):
+        for user in users:
+            yield (user, MagicMock(), None)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@patch.object(gradesync, 'get_block_structure_manager', MagicMock())
+@patch.object(gradesync, 'CourseGradeFactory', FakeCourseGradeFactory)
+class LTIGradeSyncBulkTestCase(TestCase):
+    """
+    Tests for LTIGradeSync.iterate_students_bulk()
+    """
+    def setUp(self):
+        super(LTIGradeSyncBulkTestCase, self).setUp()
+        self.users = [UserFactory() for _ in range(5)]
+        users_enrolled_in = patch.object(
+            gradesync.CourseEnrollment.objects,
+            'users_enrolled_in',
+            return_value=get_user_model().objects.filter(id__in=[user.id for user in self.users])
+        )
+        users_enrolled_in.start()
+        self.addCleanup(users_enrolled_in.stop)
+
+    def _grade_sync(self, **kwargs):
+        grade_sync = gradesync.LTIGradeSync(chunk_size=2, **kwargs)
+        grade_sync.course_id = COURSE_ID
+        grade_sync.course_key = gradesync.CourseKey.from_string(COURSE_ID)
+        grade_sync.context_id = CONTEXT_ID
+        grade_sync.console_output = MagicMock()
+        grade_sync.clear_checkpoint()
+        return grade_sync
+
+    def _processed(self, verify_lti_cache_bulk):
+        return [call[0][0][0] for call in verify_lti_cache_bulk.call_args_list]
+
+    @patch.object(gradesync.LTIGradeSync, 'verify_lti_cache_bulk')
+    def test_processes_every_student_once(self, verify_lti_cache_bulk):
+        grade_sync = self._grade_sync()
+        grade_sync.iterate_students_bulk()
+
+        self.assertEqual(self._processed(verify_lti_cache_bulk), self.users)
+        self.assertIsNone(grade_sync.get_checkpoint())
+
+    @patch.object(gradesync.LTIGradeSync, 'verify_lti_cache_bulk')
+    def test_resumes_after_checkpoint(self, verify_lti_cache_bulk):
+        grade_sync = self._grade_sync()
+        grade_sync.set_checkpoint(self.users[1].id)
+        grade_sync.iterate_students_bulk()
+
+        self.assertEqual(self._processed(verify_lti_cache_bulk), self.users[2:])
+
+    @patch.object(gradesync.LTIGradeSync, 'verify_lti_cache_bulk')
+    def test_restart_ignores_checkpoint(self, verify_lti_cache_bulk):
+        grade_sync = self._grade_sync(resume=False)
+        grade_sync.set_checkpoint(self.users[1].id)
+        grade_sync.iterate_students_bulk()
+
+        self.assertEqual(self._processed(verify_lti_cache_bulk), self.users)
+
+    def test_interrupted_run_keeps_checkpoint(self):
+        grade_sync = self._grade_sync()
+        with patch.object(gradesync, 'willo_api_map', side_effect=[None, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                grade_sync.iterate_students_bulk()
+
+        # the first chunk of two students completed before the interruption.
+        self.assertEqual(grade_sync.get_checkpoint(), self.users[1].id)
+
+    @patch.object(gradesync, 'willo_api_post_grade', return_value=200)
+    @patch.object(gradesync, 'willo_api_create_column', return_value=201)
+    @patch.object(gradesync, 'willo_api_prefetch_outcomes')
+    @patch.object(gradesync, 'get_lti_cached_result_date', return_value=datetime.datetime(2020, 4, 24, tzinfo=pytz.UTC))
+    @patch.object(gradesync, 'get_lti_user_id', return_value='7010d877b3b74f39a6cbf89f9c3819ce')
+    @patch.object(gradesync, 'get_ext_wl_outcome_service_url', return_value='https://app.willolabs.com/api/v1/outcomes/DKGSf3/')
+    @patch.object(gradesync, 'is_lti_cached_user', return_value=True)
+    @patch.object(gradesync, 'InternalCourseGradeView')
+    def test_posts_columns_and_grades(self, grade_view, *mocks):
+        willo_api_create_column, willo_api_post_grade = mocks[-2], mocks[-1]
+        grade_view.return_value.get_from_course_grade.return_value = {
+            'course_enrollment_start': datetime.datetime(2020, 1, 1, tzinfo=pytz.UTC),
+            'course_chapters': {
+                'chapter1': {'chapter_sections': {
+                    'section1': {
+                        'section_display_name': 'Midterm Exam 1',
+                        'section_url': 'https://rover/courses/{}/courseware/c0a9afb73af311e98367b7d76f928163/'.format(COURSE_ID),
+                        'section_due_date': datetime.datetime(2020, 3, 1, tzinfo=pytz.UTC),
+                        'section_completed_date': None,
+                        'section_graded': True,
+                        'section_grade': {
+                            'section_grade_earned': 4.0,
+                            'section_grade_possible': 5.0,
+                            'section_attempted_graded': True,
+                        },
+                    },
+                }},
+            },
+        }
+
+        self._grade_sync().iterate_students_bulk()
+
+        self.assertEqual(willo_api_create_column.call_count, len(self.users))
+        column = willo_api_create_column.call_args[1]['data']
+        self.assertEqual(
+            (column['canvas_assignment_group'], column['canvas_assignment_group_weight']),
+            ('Midterms', 30.0)
+        )
+        self.assertEqual(willo_api_post_grade.call_count, len(self.users))
+        grade = willo_api_post_grade.call_args[1]['data']
+        self.assertEqual((grade['score'], grade['points_possible']), (4.0, 5.0))
@@ -0,0 +1,206 @@
+"""
+Unit tests for the Willo grade post coalescing queue.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from mock import patch
+
+from .. import gradesync_queue, tasks
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lti_consumers_gradesync_queue',
+    },
+}
+COURSE_ID = 'course-v1:ABC+OS9471721_9626+01'
+ASSIGNMENT_ID = 'block-v1:ABC+OS9471721_9626+01+type@sequential+block@c8bc91313af211e98026b7d76f928163'
+PROBLEM_1 = 'block-v1:ABC+OS9471721_9626+01+type@problem+block@1'
+PROBLEM_2 = 'block-v1:ABC+OS9471721_9626+01+type@problem+block@2'
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@patch.object(gradesync_queue, 'GRADESYNC_QUEUE_DEBOUNCE_SECONDS', 30)
+class GradeSyncQueueTestCase(TestCase):
+    """
+    Tests for gradesync_queue.add_pending(), get_pending() and remove_pending()
+    """
+    def setUp(self):
+        super(GradeSyncQueueTestCase, self).setUp()
+        cache.clear()
+
+    def _add(self, username, usage_id=PROBLEM_1, assignment_id=ASSIGNMENT_ID):
+        return gradesync_queue.add_pending(
+            username=username,
+            course_id=COURSE_ID,
+            usage_id=usage_id,
+            assignment_id=assignment_id,
+            context_id='e14751571da04dd3a2c71a311dda2e1b'
+        )
+
+    @patch('time.time', return_value=3000.0)
+    def test_repeat_submissions_collapse(self, _):
+        self.assertEqual(self._add('student1'), (100, 1))
+        self.assertIsNone(self._add('student1', usage_id=PROBLEM_2))
+        self.assertIsNone(self._add('student1'))
+        self.assertEqual(self._add('student2'), (100, 2))
+
+        entries, slot_keys, slot_count = gradesync_queue.get_pending(100)
+        self.assertEqual(slot_count, 2)
+        self.assertEqual(len(slot_keys), 2)
+        entries = {entry['username']: entry for entry in entries.values()}
+        self.assertEqual(entries['student1']['submissions'], 3)
+        self.assertEqual(entries['student1']['usage_id'], PROBLEM_1)
+        self.assertEqual(entries['student2']['submissions'], 1)
+
+        stats = gradesync_queue.get_stats()
+        self.assertEqual(stats['enqueued'], 2)
+        self.assertEqual(stats['collapsed'], 2)
+
+    @patch('time.time', return_value=3000.0)
+    def test_remove_pending_empties_the_bucket(self, _):
+        self._add('student1')
+        entries, slot_keys, _ = gradesync_queue.get_pending(100)
+        self.assertEqual(len(entries), 1)
+        # entries stay queued until they are removed
+        self.assertEqual(len(gradesync_queue.get_pending(100)[0]), 1)
+
+        for key, entry in entries.items():
+            self.assertIsNone(gradesync_queue.remove_pending(key, entry))
+        gradesync_queue.remove_slots(slot_keys)
+        self.assertEqual(gradesync_queue.get_pending(100)[0], {})
+
+        # a submission after the flush opens a new pending entry
+        self.assertEqual(self._add('student1'), (100, 2))
+
+    def test_remove_pending_moves_an_updated_entry(self):
+        with patch('time.time', return_value=3000.0):
+            self._add('student1')
+            entries, _, _ = gradesync_queue.get_pending(100)
+        with patch('time.time', return_value=3031.0):
+            # collapses into the entry while its grade is being posted
+            self.assertIsNone(self._add('student1', usage_id=PROBLEM_2))
+            [(key, entry)] = entries.items()
+            self.assertEqual(gradesync_queue.remove_pending(key, entry), (101, 1))
+
+        [moved] = gradesync_queue.get_pending(101)[0].values()
+        self.assertEqual(moved['usage_id'], PROBLEM_2)
+
+    @patch('time.time', return_value=3000.0)
+    def test_get_pending_batches(self, _):
+        for i in range(5):
+            self._add('student{}'.format(i))
+
+        entries, _, slot_count = gradesync_queue.get_pending(100, offset=0, batch_size=2)
+        self.assertEqual((len(entries), slot_count), (2, 5))
+        entries, _, _ = gradesync_queue.get_pending(100, offset=2, batch_size=2)
+        self.assertEqual(len(entries), 2)
+        entries, _, _ = gradesync_queue.get_pending(100, offset=4, batch_size=2)
+        self.assertEqual(len(entries), 1)
+
+    @patch('time.time', return_value=3000.0)
+    def test_evicted_slot_counter(self, _):
+        incr = cache.incr
+        evicted = []
+
+        def evicting_incr(key, *args, **kwargs):
+            """ the slot counter is evicted between add() and incr() """
+            if not evicted:
+                evicted.append(key)
+                cache.delete(key, version=gradesync_queue.GRADESYNC_QUEUE_CACHE_VERSION)
+                raise ValueError('Key not found')
+            return incr(key, *args, **kwargs)
+
+        with patch.object(cache, 'incr', side_effect=evicting_incr):
+            self.assertEqual(self._add('student1'), (100, 1))
+        self.assertEqual(self._add('student2'), (100, 2))
+
+    def test_flush_countdown_covers_a_full_window(self):
+        self.assertEqual(gradesync_queue.bucket_id(3000.0), 100)
+        self.assertEqual(gradesync_queue.bucket_flush_countdown(100, 3000.0), 60)
+        self.assertEqual(gradesync_queue.bucket_flush_countdown(100, 3029.0), 31)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@patch.object(gradesync_queue, 'GRADESYNC_QUEUE_DEBOUNCE_SECONDS', 30)
+@patch('time.time', return_value=3000.0)
+class GradeSyncQueueTasksTestCase(TestCase):
+    """
+    Tests for tasks.enqueue_grade_post() and tasks.flush_grade_posts()
+    """
+    def setUp(self):
+        super(GradeSyncQueueTasksTestCase, self).setUp()
+        cache.clear()
+
+    def _enqueue(self, username, usage_id=PROBLEM_1):
+        return tasks.enqueue_grade_post(username, COURSE_ID, usage_id, ASSIGNMENT_ID)
+
+    @patch.object(tasks.flush_grade_posts, 'apply_async')
+    def test_enqueue_schedules_one_flush_per_bucket(self, apply_async, _):
+        self.assertTrue(self._enqueue('student1'))
+        self.assertFalse(self._enqueue('student1', usage_id=PROBLEM_2))
+        self.assertTrue(self._enqueue('student2'))
+
+        apply_async.assert_called_once_with(kwargs={'bucket': 100}, countdown=60)
+
+    @patch.object(tasks.flush_grade_posts, 'apply_async')
+    def test_enqueue_reads_the_course_from_the_model_cache(self, _, __):
+        self._enqueue('student1')
+
+        with self.assertNumQueries(0):
+            self._enqueue('student2')
+
+    @patch.object(gradesync_queue, 'GRADESYNC_QUEUE_DEBOUNCE_SECONDS', 0)
+    @patch.object(tasks, 'post_grades')
+    def test_enqueue_posts_immediately_when_disabled(self, post_grades, _):
+        self.assertFalse(self._enqueue('student1'))
+
+        post_grades.assert_called_once_with(username='student1', course_id=COURSE_ID, usage_id=PROBLEM_1)
+        self.assertEqual(gradesync_queue.get_stats()['enqueued'], 0)
+
+    @patch.object(tasks.flush_grade_posts, 'apply_async')
+    @patch.object(tasks, '_sync_grade')
+    def test_flush_posts_and_removes_entries(self, _sync_grade, _, __):
+        self._enqueue('student1')
+        self._enqueue('student1', usage_id=PROBLEM_2)
+        self._enqueue('student2')
+
+        self.assertEqual(tasks.flush_grade_posts.run(bucket=100), 2)
+
+        self.assertEqual(
+            sorted(call[1]['username'] for call in _sync_grade.call_args_list),
+            ['student1', 'student2']
+        )
+        self.assertEqual(gradesync_queue.get_pending(100)[0], {})
+        stats = gradesync_queue.get_stats()
+        self.assertEqual((stats['flushed'], stats['posted'], stats['collapsed']), (2, 2, 1))
+
+    @patch.object(tasks.flush_grade_posts, 'apply_async')
+    @patch.object(tasks.post_grades, 'apply_async')
+    @patch.object(tasks, '_sync_grade', side_effect=ValueError('willo is down'))
+    def test_flush_hands_failed_posts_to_post_grades(self, _, post_grades, __, ___):
+        self._enqueue('student1')
+
+        tasks.flush_grade_posts.run(bucket=100)
+
+        post_grades.assert_called_once_with(
+            kwargs={'username': 'student1', 'course_id': COURSE_ID, 'usage_id': PROBLEM_1}
+        )
+        self.assertEqual(gradesync_queue.get_stats()['failed'], 1)
+
+    @patch.object(tasks.flush_grade_posts, 'apply_async')
+    @patch.object(tasks, '_sync_grade')
+    def test_redelivered_flush_posts_unprocessed_entries(self, _sync_grade, _, __):
+        self._enqueue('student1')
+        self._enqueue('student2')
+
+        # the worker dies while posting the second grade
+        _sync_grade.side_effect = [True, SystemExit()]
+        with self.assertRaises(SystemExit):
+            tasks.flush_grade_posts.run(bucket=100)
+        first_username = _sync_grade.call_args_list[0][1]['username']
+
+        _sync_grade.side_effect = None
+        self.assertEqual(tasks.flush_grade_posts.run(bucket=100), 1)
+        self.assertNotEqual(_sync_grade.call_args[1]['username'], first_username)
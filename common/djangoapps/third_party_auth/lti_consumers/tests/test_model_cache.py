@@ -0,0 +1,106 @@
+"""
+Unit tests for the LTICacheManager model cache.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from edx_django_utils.cache import RequestCache
+
+from openedx.core.djangoapps.content.course_overviews.tests.factories import CourseOverviewFactory
+from student.tests.factories import UserFactory
+
+from .. import model_cache
+from ..cache import LTICacheManager
+from ..models import (
+    LTIExternalCourse,
+    LTIExternalCourseAssignmentProblems,
+    LTIExternalCourseAssignments,
+    LTIExternalCourseEnrollment,
+    LTIInternalCourse
+)
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lti_consumers_model_cache',
+    },
+}
+CONTEXT_ID = 'e14751571da04dd3a2c71a311dda2e1b'
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ModelCacheTestCase(TestCase):
+    """
+    Tests for model_cache, and its use by LTICacheManager
+    """
+    def setUp(self):
+        super(ModelCacheTestCase, self).setUp()
+        cache.clear()
+        self.user = UserFactory()
+        course_overview = CourseOverviewFactory()
+        self.course_key = course_overview.id
+        self.usage_key = self.course_key.make_usage_key('problem', 'c081d7653af211e98379b7d76f928163')
+
+        internal_course = LTIInternalCourse.objects.create(course=course_overview, enabled=True)
+        self.external_course = LTIExternalCourse.objects.create(
+            context_id=CONTEXT_ID,
+            course_id=internal_course,
+            enabled=True
+        )
+        LTIExternalCourseEnrollment.objects.create(
+            course=self.external_course,
+            user=self.user,
+            lti_user_id='ab3e190fae668d925d007d79219fbfce90afba6d'
+        )
+        self.assignment = LTIExternalCourseAssignments.objects.create(
+            course=self.external_course,
+            url='https://example.com/courses/{}/courseware/chapter/sequential'.format(self.course_key),
+            display_name='Homework 1.1'
+        )
+        LTIExternalCourseAssignmentProblems.objects.create(
+            course_assignment=self.assignment,
+            usage_key=self.usage_key
+        )
+        self._new_request()
+
+    def _new_request(self):
+        RequestCache.clear_all_namespaces()
+
+    def _grade_lookup(self):
+        cache_manager = LTICacheManager(user=self.user, course_id=str(self.course_key))
+        return cache_manager.course_enrollment, cache_manager.get_course_assignment(self.usage_key)
+
+    def test_warm_cache_does_not_query(self):
+        enrollment, assignment = self._grade_lookup()
+        self.assertEqual(enrollment.user, self.user)
+        self.assertEqual(assignment, self.assignment)
+
+        self._new_request()
+        with self.assertNumQueries(0):
+            enrollment, assignment = self._grade_lookup()
+            # The foreign keys walked by post_grade() come with the records.
+            self.assertEqual(enrollment.user.username, self.user.username)
+            self.assertEqual(enrollment.course.course_id.course_id, self.course_key)
+            self.assertEqual(assignment.course.context_id, CONTEXT_ID)
+
+    def test_lookups_are_memoized_per_request(self):
+        with self.assertNumQueries(1):
+            model_cache.get_external_course(self.course_key)
+            model_cache.get_external_course(self.course_key)
+
+    def test_save_invalidates(self):
+        self.assertTrue(model_cache.get_external_course(self.course_key).enabled)
+
+        self.external_course.enabled = False
+        self.external_course.save()
+
+        self.assertFalse(model_cache.get_external_course(self.course_key).enabled)
+
+    def test_new_problem_record_is_found(self):
+        usage_key = self.course_key.make_usage_key('problem', 'a7d25c1f3af211e98379b7d76f928163')
+        self.assertIsNone(model_cache.get_assignment_problem(self.course_key, usage_key))
+
+        LTIExternalCourseAssignmentProblems.objects.create(course_assignment=self.assignment, usage_key=usage_key)
+
+        problem = model_cache.get_assignment_problem(self.course_key, usage_key)
+        self.assertEqual(problem.course_assignment, self.assignment)
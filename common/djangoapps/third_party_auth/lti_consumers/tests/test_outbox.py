@@ -0,0 +1,99 @@
+"""
+Unit tests for the LTI Grade Sync outbox of failed grade posts.
+"""
+import datetime
+
+from django.test import TestCase
+from mock import MagicMock, patch
+
+from .. import outbox, tasks
+from ..models import LTIGradePostOutbox
+
+COURSE_ID = 'course-v1:ABC+OS9471721_9626+01'
+USAGE_ID = 'block-v1:ABC+OS9471721_9626+01+type@swxblock+block@c081d7653af211e98379b7d76f928163'
+
+
+class OutboxTestCase(TestCase):
+    """
+    Tests for outbox.record_failed_post() and outbox.replay()
+    """
+    def _record(self, username='student1', error=None):
+        outbox.record_failed_post(username, COURSE_ID, USAGE_ID, error or ValueError('timeout'))
+
+    def test_repeat_failures_share_one_row(self):
+        self._record()
+        self._record(error=ValueError('502'))
+
+        post = LTIGradePostOutbox.objects.get()
+        self.assertEqual(post.attempts, 2)
+        self.assertEqual(post.status, LTIGradePostOutbox.PENDING)
+        self.assertIn('502', post.last_error)
+
+    @patch.object(tasks, '_sync_grade', return_value=True)
+    def test_replay_deletes_delivered_posts(self, _sync_grade):
+        self._record('student1')
+        self._record('student2')
+
+        counts = outbox.replay(outbox.get_posts(), batch_size=1, posts_per_second=0)
+
+        self.assertEqual(counts['delivered'], 2)
+        self.assertEqual(_sync_grade.call_count, 2)
+        self.assertFalse(LTIGradePostOutbox.objects.exists())
+
+    @patch.object(tasks, 'willo_api_post_grade', return_value=500)
+    def test_replay_keeps_rejected_posts(self, _):
+        lti_cached_grade = MagicMock(created=datetime.datetime(2020, 4, 24, 19, 12, 19), earned_graded=1.0, possible_graded=2.0)
+
+        def sync_grade(task, username, course_id, usage_id):
+            """ _sync_grade() of a grade that Willo Labs rejects with a 500 """
+            return tasks.post_grade(
+                task,
+                lti_cached_course=MagicMock(course_id=COURSE_ID),
+                lti_cached_enrollment=MagicMock(lti_user_id='7010d877b3b74f39a6cbf89f9c3819ce'),
+                lti_cached_assignment=MagicMock(url=USAGE_ID, display_name='Lesson 4.5'),
+                lti_cached_grade=lti_cached_grade,
+            )
+
+        self._record()
+        with patch.object(tasks, '_sync_grade', side_effect=sync_grade):
+            counts = outbox.replay(outbox.get_posts(), posts_per_second=0)
+
+        self.assertEqual(counts['delivered'], 0)
+        self.assertEqual(counts['failed'], 1)
+        post = LTIGradePostOutbox.objects.get()
+        self.assertEqual(post.attempts, 2)
+        self.assertIn('500', post.last_error)
+        self.assertFalse(lti_cached_grade.save.called)
+
+    @patch.object(tasks, '_sync_grade', return_value=False)
+    def test_replay_keeps_posts_that_were_not_posted(self, _):
+        self._record()
+
+        counts = outbox.replay(outbox.get_posts(), posts_per_second=0)
+
+        self.assertEqual(counts['failed'], 1)
+        self.assertEqual(LTIGradePostOutbox.objects.get().attempts, 2)
+
+    @patch.object(tasks, '_sync_grade', side_effect=ValueError('still down'))
+    def test_replay_gives_up_after_max_attempts(self, _):
+        self._record()
+        LTIGradePostOutbox.objects.update(attempts=outbox.GRADESYNC_OUTBOX_MAX_ATTEMPTS - 1)
+
+        counts = outbox.replay(outbox.get_posts(), posts_per_second=0)
+
+        self.assertEqual(counts['gave_up'], 1)
+        self.assertEqual(LTIGradePostOutbox.objects.get().status, LTIGradePostOutbox.FAILED)
+        self.assertFalse(outbox.get_posts().exists())
+        self.assertTrue(outbox.get_posts(include_failed=True).exists())
+
+    @patch.object(tasks, '_sync_grade', side_effect=ValueError('willo is down'))
+    def test_post_grades_parks_post_after_last_retry(self, _):
+        task = tasks.post_grades
+        task.push_request(retries=task.max_retries)
+        try:
+            with self.assertRaises(ValueError):
+                task.run(username='student1', course_id=COURSE_ID, usage_id=USAGE_ID)
+        finally:
+            task.pop_request()
+
+        self.assertEqual(LTIGradePostOutbox.objects.get().username, 'student1')
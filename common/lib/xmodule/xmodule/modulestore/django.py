@@ -28,6 +28,8 @@ from edx_django_utils.cache import DEFAULT_REQUEST_CACHE
 from xmodule.contentstore.django import contentstore
 from xmodule.modulestore.draft_and_published import BranchSettingMixin
 from xmodule.modulestore.mixed import MixedModuleStore
+from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+from xmodule.modulestore.split_mongo.structure_index import DEFAULT_MAX_BYTES as STRUCTURE_INDEX_CACHE_MAX_BYTES
 from xmodule.util.xmodule_django import get_current_request_hostname
 
 # We also may not always have the current request user (crum) module available
@@ -266,6 +268,13 @@ def create_modulestore_instance(
     if issubclass(class_, BranchSettingMixin):
         _options['branch_setting_func'] = _get_modulestore_branch_setting
 
+    if issubclass(class_, SplitMongoModuleStore):
+        _options.setdefault('structure_cache_max_bytes', getattr(settings, 'SPLIT_STRUCTURE_CACHE_MAX_BYTES', 0))
+        _options.setdefault(
+            'structure_index_cache_max_bytes',
+            getattr(settings, 'SPLIT_STRUCTURE_INDEX_CACHE_MAX_BYTES', STRUCTURE_INDEX_CACHE_MAX_BYTES),
+        )
+
     if HAS_USER_SERVICE and not user_service:
         xb_user_service = DjangoXBlockUserService(get_current_user())
     else:
@@ -0,0 +1,132 @@
+"""
+Benchmarks matching the blocks of large synthetic split structures against
+get_items qualifiers, by scanning all of the blocks, as get_items used to,
+and by matching only the candidates looked up in a StructureIndex.
+
+Usage:
+    python -m xmodule.modulestore.perf_tests.benchmark_get_items -b 5000 -b 20000 --iterations 20
+"""
+
+
+import random
+import time
+
+from six.moves import range
+
+from xmodule.modulestore import BlockData, ModuleStoreRead
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.structure_index import StructureIndex
+
+try:
+    import click
+except ImportError:
+    click = None
+
+QUERIES = (
+    (u'category', {'block_type': u'problem'}, {}),
+    (u'category and format', {'block_type': u'sequential'}, {'format': u'Homework'}),
+    (u'display_name', {}, {'display_name': u'Block 42'}),
+    (u'category and $in', {'block_type': u'html'}, {'display_name': {'$in': [u'Block 7', u'Block 8']}}),
+)
+
+
+class BlockMatcher(object):
+    """
+    The block matching of the modulestores, without a modulestore.
+    """
+    _block_matches = ModuleStoreRead._block_matches  # pylint: disable=protected-access
+    _value_matches = ModuleStoreRead._value_matches  # pylint: disable=protected-access
+
+
+def make_structure(num_blocks):
+    """
+    Return a synthetic structure of num_blocks blocks, with the mix of block
+    types and settings of a large course.
+    """
+    blocks = {}
+    for index in range(num_blocks):
+        block_type = random.choice([u'problem', u'problem', u'html', u'video', u'vertical', u'sequential'])
+        fields = {'display_name': u'Block {}'.format(index)}
+        if block_type == u'sequential':
+            fields['format'] = random.choice([u'Homework', u'Lab', u'Exam'])
+            fields['graded'] = True
+        elif block_type == u'problem':
+            fields['weight'] = random.random()
+            fields['max_attempts'] = random.randint(1, 5)
+        block_key = BlockKey(block_type, u'{:032x}'.format(random.getrandbits(128)))
+        blocks[block_key] = BlockData(
+            block_type=block_type,
+            definition=u'{:024x}'.format(random.getrandbits(96)),
+            fields=fields,
+            edit_info={},
+        )
+    return {'_id': u'benchmark', 'blocks': blocks}
+
+
+def benchmark(num_blocks, iterations):
+    """
+    Return, for each of QUERIES, its label, its number of matching blocks,
+    and the average times, in seconds, to find them by scanning all of the
+    blocks and by matching the candidates of a StructureIndex, along with
+    the time to build the index.
+    """
+    structure = make_structure(num_blocks)
+    matcher = BlockMatcher()
+
+    def matches(block, qualifiers, settings):
+        return matcher._block_matches(block, qualifiers) and matcher._block_matches(block.fields, settings)
+
+    def scan(qualifiers, settings):
+        return [
+            block_key for block_key, block in structure['blocks'].items()
+            if matches(block, qualifiers, settings)
+        ]
+
+    def lookup(index, qualifiers, settings):
+        return [
+            block_key for block_key in index.candidates(qualifiers.get('block_type'), settings)
+            if matches(structure['blocks'][block_key], qualifiers, settings)
+        ]
+
+    def timed(func, *func_args):
+        started = time.time()
+        for _ in range(iterations):
+            result = func(*func_args)
+        return (time.time() - started) / iterations, result
+
+    build_time, index = timed(StructureIndex, structure)
+    results = []
+    for label, qualifiers, settings in QUERIES:
+        scan_time, scanned = timed(scan, qualifiers, settings)
+        lookup_time, looked_up = timed(lookup, index, qualifiers, settings)
+        assert scanned == looked_up
+        results.append((label, len(scanned), scan_time, lookup_time))
+    return build_time, results
+
+
+if click is not None:
+    @click.command()
+    @click.option('--blocks', '-b', multiple=True, type=int, default=(1000, 5000, 20000),
+                  help='Numbers of blocks of the structures.')
+    @click.option('--iterations', type=int, default=10, help='Number of times each query is timed.')
+    def cli(blocks, iterations):
+        """
+        Benchmark get_items block matching with and without a StructureIndex.
+        """
+        for num_blocks in blocks:
+            build_time, results = benchmark(num_blocks, iterations)
+            click.echo(u'{} blocks, index built in {:.1f} ms'.format(num_blocks, build_time * 1000))
+            click.echo(u'  {:<24}{:>10}{:>12}{:>12}'.format(u'query', u'matches', u'scan', u'index'))
+            for label, num_matches, scan_time, lookup_time in results:
+                click.echo(u'  {:<24}{:>10}{:>12}{:>12}'.format(
+                    label,
+                    num_matches,
+                    u'{:.2f} ms'.format(scan_time * 1000),
+                    u'{:.2f} ms'.format(lookup_time * 1000),
+                ))
+
+if __name__ == '__main__':
+    if click is not None:
+        cli()  # pylint: disable=no-value-for-parameter
+    else:
+        print("Aborted! Module 'click' is not installed.")
@@ -0,0 +1,167 @@
+"""
+Benchmarks reading and writing course structures of 1 to 20 MB through
+CourseStructureCache, against a local stand-in for memcached which adds a
+fixed latency to every round trip.
+
+The chunked entries are read with a single get_many, and compared to
+reading them one chunk at a time, as CourseStructureCache used to.
+
+Usage:
+    python -m xmodule.modulestore.perf_tests.benchmark_structure_cache -s 1 -s 5 -s 20 --latency 0.5
+"""
+
+
+import random
+import time
+import zlib
+
+from six.moves import cPickle as pickle
+from six.moves import range
+
+from xmodule.modulestore.split_mongo.mongo_connection import MEMCACHED_MAX_VALUE_LENGTH, CourseStructureCache
+
+try:
+    import click
+except ImportError:
+    click = None
+
+
+class MemcachedStandIn(object):
+    """
+    An in-process cache with the interface of a django cache, which, like
+    memcached, pickles its values, rejects values over the value size
+    limit, and costs a round trip per call, of `latency` seconds.
+    """
+    def __init__(self, latency):
+        self.latency = latency
+        self.round_trips = 0
+        self._values = {}
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency)
+
+    def get(self, key, default=None):
+        self._round_trip()
+        value = self._values.get(key)
+        return default if value is None else pickle.loads(value)
+
+    def get_many(self, keys):
+        self._round_trip()
+        return {key: pickle.loads(self._values[key]) for key in keys if key in self._values}
+
+    def set(self, key, value, timeout=None):
+        self._round_trip()
+        self._set(key, value)
+
+    def set_many(self, data, timeout=None):
+        self._round_trip()
+        for key, value in data.items():
+            self._set(key, value)
+
+    def _set(self, key, value):
+        pickled_value = pickle.dumps(value, 4)
+        if len(pickled_value) > MEMCACHED_MAX_VALUE_LENGTH + 1024:
+            raise ValueError(u'Value of {} bytes is over the memcached limit'.format(len(pickled_value)))
+        self._values[key] = pickled_value
+
+
+def sequential_get(cache, key):
+    """
+    Read a structure cached by CourseStructureCache.set one chunk at a
+    time, as CourseStructureCache.get used to.
+    """
+    structure_cache = CourseStructureCache()
+    header = cache.get(key)
+    chunks = []
+    for chunk_key in structure_cache._memcached_chunk_keys(key, header[0]):  # pylint: disable=protected-access
+        chunk = cache.get(chunk_key)
+        if chunk is None:
+            return None
+        chunks.append(chunk)
+    return pickle.loads(zlib.decompress(b''.join(chunks)))
+
+
+def make_structure(size_mb):
+    """
+    Return a synthetic structure whose pickle is about size_mb megabytes,
+    with block ids and fields that compress about as well as a course's.
+    """
+    blocks = []
+    structure = {'_id': u'benchmark', 'blocks': blocks}
+    target = size_mb * 1024 * 1024
+    # A block pickles to about 400 bytes.
+    for index in range(target // 400):
+        blocks.append({
+            'block_type': random.choice([u'problem', u'html', u'video', u'vertical', u'sequential']),
+            'block_id': u'{:032x}'.format(random.getrandbits(128)),
+            'definition': u'{:024x}'.format(random.getrandbits(96)),
+            'fields': {
+                'display_name': u'Block {}'.format(index),
+                'weight': random.random(),
+            },
+            'edit_info': {
+                'edited_by': random.randint(1, 1000),
+                'update_version': u'{:024x}'.format(random.getrandbits(96)),
+            },
+        })
+    return structure
+
+
+def benchmark(size_mb, latency, iterations):
+    """
+    Return the size of the compressed structure, its number of chunks, and
+    the average times, in seconds, and round trips to write it, to read
+    it with get_many, and to read it chunk by chunk.
+    """
+    structure = make_structure(size_mb)
+    stand_in = MemcachedStandIn(latency)
+    structure_cache = CourseStructureCache()
+    structure_cache.cache = stand_in
+
+    results = {}
+    for name, operation in (
+        (u'set', lambda: structure_cache.set(u'benchmark', structure)),
+        (u'get_many', lambda: structure_cache.get(u'benchmark')),
+        (u'sequential', lambda: sequential_get(stand_in, u'benchmark')),
+    ):
+        stand_in.round_trips = 0
+        started = time.time()
+        for _ in range(iterations):
+            operation()
+        results[name] = ((time.time() - started) / iterations, stand_in.round_trips // iterations)
+
+    num_chunks, compressed_size, _ = stand_in.get(u'benchmark')
+    return compressed_size, num_chunks, results
+
+
+if click is not None:
+    @click.command()
+    @click.option('--sizes', '-s', multiple=True, type=int, default=(1, 2, 5, 10, 20),
+                  help='Sizes, in MB, of the pickled structures.')
+    @click.option('--latency', type=float, default=0.5, help='Latency, in ms, of a round trip to the cache.')
+    @click.option('--iterations', type=int, default=5, help='Number of times each operation is timed.')
+    def cli(sizes, latency, iterations):
+        """
+        Benchmark CourseStructureCache against a memcached stand-in.
+        """
+        click.echo(u'{:>8}{:>12}{:>8}{:>20}{:>20}{:>20}'.format(
+            u'size', u'compressed', u'chunks', u'set', u'get_many', u'sequential get',
+        ))
+        for size_mb in sizes:
+            compressed_size, num_chunks, results = benchmark(size_mb, latency / 1000.0, iterations)
+            click.echo(u'{:>8}{:>12}{:>8}{}'.format(
+                u'{} MB'.format(size_mb),
+                u'{:.1f} MB'.format(compressed_size / 1024.0 / 1024.0),
+                num_chunks,
+                u''.join(
+                    u'{:>20}'.format(u'{:.1f} ms / {} rt'.format(results[name][0] * 1000, results[name][1]))
+                    for name in (u'set', u'get_many', u'sequential')
+                ),
+            ))
+
+if __name__ == '__main__':
+    if click is not None:
+        cli()  # pylint: disable=no-value-for-parameter
+    else:
+        print("Aborted! Module 'click' is not installed.")
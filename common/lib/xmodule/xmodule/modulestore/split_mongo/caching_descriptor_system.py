@@ -21,7 +21,7 @@ from xmodule.modulestore.edit_info import EditInfoRuntimeMixin
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.inheritance import InheritanceMixin, inheriting_field_data
 from xmodule.modulestore.split_mongo import BlockKey, CourseEnvelope
-from xmodule.modulestore.split_mongo.definition_lazy_loader import DefinitionLazyLoader
+from xmodule.modulestore.split_mongo.definition_lazy_loader import DefinitionBatchLoader, DefinitionLazyLoader
 from xmodule.modulestore.split_mongo.id_manager import SplitMongoIdManager
 from xmodule.modulestore.split_mongo.split_mongo_kvs import SplitMongoKVS
 from xmodule.x_module import XModuleMixin
@@ -85,6 +85,8 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
         self.module_data = module_data
         self.default_class = default_class
         self.local_modules = {}
+        # Fetches the definitions of the blocks loaded lazily in batches.
+        self.definition_batch_loader = DefinitionBatchLoader(modulestore)
         self._services['library_tools'] = LibraryToolsService(modulestore)
 
     @lazy
@@ -201,6 +203,7 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
                 block_key.type,
                 definition_id,
                 convert_fields,
+                batch_loader=self.definition_batch_loader,
             )
         else:
             definition_loader = None
@@ -1,9 +1,19 @@
 
 
 import copy
+from collections import defaultdict
 
 from opaque_keys.edx.locator import DefinitionLocator
 
+try:
+    from edx_django_utils.monitoring import set_custom_metric
+except ImportError:
+    set_custom_metric = None
+
+# Key, in the modulestore's request cache, of the counts of the definition
+# queries made by DefinitionBatchLoaders during the request.
+DEFINITION_LOADS_CACHE_KEY = 'split_definition_loads'
+
 
 class DefinitionLazyLoader(object):
     """
@@ -12,16 +22,21 @@ class DefinitionLazyLoader(object):
     object doesn't force access during init but waits until client wants the
     definition. Only works if the modulestore is a split mongo store.
     """
-    def __init__(self, modulestore, course_key, block_type, definition_id, field_converter):
+    def __init__(self, modulestore, course_key, block_type, definition_id, field_converter, batch_loader=None):
         """
         Simple placeholder for yet-to-be-fetched data
         :param modulestore: the pymongo db connection with the definitions
         :param definition_locator: the id of the record in the above to fetch
+        :param batch_loader: the DefinitionBatchLoader, if any, to fetch the definition along with
+            the other pending definitions
         """
         self.modulestore = modulestore
         self.course_key = course_key
         self.definition_locator = DefinitionLocator(block_type, definition_id)
         self.field_converter = field_converter
+        self.batch_loader = batch_loader
+        if batch_loader is not None:
+            batch_loader.add(course_key, definition_id)
 
     def fetch(self):
         """
@@ -31,5 +46,72 @@ class DefinitionLazyLoader(object):
         # get_definition may return a cached value perhaps from another course or code path
         # so, we copy the result here so that updates don't cross-pollinate nor change the cached
         # value in such a way that we can't tell that the definition's been updated.
-        definition = self.modulestore.get_definition(self.course_key, self.definition_locator.definition_id)
+        if self.batch_loader is not None:
+            definition = self.batch_loader.get(self.course_key, self.definition_locator.definition_id)
+        else:
+            definition = self.modulestore.get_definition(self.course_key, self.definition_locator.definition_id)
         return copy.deepcopy(definition)
+
+
+class DefinitionBatchLoader(object):
+    """
+    Collects the ids of the definitions that DefinitionLazyLoaders have yet
+    to fetch, and fetches all those of a course with a single get_definitions
+    query the first time any of them is needed, rather than one query each.
+
+    A CachingDescriptorSystem has one, so it lives as long as the system,
+    which is cached for the request.  The numbers of queries and of
+    definitions fetched during the request are kept in the modulestore's
+    request cache, and reported as the custom metrics
+    split_definition_queries and split_definitions_loaded.
+    """
+    def __init__(self, modulestore):
+        self.modulestore = modulestore
+        self._pending = defaultdict(set)
+        self._definitions = {}
+
+    def add(self, course_key, definition_id):
+        """
+        Add the definition to those to fetch with the next query for the course.
+        """
+        if (course_key, definition_id) not in self._definitions:
+            self._pending[course_key].add(definition_id)
+
+    def get(self, course_key, definition_id):
+        """
+        Return the definition, fetching it along with all of the pending
+        definitions of the course if it was not fetched yet.
+        """
+        if (course_key, definition_id) not in self._definitions:
+            definition_ids = self._pending.pop(course_key, set())
+            definition_ids.add(definition_id)
+            definitions = {
+                definition['_id']: definition
+                for definition in self.modulestore.get_definitions(course_key, list(definition_ids))
+            }
+            self._record_query(len(definitions))
+            for pending_id in definition_ids:
+                if pending_id in definitions:
+                    self._definitions[(course_key, pending_id)] = definitions[pending_id]
+
+        definition = self._definitions.get((course_key, definition_id))
+        if definition is None:
+            # Not found by id, as when it was given as a string rather than an
+            # ObjectId: get_definition casts it.
+            definition = self.modulestore.get_definition(course_key, definition_id)
+            self._record_query(1)
+        return definition
+
+    def _record_query(self, num_definitions):
+        """
+        Count a definition query in the request's counts, and report them.
+        """
+        request_cache = getattr(self.modulestore, 'request_cache', None)
+        if request_cache is None:
+            return
+        counts = request_cache.data.setdefault(DEFINITION_LOADS_CACHE_KEY, {'queries': 0, 'definitions': 0})
+        counts['queries'] += 1
+        counts['definitions'] += num_definitions
+        if set_custom_metric is not None:
+            set_custom_metric('split_definition_queries', counts['queries'])
+            set_custom_metric('split_definitions_loaded', counts['definitions'])
@@ -4,10 +4,13 @@ Segregation of pymongo functions from the data modeling mechanisms for split mod
 
 
 import datetime
+import hashlib
 import logging
 import math
 import re
+import threading
 import zlib
+from collections import OrderedDict
 from contextlib import contextmanager
 from time import time
 
@@ -228,7 +231,15 @@ class CourseStructureCache(object):
 
     If the 'course_structure_cache' doesn't exist, then don't do anything for
     for set and get.
+
+    A structure is cached as a header, under its key, and the chunks of its
+    compressed pickle, each under the key and a chunk number suffix, so that
+    large structures fit memcached's value size limit.
     """
+    # Number of chunks read along with the header.  Compressed structures
+    # rarely exceed a few megabytes.
+    PREFETCH_CHUNKS = 8
+
     def __init__(self):
         if DEBUG: log.info('mcdaniel apr-2020: CourseStructureCache.__init__() - begin')
         self.cache = None
@@ -287,92 +298,68 @@ class CourseStructureCache(object):
         return val[start:end]
 
 
+    def _memcached_chunk_keys(self, key, num_chunks):
+        """return the cache keys of the first num_chunks chunks of key."""
+        return [key + self._memcached_key_suffix(i) for i in range(1, num_chunks + 1)]
+
     def get(self, key, course_context=None):
-        """Pull the compressed, pickled struct data from cache and deserialize."""
-        if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - begin')
+        """
+        Pull the compressed, pickled struct data from cache and deserialize.
+
+        The header and the first PREFETCH_CHUNKS chunks are read in a single
+        get_many, so most structures cost one round trip.  A missing chunk,
+        as when memcached has evicted part of the entry, or data that does
+        not match the length and hash of the header is a cache miss.
+        """
         if self.cache is None:
             return None
 
         key = str(key)
         with TIMER.timer("CourseStructureCache.get", course_context) as tagger:
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - 1')
-
-            # retrieve the master cache object containing a string representation of
-            # an integer representing the number of chunks for this object.
-            n = self.cache.get(key)
-            if not n:
-                if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - cache miss.')
-                return
-
-            try:
-                n = int(float(n))
-            except ItemNotFoundError:
-                if DEBUG: log.error('Invalid data encountered trying to retrieve the chunk count for key {key}. You might need to restart memcached.'.format(
-                    key=key
-                ))
-                return
-
-
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - chunks: {n}'.format(
-                n=n
-            ))
-
-            compressed_pickled_data = None
-            i = 1
-            checksum = 0
-            while i <= n:
-                chunk_key = key + self._memcached_key_suffix(i)
-                chunk = self.cache.get(chunk_key)
-                if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - chunk: {i} key: {key}, size: {size}'.format(
-                    i=i,
-                    key=chunk_key,
-                    size=len(chunk)
-                ))
-                if chunk is None:
-                    return
-                #    raise Exception('Internal error: cache miss: key={key}'.format(
-                #        key=key+key_suffix
-                #    ))
-
-                if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - compressed_pickled_data: {t}'.format(
-                    t=type(chunk)
-                ))
-                compressed_pickled_data = chunk if i == 1 else compressed_pickled_data + chunk
-                i += 1
-                checksum += len(chunk)
-
+            values = self.cache.get_many([key] + self._memcached_chunk_keys(key, self.PREFETCH_CHUNKS))
+            header = values.get(key)
+            if not _is_valid_header(header):
+                if header is not None:
+                    log.warning(u'Invalid course structure cache header for key %s', key)
+                tagger.tag(from_cache='false')
+                tagger.sample_rate = 1
+                return None
 
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - 2')
-            tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
+            num_chunks, length, digest = header
+            chunk_keys = self._memcached_chunk_keys(key, num_chunks)
+            if num_chunks > self.PREFETCH_CHUNKS:
+                values.update(self.cache.get_many(chunk_keys[self.PREFETCH_CHUNKS:]))
 
-            if compressed_pickled_data is None:
-                # Always log cache misses, because they are unexpected
+            if any(chunk_key not in values for chunk_key in chunk_keys):
+                # Part of the entry was evicted.
+                log.debug(u'Partial course structure cache entry for key %s', key)
+                tagger.tag(from_cache='false', partial='true')
                 tagger.sample_rate = 1
-                if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - end (cache miss)')
                 return None
 
-            tagger.measure('compressed_size', len(compressed_pickled_data))
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - 3 compressed_pickled_data: {size}'.format(
-                size=len(compressed_pickled_data)
-            ))
+            compressed_pickled_data = b''.join(values[chunk_key] for chunk_key in chunk_keys)
+            if len(compressed_pickled_data) != length or _content_hash(compressed_pickled_data) != digest:
+                log.warning(u'Corrupt course structure cache entry for key %s', key)
+                tagger.tag(from_cache='false', corrupt='true')
+                tagger.sample_rate = 1
+                return None
 
+            tagger.tag(from_cache='true')
+            tagger.measure('compressed_size', length)
             pickled_data = zlib.decompress(compressed_pickled_data)
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - 4')
             tagger.measure('uncompressed_size', len(pickled_data))
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - 5')
-
-            tmp = pickle.loads(pickled_data)
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - 6')
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.get() - end')
 
-            return tmp
+            return pickle.loads(pickled_data)
 
     def set(self, key, structure, course_context=None):
-        """Given a structure, will pickle, compress, and write to cache."""
+        """
+        Given a structure, will pickle, compress, and write to cache.
+
+        The header, recording the number of chunks and the length and hash
+        of the compressed data, and the chunks are written in a single
+        set_many.
+        """
         key = str(key)
-        if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.set() - begin key: {key}'.format(
-            key=key
-        ))
         if self.cache is None:
             if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.set() - end (no cache!)')
             return None
@@ -386,38 +373,118 @@ class CourseStructureCache(object):
             object_size = len(compressed_pickled_data)
             tagger.measure('compressed_size', object_size)
 
+            num_chunks = self._memcached_num_chunks(object_size)
+            values = {
+                chunk_key: self._memcached_chunkify(i, compressed_pickled_data)
+                for i, chunk_key in enumerate(self._memcached_chunk_keys(key, num_chunks), start=1)
+            }
+            values[key] = (num_chunks, object_size, _content_hash(compressed_pickled_data))
+
             # Stuctures are immutable, so we set a timeout of "never"
-            #self.cache.set(key, compressed_pickled_data, None)
-
-            # set the master cache entry containing only
-            # an integer value representing the number of chunks
-            # this structure requires.
-            n = self._memcached_num_chunks(object_size)
-            if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.set() - chunks: {n}'.format(
-                n=n,
-            ))
-            self.cache.set(key, str(n), None)
-
-            i = 1
-            checksum = 0
-            while i <= n:
-                chunk = self._memcached_chunkify(i, compressed_pickled_data)
-                chunk_key = key + self._memcached_key_suffix(i)
-                if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.set() - chunk: {i}, key: {key}, size: {size}'.format(
-                    i=i,
-                    key=chunk_key,
-                    size=len(chunk)
-                ))
-                self.cache.set(chunk_key, chunk, None)
-                checksum += len(chunk)
-                i += 1
+            self.cache.set_many(values, None)
 
+        log.debug(
+            u'Set course structure cache entry for key %s, compressed size %s, chunks %s', key, object_size, num_chunks,
+        )
+
+
+def _content_hash(data):
+    """
+    Return the hash of the compressed data of a CourseStructureCache entry.
+    """
+    return hashlib.md5(data).hexdigest()
+
+
+def _is_valid_header(header):
+    """
+    Return whether header is a CourseStructureCache header: a tuple of
+    the number of chunks, the length and the hash of the compressed data.
+    """
+    return (
+        isinstance(header, tuple) and len(header) == 3 and
+        isinstance(header[0], int) and header[0] > 0 and
+        isinstance(header[1], int) and isinstance(header[2], six.string_types)
+    )
+
+
+class StructureLRUCache(object):
+    """
+    A process-local, least recently used cache of decoded course structures,
+    keyed by structure id (version guid), in front of CourseStructureCache.
+
+    Structures are immutable once saved, so an entry never needs to be
+    invalidated: it is only evicted, least recently used first, once the
+    cache holds more than ``max_bytes``.  The size of a structure is
+    accounted as the size of its pickle.
+
+    The structures are shared by every caller in the process, so they
+    must not be modified, as SplitMongoModuleStore.version_structure
+    copies a structure before editing it.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Return the structure cached for key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, structure):
+        """
+        Cache the given structure for key, unless it alone exceeds the budget.
+        """
+        size = len(pickle.dumps(structure, 4))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (structure, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Empty the cache.  Its statistics are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Return a dict of the number of hits, misses and evictions of the
+        cache, its hit rate, and its current number of entries and size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size': self.size,
+                'max_bytes': self.max_bytes,
+            }
 
-        if DEBUG: log.info('mcdaniel apr-2020 CourseStructureCache.set() - end. key: {key}, compressed_pickled_data: {size}, checksum: {checksum}'.format(
-            key=key,
-            size=len(compressed_pickled_data),
-            checksum=checksum
-        ))
 
 class MongoConnection(object):
     """
@@ -425,10 +492,13 @@ class MongoConnection(object):
     """
     def __init__(
         self, db, collection, host, port=27017, tz_aware=True, user=None, password=None,
-        asset_collection=None, retry_wait_time=0.1, **kwargs
+        asset_collection=None, retry_wait_time=0.1, structure_cache_max_bytes=0, **kwargs
     ):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
+
+        If structure_cache_max_bytes is set, up to that many bytes of decoded structures
+        are kept in a process-local StructureLRUCache.
         """
         # Set a write concern of 1, which makes writes complete successfully to the primary
         # only before returning. Also makes pymongo report write errors.
@@ -444,6 +514,8 @@ class MongoConnection(object):
         self.structures = self.database[collection + '.structures']
         self.definitions = self.database[collection + '.definitions']
 
+        self.structure_cache = StructureLRUCache(structure_cache_max_bytes) if structure_cache_max_bytes else None
+
     def heartbeat(self):
         """
         Check that the db is reachable.
@@ -466,6 +538,12 @@ class MongoConnection(object):
             course_context=course_context
         ))
         with TIMER.timer("get_structure", course_context) as tagger_get_structure:
+            if self.structure_cache is not None:
+                structure = self.structure_cache.get(key)
+                tagger_get_structure.tag(from_process_cache=str(structure is not None).lower())
+                if structure is not None:
+                    return structure
+
             if DEBUG: log.info('mcdaniel apr-2020: MongoConnection.get_structure() - 1')
             cache = CourseStructureCache()
             if DEBUG: log.info('mcdaniel apr-2020: MongoConnection.get_structure() - 2')
@@ -501,6 +579,8 @@ class MongoConnection(object):
                     course_context=course_context
                 ))
 
+            if self.structure_cache is not None:
+                self.structure_cache.set(key, structure)
             return structure
 
     @autoretry_read()
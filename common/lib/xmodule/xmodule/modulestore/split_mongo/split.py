@@ -105,6 +105,8 @@ from xmodule.modulestore.exceptions import (
 )
 from xmodule.modulestore.split_mongo import BlockKey, CourseEnvelope
 from xmodule.modulestore.split_mongo.mongo_connection import DuplicateKeyError, MongoConnection
+from xmodule.modulestore.split_mongo.structure_index import DEFAULT_MAX_BYTES as STRUCTURE_INDEX_CACHE_MAX_BYTES
+from xmodule.modulestore.split_mongo.structure_index import StructureIndexCache
 from xmodule.modulestore.store_utilities import DETACHED_XBLOCK_TYPES
 from xmodule.partitions.partitions_service import PartitionService
 
@@ -713,14 +715,24 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                  default_class=None,
                  error_tracker=null_error_tracker,
                  i18n_service=None, fs_service=None, user_service=None,
-                 services=None, signal_handler=None, **kwargs):
+                 services=None, signal_handler=None, structure_cache_max_bytes=0,
+                 structure_index_cache_max_bytes=STRUCTURE_INDEX_CACHE_MAX_BYTES, **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param structure_cache_max_bytes: the budget of the process-local cache of decoded structures.
+            0 disables it.
+        :param structure_index_cache_max_bytes: the budget of the process-local cache of structure indexes.
+            0 disables the indexes, so get_items and the ancestry queries scan the structures.
         """
 
         super(SplitMongoModuleStore, self).__init__(contentstore, **kwargs)
 
-        self.db_connection = MongoConnection(**doc_store_config)
+        self.db_connection = MongoConnection(structure_cache_max_bytes=structure_cache_max_bytes, **doc_store_config)
+        # Indexes of the blocks and of the ancestry of the structures read, by structure id.
+        self.structure_indexes = (
+            StructureIndexCache(structure_index_cache_max_bytes)
+            if structure_index_cache_max_bytes else None
+        )
 
         if default_class is not None:
             module_path, __, class_name = default_class.rpartition('.')
@@ -1286,11 +1298,16 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         if settings is None:
             settings = {}
+        structure_index = self._get_structure_index(course_locator, course.structure)
         if 'name' in qualifiers:
             # odd case where we don't search just confirm
             block_name = qualifiers.pop('name')
             block_ids = []
-            for block_id, block in six.iteritems(course.structure['blocks']):
+            candidates = structure_index.named(block_name) if structure_index is not None else None
+            if candidates is None:
+                candidates = six.iterkeys(course.structure['blocks'])
+            for block_id in candidates:
+                block = course.structure['blocks'][block_id]
                 # Don't do an in comparison blindly; first check to make sure
                 # that the name qualifier we're looking at isn't a plain string;
                 # if it is a string, then it should match exactly. If it's other
@@ -1317,17 +1334,24 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         path_cache = None
         parents_cache = None
 
-        if not include_orphans:
+        if not include_orphans and structure_index is None:
             path_cache = {}
             parents_cache = self.build_block_key_to_parents_mapping(course.structure)
 
-        for block_id, value in six.iteritems(course.structure['blocks']):
+        candidates = None
+        if structure_index is not None:
+            candidates = structure_index.candidates(qualifiers.get('block_type'), settings)
+        if candidates is None:
+            candidates = six.iterkeys(course.structure['blocks'])
+        for block_id in candidates:
+            value = course.structure['blocks'][block_id]
             if _block_matches_all(value):
                 if not include_orphans:
-                    if (  # pylint: disable=bad-continuation
-                        block_id.type in DETACHED_XBLOCK_TYPES or
-                        self.has_path_to_root(block_id, course, path_cache, parents_cache)
-                    ):
+                    if structure_index is not None:
+                        has_path_to_root = structure_index.has_path_to_root(block_id)
+                    else:
+                        has_path_to_root = self.has_path_to_root(block_id, course, path_cache, parents_cache)
+                    if block_id.type in DETACHED_XBLOCK_TYPES or has_path_to_root:
                         items.append(block_id)
                 else:
                     items.append(block_id)
@@ -1337,6 +1361,19 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         else:
             return []
 
+    def _get_structure_index(self, course_key, structure):
+        """
+        Return the cached StructureIndex of the given structure, or None if
+        structure indexes are disabled, or if the structure is being edited
+        by the active bulk operation on course_key, and so may not be indexed.
+        """
+        if self.structure_indexes is None:
+            return None
+        bulk_write_record = self._get_bulk_ops_record(course_key)
+        if bulk_write_record.active and structure['_id'] not in bulk_write_record.structures_in_db:
+            return None
+        return self.structure_indexes.get(structure)
+
     def build_block_key_to_parents_mapping(self, structure):
         """
         Given a structure, builds block_key to parents mapping for all block keys in structure
@@ -1405,6 +1442,13 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             raise ItemNotFoundError(locator)
 
         course = self._lookup_course(locator.course_key)
+        structure_index = self._get_structure_index(locator.course_key, course.structure)
+        if structure_index is not None:
+            parent_id = structure_index.parent(BlockKey.from_usage_key(locator))
+            if parent_id is None:
+                return None
+            return BlockUsageLocator.make_relative(locator, block_type=parent_id.type, block_id=parent_id.id)
+
         all_parent_ids = self._get_parents_from_structure(BlockKey.from_usage_key(locator), course.structure)
 
         # Check and verify the found parent_ids are not orphans; Remove parent which has no valid path
@@ -1436,6 +1480,13 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         detached_categories = [name for name, __ in XBlock.load_tagged_classes("detached")]
         course = self._lookup_course(course_key)
+        structure_index = self._get_structure_index(course_key, course.structure)
+        if structure_index is not None:
+            return [
+                course_key.make_usage_key(block_type=block_id.type, block_id=block_id.id)
+                for block_id in structure_index.orphans(course.structure['root'], detached_categories)
+            ]
+
         items = set(course.structure['blocks'].keys())
         items.remove(course.structure['root'])
         blocks = course.structure['blocks']
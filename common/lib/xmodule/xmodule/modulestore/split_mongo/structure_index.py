@@ -0,0 +1,233 @@
+"""
+Secondary indexes of the blocks of a split structure, for answering
+get_items qualifiers with lookups rather than scans of all of the blocks,
+and ancestry queries (parents, paths to the root, orphans) without walking
+the whole structure for each of them.
+
+Structures saved to the db are immutable, so the index of a structure is
+built on first use and cached by structure id (version guid).
+"""
+
+
+import threading
+from collections import OrderedDict, defaultdict
+
+import six
+from six.moves import cPickle as pickle
+
+# Default budget, in bytes, of a StructureIndexCache.
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def is_indexable(criteria):
+    """
+    Return whether a get_items criteria can be looked up in an index: it
+    matches by equality, rather than as a regex, function or $in/$nin dict.
+    """
+    if not isinstance(criteria, (six.string_types, int, tuple)):
+        return False
+    try:
+        hash(criteria)
+    except TypeError:
+        return False
+    return True
+
+
+class StructureIndex(object):
+    """
+    Indexes of the keys of the blocks of a structure by block type, by block
+    id, and by the value of any of their settings fields, and of the
+    ancestry of the blocks.  The settings and ancestry indexes are built on
+    first use.  Each index lists its keys in the order of the structure's
+    blocks.
+    """
+    def __init__(self, structure):
+        self._blocks = structure['blocks']
+        self.positions = {}
+        self.by_type = defaultdict(list)
+        self.by_id = defaultdict(list)
+        for position, (block_key, block) in enumerate(six.iteritems(self._blocks)):
+            self.positions[block_key] = position
+            self.by_type[block.block_type].append(block_key)
+            self.by_id[block_key.id].append(block_key)
+        self._by_field = {}
+        self._parents = None
+        self._rooted = None
+        self._lock = threading.Lock()
+
+    def by_field(self, field_name):
+        """
+        Return the index of the blocks by the value of the given settings
+        field.  A block whose value is a list is indexed by each of its
+        hashable elements, as get_items matches any of them.
+        """
+        index = self._by_field.get(field_name)
+        if index is None:
+            index = defaultdict(list)
+            for block_key, block in six.iteritems(self._blocks):
+                if field_name not in block.fields:
+                    continue
+                value = block.fields[field_name]
+                for element in (value if isinstance(value, list) else [value]):
+                    try:
+                        keys = index[element]
+                    except TypeError:
+                        # Unhashable values never equal an indexable criteria.
+                        continue
+                    if not keys or keys[-1] != block_key:
+                        keys.append(block_key)
+            with self._lock:
+                index = self._by_field.setdefault(field_name, index)
+        return index
+
+    def candidates(self, block_type=None, settings=None):
+        """
+        Return the keys of the blocks which may match the given block_type
+        and settings get_items criteria, in the order of the structure's
+        blocks, or None if none of the criteria can be looked up.  The
+        candidates must still be matched against all of the criteria.
+        """
+        lookups = []
+        if block_type is not None and is_indexable(block_type):
+            lookups.append(self.by_type.get(block_type, []))
+        for field_name, criteria in six.iteritems(settings or {}):
+            if is_indexable(criteria):
+                lookups.append(self.by_field(field_name).get(criteria, []))
+        if not lookups:
+            return None
+
+        lookups.sort(key=len)
+        keys = set(lookups[0])
+        for lookup in lookups[1:]:
+            keys.intersection_update(lookup)
+        return sorted(keys, key=self.positions.__getitem__)
+
+    def named(self, names):
+        """
+        Return the keys of the blocks with the given block id, or with any of
+        the given list of block ids, in the order of the structure's blocks,
+        or None if names is neither.
+        """
+        if isinstance(names, six.string_types):
+            return list(self.by_id.get(names, []))
+        if isinstance(names, (list, tuple, set, frozenset)):
+            keys = set()
+            for name in names:
+                if isinstance(name, six.string_types):
+                    keys.update(self.by_id.get(name, []))
+            return sorted(keys, key=self.positions.__getitem__)
+        return None
+
+    @property
+    def parents(self):
+        """
+        The keys of the parents of each block which has any, by block key.
+        """
+        if self._parents is None:
+            parents = defaultdict(list)
+            for block_key, block in six.iteritems(self._blocks):
+                for child_key in block.fields.get('children', []):
+                    child_parents = parents[child_key]
+                    if not child_parents or child_parents[-1] != block_key:
+                        child_parents.append(block_key)
+            self._parents = dict(parents)
+        return self._parents
+
+    def has_path_to_root(self, block_key):
+        """
+        Return whether the given block has a path to the root of the
+        structure, that is, whether it descends from a course or library
+        block with no parents.
+        """
+        if self._rooted is None:
+            parents = self.parents
+            queue = [
+                root_key for root_key in self._blocks
+                if root_key.type in ('course', 'library') and root_key not in parents
+            ]
+            rooted = set(queue)
+            while queue:
+                block = self._blocks.get(queue.pop())
+                for child_key in (block.fields.get('children', []) if block is not None else []):
+                    if child_key not in rooted:
+                        rooted.add(child_key)
+                        queue.append(child_key)
+            self._rooted = rooted
+        return block_key in self._rooted
+
+    def parent(self, block_key):
+        """
+        Return the key of the parent of the given block which has a path to
+        the root, the alphabetically least if there are several, or None.
+        """
+        valid_parents = [
+            parent_key for parent_key in self.parents.get(block_key, [])
+            if self.has_path_to_root(parent_key)
+        ]
+        if not valid_parents:
+            return None
+        return min(valid_parents, key=lambda parent_key: (parent_key.type, parent_key.id))
+
+    def orphans(self, root_key, detached_types):
+        """
+        Return the keys of the blocks, other than the given root and those of
+        the given detached block types, which are no block's child.
+        """
+        parents = self.parents
+        return [
+            block_key for block_key, block in six.iteritems(self._blocks)
+            if block_key != root_key and block_key not in parents and block.block_type not in detached_types
+        ]
+
+
+class StructureIndexCache(object):
+    """
+    A process-local, least recently used cache of StructureIndexes, keyed
+    by structure id.  Only indexes of structures saved to the db, which
+    are immutable, may be cached.
+
+    An index keeps its structure's blocks, to build its settings and
+    ancestry indexes on first use, so the size of an index is accounted as
+    the size of the pickle of its structure, as by StructureLRUCache, and
+    indexes are evicted once the cache holds more than ``max_bytes``.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def get(self, structure):
+        """
+        Return the index of the given structure, building it if need be.
+        The index of a structure which alone exceeds the budget is built
+        but not cached.
+        """
+        structure_id = structure['_id']
+        with self._lock:
+            entry = self._entries.get(structure_id)
+            if entry is not None:
+                self._entries.move_to_end(structure_id)
+                return entry[0]
+
+        index = StructureIndex(structure)
+        size = len(pickle.dumps(structure, 4))
+        if size > self.max_bytes:
+            return index
+        with self._lock:
+            if structure_id in self._entries:
+                return self._entries[structure_id][0]
+            self._entries[structure_id] = (index, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+        return index
+
+    def clear(self):
+        """
+        Empty the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
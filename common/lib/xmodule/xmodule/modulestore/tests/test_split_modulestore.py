@@ -36,6 +36,7 @@ from xmodule.modulestore.exceptions import (
 )
 from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import StructureLRUCache
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
 from xmodule.modulestore.tests.factories import check_mongo_calls
 from xmodule.modulestore.tests.mongo_connection import MONGO_HOST, MONGO_PORT_NUM
@@ -986,6 +987,24 @@ class TestCourseStructureCache(SplitModuleTest):
         # now make sure that you get the same structure
         self.assertEqual(not_corrupt_structure, not_cached_structure)
 
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_course_structure_cache_partial_eviction(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+
+        with check_mongo_calls(1):
+            not_cached_structure = self._get_structure(self.new_course)
+
+        # If a chunk of the structure was evicted, get it from mongo again.
+        self.cache.delete(str(self.new_course.id.version_guid) + '001')
+        with check_mongo_calls(1):
+            not_partial_structure = self._get_structure(self.new_course)
+        self.assertEqual(not_partial_structure, not_cached_structure)
+
+        # The structure was cached again.
+        with check_mongo_calls(0):
+            cached_structure = self._get_structure(self.new_course)
+        self.assertEqual(cached_structure, not_cached_structure)
+
     @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
     def test_course_structure_cache_no_cache_configured(self, mock_get_cache):
         mock_get_cache.side_effect = InvalidCacheBackendError
@@ -1013,6 +1032,21 @@ class TestCourseStructureCache(SplitModuleTest):
         # now make sure that you get the same structure
         self.assertEqual(cached_structure, not_cached_structure)
 
+    def test_process_structure_cache(self):
+        db_connection = modulestore().db_connection
+        db_connection.structure_cache = StructureLRUCache(10 * 1024 * 1024)
+        self.addCleanup(setattr, db_connection, 'structure_cache', None)
+
+        with check_mongo_calls(1):
+            not_cached_structure = self._get_structure(self.new_course)
+
+        # Even with the dummy cache, the structure is now cached in the process.
+        with check_mongo_calls(0):
+            cached_structure = self._get_structure(self.new_course)
+
+        self.assertIs(cached_structure, not_cached_structure)
+        self.assertEqual(db_connection.structure_cache.stats()['hits'], 1)
+
     def _get_structure(self, course):
         """
         Helper function to get a structure from a course.
@@ -1092,6 +1126,22 @@ class SplitModuleItemTests(SplitModuleTest):
         )
         self.assertFalse(modulestore().has_item(locator))
 
+    def test_lazy_definitions_loaded_in_one_query(self):
+        """
+        The definitions of the blocks loaded lazily are fetched together, the
+        first time any of them is needed.
+        """
+        hero_locator = CourseLocator(org="testx", course="GreekHero", run="run", branch=BRANCH_NAME_DRAFT)
+        chapter = modulestore().get_item(BlockUsageLocator(hero_locator, 'chapter', 'chapter3'), depth=1)
+        problems = chapter.get_children()
+        self.assertEqual(len(problems), 3)
+
+        with check_mongo_calls(1):
+            problems[0].data  # pylint: disable=pointless-statement
+        with check_mongo_calls(0):
+            for problem in problems[1:]:
+                problem.data  # pylint: disable=pointless-statement
+
     @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
     def test_get_item(self, _from_json):
         '''
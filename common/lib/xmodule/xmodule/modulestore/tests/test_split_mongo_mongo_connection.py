@@ -7,7 +7,7 @@ from mock import patch
 from pymongo.errors import ConnectionFailure
 
 from xmodule.exceptions import HeartbeatFailure
-from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
+from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection, StructureLRUCache
 
 
 class TestHeartbeatFailureException(unittest.TestCase):
@@ -23,3 +23,40 @@ class TestHeartbeatFailureException(unittest.TestCase):
 
             with self.assertRaises(HeartbeatFailure):
                 useless_conn.heartbeat()
+
+
+class TestStructureLRUCache(unittest.TestCase):
+    """ Test the eviction and statistics of the process-local structure cache """
+
+    def _structure(self, key):
+        return {'_id': key, 'blocks': {}, 'padding': 'x' * 1000}
+
+    def test_get_and_set(self):
+        cache = StructureLRUCache(1024 * 1024)
+        self.assertIsNone(cache.get('a'))
+        structure = self._structure('a')
+        cache.set('a', structure)
+        self.assertIs(cache.get('a'), structure)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = StructureLRUCache(2500)
+        cache.set('a', self._structure('a'))
+        cache.set('b', self._structure('b'))
+        # 'a' becomes the most recently used, so 'b' is evicted to make room for 'c'.
+        cache.get('a')
+        cache.set('c', self._structure('c'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertLessEqual(cache.stats()['size'], 2500)
+
+    def test_structure_over_budget_is_not_cached(self):
+        cache = StructureLRUCache(100)
+        cache.set('a', self._structure('a'))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
@@ -0,0 +1,146 @@
+""" Test the indexes of split structures used by get_items """
+
+
+import re
+import unittest
+
+from six.moves import cPickle as pickle
+
+from xmodule.modulestore import BlockData
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.structure_index import StructureIndex, StructureIndexCache
+
+
+def make_structure(structure_id, blocks):
+    """
+    Return a structure of the given (block_type, block_id, fields) blocks.
+    """
+    return {
+        '_id': structure_id,
+        'blocks': {
+            BlockKey(block_type, block_id): BlockData(block_type=block_type, fields=fields)
+            for block_type, block_id, fields in blocks
+        },
+    }
+
+
+class TestStructureIndex(unittest.TestCase):
+    """ Test the candidates looked up in a StructureIndex """
+
+    def setUp(self):
+        super(TestStructureIndex, self).setUp()
+        self.structure = make_structure('structure', [
+            ('chapter', 'intro', {'display_name': 'Intro'}),
+            ('sequential', 'hw1', {'format': 'Homework', 'graded': True}),
+            ('sequential', 'lab1', {'format': 'Lab', 'graded': True}),
+            ('problem', 'p1', {'tags': ['easy', 'math'], 'data': {'unhashable': []}}),
+            ('problem', 'intro', {'tags': ['hard']}),
+            ('sequential', 'hw2', {'format': 'Homework', 'graded': False}),
+        ])
+        self.index = StructureIndex(self.structure)
+
+    def test_block_type(self):
+        self.assertEqual(
+            self.index.candidates('sequential'),
+            [BlockKey('sequential', 'hw1'), BlockKey('sequential', 'lab1'), BlockKey('sequential', 'hw2')],
+        )
+        self.assertEqual(self.index.candidates('video'), [])
+
+    def test_block_type_and_settings(self):
+        self.assertEqual(
+            self.index.candidates('sequential', {'format': 'Homework', 'graded': True}),
+            [BlockKey('sequential', 'hw1')],
+        )
+        self.assertEqual(self.index.candidates(None, {'format': 'Exam'}), [])
+
+    def test_list_settings(self):
+        self.assertEqual(self.index.candidates(None, {'tags': 'math'}), [BlockKey('problem', 'p1')])
+
+    def test_unindexable_criteria(self):
+        self.assertIsNone(self.index.candidates())
+        self.assertIsNone(self.index.candidates(re.compile('seq'), {'format': {'$in': ['Homework']}}))
+        # Unindexable criteria are left to be matched against the candidates.
+        self.assertEqual(
+            self.index.candidates('sequential', {'format': re.compile('^H')}),
+            [BlockKey('sequential', 'hw1'), BlockKey('sequential', 'lab1'), BlockKey('sequential', 'hw2')],
+        )
+
+    def test_named(self):
+        self.assertEqual(self.index.named('intro'), [BlockKey('chapter', 'intro'), BlockKey('problem', 'intro')])
+        self.assertEqual(
+            self.index.named(['hw2', 'p1', 'missing']),
+            [BlockKey('problem', 'p1'), BlockKey('sequential', 'hw2')],
+        )
+        self.assertIsNone(self.index.named(re.compile('hw')))
+
+
+class TestStructureIndexCache(unittest.TestCase):
+    """ Test the caching of StructureIndexes by structure id """
+
+    def test_cached_by_structure_id(self):
+        first, second, third = [make_structure(structure_id, []) for structure_id in ('a', 'b', 'c')]
+        cache = StructureIndexCache(max_bytes=2 * len(pickle.dumps(first, 4)))
+
+        first_index = cache.get(first)
+        self.assertIs(cache.get(first), first_index)
+        second_index = cache.get(second)
+        # Using first makes second the least recently used.
+        cache.get(first)
+        cache.get(third)
+        self.assertIs(cache.get(first), first_index)
+        self.assertIsNot(cache.get(second), second_index)
+
+        cache.clear()
+        self.assertEqual(cache.size, 0)
+        self.assertIsNot(cache.get(first), first_index)
+
+    def test_structure_over_budget(self):
+        structure = make_structure('structure', [('chapter', 'intro', {'display_name': 'Intro'})])
+        cache = StructureIndexCache(max_bytes=len(pickle.dumps(structure, 4)) - 1)
+
+        index = cache.get(structure)
+        self.assertEqual(index.candidates('chapter'), [BlockKey('chapter', 'intro')])
+        self.assertIsNot(cache.get(structure), index)
+        self.assertEqual(cache.size, 0)
+
+
+class TestStructureAncestry(unittest.TestCase):
+    """ Test the ancestry queries of a StructureIndex """
+
+    def setUp(self):
+        super(TestStructureAncestry, self).setUp()
+        self.root = BlockKey('course', 'course')
+        self.chapter = BlockKey('chapter', 'chapter')
+        self.sequential = BlockKey('sequential', 'sequential')
+        self.vertical = BlockKey('vertical', 'vertical')
+        self.orphan = BlockKey('vertical', 'orphan')
+        self.problem = BlockKey('problem', 'problem')
+        self.structure = make_structure('structure', [
+            ('course', 'course', {'children': [self.chapter]}),
+            ('chapter', 'chapter', {'children': [self.sequential]}),
+            ('sequential', 'sequential', {'children': [self.vertical]}),
+            ('vertical', 'vertical', {'children': [self.problem]}),
+            # The problem is also the child of an orphan, which sorts before its other parent.
+            ('vertical', 'orphan', {'children': [self.problem]}),
+            ('problem', 'problem', {}),
+            ('static_tab', 'tab', {}),
+        ])
+        self.index = StructureIndex(self.structure)
+
+    def test_parents(self):
+        self.assertEqual(self.index.parents[self.problem], [self.vertical, self.orphan])
+        self.assertNotIn(self.root, self.index.parents)
+
+    def test_has_path_to_root(self):
+        for block_key in (self.root, self.chapter, self.sequential, self.vertical, self.problem):
+            self.assertTrue(self.index.has_path_to_root(block_key))
+        self.assertFalse(self.index.has_path_to_root(self.orphan))
+
+    def test_parent(self):
+        self.assertEqual(self.index.parent(self.problem), self.vertical)
+        self.assertEqual(self.index.parent(self.chapter), self.root)
+        self.assertIsNone(self.index.parent(self.root))
+        self.assertIsNone(self.index.parent(self.orphan))
+
+    def test_orphans(self):
+        self.assertEqual(self.index.orphans(self.root, ['static_tab']), [self.orphan])
@@ -30,6 +30,7 @@ class ContentLibraryTransformer(FilteringTransformerMixin, BlockStructureTransfo
     """
     WRITE_VERSION = 1
     READ_VERSION = 1
+    INCREMENTAL_COLLECT = True
 
     @classmethod
     def name(cls):
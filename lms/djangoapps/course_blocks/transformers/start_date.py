@@ -33,6 +33,7 @@ class StartDateTransformer(FilteringTransformerMixin, BlockStructureTransformer)
     """
     WRITE_VERSION = 1
     READ_VERSION = 1
+    INCREMENTAL_COLLECT = True
     MERGED_START_DATE = 'merged_start_date'
 
     @classmethod
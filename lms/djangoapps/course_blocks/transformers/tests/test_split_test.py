@@ -4,10 +4,15 @@ Tests for SplitTestTransformer.
 
 
 import ddt
+from mock import patch
 
 import openedx.core.djangoapps.user_api.course_tag.api as course_tag_api
+from openedx.core.djangoapps.content.block_structure import incremental
+from openedx.core.djangoapps.content.block_structure.factory import BlockStructureFactory
+from openedx.core.djangoapps.content.block_structure.transformers import BlockStructureTransformers
 from openedx.core.djangoapps.user_api.partition_schemes import RandomUserPartitionScheme
 from student.tests.factories import CourseEnrollmentFactory
+from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.tests.factories import check_mongo_calls
 from xmodule.partitions.partitions import Group, UserPartition
 from xmodule.partitions.partitions_service import get_user_partition_groups
@@ -225,3 +230,25 @@ class SplitTestTransformerTestCase(CourseStructureTestCase):
             set(block_structure1.get_block_keys()),
             set(block_structure2.get_block_keys()),
         )
+
+    def test_incremental_collect(self):
+        collected = BlockStructureFactory.create_from_modulestore(self.course.location, modulestore())
+        BlockStructureTransformers.collect(collected)
+
+        # An edit of J, under group 1 of BSplit, re-collects BSplit
+        # without the blocks of its other groups.
+        edited_key = self.blocks['J'].location
+        block_structure = BlockStructureFactory.create_from_modulestore(self.course.location, modulestore())
+        with patch.object(incremental, '_has_changed', lambda usage_key, *args: usage_key == edited_key):
+            num_collected = BlockStructureTransformers.collect_incrementally(block_structure, collected)
+
+        self.assertLess(num_collected, len(block_structure))
+        for block_key in block_structure:
+            self.assertEqual(
+                block_structure.get_transformer_block_field(
+                    block_key, UserPartitionTransformer, 'merged_group_access'
+                )._access,
+                collected.get_transformer_block_field(
+                    block_key, UserPartitionTransformer, 'merged_group_access'
+                )._access,
+            )
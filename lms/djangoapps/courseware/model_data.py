@@ -989,6 +989,30 @@ class ScoresClient(object):
         client.fetch_scores(scorable_locations)
         return client
 
+    @classmethod
+    def create_for_users(cls, course_id, user_ids, scorable_locations):
+        """
+        Create a ScoresClient for each of the given users, with pre-fetched
+        data for the given locations, in a single query.
+
+        Returns a dict of {user_id: ScoresClient}.
+        """
+        clients = {user_id: cls(course_id, user_id) for user_id in user_ids}
+        scores_qset = StudentModule.objects.filter(
+            student_id__in=list(clients),
+            course_id=course_id,
+            module_state_key__in=set(scorable_locations),
+        )
+        for user_id, location, correct, total, created in scores_qset.values_list(
+                'student_id', 'module_state_key', 'grade', 'max_grade', 'created'
+        ):
+            client = clients[user_id]
+            # pylint: disable=protected-access
+            client._locations_to_scores[location.map_into_course(course_id)] = cls.Score(correct, total, created)
+        for client in six.itervalues(clients):
+            client._has_fetched = True  # pylint: disable=protected-access
+        return clients
+
 
 # @contract(user_id=int, usage_key=UsageKey, score="number|None", max_score="number|None")
 def set_score(user_id, usage_key, score, max_score):
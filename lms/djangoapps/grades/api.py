@@ -12,11 +12,12 @@ from opaque_keys.edx.keys import CourseKey, UsageKey
 from six import text_type
 
 # Public Grades Modules
-from lms.djangoapps.grades import constants, context, course_data, events
+from lms.djangoapps.grades import constants, context, course_data, events, snapshots
 # Grades APIs that should NOT belong within the Grades subsystem
 # TODO move Gradebook to be an external feature outside of core Grades
 from lms.djangoapps.grades.config.waffle import is_writable_gradebook_enabled, gradebook_can_see_bulk_management
 # Public Grades Factories
+from lms.djangoapps.grades.batch_grading import BatchGradeFactory
 from lms.djangoapps.grades.course_grade_factory import CourseGradeFactory
 from lms.djangoapps.grades.models_api import *
 from lms.djangoapps.grades.signals import signals
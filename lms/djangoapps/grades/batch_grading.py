@@ -0,0 +1,458 @@
+"""
+Batched computation of course grades for many learners at once.
+
+Computing course grades one learner at a time creates ProblemScore,
+SubsectionGrade and CourseGrade objects for every block and subsection,
+which dominates gradebook and report jobs over thousands of learners.
+Instead, CourseGradingIndex lays out a course's subsections and scorable
+blocks once.  BatchGradeFactory then loads the scores of a batch of
+learners into (learners x blocks) arrays, and computes the subsection,
+assignment type and course percentages with array operations.
+
+The results match those of CourseGradeFactory().update() for each
+learner, without persisting them: the same floating point operations are
+applied to the same values, in the same order.
+"""
+
+
+from collections import namedtuple
+
+import numpy as np
+import six
+
+from lms.djangoapps.courseware.models import StudentModule
+from xmodule.graders import AssignmentFormatGrader, WeightedSubsectionsGrader
+
+from .config import assume_zero_if_absent, should_persist_grades
+from .course_data import CourseData
+from .course_grade import CourseGrade
+from .models import PersistentSubsectionGrade
+from .prefetch import get_bulk_submissions_scores
+from .scores import possibly_scored
+from .subsection_grade import NonZeroSubsectionGrade
+from .transformer import GradesTransformer
+
+
+class CourseGradingIndex(object):
+    """
+    A fixed layout of a course's subsections, in grading order, and of the
+    scorable blocks within each of them, along with their collected
+    weights, max scores and graded values.
+
+    Each subsection owns a contiguous range of "slots", one for each of
+    its scorable blocks in post-order, so a block that belongs to several
+    subsections has several slots.
+    """
+    def __init__(self, course, collected_block_structure):
+        self.course = course
+        self.course_key = course.id
+        self.collected_block_structure = collected_block_structure
+        structure = collected_block_structure
+
+        # Subsections are graded in the order of their first appearance
+        # in the course's chapters, as in CourseGrade.graded_subsections_by_format.
+        self.subsections = []
+        self.subsection_index = {}
+        for chapter_key in structure.get_children(structure.root_block_usage_key):
+            for subsection_key in structure.get_children(chapter_key):
+                if subsection_key not in self.subsection_index:
+                    self.subsection_index[subsection_key] = len(self.subsections)
+                    self.subsections.append(subsection_key)
+
+        self.blocks = []
+        self.block_index = {}
+        slot_blocks, slot_subsections, self.subsection_slots = [], [], []
+        self.multi_path_slots = []
+        for subsection, subsection_key in enumerate(self.subsections):
+            start = len(slot_blocks)
+            for block_key in structure.post_order_traversal(filter_func=possibly_scored, start_node=subsection_key):
+                if not structure.get_xblock_field(block_key, 'has_score', False):
+                    continue
+                if block_key not in self.block_index:
+                    self.block_index[block_key] = len(self.blocks)
+                    self.blocks.append(block_key)
+                if not _has_single_path(structure, block_key, subsection_key):
+                    self.multi_path_slots.append(len(slot_blocks))
+                slot_blocks.append(self.block_index[block_key])
+                slot_subsections.append(subsection)
+            self.subsection_slots.append(slice(start, len(slot_blocks)))
+
+        self.slot_blocks = np.array(slot_blocks, dtype=int)
+        self.slot_subsections = np.array(slot_subsections, dtype=int)
+        self.block_keys_by_id = {six.text_type(block_key): index for index, block_key in enumerate(self.blocks)}
+
+        self.weights = _float_array(structure.get_xblock_field(block_key, 'weight') for block_key in self.blocks)
+        self.max_scores = _float_array(
+            structure.get_transformer_block_field(block_key, GradesTransformer, 'max_score')
+            for block_key in self.blocks
+        )
+        self.explicit_graded = np.array(
+            [_get_explicit_graded(structure, block_key) for block_key in self.blocks], dtype=bool,
+        )
+        self.subsection_graded = np.array(
+            [bool(structure.get_xblock_field(key, 'graded', False)) for key in self.subsections], dtype=bool,
+        )
+        self.subsection_formats = [structure.get_xblock_field(key, 'format', '') for key in self.subsections]
+
+        self.grade_cutoffs = course.grade_cutoffs
+        self.assignment_types = self._get_assignment_types(course)
+
+    def _get_assignment_types(self, course):
+        """
+        Returns a list of AssignmentType for the course's grading policy.
+
+        Raises ValueError if the course's grader is not a
+        WeightedSubsectionsGrader of AssignmentFormatGraders.
+        """
+        grader = CourseGrade._prep_course_for_grading(course).grader  # pylint: disable=protected-access
+        if not isinstance(grader, WeightedSubsectionsGrader) or not all(
+                isinstance(subgrader, AssignmentFormatGrader) for subgrader, _, _ in grader.subgraders
+        ):
+            raise ValueError(u'Batched grading does not support the grader of {}.'.format(self.course_key))
+
+        return [
+            AssignmentType(
+                columns=np.array(
+                    [
+                        index for index, subsection_format in enumerate(self.subsection_formats)
+                        if subsection_format == subgrader.type
+                    ],
+                    dtype=int,
+                ),
+                min_count=int(float(subgrader.min_count)),
+                drop_count=subgrader.drop_count,
+                weight=weight,
+            )
+            for subgrader, _, weight in grader.subgraders
+        ]
+
+
+AssignmentType = namedtuple('AssignmentType', ['columns', 'min_count', 'drop_count', 'weight'])
+
+
+class BatchCourseGrades(object):
+    """
+    The grades of a batch of learners in a course, as arrays with a row
+    per learner, and a column per subsection of the CourseGradingIndex or
+    per assignment type of its grading policy.
+    """
+    GradeResult = namedtuple('GradeResult', ['student', 'percent', 'letter_grade', 'passed', 'attempted'])
+
+    def __init__(self, index, users, subsection_visible, totals, attempted):
+        self.index = index
+        self.users = users
+        self.subsection_visible = subsection_visible
+        self.earned_all, self.possible_all, self.earned_graded, self.possible_graded = totals
+        self.subsection_attempted = attempted
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.subsection_percents = np.where(
+                self.possible_graded > 0,
+                np.around(self.earned_graded / self.possible_graded, decimals=2),
+                0.0,
+            )
+
+        # CourseGrade.graded_subsections_by_format
+        graded = subsection_visible & index.subsection_graded & (self.possible_graded > 0)
+        self.assignment_type_percents = np.zeros((len(users), len(index.assignment_types)))
+        course_percents = np.zeros(len(users))
+        for column, assignment_type in enumerate(index.assignment_types):
+            percents = grade_assignment_type(
+                self.subsection_percents[:, assignment_type.columns],
+                graded[:, assignment_type.columns],
+                assignment_type.min_count,
+                assignment_type.drop_count,
+            )
+            self.assignment_type_percents[:, column] = percents
+            course_percents = course_percents + percents * assignment_type.weight
+
+        # CourseGrade.update, which is cheap enough per learner, on python
+        # floats so that the results serialize like those of CourseGrade.
+        self.percents = [
+            CourseGrade._compute_percent({'percent': percent})  # pylint: disable=protected-access
+            for percent in course_percents.tolist()
+        ]
+        self.letter_grades = [
+            CourseGrade._compute_letter_grade(index.grade_cutoffs, percent)  # pylint: disable=protected-access
+            for percent in self.percents
+        ]
+        self.passed = [
+            CourseGrade._compute_passed(index.grade_cutoffs, percent)  # pylint: disable=protected-access
+            for percent in self.percents
+        ]
+        if assume_zero_if_absent(index.course_key):
+            self.attempted = [True] * len(users)
+        else:
+            self.attempted = [bool(row) for row in np.any(attempted & subsection_visible, axis=1)]
+
+    def __len__(self):
+        return len(self.users)
+
+    def __iter__(self):
+        """
+        Yields a GradeResult for each learner.
+        """
+        for row, user in enumerate(self.users):
+            yield self.GradeResult(user, self.percents[row], self.letter_grades[row], self.passed[row], self.attempted[row])
+
+
+class BatchGradeFactory(object):
+    """
+    Factory class to compute the course grades of batches of learners.
+    """
+    def __init__(self, course=None, collected_block_structure=None, course_key=None):
+        course_data = CourseData(
+            user=None, course=course, collected_block_structure=collected_block_structure, course_key=course_key,
+        )
+        self.index = CourseGradingIndex(course_data.course, course_data.collected_structure)
+
+    def compute(self, users, force_update_subsections=False):
+        """
+        Returns the BatchCourseGrades of the given users, as computed by
+        CourseGradeFactory().update(user, force_update_subsections=...)
+        for each of them.
+        """
+        index = self.index
+        users = list(users)
+        subsection_visible = np.zeros((len(users), len(index.subsections)), dtype=bool)
+        slot_visible = np.zeros((len(users), len(index.slot_blocks)), dtype=bool)
+        for row, user in enumerate(users):
+            course_data = CourseData(
+                user, course=index.course, collected_block_structure=index.collected_block_structure,
+            )
+            subsection_visible[row], slot_visible[row] = _get_visibility(index, course_data.structure)
+
+        assume_zero = assume_zero_if_absent(index.course_key) and not force_update_subsections
+        if assume_zero:
+            # ZeroSubsectionGrade, whose scores ignore the learner's state.
+            problem_scores = _get_problem_scores(index, *_no_learner_scores(index, len(users)))
+        else:
+            problem_scores = _get_problem_scores(
+                index,
+                *(_load_submissions_scores(index, users) + _load_csm_scores(index, users))
+            )
+        totals, attempted = _aggregate_subsection_scores(index, problem_scores, slot_visible)
+
+        if should_persist_grades(index.course_key) and not force_update_subsections:
+            # ReadSubsectionGrade, for the subsections whose grades were persisted.
+            _read_persisted_subsection_grades(index, users, totals, attempted)
+
+        totals = tuple(np.where(subsection_visible, total, 0.0) for total in totals)
+        return BatchCourseGrades(index, users, subsection_visible, totals, attempted)
+
+
+def grade_assignment_type(percents, present, min_count, drop_count):
+    """
+    Returns the percent of each learner (row) for an assignment type, as
+    AssignmentFormatGrader.grade computes it from the percents of the
+    learner's graded subsections of that type, where present.
+    """
+    num_users, num_columns = percents.shape
+    num_entries = np.maximum(min_count, present.sum(axis=1))
+    width = max(min_count, num_columns)
+    if not width:
+        return np.zeros(num_users)
+
+    # Move each row's present percents to the left, in order.  They are
+    # followed by the grader's 0.0 placeholders, up to num_entries.
+    order = np.argsort(~present, axis=1, kind='stable')
+    entries = np.zeros((num_users, width))
+    entries[:, :num_columns] = np.take_along_axis(np.where(present, percents, 0.0), order, axis=1)
+    kept = np.arange(width) < num_entries[:, np.newaxis]
+
+    if drop_count > 0:
+        # Like total_with_drops, stable sort by decreasing percent, with
+        # the columns past num_entries first, and drop the last entries.
+        ranking = np.argsort(np.where(kept, -entries, -np.inf), axis=1, kind='stable')
+        np.put_along_axis(kept, ranking[:, -drop_count:], False, axis=1)
+
+    # accumulate sums sequentially, in the grader's order.
+    total = np.add.accumulate(np.where(kept, entries, 0.0), axis=1)[:, -1]
+    divisor = num_entries - drop_count
+    return np.where(divisor > 0, total / np.maximum(divisor, 1), total)
+
+
+ProblemScores = namedtuple('ProblemScores', ['earned', 'possible', 'graded', 'attempted'])
+
+
+def _get_problem_scores(index, sub_earned, sub_possible, sub_attempted, csm_correct, csm_total):
+    """
+    Returns the ProblemScores of each learner (row) for each scorable
+    block, as scores.get_score computes them, given the scores from the
+    Submissions API and from CSM, which are nan where absent.  A possible
+    score of nan marks a block without a score.
+    """
+    has_submission = ~np.isnan(sub_possible)
+    has_csm = ~np.isnan(csm_total)
+
+    raw_earned = np.where(has_csm, np.nan_to_num(csm_correct), 0.0)
+    raw_possible = np.where(has_csm, csm_total, index.max_scores)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # scores.weighted_score
+        use_weight = ~np.isnan(index.weights) & (raw_possible != 0)
+        earned = np.where(use_weight, raw_earned * index.weights / raw_possible, raw_earned)
+        possible = np.where(use_weight, index.weights, raw_possible)
+    # blocks without a max_score have no score.
+    possible[np.isnan(raw_possible)] = np.nan
+    earned = np.where(has_submission, sub_earned, earned)
+    possible = np.where(has_submission, sub_possible, possible)
+
+    graded = index.explicit_graded & (np.nan_to_num(possible) > 0)
+    attempted = np.where(has_submission, sub_attempted, has_csm & ~np.isnan(csm_correct))
+    return ProblemScores(earned, possible, graded, attempted)
+
+
+def _aggregate_subsection_scores(index, problem_scores, slot_visible):
+    """
+    Returns the all and graded (earned, possible) totals of each learner
+    (row) for each subsection, as graders.aggregate_scores computes them,
+    and whether any of its problems were attempted.
+    """
+    scored = slot_visible & ~np.isnan(problem_scores.possible[:, index.slot_blocks])
+    graded = scored & problem_scores.graded[:, index.slot_blocks]
+    earned = problem_scores.earned[:, index.slot_blocks]
+    possible = problem_scores.possible[:, index.slot_blocks]
+    attempted_slots = scored & problem_scores.attempted[:, index.slot_blocks]
+
+    num_users, num_subsections = len(slot_visible), len(index.subsections)
+    totals = tuple(np.zeros((num_users, num_subsections)) for _ in range(4))
+    attempted = np.zeros((num_users, num_subsections), dtype=bool)
+    for subsection, slots in enumerate(index.subsection_slots):
+        if slots.start == slots.stop:
+            continue
+        for total, values, mask in zip(totals, (earned, possible) * 2, (scored, scored, graded, graded)):
+            # accumulate sums sequentially, in post-order like float_sum.
+            total[:, subsection] = np.add.accumulate(np.where(mask[:, slots], values[:, slots], 0.0), axis=1)[:, -1]
+        attempted[:, subsection] = np.any(attempted_slots[:, slots], axis=1)
+    return totals, attempted
+
+
+def _read_persisted_subsection_grades(index, users, totals, attempted):
+    """
+    Replaces the computed totals with those of the learners' persisted
+    subsection grades, including any overrides.
+    """
+    rows = {user.id: row for row, user in enumerate(users)}
+    records = PersistentSubsectionGrade.objects.select_related('override').filter(
+        user_id__in=list(rows),
+        course_id=index.course_key,
+    )
+    for record in records:
+        subsection = index.subsection_index.get(record.full_usage_key)
+        if subsection is None:
+            continue
+        row = rows[record.user_id]
+        for is_graded, (earned, possible) in ((False, totals[:2]), (True, totals[2:])):
+            # pylint: disable=protected-access
+            score = NonZeroSubsectionGrade._aggregated_score_from_model(record, is_graded=is_graded)
+            earned[row, subsection] = score.earned
+            possible[row, subsection] = score.possible
+        attempted[row, subsection] = record.first_attempted is not None
+
+
+def _load_submissions_scores(index, users):
+    """
+    Returns the (earned, possible, attempted) arrays of the learners'
+    scores from the Submissions API.
+    """
+    earned = np.full((len(users), len(index.blocks)), np.nan)
+    possible = np.full((len(users), len(index.blocks)), np.nan)
+    attempted = np.zeros((len(users), len(index.blocks)), dtype=bool)
+    scores_by_user = get_bulk_submissions_scores(index.course_key, users)
+    for row, user in enumerate(users):
+        for block_id, score in six.iteritems(scores_by_user[user.id]):
+            column = index.block_keys_by_id.get(block_id)
+            if column is not None and score:
+                earned[row, column] = score['points_earned']
+                possible[row, column] = score['points_possible']
+                attempted[row, column] = score['created_at'] is not None
+    return earned, possible, attempted
+
+
+def _load_csm_scores(index, users):
+    """
+    Returns the (correct, total) arrays of the learners' scores stored in
+    the courseware student module.
+    """
+    correct = np.full((len(users), len(index.blocks)), np.nan)
+    total = np.full((len(users), len(index.blocks)), np.nan)
+    rows = {user.id: row for row, user in enumerate(users)}
+    scores = StudentModule.objects.filter(
+        student_id__in=list(rows),
+        course_id=index.course_key,
+        module_state_key__in=index.blocks,
+    ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+    for user_id, location, grade, max_grade in scores:
+        column = index.block_index.get(location.map_into_course(index.course_key))
+        if column is not None and max_grade is not None:
+            correct[rows[user_id], column] = np.nan if grade is None else grade
+            total[rows[user_id], column] = max_grade
+    return correct, total
+
+
+def _no_learner_scores(index, num_users):
+    """
+    Returns empty Submissions API and CSM score arrays.
+    """
+    empty = np.full((num_users, len(index.blocks)), np.nan)
+    return empty, empty, np.zeros(empty.shape, dtype=bool), empty, empty
+
+
+def _get_visibility(index, structure):
+    """
+    Returns whether each subsection and each slot of the index is in the
+    given learner's course structure, as visited by CourseGrade.
+    """
+    subsection_visible = np.zeros(len(index.subsections), dtype=bool)
+    for chapter_key in structure.get_children(structure.root_block_usage_key):
+        for subsection_key in structure.get_children(chapter_key):
+            if subsection_key in index.subsection_index:
+                subsection_visible[index.subsection_index[subsection_key]] = True
+
+    block_visible = np.array([block_key in structure for block_key in index.blocks], dtype=bool)
+    slot_visible = block_visible[index.slot_blocks] & subsection_visible[index.slot_subsections]
+
+    # A block with several paths to its subsection may be in the structure
+    # but no longer under the subsection, so traverse it as the
+    # SubsectionGrade would.
+    reachable = {}
+    for slot in index.multi_path_slots:
+        subsection = index.slot_subsections[slot]
+        if slot_visible[slot]:
+            if subsection not in reachable:
+                reachable[subsection] = set(structure.post_order_traversal(
+                    filter_func=possibly_scored,
+                    start_node=index.subsections[subsection],
+                ))
+            slot_visible[slot] = index.blocks[index.slot_blocks[slot]] in reachable[subsection]
+    return subsection_visible, slot_visible
+
+
+def _has_single_path(structure, block_key, subsection_key):
+    """
+    Returns whether the given block has a single path to the given
+    subsection, through blocks with a single parent.
+    """
+    while block_key != subsection_key:
+        parents = structure.get_parents(block_key)
+        if len(parents) != 1:
+            return False
+        block_key = parents[0]
+    return True
+
+
+def _get_explicit_graded(structure, block_key):
+    """
+    Returns the graded value of the given block, as scores._get_explicit_graded.
+    """
+    field_value = structure.get_transformer_block_field(
+        block_key, GradesTransformer, GradesTransformer.EXPLICIT_GRADED_FIELD_NAME,
+    )
+    return True if field_value is None else field_value
+
+
+def _float_array(values):
+    """
+    Returns an array of the given values, with nan for None.
+    """
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
@@ -12,12 +12,15 @@ WAFFLE_NAMESPACE = u'grades'
 # Switches
 ASSUME_ZERO_GRADE_IF_ABSENT = u'assume_zero_grade_if_absent'
 DISABLE_REGRADE_ON_POLICY_CHANGE = u'disable_regrade_on_policy_change'
+DEBOUNCE_SUBSECTION_GRADE_UPDATES = u'debounce_subsection_grade_updates'
 
 # Course Flags
 REJECTED_EXAM_OVERRIDES_GRADE = u'rejected_exam_overrides_grade'
 ENFORCE_FREEZE_GRADE_AFTER_COURSE_END = u'enforce_freeze_grade_after_course_end'
 WRITABLE_GRADEBOOK = u'writable_gradebook'
 BULK_MANAGEMENT = u'bulk_management'
+GRADE_SNAPSHOTS = u'grade_snapshots'
+BATCH_GRADING = u'batch_grading'
 
 
 def waffle():
@@ -55,6 +58,19 @@ def waffle_flags():
             BULK_MANAGEMENT,
             flag_undefined_default=False,
         ),
+        # Maintain and read denormalized snapshots of the course's grades.
+        GRADE_SNAPSHOTS: CourseWaffleFlag(
+            namespace,
+            GRADE_SNAPSHOTS,
+            flag_undefined_default=False,
+        ),
+        # Compute the course grades of whole pages of learners with the BatchGradeFactory,
+        # in courses that do not persist grades.
+        BATCH_GRADING: CourseWaffleFlag(
+            namespace,
+            BATCH_GRADING,
+            flag_undefined_default=False,
+        ),
     }
 
 
@@ -72,3 +88,17 @@ def gradebook_can_see_bulk_management(course_key):
     (provided that course contains a masters track, as of this writing)
     """
     return waffle_flags()[BULK_MANAGEMENT].is_enabled(course_key)
+
+
+def grade_snapshots_enabled(course_key):
+    """
+    Returns whether grade snapshots are maintained and read for the given course.
+    """
+    return waffle_flags()[GRADE_SNAPSHOTS].is_enabled(course_key)
+
+
+def batch_grading_enabled(course_key):
+    """
+    Returns whether the course grades of pages of learners are computed in batches.
+    """
+    return waffle_flags()[BATCH_GRADING].is_enabled(course_key)
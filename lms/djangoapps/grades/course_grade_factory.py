@@ -4,6 +4,7 @@ Course Grade Factory Class
 
 
 from collections import namedtuple
+from itertools import islice
 from logging import getLogger
 
 import six
@@ -20,6 +21,7 @@ from .course_data import CourseData
 from .course_grade import CourseGrade, ZeroCourseGrade
 from .models import PersistentCourseGrade
 from .models_api import prefetch_grade_overrides_and_visible_blocks
+from .prefetch import prefetch_grade_data
 
 log = getLogger(__name__)
 
@@ -38,6 +40,7 @@ class CourseGradeFactory(object):
             course_structure=None,
             course_key=None,
             create_if_needed=True,
+            prefetched_data=None,
     ):
         """
         Returns the CourseGrade for the given user in the course.
@@ -48,15 +51,18 @@ class CourseGradeFactory(object):
 
         At least one of course, collected_block_structure, course_structure,
         or course_key should be provided.
+
+        prefetched_data is the PrefetchedGradeData of a batch of users
+        including the given user, as yielded by prefetch_grade_data.
         """
         course_data = CourseData(user, course, collected_block_structure, course_structure, course_key)
         try:
-            return self._read(user, course_data)
+            return self._read(user, course_data, prefetched_data=prefetched_data)
         except PersistentCourseGrade.DoesNotExist:
             if assume_zero_if_absent(course_data.course_key):
                 return self._create_zero(user, course_data)
             elif create_if_needed:
-                return self._update(user, course_data)
+                return self._update(user, course_data, prefetched_data=prefetched_data)
             else:
                 return None
 
@@ -68,6 +74,7 @@ class CourseGradeFactory(object):
             course_structure=None,
             course_key=None,
             force_update_subsections=False,
+            prefetched_data=None,
     ):
         """
         Computes, updates, and returns the CourseGrade for the given
@@ -75,12 +82,16 @@ class CourseGradeFactory(object):
 
         At least one of course, collected_block_structure, course_structure,
         or course_key should be provided.
+
+        prefetched_data is the PrefetchedGradeData of a batch of users
+        including the given user, as yielded by prefetch_grade_data.
         """
         course_data = CourseData(user, course, collected_block_structure, course_structure, course_key)
         return self._update(
             user,
             course_data,
-            force_update_subsections=force_update_subsections
+            force_update_subsections=force_update_subsections,
+            prefetched_data=prefetched_data,
         )
 
     def iter(
@@ -90,6 +101,7 @@ class CourseGradeFactory(object):
             collected_block_structure=None,
             course_key=None,
             force_update=False,
+            batch_size=None,
     ):
         """
         Given a course and an iterable of students (User), yield a GradeResult
@@ -99,6 +111,10 @@ class CourseGradeFactory(object):
 
         If an error occurred, course_grade will be None and err_msg will be an
         exception message. If there was no error, err_msg is an empty string.
+
+        If batch_size is given, the students' scores and persisted grades are
+        prefetched in batches of batch_size students, in a few queries per
+        batch rather than per student.
         """
         # Pre-fetch the collected course_structure (in _iter_grade_result) so:
         # 1. Correctness: the same version of the course is used to
@@ -109,16 +125,27 @@ class CourseGradeFactory(object):
             user=None, course=course, collected_block_structure=collected_block_structure, course_key=course_key,
         )
         stats_tags = [u'action:{}'.format(course_data.course_key)]
-        for user in users:
-            yield self._iter_grade_result(user, course_data, force_update)
+        if not batch_size:
+            for user in users:
+                yield self._iter_grade_result(user, course_data, force_update)
+            return
+
+        users = iter(users)
+        batch = list(islice(users, batch_size))
+        while batch:
+            with prefetch_grade_data(course_data, batch, force_update) as prefetched_data:
+                for user in batch:
+                    yield self._iter_grade_result(user, course_data, force_update, prefetched_data)
+            batch = list(islice(users, batch_size))
 
-    def _iter_grade_result(self, user, course_data, force_update):
+    def _iter_grade_result(self, user, course_data, force_update, prefetched_data=None):
         try:
             kwargs = {
                 'user': user,
                 'course': course_data.course,
                 'collected_block_structure': course_data.collected_structure,
                 'course_key': course_data.course_key,
+                'prefetched_data': prefetched_data,
             }
             if force_update:
                 kwargs['force_update_subsections'] = True
@@ -146,7 +173,7 @@ class CourseGradeFactory(object):
         return ZeroCourseGrade(user, course_data)
 
     @staticmethod
-    def _read(user, course_data):
+    def _read(user, course_data, prefetched_data=None):
         """
         Returns a CourseGrade object based on stored grade information
         for the given user and course.
@@ -162,11 +189,12 @@ class CourseGradeFactory(object):
             course_data,
             persistent_grade.percent_grade,
             persistent_grade.letter_grade,
-            persistent_grade.letter_grade != u''
+            persistent_grade.letter_grade != u'',
+            prefetched_data=prefetched_data,
         )
 
     @staticmethod
-    def _update(user, course_data, force_update_subsections=False):
+    def _update(user, course_data, force_update_subsections=False, prefetched_data=None):
         """
         Computes, saves, and returns a CourseGrade object for the
         given user and course.
@@ -175,13 +203,15 @@ class CourseGradeFactory(object):
         COURSE_GRADE_NOW_FAILED if learner is now failing course
         """
         should_persist = should_persist_grades(course_data.course_key)
-        if should_persist and force_update_subsections:
+        if should_persist and force_update_subsections and prefetched_data is None:
+            # Otherwise, they were prefetched for the whole batch.
             prefetch_grade_overrides_and_visible_blocks(user, course_data.course_key)
 
         course_grade = CourseGrade(
             user,
             course_data,
-            force_update_subsections=force_update_subsections
+            force_update_subsections=force_update_subsections,
+            prefetched_data=prefetched_data,
         )
         course_grade = course_grade.update()
 
@@ -0,0 +1,142 @@
+"""
+Collapses the subsection grade updates queued in quick succession for the
+same learner and block, as when a learner repeatedly checks the answers
+of a multi-part problem, into a single recalculate_subsection_grade_v3
+task carrying the newest of their events.
+
+Each update of a (user, course, block) takes the next number of its
+sequence, with an atomic cache increment, and stores its task arguments
+under a key of its own, so that concurrent updates never overwrite each
+other's.  A task is queued only if the update adds the pending marker of
+the (user, course, block), which holds the number of the first update
+collapsed into the task.  The pending task clears the marker, then reads
+and deletes the arguments of the updates numbered from that first one up
+to the newest.  An update whose arguments it missed adds the marker anew
+and queues a task of its own, so no update is ever dropped.
+"""
+
+
+import hashlib
+
+from django.core.cache import cache
+from six.moves import range
+
+from .config.waffle import DEBOUNCE_SUBSECTION_GRADE_UPDATES, waffle
+
+CACHE_KEY_PREFIX = u'grades.debounce'
+
+# The pending marker expires in case its task is lost, after which the next
+# update queues a new task.  The arguments outlive the task by far, since an
+# update whose arguments expired before its task ran would be recalculated
+# from those of the first update collapsed into the task.  Arguments that
+# no task reads, as when one is lost, expire with the sequence.
+PENDING_TIMEOUT_SECONDS = 300
+ARGUMENTS_TIMEOUT_SECONDS = 3600
+
+STATS = (u'collapsed', u'executed')
+
+
+def is_debounce_enabled():
+    """
+    Returns whether subsection grade updates are to be debounced.
+    """
+    return waffle().is_enabled(DEBOUNCE_SUBSECTION_GRADE_UPDATES)
+
+
+def debounce_subsection_update(task_kwargs):
+    """
+    Stores the given recalculate_subsection_grade_v3 arguments as the
+    newest of their (user, course, block), and returns whether a task
+    must be queued for them, as none is pending yet.  Otherwise, the
+    update is collapsed into the pending task.
+    """
+    sequence_key, pending_key = _cache_keys(task_kwargs)
+    number = _increment(sequence_key, ARGUMENTS_TIMEOUT_SECONDS)
+    cache.set(_arguments_key(sequence_key, number), task_kwargs, ARGUMENTS_TIMEOUT_SECONDS)
+
+    if cache.add(pending_key, number, PENDING_TIMEOUT_SECONDS):
+        return True
+    _increment_stat(u'collapsed')
+    return False
+
+
+def pop_subsection_update(task_kwargs):
+    """
+    Returns the newest arguments of the (user, course, block) of the
+    given arguments of a debounced task, and the number of updates they
+    collapse, marks its task as no longer pending, and deletes the
+    arguments of the collapsed updates.
+    """
+    sequence_key, pending_key = _cache_keys(task_kwargs)
+    first = cache.get(pending_key)
+    cache.delete(pending_key)
+    newest = cache.get(sequence_key)
+    _increment_stat(u'executed')
+    if first is None or newest is None:
+        return task_kwargs, 1
+
+    arguments_keys = [_arguments_key(sequence_key, number) for number in range(first, newest + 1)]
+    collapsed = cache.get_many(arguments_keys)
+    cache.delete_many(arguments_keys)
+    collapsed_kwargs = [collapsed[key] for key in arguments_keys if key in collapsed]
+    if not collapsed_kwargs:
+        return task_kwargs, 1
+    newest_kwargs = collapsed_kwargs[-1]
+    if any(kwargs.get('force_update_subsections') for kwargs in collapsed_kwargs):
+        # Keep forcing the update of the subsections if any collapsed update did.
+        newest_kwargs = dict(newest_kwargs, force_update_subsections=True)
+    return newest_kwargs, len(collapsed_kwargs)
+
+
+def get_stats():
+    """
+    Returns the cumulative numbers of updates that were collapsed into a
+    pending task, and of debounced tasks that were executed.
+    """
+    values = cache.get_many([_stat_key(name) for name in STATS])
+    return {name: values.get(_stat_key(name), 0) for name in STATS}
+
+
+def reset_stats():
+    """
+    Zeroes the cumulative counters of get_stats.
+    """
+    cache.delete_many([_stat_key(name) for name in STATS])
+
+
+def _increment_stat(name):
+    _increment(_stat_key(name), None)
+
+
+def _increment(key, timeout):
+    """
+    Atomically increments the counter under the given cache key, starting
+    it at zero if it does not exist, and returns its new value.
+    """
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add and incr.
+        cache.set(key, 1, timeout)
+        return 1
+
+
+def _cache_keys(task_kwargs):
+    """
+    Returns the cache keys of the update sequence and of the pending
+    marker of the (user, course, block) of the given arguments.
+    """
+    digest = hashlib.md5(u'{user_id}|{course_id}|{usage_id}'.format(**task_kwargs).encode('utf-8')).hexdigest()
+    return (
+        u'{}.sequence.{}'.format(CACHE_KEY_PREFIX, digest),
+        u'{}.pending.{}'.format(CACHE_KEY_PREFIX, digest),
+    )
+
+
+def _arguments_key(sequence_key, number):
+    return u'{}.{}'.format(sequence_key, number)
+
+
+def _stat_key(name):
+    return u'{}.stats.{}'.format(CACHE_KEY_PREFIX, name)
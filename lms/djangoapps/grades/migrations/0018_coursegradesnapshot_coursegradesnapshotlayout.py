@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+from opaque_keys.edx.django.models import CourseKeyField
+
+from lms.djangoapps.courseware.fields import UnsignedBigIntAutoField
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0017_delete_manual_psgoverride_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseGradeSnapshot',
+            fields=[
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, verbose_name='created', editable=False)),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, verbose_name='modified', editable=False)),
+                ('id', UnsignedBigIntAutoField(serialize=False, primary_key=True)),
+                ('user_id', models.IntegerField()),
+                ('course_id', CourseKeyField(max_length=255)),
+                ('percent_grade', models.FloatField()),
+                ('letter_grade', models.CharField(max_length=255, verbose_name='Letter grade for course', blank=True)),
+                ('passed', models.BooleanField(default=False)),
+                ('attempted', models.BooleanField(default=False)),
+                ('subsection_scores', models.BinaryField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseGradeSnapshotLayout',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', CourseKeyField(max_length=255, unique=True)),
+                ('usage_keys', models.TextField(default='', blank=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='coursegradesnapshot',
+            unique_together=set([('course_id', 'user_id')]),
+        ),
+    ]
@@ -18,7 +18,7 @@ from hashlib import sha1
 import six
 from django.apps import apps
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.timezone import now
 from lazy import lazy
@@ -178,6 +178,22 @@ class VisibleBlocks(models.Model):
             prefetched = cls._initialize_cache(user_id, course_key)
         return prefetched
 
+    @classmethod
+    def prefetch(cls, course_key, users):
+        """
+        Prefetches visible blocks for the given users in the given course,
+        in a single query, and stores them in each user's cache.
+        """
+        prefetched = {user.id: {} for user in users}
+        grades_with_blocks = PersistentSubsectionGrade.objects.select_related('visible_blocks').filter(
+            user_id__in=list(prefetched),
+            course_id=course_key,
+        )
+        for grade in grades_with_blocks:
+            prefetched[grade.user_id][grade.visible_blocks.hashed] = grade.visible_blocks
+        for user_id, user_prefetched in six.iteritems(prefetched):
+            get_cache(cls._CACHE_NAMESPACE)[cls._cache_key(user_id, course_key)] = user_prefetched
+
     @classmethod
     def cached_get_or_create(cls, user_id, blocks):
         """
@@ -644,6 +660,120 @@ class PersistentCourseGrade(TimeStampedModel):
         events.course_grade_calculated(grade)
 
 
+@python_2_unicode_compatible
+class CourseGradeSnapshotLayout(models.Model):
+    """
+    The subsections of a course whose scores are packed in the course's
+    CourseGradeSnapshots, in the order of their slots in the packed
+    vectors.  Subsections are only ever appended, so the slots of
+    existing snapshots remain valid as the course changes.
+
+    .. no_pii:
+    """
+    class Meta(object):
+        app_label = "grades"
+
+    course_id = CourseKeyField(blank=False, max_length=255, unique=True)
+
+    # The usage keys of the subsections, one per line.
+    usage_keys = models.TextField(blank=True, default=u'')
+
+    _CACHE_NAMESPACE = u"grades.models.CourseGradeSnapshotLayout"
+
+    def __str__(self):
+        return u"{} course: {}, subsections: {}".format(type(self).__name__, self.course_id, len(self.slots))
+
+    @lazy
+    def slots(self):
+        """
+        Returns the usage keys of the subsections, in the order of their slots.
+        """
+        return [
+            UsageKey.from_string(usage_key).map_into_course(self.course_id)
+            for usage_key in self.usage_keys.split(u'\n') if usage_key
+        ]
+
+    @lazy
+    def slot_indices(self):
+        """
+        Returns a dict of the slot index of each subsection usage key.
+        """
+        return {usage_key: index for index, usage_key in enumerate(self.slots)}
+
+    @classmethod
+    def read(cls, course_id):
+        """
+        Returns the layout of the given course, or None if it has none yet.
+        The layout is cached in the RequestCache.
+        """
+        cache = get_cache(cls._CACHE_NAMESPACE)
+        if course_id not in cache:
+            cache[course_id] = cls.objects.filter(course_id=course_id).first()
+        return cache[course_id]
+
+    @classmethod
+    def extend(cls, course_id, usage_keys):
+        """
+        Returns the layout of the given course, once the given subsection
+        usage keys missing from it are appended to it.
+        """
+        layout = cls.read(course_id)
+        if layout is not None and all(usage_key in layout.slot_indices for usage_key in usage_keys):
+            return layout
+
+        with transaction.atomic():
+            layout, _ = cls.objects.select_for_update().get_or_create(course_id=course_id)
+            missing_keys = [usage_key for usage_key in usage_keys if usage_key not in layout.slot_indices]
+            if missing_keys:
+                layout.usage_keys = u'\n'.join(
+                    [six.text_type(usage_key) for usage_key in layout.slots + missing_keys]
+                )
+                layout.save()
+                layout = cls.objects.get(pk=layout.pk)
+        get_cache(cls._CACHE_NAMESPACE)[course_id] = layout
+        return layout
+
+
+@python_2_unicode_compatible
+class CourseGradeSnapshot(TimeStampedModel):
+    """
+    A denormalized snapshot of a learner's grades in a course: the course
+    grade along with the scores of all of the course's subsections, packed
+    into a single vector whose slots are given by the course's
+    CourseGradeSnapshotLayout.  The snapshots of a page of learners are
+    read in a single query, with no course structure traversal.
+
+    .. no_pii:
+    """
+    class Meta(object):
+        app_label = "grades"
+        # (course_id, user_id) for reading the snapshots of a page of learners.
+        unique_together = [
+            ('course_id', 'user_id'),
+        ]
+
+    # primary key will need to be large for this table
+    id = UnsignedBigIntAutoField(primary_key=True)  # pylint: disable=invalid-name
+    user_id = models.IntegerField(blank=False)
+    course_id = CourseKeyField(blank=False, max_length=255)
+
+    percent_grade = models.FloatField(blank=False)
+    letter_grade = models.CharField(u'Letter grade for course', blank=True, max_length=255)
+    passed = models.BooleanField(default=False)
+    attempted = models.BooleanField(default=False)
+
+    # The packed scores of the subsections, see lms.djangoapps.grades.snapshots.
+    subsection_scores = models.BinaryField(blank=True)
+
+    def __str__(self):
+        return u', '.join([
+            u"{} user: {}".format(type(self).__name__, self.user_id),
+            u"course: {}".format(self.course_id),
+            u"percent grade: {}%".format(self.percent_grade),
+            u"letter grade: {}".format(self.letter_grade),
+        ])
+
+
 @python_2_unicode_compatible
 class PersistentSubsectionGradeOverride(models.Model):
     """
@@ -700,6 +830,22 @@ class PersistentSubsectionGradeOverride(models.Model):
             cls.objects.filter(grade__user_id=user_id, grade__course_id=course_key)
         }
 
+    @classmethod
+    def bulk_prefetch(cls, course_key, users):
+        """
+        Prefetches the overrides for the given users in the given course,
+        in a single query.
+        """
+        prefetched = {user.id: {} for user in users}
+        overrides = cls.objects.select_related('grade').filter(
+            grade__user_id__in=list(prefetched),
+            grade__course_id=course_key,
+        )
+        for override in overrides:
+            prefetched[override.grade.user_id][override.grade.usage_key] = override
+        for user_id, user_prefetched in six.iteritems(prefetched):
+            get_cache(cls._CACHE_NAMESPACE)[(user_id, str(course_key))] = user_prefetched
+
     @classmethod
     def get_override(cls, user_id, usage_key):
         prefetch_values = get_cache(cls._CACHE_NAMESPACE).get((user_id, str(usage_key.course_key)), None)
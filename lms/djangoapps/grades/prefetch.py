@@ -0,0 +1,122 @@
+"""
+Prefetches the learner data needed to compute the grades of a batch of
+learners in a course, in a few queries for the whole batch rather than a
+few per learner.
+"""
+
+
+from contextlib import contextmanager
+
+from lazy import lazy
+
+from lms.djangoapps.courseware.model_data import ScoresClient
+from student.models import anonymous_id_for_user
+
+from .config import should_persist_grades
+from .models import PersistentCourseGrade, PersistentSubsectionGrade, PersistentSubsectionGradeOverride, VisibleBlocks
+from .scores import possibly_scored
+
+
+class PrefetchedGradeData(object):
+    """
+    The scores of a batch of learners in a course, loaded lazily for the
+    whole batch the first time any learner's scores are needed.
+    """
+    def __init__(self, course_data, users):
+        self.course_data = course_data
+        self.users = users
+
+    def get_csm_scores(self, user):
+        """
+        Returns the ScoresClient of the given learner's scores stored in
+        the courseware student module.
+        """
+        return self._csm_scores[user.id]
+
+    def get_submissions_scores(self, user):
+        """
+        Returns the given learner's scores stored by the Submissions API,
+        as returned by submissions_api.get_scores.
+        """
+        return self._submissions_scores.get(user.id, {})
+
+    @lazy
+    def _csm_scores(self):
+        scorable_locations = [
+            block_key for block_key in self.course_data.collected_structure if possibly_scored(block_key)
+        ]
+        return ScoresClient.create_for_users(
+            self.course_data.course_key, [user.id for user in self.users], scorable_locations,
+        )
+
+    @lazy
+    def _submissions_scores(self):
+        return get_bulk_submissions_scores(self.course_data.course_key, self.users)
+
+
+@contextmanager
+def prefetch_grade_data(course_data, users, force_update=False):
+    """
+    Prefetches the persisted course and subsection grades of the given
+    users, along with their grade overrides and visible blocks if their
+    grades are to be updated, and yields the PrefetchedGradeData of their
+    scores.  The prefetched grades are cleared on exit.
+    """
+    course_key = course_data.course_key
+    should_persist = should_persist_grades(course_key)
+    if should_persist:
+        PersistentCourseGrade.prefetch(course_key, users)
+        PersistentSubsectionGrade.prefetch(course_key, users)
+        if force_update:
+            PersistentSubsectionGradeOverride.bulk_prefetch(course_key, users)
+            VisibleBlocks.prefetch(course_key, users)
+    try:
+        yield PrefetchedGradeData(course_data, users)
+    finally:
+        if should_persist:
+            PersistentCourseGrade.clear_prefetched_data(course_key)
+            PersistentSubsectionGrade.clear_prefetched_data(course_key)
+
+
+def get_bulk_submissions_scores(course_key, users):
+    """
+    Returns the scores stored by the Submissions API for the given users
+    in the course, in a single query, as a dict of {user_id: scores} where
+    scores are as returned by submissions_api.get_scores.
+    """
+    users_by_anonymous_id = {
+        anonymous_id_for_user(user, course_key, save=False): user.id
+        for user in users
+    }
+    scores = {user.id: {} for user in users}
+    scores_by_anonymous_id = _submissions_get_scores_for_students(str(course_key), list(users_by_anonymous_id))
+    for anonymous_id, student_scores in scores_by_anonymous_id.items():
+        scores[users_by_anonymous_id[anonymous_id]] = student_scores
+    return scores
+
+
+def _submissions_get_scores_for_students(course_id, student_ids):
+    """
+    COPY of submissions.api.get_scores for many students at once, as the
+    Submissions API has no bulk equivalent.  Returns a dict of
+    {student_id: scores} for the students with scores, where scores are
+    as returned by submissions.api.get_scores.
+
+    It reads the Submissions API's models and serializer, which are not
+    part of its public API, so it must be kept in sync with get_scores
+    whenever edx-submissions is upgraded, and be replaced by a public bulk
+    API once there is one.
+    """
+    from submissions.models import ScoreSummary
+    from submissions.serializers import UnannotatedScoreSerializer
+
+    scores = {}
+    score_summaries = ScoreSummary.objects.filter(
+        student_item__course_id=course_id,
+        student_item__student_id__in=student_ids,
+    ).select_related('latest', 'latest__submission', 'student_item')
+    for summary in score_summaries:
+        if not summary.latest.is_hidden():
+            student_scores = scores.setdefault(summary.student_item.student_id, {})
+            student_scores[summary.student_item.item_id] = UnannotatedScoreSerializer(summary.latest).data
+    return scores
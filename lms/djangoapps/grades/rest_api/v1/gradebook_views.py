@@ -27,6 +27,7 @@ from lms.djangoapps.grades.api import constants as grades_constants
 from lms.djangoapps.grades.api import context as grades_context
 from lms.djangoapps.grades.api import events as grades_events
 from lms.djangoapps.grades.api import is_writable_gradebook_enabled, prefetch_course_and_subsection_grades
+from lms.djangoapps.grades.api import snapshots as grades_snapshots
 from lms.djangoapps.grades.api import gradebook_can_see_bulk_management as can_see_bulk_management
 from lms.djangoapps.grades.course_data import CourseData
 from lms.djangoapps.grades.grade_utils import are_grades_frozen
@@ -623,7 +624,7 @@ class GradebookView(GradeViewMixin, PaginatedAPIView):
             users_counts = self._get_users_counts(course_key, q_objects, annotations=annotations)
 
             with bulk_gradebook_view_context(course_key, users):
-                for user, course_grade, exc in CourseGradeFactory().iter(
+                for user, course_grade, exc in grades_snapshots.iter_grades(
                     users, course_key=course_key, collected_block_structure=course_data.collected_structure
                 ):
                     if not exc:
@@ -4,17 +4,25 @@ Tests for v1 views
 
 
 from collections import OrderedDict
+from datetime import datetime
 
 import ddt
+from django.conf import settings
 from django.urls import reverse
 from mock import MagicMock, patch
 from opaque_keys import InvalidKeyError
+from pytz import UTC
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from lms.djangoapps.grades.config.waffle import BATCH_GRADING, ENFORCE_FREEZE_GRADE_AFTER_COURSE_END, waffle_flags
+from lms.djangoapps.grades.grade_utils import are_grades_frozen
+from lms.djangoapps.grades.models import PersistentCourseGrade
 from lms.djangoapps.grades.rest_api.v1.tests.mixins import GradeViewTestMixin
 from lms.djangoapps.grades.rest_api.v1.views import CourseGradesView
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 from openedx.core.djangoapps.user_authn.tests.utils import AuthAndScopesTestMixin
+from openedx.core.djangoapps.waffle_utils.testutils import override_waffle_flag
 from student.tests.factories import UserFactory
 
 
@@ -266,3 +274,58 @@ class CourseGradesViewTest(GradeViewTestMixin, APITestCase):
         ])
 
         self.assertEqual(expected_data, resp.data)
+
+    @patch.dict(settings.FEATURES, {'PERSISTENT_GRADES_ENABLED_FOR_ALL_TESTS': False})
+    def test_batch_grading(self):
+        self.client.login(username=self.global_staff.username, password=self.password)
+        expected_data = self.client.get(self.get_url()).data
+
+        with override_waffle_flag(waffle_flags()[BATCH_GRADING], active=True):
+            with patch('lms.djangoapps.grades.rest_api.v1.views.CourseGradeFactory') as mock_factory:
+                resp = self.client.get(self.get_url())
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertFalse(mock_factory.called)
+        self.assertEqual(expected_data, resp.data)
+
+    def _save_course_grade(self, user, percent, letter_grade):
+        """
+        Saves a course grade for the given user which the course's current
+        grading policy would not compute, as its problems are unanswered.
+        """
+        PersistentCourseGrade.update_or_create(
+            user_id=user.id,
+            course_id=self.course.id,
+            course_version='',
+            grading_policy_hash='an older grading policy',
+            percent_grade=percent,
+            letter_grade=letter_grade,
+            passed=bool(letter_grade),
+        )
+
+    def _assert_batch_grading_serves_saved_grades(self):
+        """
+        Asserts that batch grading serves the saved grades, as without it.
+        """
+        self.client.login(username=self.global_staff.username, password=self.password)
+        expected_data = self.client.get(self.get_url()).data
+        with override_waffle_flag(waffle_flags()[BATCH_GRADING], active=True):
+            resp = self.client.get(self.get_url())
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(expected_data, resp.data)
+        grades = {grade['username']: grade for grade in resp.data['results']}
+        self.assertEqual(grades[self.student.username]['percent'], 0.73)
+        self.assertEqual(grades[self.student.username]['letter_grade'], 'Pass')
+        self.assertTrue(grades[self.student.username]['passed'])
+
+    def test_batch_grading_saved_grade_of_older_policy(self):
+        self._save_course_grade(self.student, 0.73, 'Pass')
+        self._assert_batch_grading_serves_saved_grades()
+
+    @override_waffle_flag(waffle_flags()[ENFORCE_FREEZE_GRADE_AFTER_COURSE_END], active=True)
+    def test_batch_grading_frozen_grades(self):
+        CourseOverview.objects.filter(id=self.course.id).update(end=datetime(2000, 1, 1, tzinfo=UTC))
+        self.assertTrue(are_grades_frozen(self.course.id))
+        self._save_course_grade(self.student, 0.73, 'Pass')
+        self._assert_batch_grading_serves_saved_grades()
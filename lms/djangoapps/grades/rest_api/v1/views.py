@@ -13,7 +13,14 @@ from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 
 from lms.djangoapps.courseware.access import has_access
-from lms.djangoapps.grades.api import CourseGradeFactory, clear_prefetched_course_grades, prefetch_course_grades
+from lms.djangoapps.grades.api import (
+    BatchGradeFactory,
+    CourseGradeFactory,
+    clear_prefetched_course_grades,
+    prefetch_course_grades
+)
+from lms.djangoapps.grades.config import should_persist_grades
+from lms.djangoapps.grades.config.waffle import batch_grading_enabled
 from lms.djangoapps.grades.rest_api.serializers import GradingPolicySerializer
 from lms.djangoapps.grades.rest_api.v1.utils import CourseEnrollmentPagination, GradeViewMixin
 from openedx.core.lib.api.authentication import BearerAuthenticationAllowInactiveUser
@@ -136,6 +143,12 @@ class CourseGradesView(GradeViewMixin, PaginatedAPIView):
         user_grades = []
         users = self._paginate_users(course_key)
 
+        batch_grades = self._get_batch_grades(course_key, users)
+        if batch_grades is not None:
+            for result in batch_grades:
+                user_grades.append(self._serialize_user_grade(result.student, course_key, result))
+            return self.get_paginated_response(user_grades)
+
         with bulk_course_grade_context(course_key, users):
             for user, course_grade, exc in CourseGradeFactory().iter(users, course_key=course_key):
                 if not exc:
@@ -143,6 +156,28 @@ class CourseGradesView(GradeViewMixin, PaginatedAPIView):
 
         return self.get_paginated_response(user_grades)
 
+    def _get_batch_grades(self, course_key, users):
+        """
+        Returns the BatchCourseGrades of the given users, or None if batch
+        grading is not enabled for the course or does not support its grader.
+
+        Grades are only computed in batches for courses that do not persist
+        grades, whose grades CourseGradeFactory recomputes on every read
+        without saving them.  Otherwise, the saved grades must be served as
+        they are, even when frozen or computed under an older grading
+        policy, and the missing ones created, so CourseGradeFactory reads
+        them.  Unlike CourseGradeFactory, batched grades do not send
+        COURSE_GRADE_CHANGED.
+        """
+        if not batch_grading_enabled(course_key) or should_persist_grades(course_key):
+            return None
+        try:
+            batch_grade_factory = BatchGradeFactory(course_key=course_key)
+        except ValueError as exc:
+            log.warning(u'Grades: falling back to per-learner grading of %s: %s', course_key, exc)
+            return None
+        return batch_grade_factory.compute(users)
+
 
 class CourseGradingPolicy(GradeViewMixin, ListAPIView):
     """
@@ -14,6 +14,7 @@ from xblock.scorable import ScorableXBlockMixin, Score
 
 from lms.djangoapps.courseware.model_data import get_score, set_score
 from openedx.core.djangoapps.course_groups.signals.signals import COHORT_MEMBERSHIP_UPDATED
+from openedx.core.djangoapps.signals.signals import COURSE_GRADE_CHANGED
 from openedx.core.lib.grade_utils import is_score_higher_or_equal
 from student.models import user_by_anonymous_id
 from student.signals import ENROLLMENT_TRACK_UPDATED
@@ -21,9 +22,12 @@ from track.event_transaction_utils import get_event_transaction_id, get_event_tr
 from util.date_utils import to_timestamp
 
 from .. import events
+from ..config.waffle import grade_snapshots_enabled
 from ..constants import ScoreDatabaseTableEnum
 from ..course_grade_factory import CourseGradeFactory
+from ..debounce import debounce_subsection_update, is_debounce_enabled
 from ..scores import weighted_score
+from ..snapshots import update_snapshot
 from ..tasks import (
     RECALCULATE_GRADE_DELAY_SECONDS,
     recalculate_course_and_subsection_grades_for_user,
@@ -224,20 +228,26 @@ def enqueue_subsection_update(sender, **kwargs):  # pylint: disable=unused-argum
     context_key = LearningContextKey.from_string(kwargs['course_id'])
     if not context_key.is_course:
         return  # If it's not a course, it has no subsections, so skip the subsection grading update
+    task_kwargs = dict(
+        user_id=kwargs['user_id'],
+        anonymous_user_id=kwargs.get('anonymous_user_id'),
+        course_id=kwargs['course_id'],
+        usage_id=kwargs['usage_id'],
+        only_if_higher=kwargs.get('only_if_higher'),
+        expected_modified_time=to_timestamp(kwargs['modified']),
+        score_deleted=kwargs.get('score_deleted', False),
+        event_transaction_id=six.text_type(get_event_transaction_id()),
+        event_transaction_type=six.text_type(get_event_transaction_type()),
+        score_db_table=kwargs['score_db_table'],
+        force_update_subsections=kwargs.get('force_update_subsections', False),
+    )
+    if is_debounce_enabled():
+        # Collapse the update into the task already queued for it, if any.
+        if not debounce_subsection_update(task_kwargs):
+            return
+        task_kwargs['debounced'] = True
     recalculate_subsection_grade_v3.apply_async(
-        kwargs=dict(
-            user_id=kwargs['user_id'],
-            anonymous_user_id=kwargs.get('anonymous_user_id'),
-            course_id=kwargs['course_id'],
-            usage_id=kwargs['usage_id'],
-            only_if_higher=kwargs.get('only_if_higher'),
-            expected_modified_time=to_timestamp(kwargs['modified']),
-            score_deleted=kwargs.get('score_deleted', False),
-            event_transaction_id=six.text_type(get_event_transaction_id()),
-            event_transaction_type=six.text_type(get_event_transaction_type()),
-            score_db_table=kwargs['score_db_table'],
-            force_update_subsections=kwargs.get('force_update_subsections', False),
-        ),
+        kwargs=task_kwargs,
         countdown=RECALCULATE_GRADE_DELAY_SECONDS,
     )
 
@@ -251,6 +261,16 @@ def recalculate_course_grade_only(sender, course, course_structure, user, **kwar
     CourseGradeFactory().update(user, course=course, course_structure=course_structure)
 
 
+@receiver(COURSE_GRADE_CHANGED)
+def update_course_grade_snapshot(sender, user, course_grade, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Saves the snapshot of the changed course grade, if grade snapshots
+    are enabled for the course.
+    """
+    if grade_snapshots_enabled(course_key):
+        update_snapshot(user, course_grade)
+
+
 @receiver(ENROLLMENT_TRACK_UPDATED)
 @receiver(COHORT_MEMBERSHIP_UPDATED)
 def recalculate_course_and_subsection_grades(sender, user, course_key, countdown=None, **kwargs):  # pylint: disable=unused-argument
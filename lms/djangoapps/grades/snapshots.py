@@ -0,0 +1,214 @@
+"""
+Denormalized snapshots of the grades of the learners of a course, for
+reading the grades of whole pages of learners, as the gradebook, grade
+reports and the grades api do, without reading their subsection grades
+nor traversing the course structure for each of them.
+
+A learner's CourseGradeSnapshot holds their course grade and the scores of
+all of the course's subsections, packed into a vector of fixed-size slots
+in the order of the course's CourseGradeSnapshotLayout.  Each slot holds
+the subsection's earned and possible scores, over all of its problems and
+over its graded problems, and flags of whether it was attempted and
+overridden.  Snapshots are updated whenever the learner's course grade
+is, on the COURSE_GRADE_CHANGED signal, when enabled for the course by
+the grades.grade_snapshots waffle flag.
+"""
+
+
+import struct
+
+from xmodule.graders import AggregatedScore
+
+from .config.waffle import grade_snapshots_enabled
+from .course_data import CourseData
+from .course_grade import CourseGradeBase
+from .course_grade_factory import CourseGradeFactory
+from .models import CourseGradeSnapshot, CourseGradeSnapshotLayout
+from .scores import compute_percent
+from .subsection_grade import SubsectionGradeBase, ZeroSubsectionGrade
+
+# The earned and possible scores of all problems, those of graded
+# problems, and the flags below.
+_SLOT = struct.Struct('<4dB')
+_EMPTY_SLOT = (0.0, 0.0, 0.0, 0.0, 0)
+
+_ATTEMPTED = 1
+_ATTEMPTED_GRADED = 2
+_OVERRIDDEN = 4
+
+
+def update_snapshot(user, course_grade):
+    """
+    Saves the snapshot of the given course grade of the given user.
+    """
+    course_key = course_grade.course_data.course_key
+    subsection_grades = course_grade.subsection_grades
+    layout = CourseGradeSnapshotLayout.extend(course_key, list(subsection_grades))
+    CourseGradeSnapshot.objects.update_or_create(
+        user_id=user.id,
+        course_id=course_key,
+        defaults=dict(
+            percent_grade=course_grade.percent,
+            letter_grade=course_grade.letter_grade or u'',
+            passed=course_grade.passed,
+            attempted=course_grade.attempted,
+            subsection_scores=pack_subsection_scores(layout, subsection_grades),
+        ),
+    )
+
+
+def pack_subsection_scores(layout, subsection_grades):
+    """
+    Returns the scores of the given subsection grades, a dict keyed by
+    subsection usage key, packed in the slots of the given layout.
+    """
+    packed = bytearray(_SLOT.size * len(layout.slots))
+    for usage_key, subsection_grade in subsection_grades.items():
+        if isinstance(subsection_grade, ZeroSubsectionGrade):
+            # Its slot is left empty rather than traversing its problems.
+            continue
+        flags = 0
+        if subsection_grade.all_total.first_attempted is not None:
+            flags |= _ATTEMPTED
+        if subsection_grade.attempted_graded:
+            flags |= _ATTEMPTED_GRADED
+        if subsection_grade.override:
+            flags |= _OVERRIDDEN
+        _SLOT.pack_into(
+            packed,
+            _SLOT.size * layout.slot_indices[usage_key],
+            subsection_grade.all_total.earned,
+            subsection_grade.all_total.possible,
+            subsection_grade.graded_total.earned,
+            subsection_grade.graded_total.possible,
+            flags,
+        )
+    return bytes(packed)
+
+
+def iter_snapshot_grades(users, course=None, collected_block_structure=None, course_key=None, batch_size=None):
+    """
+    Given a course and an iterable of students (User), yields a
+    CourseGradeFactory.GradeResult for every student, in order, as
+    CourseGradeFactory.iter does, but with a SnapshotCourseGrade read from
+    the students' snapshots in a single query.  The grades of the students
+    with no snapshot yet are read by CourseGradeFactory.iter.
+    """
+    users = list(users)
+    course_data = CourseData(
+        user=None, course=course, collected_block_structure=collected_block_structure, course_key=course_key,
+    )
+    course_key = course_data.course_key
+    snapshots = {
+        snapshot.user_id: snapshot
+        for snapshot in CourseGradeSnapshot.objects.filter(
+            course_id=course_key,
+            user_id__in=[user.id for user in users],
+        )
+    }
+    layout = CourseGradeSnapshotLayout.read(course_key)
+
+    missing_users = [user for user in users if user.id not in snapshots or layout is None]
+    missing_results = {}
+    if missing_users:
+        missing_results = {
+            result.student.id: result
+            for result in CourseGradeFactory().iter(
+                missing_users,
+                course=course,
+                collected_block_structure=course_data.collected_structure,
+                course_key=course_key,
+                batch_size=batch_size,
+            )
+        }
+
+    for user in users:
+        if user.id in missing_results:
+            yield missing_results[user.id]
+        else:
+            # Each grade gets the course data of its own user, so that its
+            # chapter and subsection grades traverse the blocks visible to
+            # them, while sharing the course's collected structure.
+            user_course_data = CourseData(
+                user,
+                course=course,
+                collected_block_structure=course_data.collected_structure,
+                course_key=course_key,
+            )
+            yield CourseGradeFactory.GradeResult(
+                user, SnapshotCourseGrade(user, user_course_data, snapshots[user.id], layout), None,
+            )
+
+
+def iter_grades(users, course=None, collected_block_structure=None, course_key=None, batch_size=None):
+    """
+    Yields the GradeResults of the given students, from their snapshots if
+    grade snapshots are enabled for the course, or from CourseGradeFactory.
+    """
+    if course_key is None:
+        course_key = course.id
+    grades_iter = iter_snapshot_grades if grade_snapshots_enabled(course_key) else CourseGradeFactory().iter
+    return grades_iter(
+        users,
+        course=course,
+        collected_block_structure=collected_block_structure,
+        course_key=course_key,
+        batch_size=batch_size,
+    )
+
+
+class SnapshotCourseGrade(CourseGradeBase):
+    """
+    Course Grade class for grades read from a CourseGradeSnapshot.
+
+    Its subsection grades hold their scores but not their problem scores,
+    which are not stored in the snapshot.
+    """
+    def __init__(self, user, course_data, snapshot, layout):
+        super(SnapshotCourseGrade, self).__init__(
+            user, course_data, snapshot.percent_grade, snapshot.letter_grade, snapshot.passed,
+        )
+        self._attempted = snapshot.attempted
+        self._subsection_scores = snapshot.subsection_scores
+        self._layout = layout
+
+    @property
+    def attempted(self):
+        return self._attempted
+
+    def _get_subsection_grade(self, subsection, force_update_subsections=False):
+        index = self._layout.slot_indices.get(subsection.location)
+        if index is None or _SLOT.size * (index + 1) > len(self._subsection_scores):
+            # The subsection was added to the course since the snapshot was saved.
+            slot = _EMPTY_SLOT
+        else:
+            slot = _SLOT.unpack_from(self._subsection_scores, _SLOT.size * index)
+        return SnapshotSubsectionGrade(subsection, *slot)
+
+
+class SnapshotSubsectionGrade(SubsectionGradeBase):
+    """
+    Class for Subsection Grades read from a CourseGradeSnapshot.
+
+    Its totals have no first attempted date, and its override is True
+    rather than the override itself when the subsection was overridden.
+    """
+    def __init__(self, subsection, earned_all, possible_all, earned_graded, possible_graded, flags):
+        super(SnapshotSubsectionGrade, self).__init__(subsection)
+        self.all_total = AggregatedScore(earned_all, possible_all, False, None)
+        self.graded_total = AggregatedScore(earned_graded, possible_graded, True, None)
+        self._flags = flags
+        if flags & _OVERRIDDEN:
+            self.override = True
+
+    @property
+    def attempted(self):
+        return bool(self._flags & _ATTEMPTED)
+
+    @property
+    def attempted_graded(self):
+        return bool(self._flags & _ATTEMPTED_GRADED)
+
+    @property
+    def percent_graded(self):
+        return compute_percent(self.graded_total.earned, self.graded_total.possible)
@@ -29,6 +29,7 @@ from xmodule.modulestore.django import modulestore
 from .config.waffle import DISABLE_REGRADE_ON_POLICY_CHANGE, waffle
 from .constants import ScoreDatabaseTableEnum
 from .course_grade_factory import CourseGradeFactory
+from .debounce import pop_subsection_update
 from .exceptions import DatabaseNotReadyError
 from .grade_utils import are_grades_frozen
 from .signals.signals import SUBSECTION_SCORE_CHANGED
@@ -37,7 +38,7 @@ from .transformer import GradesTransformer
 
 # mcdaniel dec-2019
 # LTI Grade Sync
-from common.djangoapps.third_party_auth.lti_consumers.tasks import post_grades
+from common.djangoapps.third_party_auth.lti_consumers.tasks import enqueue_grade_post
 from common.djangoapps.third_party_auth.lti_consumers.utils import is_lti_gradesync_enabled
 
 log = getLogger(__name__)
@@ -183,7 +184,13 @@ def recalculate_subsection_grade_v3(self, **kwargs):
     """
     Latest version of the recalculate_subsection_grade task.  See docstring
     for _recalculate_subsection_grade for further description.
+
+    A task queued with `debounced=True` recalculates the grade from the
+    newest of the updates collapsed into it by the debounce module.
     """
+    if kwargs.pop('debounced', False):
+        kwargs, collapsed_events = pop_subsection_update(kwargs)
+        set_custom_metric('debounced_events', collapsed_events)
     _recalculate_subsection_grade(self, **kwargs)
 
 
@@ -316,7 +323,8 @@ def _update_subsection_grades(
     mcdaniel dec-2019:
         added a hook to common.third_party_auth.willolabls.tasks.post_grades()
         to facilitate real-time grade sync to remote systems connecting to Rover
-        via Willo Labs LTI.
+        via Willo Labs LTI. Grade posts now pass through enqueue_grade_post(),
+        which coalesces rapid successive submissions for the same assignment.
     """
     student = User.objects.get(id=user_id)
     store = modulestore()
@@ -362,17 +370,18 @@ def _update_subsection_grades(
                 if is_lti_gradesync_enabled(course_key=course_key):
                     course_id_string = course_key.html_id()
                     usage_id_string = 'block-v1:'+scored_block_usage_key._to_string()
-                    log.info('_update_subsection_grades() - calling post_grades() with: {log_dict}'.format(
+                    log.info('_update_subsection_grades() - calling enqueue_grade_post() with: {log_dict}'.format(
                         log_dict={
                             'username': student.username,
                             'course_id': course_id_string,
                             'usage_id': usage_id_string
                             }
                     ))
-                    post_grades(
+                    enqueue_grade_post(
                         username=student.username,
                         course_id=course_id_string,
-                        usage_id=usage_id_string
+                        usage_id=usage_id_string,
+                        assignment_id=six.text_type(subsection_usage_key)
                     )
 
 def _course_task_args(course_key, **kwargs):
@@ -0,0 +1,186 @@
+"""
+Tests for the batched course grading engine.
+"""
+
+
+from unittest import TestCase
+
+import ddt
+import numpy as np
+from capa.tests.response_xml_factory import MultipleChoiceResponseXMLFactory
+from lms.djangoapps.courseware.tests.factories import StudentModuleFactory
+from openedx.core.djangolib.testing.utils import get_mock_request
+from student.models import CourseEnrollment
+from student.tests.factories import UserFactory
+from xmodule.graders import AssignmentFormatGrader
+from xmodule.modulestore.tests.factories import ItemFactory
+
+from ..batch_grading import BatchGradeFactory, grade_assignment_type
+from ..config.tests.utils import persistent_grades_feature_flags
+from ..course_grade_factory import CourseGradeFactory
+from ..models import PersistentSubsectionGrade, PersistentSubsectionGradeOverride
+from .base import GradeTestBase
+from .utils import answer_problem
+
+
+@ddt.ddt
+class TestGradeAssignmentType(TestCase):
+    """
+    Tests that assignment types are graded as by AssignmentFormatGrader.
+    """
+    @ddt.data(
+        # percents, present, min_count, drop_count
+        ([0.5, 1.0, 0.25], [True, True, True], 3, 1),
+        ([0.5, 1.0, 0.25], [True, False, True], 3, 1),
+        ([0.5, 0.5, 0.5, 1.0], [True, True, True, True], 2, 2),
+        ([1.0, 0.0], [False, False], 4, 1),
+        ([0.3, 0.7], [True, True], 0, 5),
+        ([], [], 2, 0),
+    )
+    @ddt.unpack
+    def test_grade_assignment_type(self, percents, present, min_count, drop_count):
+        grader = AssignmentFormatGrader(u'Homework', min_count, drop_count)
+        present_percents = [percent for percent, is_present in zip(percents, present) if is_present]
+        breakdown = [
+            {'percent': present_percents[i] if i < len(present_percents) else 0.0}
+            for i in range(max(min_count, len(present_percents)))
+        ]
+        expected_percent, _ = grader.total_with_drops(breakdown)
+
+        actual_percents = grade_assignment_type(
+            np.array([percents], dtype=float).reshape(1, len(percents)),
+            np.array([present], dtype=bool).reshape(1, len(present)),
+            min_count,
+            drop_count,
+        )
+        self.assertEqual(actual_percents[0], expected_percent)
+
+
+@ddt.ddt
+class TestBatchGradeFactory(GradeTestBase):
+    """
+    Tests that batched course grades match those of CourseGradeFactory.
+    """
+    @ddt.data(True, False)
+    def test_compute_matches_course_grade_factory(self, answered):
+        if answered:
+            answer_problem(self.course, self.request, self.problem, score=1, max_value=2)
+
+        batch_grades = BatchGradeFactory(self.course).compute([self.request.user])
+        course_grade = CourseGradeFactory().update(self.request.user, self.course)
+
+        self.assertEqual(len(batch_grades), 1)
+        result = next(iter(batch_grades))
+        self.assertEqual(result.student, self.request.user)
+        self.assertEqual(result.percent, course_grade.percent)
+        self.assertEqual(result.letter_grade, course_grade.letter_grade)
+        self.assertEqual(result.passed, course_grade.passed)
+        self.assertEqual(result.attempted, course_grade.attempted)
+
+    def _create_learners(self, *scores):
+        """
+        Returns an enrolled learner for each of the given (problem score,
+        problem2 score) pairs, out of 2, with None for an unanswered problem.
+        """
+        learners = []
+        for problem_score, problem2_score in scores:
+            learner = UserFactory()
+            CourseEnrollment.enroll(learner, self.course.id)
+            request = get_mock_request(learner)
+            for problem, score in ((self.problem, problem_score), (self.problem2, problem2_score)):
+                if score is not None:
+                    answer_problem(self.course, request, problem, score=score, max_value=2)
+            learners.append(learner)
+        return learners
+
+    def _assert_matches_course_grade_factory(self, learners):
+        """
+        Asserts that the batched grades of the given learners match those
+        of CourseGradeFactory, learner by learner.
+        """
+        batch_grades = BatchGradeFactory(self.course).compute(learners)
+        self.assertEqual(len(batch_grades), len(learners))
+        for learner, result in zip(learners, batch_grades):
+            course_grade = CourseGradeFactory().update(learner, self.course)
+            self.assertEqual(result.student, learner)
+            self.assertEqual(
+                (result.percent, result.letter_grade, result.passed, result.attempted),
+                (course_grade.percent, course_grade.letter_grade, course_grade.passed, course_grade.attempted),
+            )
+
+    def test_several_learners(self):
+        learners = self._create_learners((2, 2), (1, None), (None, 0), (None, None))
+        self._assert_matches_course_grade_factory(learners)
+
+    def test_drop_count(self):
+        self.grading_policy['GRADER'][0].update({'min_count': 2, 'drop_count': 1})
+        self.course.set_grading_policy(self.grading_policy)
+        self.store.update_item(self.course, 0)
+
+        learners = self._create_learners((2, 0), (0, 1), (1, None))
+        self._assert_matches_course_grade_factory(learners)
+
+    def test_persisted_grades_and_overrides(self):
+        with persistent_grades_feature_flags(global_flag=True, enabled_for_all_courses=True):
+            learners = self._create_learners((1, 2), (2, 1))
+            for learner in learners:
+                CourseGradeFactory().update(learner, self.course)
+
+            # The overridden grade, and the persisted grade of a problem
+            # answered since, are read by both rather than recomputed.
+            PersistentSubsectionGradeOverride.update_or_create_override(
+                UserFactory(),
+                PersistentSubsectionGrade.objects.get(user_id=learners[0].id, usage_key=self.sequence.location),
+                earned_all_override=0.0,
+                earned_graded_override=0.0,
+            )
+            answer_problem(self.course, get_mock_request(learners[1]), self.problem2, score=2, max_value=2)
+
+            self._assert_matches_course_grade_factory(learners)
+
+
+class TestBatchGradeFactoryVisibility(GradeTestBase):
+    """
+    Tests that batched course grades match those of CourseGradeFactory for
+    content that is hidden from some of the learners.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(TestBatchGradeFactoryVisibility, cls).setUpClass()
+        with cls.store.bulk_operations(cls.course.id):
+            cls.hidden_problem = ItemFactory.create(
+                parent=cls.sequence2,
+                category='problem',
+                display_name='Hidden Problem',
+                data=MultipleChoiceResponseXMLFactory().build_xml(
+                    question_text='The correct answer is Choice 1',
+                    choices=[True, False],
+                    choice_names=['choice_0', 'choice_1'],
+                ),
+                visible_to_staff_only=True,
+            )
+
+    def test_hidden_content(self):
+        learner = UserFactory()
+        staff = UserFactory(is_staff=True)
+        for user in (learner, staff):
+            CourseEnrollment.enroll(user, self.course.id)
+            StudentModuleFactory(
+                student=user,
+                course_id=self.course.id,
+                module_state_key=self.hidden_problem.location,
+                grade=1,
+                max_grade=1,
+            )
+        answer_problem(self.course, get_mock_request(learner), self.problem, score=1, max_value=1)
+
+        batch_grades = BatchGradeFactory(self.course).compute([learner, staff])
+        for result in batch_grades:
+            course_grade = CourseGradeFactory().update(result.student, self.course)
+            self.assertEqual(
+                (result.percent, result.letter_grade, result.passed, result.attempted),
+                (course_grade.percent, course_grade.letter_grade, course_grade.passed, course_grade.attempted),
+            )
+        # Only the staff user sees, and is graded on, the hidden problem.
+        learner_grade, staff_grade = batch_grades
+        self.assertNotEqual(learner_grade.percent, staff_grade.percent)
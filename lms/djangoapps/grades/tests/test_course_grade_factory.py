@@ -7,6 +7,8 @@ import itertools
 
 import ddt
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from mock import patch
 from six import text_type
 
@@ -20,6 +22,7 @@ from xmodule.modulestore.tests.factories import CourseFactory
 from ..config.waffle import ASSUME_ZERO_GRADE_IF_ABSENT, waffle
 from ..course_grade import CourseGrade, ZeroCourseGrade
 from ..course_grade_factory import CourseGradeFactory
+from ..prefetch import prefetch_grade_data
 from ..subsection_grade import ReadSubsectionGrade, ZeroSubsectionGrade
 from .base import GradeTestBase
 from .utils import mock_get_score
@@ -297,6 +300,29 @@ class TestGradeIteration(SharedModuleStoreTestCase):
             self.assertIsNone(course_grade.letter_grade)
             self.assertEqual(course_grade.percent, 0.0)
 
+    def test_batch_size(self):
+        """
+        Student data is prefetched per batch of students, and the grades
+        are the same as without batches.
+        """
+        expected_course_grades, _ = self._course_grades_and_errors_for(self.course, self.students)
+        with patch(
+            'lms.djangoapps.grades.course_grade_factory.prefetch_grade_data',
+            wraps=prefetch_grade_data,
+        ) as mock_prefetch_grade_data:
+            grade_results = list(CourseGradeFactory().iter(self.students, self.course, batch_size=2))
+        self.assertEqual(mock_prefetch_grade_data.call_count, 3)
+        self.assertEqual([result.student for result in grade_results], self.students)
+        for student, course_grade, error in grade_results:
+            self.assertIsNone(error)
+            self.assertEqual(course_grade.percent, expected_course_grades[student].percent)
+
+        # The number of queries depends on the number of batches, not of students.
+        with CaptureQueriesContext(connection) as queries:
+            list(CourseGradeFactory().iter(self.students[:1], self.course, batch_size=len(self.students)))
+        with self.assertNumQueries(len(queries)):
+            list(CourseGradeFactory().iter(self.students, self.course, batch_size=len(self.students)))
+
     @patch('lms.djangoapps.grades.course_grade_factory.CourseGradeFactory.read')
     def test_grading_exception(self, mock_course_grade):
         """Test that we correctly capture exception messages that bubble up from
@@ -0,0 +1,61 @@
+"""
+Tests for grade snapshots.
+"""
+
+
+from openedx.core.djangoapps.waffle_utils.testutils import override_waffle_flag
+from student.models import CourseEnrollment
+from student.tests.factories import UserFactory
+
+from ..config.waffle import GRADE_SNAPSHOTS, waffle_flags
+from ..course_grade_factory import CourseGradeFactory
+from ..models import CourseGradeSnapshot, CourseGradeSnapshotLayout
+from ..snapshots import SnapshotCourseGrade, iter_snapshot_grades
+from .base import GradeTestBase
+from .utils import answer_problem
+
+
+@override_waffle_flag(waffle_flags()[GRADE_SNAPSHOTS], active=True)
+class TestGradeSnapshots(GradeTestBase):
+    """
+    Tests that the grades read from snapshots match those of
+    CourseGradeFactory.
+    """
+    def test_snapshot_matches_course_grade(self):
+        answer_problem(self.course, self.request, self.problem, score=1, max_value=2)
+        course_grade = CourseGradeFactory().update(self.request.user, self.course)
+
+        self.assertTrue(
+            CourseGradeSnapshot.objects.filter(user_id=self.request.user.id, course_id=self.course.id).exists()
+        )
+        layout = CourseGradeSnapshotLayout.read(self.course.id)
+        self.assertEqual(set(layout.slots), set(course_grade.subsection_grades))
+
+        [(student, snapshot_grade, error)] = list(iter_snapshot_grades([self.request.user], course=self.course))
+        self.assertEqual(student, self.request.user)
+        self.assertIsNone(error)
+        self.assertIsInstance(snapshot_grade, SnapshotCourseGrade)
+        self.assertEqual(snapshot_grade.course_data.user, self.request.user)
+        self.assertEqual(set(snapshot_grade.subsection_grades), set(course_grade.subsection_grades))
+        self.assertEqual(set(snapshot_grade.chapter_grades), set(course_grade.chapter_grades))
+        self.assertEqual(snapshot_grade.percent, course_grade.percent)
+        self.assertEqual(snapshot_grade.letter_grade, course_grade.letter_grade)
+        self.assertEqual(snapshot_grade.passed, course_grade.passed)
+        self.assertEqual(snapshot_grade.attempted, course_grade.attempted)
+        for location in (self.sequence.location, self.sequence2.location):
+            expected = course_grade.subsection_grade(location)
+            actual = snapshot_grade.subsection_grade(location)
+            self.assertEqual(actual.graded_total.earned, expected.graded_total.earned)
+            self.assertEqual(actual.graded_total.possible, expected.graded_total.possible)
+            self.assertEqual(actual.attempted_graded, expected.attempted_graded)
+            self.assertEqual(actual.percent_graded, expected.percent_graded)
+
+    def test_learner_without_snapshot(self):
+        CourseGradeFactory().update(self.request.user, self.course)
+        other_user = UserFactory()
+        CourseEnrollment.enroll(other_user, self.course.id)
+
+        results = list(iter_snapshot_grades([other_user, self.request.user], course=self.course))
+        self.assertEqual([result.student for result in results], [other_user, self.request.user])
+        self.assertNotIsInstance(results[0].course_grade, SnapshotCourseGrade)
+        self.assertIsInstance(results[1].course_grade, SnapshotCourseGrade)
@@ -12,14 +12,20 @@ import ddt
 import pytz
 import six
 from django.conf import settings
+from django.core.cache import cache
 from django.db.utils import IntegrityError
 from django.utils import timezone
 from mock import MagicMock, patch
 from six.moves import range
 
-from lms.djangoapps.grades import tasks
+from lms.djangoapps.grades import debounce, tasks
 from lms.djangoapps.grades.config.models import PersistentGradesEnabledFlag
-from lms.djangoapps.grades.config.waffle import ENFORCE_FREEZE_GRADE_AFTER_COURSE_END, waffle_flags
+from lms.djangoapps.grades.config.waffle import (
+    DEBOUNCE_SUBSECTION_GRADE_UPDATES,
+    ENFORCE_FREEZE_GRADE_AFTER_COURSE_END,
+    waffle,
+    waffle_flags
+)
 from lms.djangoapps.grades.constants import ScoreDatabaseTableEnum
 from lms.djangoapps.grades.models import PersistentCourseGrade, PersistentSubsectionGrade
 from lms.djangoapps.grades.services import GradesService
@@ -144,6 +150,43 @@ class RecalculateSubsectionGradeTest(HasCourseWithProblemsMixin, ModuleStoreTest
             PROBLEM_WEIGHTED_SCORE_CHANGED.send(sender=None, **send_args)
             mock_task_apply.assert_called_once_with(countdown=RECALCULATE_GRADE_DELAY_SECONDS, kwargs=local_task_args)
 
+    def test_debounced_problem_weighted_score_changes(self):
+        """
+        Ensures that successive PROBLEM_WEIGHTED_SCORE_CHANGED signals for the
+        same problem enqueue a single task, which runs with the newest of them.
+        """
+        self.set_up_course()
+        debounce.reset_stats()
+        send_args = self.problem_weighted_score_changed_kwargs
+        modified_times = [send_args['modified'] + timedelta(seconds=index) for index in range(3)]
+        with waffle().override(DEBOUNCE_SUBSECTION_GRADE_UPDATES, active=True), patch(
+            'lms.djangoapps.grades.tasks.recalculate_subsection_grade_v3.apply_async',
+            return_value=None
+        ) as mock_task_apply:
+            for modified in modified_times:
+                PROBLEM_WEIGHTED_SCORE_CHANGED.send(sender=None, **dict(send_args, modified=modified))
+
+        self.assertEqual(mock_task_apply.call_count, 1)
+        task_kwargs = mock_task_apply.call_args[1]['kwargs']
+        self.assertTrue(task_kwargs['debounced'])
+        self.assertEqual(task_kwargs['expected_modified_time'], to_timestamp(modified_times[0]))
+
+        with patch('lms.djangoapps.grades.tasks._recalculate_subsection_grade') as mock_recalculate:
+            recalculate_subsection_grade_v3.apply(kwargs=task_kwargs)
+        self.assertEqual(
+            mock_recalculate.call_args[1]['expected_modified_time'], to_timestamp(modified_times[-1]),
+        )
+        self.assertNotIn('debounced', mock_recalculate.call_args[1])
+        self.assertEqual(debounce.get_stats(), {u'collapsed': 2, u'executed': 1})
+
+        # The arguments of the collapsed updates are deleted once read.
+        sequence_key, _ = debounce._cache_keys(task_kwargs)  # pylint: disable=protected-access
+        arguments_keys = [
+            debounce._arguments_key(sequence_key, number)  # pylint: disable=protected-access
+            for number in range(1, cache.get(sequence_key) + 1)
+        ]
+        self.assertEqual(cache.get_many(arguments_keys), {})
+
     @patch('lms.djangoapps.grades.signals.signals.SUBSECTION_SCORE_CHANGED.send')
     def test_triggers_subsection_score_signal(self, mock_subsection_signal):
         """
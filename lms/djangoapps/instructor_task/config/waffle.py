@@ -13,6 +13,7 @@ WAFFLE_SWITCHES = WaffleSwitchNamespace(name=WAFFLE_NAMESPACE)
 # Waffle switches
 OPTIMIZE_GET_LEARNERS_FOR_COURSE = u'optimize_get_learners_for_course'
 GENERATE_GRADE_REPORT_VERIFIED_ONLY = u'generate_grade_report_for_verified_only'
+SHARDED_GRADE_REPORTS = u'sharded_grade_reports'
 
 
 def waffle_flags():
@@ -35,3 +36,11 @@ def generate_grade_report_for_verified_only():
     verified learners.
     """
     return WAFFLE_SWITCHES.is_enabled(GENERATE_GRADE_REPORT_VERIFIED_ONLY)
+
+
+def sharded_grade_reports_enabled():
+    """
+    Returns True if waffle switch is enabled that indicates grade reports are
+    generated in shards of learners, graded in parallel by subtasks.
+    """
+    return WAFFLE_SWITCHES.is_enabled(SHARDED_GRADE_REPORTS)
@@ -16,3 +16,12 @@ class UpdateProblemModuleStateError(Exception):
 class DuplicateTaskException(Exception):
     """Exception indicating that a task already exists or has already completed."""
     pass
+
+
+class GradeReportShardMissingError(Exception):
+    """
+    Error signaling that a partial file of a sharded grade report is
+    missing, typically because its shard failed, so the merged report
+    would be incomplete.
+    """
+    pass
@@ -0,0 +1,120 @@
+"""
+Command to measure the peak memory used to upload a large grade report.
+"""
+
+
+import multiprocessing
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+import psutil
+from django.core.management.base import BaseCommand
+from opaque_keys.edx.locator import CourseLocator
+from six.moves import range
+
+from lms.djangoapps.instructor_task.models import DjangoStorageReportStore
+
+BENCHMARK_COURSE_KEY = CourseLocator('org', 'benchmark', 'report_upload')
+REPORT_FILENAME = u'problem_grade_report.csv'
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_report_upload --settings=devstack
+        $ ./manage.py lms benchmark_report_upload --learners 100000 --problems 300 --settings=devstack
+
+    Uploads the problem grade report of a synthetic course, with the earned
+    and possible scores of every problem for each learner, to a temporary
+    local report store: once from a list of all of its rows, and once from
+    a generator of its rows, as the grade reports now upload them.  Each
+    upload runs in a process of its own, whose peak RSS above its RSS
+    before the upload is reported.
+    """
+    help = u'Benchmarks the peak memory used to upload a large problem grade report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--learners',
+            help=u'Number of learners in the synthetic course.',
+            type=int,
+            default=20000,
+        )
+        parser.add_argument(
+            '--problems',
+            help=u'Number of problems in the synthetic course.',
+            type=int,
+            default=100,
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(u'synthetic, {} learners, {} problems'.format(options['learners'], options['problems']))
+        self.stdout.write(u'  {:<20}{:>16}{:>14}{:>16}'.format(u'', u'peak RSS', u'time', u'report size'))
+        for label, streaming in ((u'list of rows', False), (u'generator of rows', True)):
+            # A fresh process per upload, so that each has a peak RSS of its own.
+            pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+            try:
+                peak_rss, duration, size = pool.apply(
+                    benchmark_upload, (options['learners'], options['problems'], streaming),
+                )
+            finally:
+                pool.close()
+                pool.join()
+            self.stdout.write(u'  {:<20}{:>16}{:>14}{:>16}'.format(
+                label,
+                u'{:.1f} MB'.format(peak_rss / 1024.0 / 1024.0),
+                u'{:.2f} s'.format(duration),
+                u'{:.1f} MB'.format(size / 1024.0 / 1024.0),
+            ))
+
+
+def benchmark_upload(num_learners, num_problems, streaming):
+    """
+    Uploads the synthetic report to a temporary local report store, and
+    returns the increase of the peak RSS of the current process, in bytes,
+    the time it took, in seconds, and the size of the report, in bytes.
+    """
+    location = tempfile.mkdtemp()
+    try:
+        report_store = DjangoStorageReportStore(
+            storage_class='django.core.files.storage.FileSystemStorage',
+            storage_kwargs={'location': location},
+        )
+        baseline_rss = psutil.Process().memory_info().rss
+        started = time.time()
+        rows = generate_report_rows(num_learners, num_problems)
+        if not streaming:
+            rows = list(rows)
+        report_store.store_rows(BENCHMARK_COURSE_KEY, REPORT_FILENAME, rows)
+        duration = time.time() - started
+        size = report_store.storage.size(report_store.path_to(BENCHMARK_COURSE_KEY, REPORT_FILENAME))
+    finally:
+        shutil.rmtree(location)
+    # ru_maxrss is in kilobytes on Linux.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return peak_rss - baseline_rss, duration, size
+
+
+def generate_report_rows(num_learners, num_problems):
+    """
+    A generator of the rows of a problem grade report for the given numbers
+    of learners and problems, headers first.
+    """
+    yield (
+        [u'Student ID', u'Email', u'Username', u'Enrollment Status', u'Grade'] +
+        [
+            u'Problem {} - Problem {} ({})'.format(index, index, score_type)
+            for index in range(num_problems)
+            for score_type in (u'Earned', u'Possible')
+        ]
+    )
+    for user_id in range(1, num_learners + 1):
+        scores = []
+        for _ in range(num_problems):
+            scores.extend([random.choice([0.0, 0.5, 1.0, u'Not Attempted']), 1.0])
+        yield [
+            user_id, u'learner{}@example.com'.format(user_id), u'learner{}'.format(user_id), u'ENROLLED', 0.5,
+        ] + scores
@@ -16,17 +16,19 @@ ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 import codecs
 import csv
+import gzip
 import hashlib
 import json
 import logging
 import os.path
+import tempfile
 from uuid import uuid4
 
 import six
 from boto.exception import BotoServerError
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.db import models, transaction
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext as _
@@ -196,9 +198,7 @@ class InstructorTask(models.Model):
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download.
     """
     @classmethod
     def from_config(cls, config_name):
@@ -247,6 +247,10 @@ class DjangoStorageReportStore(ReportStore):
     """
     ReportStore implementation that delegates to django's storage api.
     """
+    # Size, in bytes, above which the CSV written by `store_rows` is spooled
+    # to a temporary file on disk rather than kept in memory.
+    MAX_IN_MEMORY_SIZE = 8 * 1024 * 1024
+
     def __init__(self, storage_class=None, storage_kwargs=None):
         if storage_kwargs is None:
             storage_kwargs = {}
@@ -276,12 +280,13 @@ class DjangoStorageReportStore(ReportStore):
         """
         Store the contents of `buff` in a directory determined by hashing
         `course_id`, and name the file `filename`. `buff` can be any file-like
-        object, ready to be read from the beginning.
+        object, ready to be read from the beginning.  A django `File` of
+        bytes, such as the one written by `store_rows`, is saved as is.
         """
         path = self.path_to(course_id, filename)
         # See https://github.com/boto/boto/issues/2868
         # Boto doesn't play nice with unicod in python3
-        if not six.PY2:
+        if not six.PY2 and not isinstance(buff, File):
             buff = ContentFile(buff.read().encode('utf-8'))
 
         self.storage.save(path, buff)
@@ -290,15 +295,51 @@ class DjangoStorageReportStore(ReportStore):
         """
         Given a course_id, filename, and rows (each row is an iterable of
         strings), write the rows to the storage backend in csv format.
+
+        `rows` may be any iterable, such as a generator.  The rows are
+        written one at a time to a temporary file, which is kept in memory
+        up to MAX_IN_MEMORY_SIZE bytes and spooled to disk beyond, and which
+        the storage backend then reads in chunks.  So neither the rows nor
+        the CSV need to fit in memory.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=self.MAX_IN_MEMORY_SIZE) as output_file:
+            if six.PY2:
+                # Adding unicode signature (BOM) for MS Excel 2013 compatibility
+                output_file.write(codecs.BOM_UTF8)
+                csvwriter = csv.writer(output_file)
+            else:
+                csvwriter = csv.writer(codecs.getwriter('utf-8')(output_file))
+            csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+            output_file.seek(0)
+            self.store(course_id, filename, File(output_file, name=filename))
+
+    def read_rows(self, course_id, filename):
+        """
+        Given a course_id and filename, return the rows of the csv file
+        stored by `store_rows`, as lists of strings, or None if there is
+        no such file.
+        """
+        if not self.exists(course_id, filename):
+            return None
+        with self.storage.open(self.path_to(course_id, filename)) as csv_file:
+            content = csv_file.read()
+        if content[:2] == b'\x1f\x8b':
+            # Stored gzipped, as by S3 storage with gzip enabled.
+            content = gzip.decompress(content)
+        return list(csv.reader(six.StringIO(content.decode('utf-8-sig'))))
+
+    def exists(self, course_id, filename):
+        """
+        Return whether a file with the given filename is stored for the
+        given course.
+        """
+        return self.storage.exists(self.path_to(course_id, filename))
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file with the given filename for the given course.
         """
-        output_buffer = ContentFile('')
-        # Adding unicode signature (BOM) for MS Excel 2013 compatibility
-        if six.PY2:
-            output_buffer.write(codecs.BOM_UTF8)
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        output_buffer.seek(0)
-        self.store(course_id, filename, output_buffer)
+        self.storage.delete(self.path_to(course_id, filename))
 
     def links_for(self, course_id):
         """
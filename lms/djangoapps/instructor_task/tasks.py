@@ -37,7 +37,13 @@ from lms.djangoapps.instructor_task.tasks_helper.enrollments import (
     upload_may_enroll_csv,
     upload_students_csv
 )
-from lms.djangoapps.instructor_task.tasks_helper.grades import CourseGradeReport, ProblemGradeReport, ProblemResponses
+from lms.djangoapps.instructor_task.tasks_helper.grades import (
+    CourseGradeReport,
+    ProblemGradeReport,
+    ProblemResponses,
+    grade_report_shard,
+    merge_grade_report_shards as merge_grade_report_shard_files
+)
 from lms.djangoapps.instructor_task.tasks_helper.misc import (
     cohort_students_and_upload,
     upload_course_survey_report,
@@ -206,6 +212,33 @@ def calculate_problem_grade_report(entry_id, xmodule_instance_args):
     return run_main_task(entry_id, task_fn, action_name)
 
 
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def compute_grade_report_shard(
+        entry_id, report_name, action_name, shard_index, num_shards, user_ids, merge_subtask_id, subtask_status_dict,
+):
+    """
+    Grades a shard of the learners of a grade report generated in shards,
+    and stores their rows for merge_grade_report_shards.
+
+    `report_name` is the name of the grade report's class, and `user_ids`
+    the ids of the shard's learners.  The merge_grade_report_shards
+    subtask with the id `merge_subtask_id` is queued once every shard is
+    graded.
+    """
+    return grade_report_shard(
+        entry_id, report_name, action_name, shard_index, num_shards, user_ids, merge_subtask_id, subtask_status_dict,
+    )
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def merge_grade_report_shards(entry_id, report_name, action_name, num_shards, subtask_status_dict):
+    """
+    Merges the rows of the graded shards of a grade report, in order, and
+    pushes the resulting CSVs to the report store for download.
+    """
+    return merge_grade_report_shard_files(entry_id, report_name, action_name, num_shards, subtask_status_dict)
+
+
 @task(base=BaseInstructorTask)
 def calculate_students_features_csv(entry_id, xmodule_instance_args):
     """
@@ -2,21 +2,24 @@
 Functionality for generating grade reports.
 """
 
+import json
 import logging
 import re
 from collections import OrderedDict, defaultdict
 from datetime import datetime
 from itertools import chain
 from time import time
+from uuid import uuid4
 
 import six
+from celery.states import FAILURE, SUCCESS
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from lazy import lazy
 from opaque_keys.edx.keys import UsageKey
 from pytz import UTC
 from six import text_type
-from six.moves import zip, zip_longest
+from six.moves import range, zip, zip_longest
 
 from course_blocks.api import get_course_blocks
 from course_modes.models import CourseMode
@@ -25,12 +28,21 @@ from lms.djangoapps.courseware.courses import get_course_by_id
 from lms.djangoapps.courseware.user_state_client import DjangoXBlockUserStateClient
 from lms.djangoapps.grades.api import CourseGradeFactory
 from lms.djangoapps.grades.api import context as grades_context
-from lms.djangoapps.grades.api import prefetch_course_and_subsection_grades
+from lms.djangoapps.grades.api import snapshots as grades_snapshots
 from lms.djangoapps.instructor_analytics.basic import list_problem_responses
 from lms.djangoapps.instructor_analytics.csvs import format_dictlist
 from lms.djangoapps.instructor_task.config.waffle import (
     generate_grade_report_for_verified_only,
-    optimize_get_learners_switch_enabled
+    optimize_get_learners_switch_enabled,
+    sharded_grade_reports_enabled
+)
+from lms.djangoapps.instructor_task.exceptions import GradeReportShardMissingError
+from lms.djangoapps.instructor_task.models import InstructorTask, ReportStore
+from lms.djangoapps.instructor_task.subtasks import (
+    SubtaskStatus,
+    check_subtask_is_valid,
+    initialize_subtask_info,
+    update_subtask_status
 )
 from lms.djangoapps.teams.models import CourseTeamMembership
 from lms.djangoapps.verify_student.services import IDVerificationService
@@ -40,6 +52,7 @@ from openedx.core.djangoapps.course_groups.cohorts import bulk_cache_cohorts, ge
 from openedx.core.djangoapps.user_api.course_tag.api import BulkCourseTags
 from student.models import CourseEnrollment
 from student.roles import BulkRoleCache
+from util.db import outer_atomic
 from xmodule.modulestore.django import modulestore
 from xmodule.partitions.partitions_service import PartitionService
 from xmodule.split_test_module import get_split_user_partitions
@@ -73,6 +86,8 @@ class GradeReportBase(object):
     """
     Base class for grade reports (ProblemGradeReport and CourseGradeReport).
     """
+    # Batch size for chunking the list of enrollees in the course.
+    USER_BATCH_SIZE = 100
 
     def _get_enrolled_learner_count(self, context):
         """
@@ -124,7 +139,7 @@ class GradeReportBase(object):
         """
         Returns a generator of batches of users.
         """
-        def grouper(iterable, chunk_size=100, fillvalue=None):
+        def grouper(iterable, chunk_size=self.USER_BATCH_SIZE, fillvalue=None):
             args = [iter(iterable)] * chunk_size
             return zip_longest(*args, fillvalue=fillvalue)
 
@@ -163,26 +178,31 @@ class GradeReportBase(object):
         course_id = context.course_id
         return get_enrolled_learners_for_course(course_id=course_id, verified_only=context.report_for_verified_only)
 
-    def _compile(self, context, batched_rows):
+    def _compile(self, context, batched_rows, error_rows):
         """
-        Compiles and returns the complete list of (success_rows, error_rows) for
-        the given batched_rows and context.
+        Returns a generator of the success rows of the given batched_rows,
+        which appends their error rows to the given error_rows list and
+        updates the metrics on task status as it is consumed.  So the
+        success rows can be uploaded as they are generated, rather than all
+        held in memory.
         """
-        # partition and chain successes and errors
-        success_rows, error_rows = zip(*batched_rows)
-        success_rows = list(chain(*success_rows))
-        error_rows = list(chain(*error_rows))
+        for batch_success_rows, batch_error_rows in batched_rows:
+            error_rows.extend(batch_error_rows)
 
-        # update metrics on task status
-        context.task_progress.succeeded = len(success_rows)
-        context.task_progress.failed = len(error_rows)
-        context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
-        context.task_progress.total = context.task_progress.attempted
-        return success_rows, error_rows
+            # update metrics on task status
+            context.task_progress.succeeded += len(batch_success_rows)
+            context.task_progress.failed += len(batch_error_rows)
+            context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
+            context.task_progress.total = context.task_progress.attempted
+
+            for row in batch_success_rows:
+                yield row
 
     def _upload(self, context, success_rows, error_rows):
         """
-        Creates and uploads a CSV for the given headers and rows.
+        Creates and uploads a CSV for the given headers and rows.  The error
+        rows are uploaded once the success rows, which may be generated
+        while they are uploaded, are consumed.
         """
         date = datetime.now(UTC)
         upload_csv_to_report_store(success_rows, context.file_name, context.course_id, date)
@@ -394,17 +414,178 @@ class _CourseGradeBulkContext(object):
         self.enrollments = _EnrollmentBulkContext(context, users)
         bulk_cache_cohorts(context.course_id, users)
         BulkRoleCache.prefetch(users)
-        prefetch_course_and_subsection_grades(context.course_id, users)
         BulkCourseTags.prefetch(context.course_id, users)
 
 
-class CourseGradeReport(object):
+class _ShardedGradeReportMixin(object):
+    """
+    Generates a grade report in shards of learners, when the
+    instructor_task.sharded_grade_reports waffle switch is enabled.
+
+    Each shard is graded by a subtask, in parallel, which stores its rows in
+    partial CSV files.  Once all shards are graded, a final subtask merges
+    the partial files, in order, into the report's CSV files.
+
+    Subclasses define CONTEXT_CLASS, USER_BATCH_SIZE, _rows_for_users and
+    _upload_rows.
+    """
+    # Directory, within the course's report store directory, of the partial files.
+    SHARDS_DIRECTORY = u'grade_report_shards'
+
+    @classmethod
+    def _create_context(cls, entry, action_name):
+        """
+        Returns the context of the report of the given InstructorTask, for a subtask.
+        """
+        return cls.CONTEXT_CLASS(
+            {'task_id': entry.task_id}, entry.id, entry.course_id, json.loads(entry.task_input), action_name,
+        )
+
+    def _generate_sharded(self, context, entry_id):
+        """
+        Queues the subtasks grading the report's shards of learners.  The
+        report is generated directly if it has a single shard.
+        """
+        user_ids = list(self._learner_ids(context))
+        users_per_shard = settings.GRADES_DOWNLOAD_USERS_PER_SHARD
+        if len(user_ids) <= users_per_shard:
+            return self._generate(context)
+
+        shards = [user_ids[start:start + users_per_shard] for start in range(0, len(user_ids), users_per_shard)]
+        shard_subtask_ids = [str(uuid4()) for _ in shards]
+        merge_subtask_id = str(uuid4())
+
+        # Make sure the subtasks are known before handing them off to celery.
+        entry = InstructorTask.objects.get(pk=entry_id)
+        with outer_atomic():
+            progress = initialize_subtask_info(
+                entry, context.action_name, len(user_ids), shard_subtask_ids + [merge_subtask_id],
+            )
+
+        # Imported here, as the tasks module imports this one.
+        from lms.djangoapps.instructor_task.tasks import compute_grade_report_shard
+        context.update_status(u'Queueing {} grade report shards'.format(len(shards)))
+        for shard_index, (subtask_id, shard_user_ids) in enumerate(zip(shard_subtask_ids, shards)):
+            compute_grade_report_shard.subtask(
+                (
+                    entry_id,
+                    type(self).__name__,
+                    context.action_name,
+                    shard_index,
+                    len(shards),
+                    shard_user_ids,
+                    merge_subtask_id,
+                    SubtaskStatus.create(subtask_id).to_dict(),
+                ),
+                task_id=subtask_id,
+            ).apply_async()
+        return progress
+
+    def _learner_ids(self, context):
+        """
+        Returns the ids of the learners of the report, in order.
+        """
+        filter_kwargs = {
+            'courseenrollment__course_id': context.course_id,
+        }
+        if generate_grade_report_for_verified_only():
+            filter_kwargs['courseenrollment__mode'] = CourseMode.VERIFIED
+        return get_user_model().objects.filter(**filter_kwargs).values_list('id', flat=True).order_by('id')
+
+    def _grade_shard(self, context, entry_id, shard_index, user_ids):
+        """
+        Grades the given learners, in batches, and stores their rows in the
+        shard's partial files.  Returns the numbers of learners that
+        succeeded and failed.
+        """
+        success_rows, error_rows = [], []
+        for start in range(0, len(user_ids), self.USER_BATCH_SIZE):
+            users = list(
+                get_user_model().objects.filter(
+                    id__in=user_ids[start:start + self.USER_BATCH_SIZE],
+                ).select_related('profile').order_by('id')
+            )
+            batch_success_rows, batch_error_rows = self._rows_for_users(context, users)
+            success_rows.extend(batch_success_rows)
+            error_rows.extend(batch_error_rows)
+            # Clear the CourseEnrollment caches after each batch of users has been processed
+            get_cache('get_enrollment').clear()
+            get_cache(CourseEnrollment.MODE_CACHE_NAMESPACE).clear()
+
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        report_store.store_rows(context.course_id, self._shard_filename(entry_id, shard_index), success_rows)
+        report_store.store_rows(context.course_id, self._shard_filename(entry_id, shard_index, u'_err'), error_rows)
+        return len(success_rows), len(error_rows)
+
+    def _merge_shards(self, context, entry_id, num_shards):
+        """
+        Merges the partial files of the report's shards, in order, into the
+        report's CSV files, and deletes them.  The success rows are read a
+        shard at a time, as they are uploaded.
+
+        Raises GradeReportShardMissingError, without uploading anything, if
+        a partial file is missing, rather than uploading an incomplete report.
+        """
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        missing_filenames = [
+            self._shard_filename(entry_id, shard_index, suffix)
+            for shard_index in range(num_shards)
+            for suffix in (u'', u'_err')
+            if not report_store.exists(context.course_id, self._shard_filename(entry_id, shard_index, suffix))
+        ]
+        if missing_filenames:
+            TASK_LOG.error(
+                u'%s, Task type: %s, Missing grade report shards %s',
+                context.task_info_string, context.action_name, u', '.join(missing_filenames),
+            )
+            raise GradeReportShardMissingError(
+                u'Missing grade report shards: {}'.format(u', '.join(missing_filenames))
+            )
+
+        error_rows = list(self._read_shards(context, report_store, entry_id, num_shards, u'_err'))
+        success_rows = self._read_shards(context, report_store, entry_id, num_shards)
+
+        context.update_status(u'Uploading grades')
+        self._upload_rows(context, success_rows, error_rows)
+
+        for shard_index in range(num_shards):
+            for suffix in (u'', u'_err'):
+                report_store.delete(context.course_id, self._shard_filename(entry_id, shard_index, suffix))
+
+    def _read_shards(self, context, report_store, entry_id, num_shards, suffix=u''):
+        """
+        A generator of the rows of the given partial files of the report's
+        shards, in order.
+        """
+        for shard_index in range(num_shards):
+            filename = self._shard_filename(entry_id, shard_index, suffix)
+            shard_rows = report_store.read_rows(context.course_id, filename)
+            if shard_rows is None:
+                raise GradeReportShardMissingError(u'Missing grade report shard: {}'.format(filename))
+            for row in shard_rows:
+                yield row
+
+    def _shard_filename(self, entry_id, shard_index, suffix=u''):
+        """
+        Returns the name of a partial file of the given shard.
+        """
+        return u'{directory}/{entry_id}/{shard_index}{suffix}.csv'.format(
+            directory=self.SHARDS_DIRECTORY,
+            entry_id=entry_id,
+            shard_index=shard_index,
+            suffix=suffix,
+        )
+
+
+class CourseGradeReport(_ShardedGradeReportMixin):
     """
     Class to encapsulate functionality related to generating Grade Reports.
     """
     # Batch size for chunking the list of enrollees in the course.
     USER_BATCH_SIZE = 100
 
+    CONTEXT_CLASS = _CourseGradeReportContext
+
     @classmethod
     def generate(cls, _xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
         """
@@ -412,6 +593,8 @@ class CourseGradeReport(object):
         """
         with modulestore().bulk_operations(course_id):
             context = _CourseGradeReportContext(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name)
+            if sharded_grade_reports_enabled():
+                return CourseGradeReport()._generate_sharded(context, _entry_id)
             return CourseGradeReport()._generate(context)
 
     def _generate(self, context):
@@ -423,10 +606,9 @@ class CourseGradeReport(object):
         error_headers = self._error_headers()
         batched_rows = self._batched_rows(context)
 
-        context.update_status(u'Compiling grades')
-        success_rows, error_rows = self._compile(context, batched_rows)
-
-        context.update_status(u'Uploading grades')
+        context.update_status(u'Compiling and uploading grades')
+        error_rows = []
+        success_rows = self._compile(context, batched_rows, error_rows)
         self._upload(context, success_headers, success_rows, error_headers, error_rows)
 
         return context.update_status(u'Completed grades')
@@ -460,33 +642,44 @@ class CourseGradeReport(object):
             users = [u for u in users if u is not None]
             yield self._rows_for_users(context, users)
 
-    def _compile(self, context, batched_rows):
+    def _compile(self, context, batched_rows, error_rows):
         """
-        Compiles and returns the complete list of (success_rows, error_rows) for
-        the given batched_rows and context.
+        Returns a generator of the success rows of the given batched_rows,
+        which appends their error rows to the given error_rows list and
+        updates the metrics on task status as it is consumed.  So the
+        success rows can be uploaded as they are generated, rather than all
+        held in memory.
         """
-        # partition and chain successes and errors
-        success_rows, error_rows = zip(*batched_rows)
-        success_rows = list(chain(*success_rows))
-        error_rows = list(chain(*error_rows))
+        for batch_success_rows, batch_error_rows in batched_rows:
+            error_rows.extend(batch_error_rows)
 
-        # update metrics on task status
-        context.task_progress.succeeded = len(success_rows)
-        context.task_progress.failed = len(error_rows)
-        context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
-        context.task_progress.total = context.task_progress.attempted
-        return success_rows, error_rows
+            # update metrics on task status
+            context.task_progress.succeeded += len(batch_success_rows)
+            context.task_progress.failed += len(batch_error_rows)
+            context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
+            context.task_progress.total = context.task_progress.attempted
+
+            for row in batch_success_rows:
+                yield row
 
     def _upload(self, context, success_headers, success_rows, error_headers, error_rows):
         """
-        Creates and uploads a CSV for the given headers and rows.
+        Creates and uploads a CSV for the given headers and rows.  The error
+        rows are uploaded once the success rows, which may be generated
+        while they are uploaded, are consumed.
         """
         date = datetime.now(UTC)
-        upload_csv_to_report_store([success_headers] + success_rows, 'grade_report', context.course_id, date)
+        upload_csv_to_report_store(chain([success_headers], success_rows), 'grade_report', context.course_id, date)
         if len(error_rows) > 0:
             error_rows = [error_headers] + error_rows
             upload_csv_to_report_store(error_rows, 'grade_report_err', context.course_id, date)
 
+    def _upload_rows(self, context, success_rows, error_rows):
+        """
+        Creates and uploads a CSV for the given rows, with this report's headers.
+        """
+        self._upload(context, self._success_headers(context), success_rows, self._error_headers(), error_rows)
+
     def _grades_header(self, context):
         """
         Returns the applicable grades-related headers for this report.
@@ -687,11 +880,14 @@ class CourseGradeReport(object):
             bulk_context = _CourseGradeBulkContext(context, users)
 
             success_rows, error_rows = [], []
-            for user, course_grade, error in CourseGradeFactory().iter(
+            # No problem scores are read from the course grades, so they
+            # may come from the learners' grade snapshots.
+            for user, course_grade, error in grades_snapshots.iter_grades(
                 users,
                 course=context.course,
                 collected_block_structure=context.course_structure,
                 course_key=context.course_id,
+                batch_size=self.USER_BATCH_SIZE,
             ):
                 if not course_grade:
                     # An empty gradeset means we failed to grade a student.
@@ -711,10 +907,11 @@ class CourseGradeReport(object):
             return success_rows, error_rows
 
 
-class ProblemGradeReport(GradeReportBase):
+class ProblemGradeReport(_ShardedGradeReportMixin, GradeReportBase):
     """
     Class to encapsulate functionality related to generating Problem Grade Reports.
     """
+    CONTEXT_CLASS = _ProblemGradeReportContext
 
     @classmethod
     def generate(cls, _xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
@@ -724,6 +921,8 @@ class ProblemGradeReport(GradeReportBase):
         with modulestore().bulk_operations(course_id):
             context = _ProblemGradeReportContext(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name)
             # pylint: disable=protected-access
+            if sharded_grade_reports_enabled():
+                return ProblemGradeReport()._generate_sharded(context, _entry_id)
             return ProblemGradeReport()._generate(context)
 
     def _generate(self, context):
@@ -736,10 +935,10 @@ class ProblemGradeReport(GradeReportBase):
         error_headers = self._error_headers()
         batched_rows = self._batched_rows(context)
 
-        context.update_status('ProblemGradeReport - 2: Compiling grades')
-        success_rows, error_rows = self._compile(context, batched_rows)
-        context.update_status('ProblemGradeReport - 3: Uploading grades')
-        self._upload(context, [success_headers] + success_rows, [error_headers] + error_rows)
+        context.update_status('ProblemGradeReport - 2: Compiling and uploading grades')
+        error_rows = [error_headers]
+        success_rows = self._compile(context, batched_rows, error_rows)
+        self._upload(context, chain([success_headers], success_rows), error_rows)
 
         return context.update_status('ProblemGradeReport - 4: Completed problem grades')
 
@@ -776,6 +975,7 @@ class ProblemGradeReport(GradeReportBase):
             course=context.course,
             collected_block_structure=context.course_structure,
             course_key=context.course_id,
+            batch_size=self.USER_BATCH_SIZE,
         ):
             context.task_progress.attempted += 1
             if not course_grade:
@@ -822,6 +1022,111 @@ class ProblemGradeReport(GradeReportBase):
             get_cache('get_enrollment').clear()
             get_cache(CourseEnrollment.MODE_CACHE_NAMESPACE).clear()
 
+    def _upload_rows(self, context, success_rows, error_rows):
+        """
+        Creates and uploads a CSV for the given rows, with this report's headers.
+        """
+        self._upload(
+            context, chain([self._success_headers(context)], success_rows), [self._error_headers()] + error_rows,
+        )
+
+
+_SHARDED_GRADE_REPORTS = {
+    report_class.__name__: report_class
+    for report_class in (CourseGradeReport, ProblemGradeReport)
+}
+
+
+def grade_report_shard(
+        entry_id, report_name, action_name, shard_index, num_shards, user_ids, merge_subtask_id, subtask_status_dict,
+):
+    """
+    Grades a shard of the learners of a sharded grade report, for the
+    compute_grade_report_shard subtask, and queues the subtask merging the
+    report's shards once they are all graded.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    report = _SHARDED_GRADE_REPORTS[report_name]()
+    try:
+        entry = InstructorTask.objects.get(pk=entry_id)
+        with modulestore().bulk_operations(entry.course_id):
+            context = report._create_context(entry, action_name)  # pylint: disable=protected-access
+            context.update_status(u'Grading shard {} of {}'.format(shard_index + 1, num_shards))
+            # pylint: disable=protected-access
+            succeeded, failed = report._grade_shard(context, entry_id, shard_index, user_ids)
+    except Exception:
+        # Count all of the shard's learners as failed, to keep the counts consistent.
+        TASK_LOG.exception(u'Grade report shard %s of instructor task %s failed', shard_index, entry_id)
+        subtask_status.increment(failed=len(user_ids), state=FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        _queue_grade_report_merge_if_ready(entry_id, report_name, action_name, num_shards, merge_subtask_id)
+        raise
+
+    subtask_status.increment(succeeded=succeeded, failed=failed, state=SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    _queue_grade_report_merge_if_ready(entry_id, report_name, action_name, num_shards, merge_subtask_id)
+    return subtask_status.to_dict()
+
+
+def merge_grade_report_shards(entry_id, report_name, action_name, num_shards, subtask_status_dict):
+    """
+    Merges the graded shards of a sharded grade report into its CSV files,
+    for the merge_grade_report_shards subtask.  The InstructorTask succeeds
+    once they are uploaded, and fails if they cannot be, as when a shard
+    failed.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    report = _SHARDED_GRADE_REPORTS[report_name]()
+    try:
+        entry = InstructorTask.objects.get(pk=entry_id)
+        with modulestore().bulk_operations(entry.course_id):
+            context = report._create_context(entry, action_name)  # pylint: disable=protected-access
+            context.update_status(u'Merging {} grade report shards'.format(num_shards))
+            report._merge_shards(context, entry_id, num_shards)  # pylint: disable=protected-access
+            context.update_status(u'Completed grades')
+    except Exception:
+        TASK_LOG.exception(u'Merging the grade report shards of instructor task %s failed', entry_id)
+        subtask_status.increment(state=FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        # The merge is the report's last subtask, so no report is uploaded:
+        # fail the InstructorTask rather than reporting it as a success.
+        entry = InstructorTask.objects.get(pk=entry_id)
+        entry.task_state = FAILURE
+        entry.save_now()
+        raise
+
+    subtask_status.increment(state=SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    return subtask_status.to_dict()
+
+
+def _queue_grade_report_merge_if_ready(entry_id, report_name, action_name, num_shards, merge_subtask_id):
+    """
+    Queues the subtask merging the shards of a sharded grade report, if all
+    of its shards are done.
+
+    The merge subtask may be queued twice, when the last shards complete at
+    the same time, but it then runs only once, as for any duplicate subtask.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+    subtask_dict = json.loads(entry.subtasks)
+    num_completed = subtask_dict['succeeded'] + subtask_dict['failed']
+    if num_completed < subtask_dict['total'] - 1:
+        return
+
+    # Imported here, as the tasks module imports this one.
+    from lms.djangoapps.instructor_task.tasks import merge_grade_report_shards as merge_grade_report_shards_task
+    merge_grade_report_shards_task.subtask(
+        (entry_id, report_name, action_name, num_shards, SubtaskStatus.create(merge_subtask_id).to_dict()),
+        task_id=merge_subtask_id,
+    ).apply_async()
+
 
 class ProblemResponses(object):
     """
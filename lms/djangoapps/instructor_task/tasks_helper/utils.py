@@ -33,6 +33,8 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
                 [row1_colum1, row1_colum2, ...],
                 ...
             ]
+            Any iterable of rows, such as a generator, may be given: the
+            rows are written to the report store as they are iterated.
         csv_name: Name of the resulting CSV
         course_id: ID of the course
 
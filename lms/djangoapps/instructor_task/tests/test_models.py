@@ -9,6 +9,7 @@ from six import StringIO
 
 from django.conf import settings
 from django.test import SimpleTestCase, TestCase, override_settings
+from mock import ANY, patch
 from opaque_keys.edx.locator import CourseLocator
 
 from common.test.utils import MockS3BotoMixin
@@ -69,6 +70,34 @@ class ReportStoreTestMixin(object):
             ['new_file', 'middle_file', 'old_file']
         )
 
+    def test_store_rows_from_generator(self):
+        """
+        Test that ReportStore.store_rows() writes rows generated one at a
+        time, even once they no longer fit in memory.
+        """
+        report_store = self.create_report_store()
+        report_store.MAX_IN_MEMORY_SIZE = 100
+        rows = ([u'learner{}'.format(index), u'ni\xf1o', str(index)] for index in range(100))
+
+        report_store.store_rows(self.course_id, 'report.csv', rows)
+
+        self.assertEqual(
+            report_store.read_rows(self.course_id, 'report.csv'),
+            [[u'learner{}'.format(index), u'ni\xf1o', str(index)] for index in range(100)],
+        )
+
+    def test_store_rows_uses_store(self):
+        """
+        Test that ReportStore.store_rows() saves its CSV through
+        ReportStore.store().
+        """
+        report_store = self.create_report_store()
+        with patch.object(report_store, 'store', wraps=report_store.store) as mock_store:
+            report_store.store_rows(self.course_id, 'report.csv', [[u'ni\xf1o']])
+
+        mock_store.assert_called_once_with(self.course_id, 'report.csv', ANY)
+        self.assertEqual(report_store.read_rows(self.course_id, 'report.csv'), [[u'ni\xf1o']])
+
 
 class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, SimpleTestCase):
     """
@@ -8,22 +8,26 @@ Unit tests for LMS instructor-initiated background tasks helper functions.
 
 """
 
+import json
 import os
 import shutil
 import tempfile
 import urllib
 from contextlib import contextmanager
+from uuid import uuid4
 from datetime import datetime, timedelta
 
 import ddt
 import unicodecsv
+from celery.states import FAILURE, SUCCESS
 from capa.tests.response_xml_factory import MultipleChoiceResponseXMLFactory
 from course_modes.models import CourseMode
 from course_modes.tests.factories import CourseModeFactory
 from courseware.tests.factories import InstructorFactory
 from django.conf import settings
+from django.db import connection
 from django.urls import reverse
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from freezegun import freeze_time
 from instructor_analytics.basic import UNAVAILABLE, list_problem_responses
 from mock import MagicMock, Mock, patch, ANY
@@ -47,6 +51,7 @@ from student.models import (
 )
 from student.tests.factories import CourseEnrollmentFactory, UserFactory
 from survey.models import SurveyAnswer, SurveyForm
+from waffle.testutils import override_switch
 from xmodule.modulestore import ModuleStoreEnum
 from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory, check_mongo_calls
@@ -81,6 +86,7 @@ from lms.djangoapps.instructor_task.tests.test_base import (
     InstructorTaskModuleTestCase,
     TestReportMixin,
 )
+from lms.djangoapps.instructor_task.tests.factories import InstructorTaskFactory
 from lms.djangoapps.teams.tests.factories import CourseTeamFactory, CourseTeamMembershipFactory
 from lms.djangoapps.verify_student.tests.factories import SoftwareSecurePhotoVerificationFactory
 from openedx.core.djangoapps.course_groups.models import CohortMembership, CourseUserGroupPartitionGroup
@@ -89,7 +95,7 @@ from openedx.core.djangoapps.credit.tests.factories import CreditCourseFactory
 from openedx.core.djangoapps.request_cache.middleware import RequestCache
 from openedx.core.djangoapps.user_api.partition_schemes import RandomUserPartitionScheme
 from openedx.core.djangoapps.util.testing import ContentGroupTestCase, TestConditionalContent
-from ..models import ReportStore
+from ..models import InstructorTask, ReportStore
 from ..tasks_helper.utils import UPDATE_STATUS_FAILED, UPDATE_STATUS_SUCCEEDED
 
 
@@ -156,6 +162,55 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
         self.assertTrue(any('grade_report_err' in item[0] for item in report_store.links_for(self.course.id)))
 
+    @override_settings(GRADES_DOWNLOAD_USERS_PER_SHARD=1)
+    @override_switch('instructor_task.sharded_grade_reports', active=True)
+    @patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task')
+    def test_sharded_grading(self, _mock_current_task):
+        """
+        Test that a grade report generated in shards of learners includes
+        the rows of every shard, in order.
+        """
+        students = [self.create_student(u'student{}'.format(i), u'student{}@example.com'.format(i)) for i in range(3)]
+        entry = InstructorTaskFactory.create(course_id=self.course.id, task_id=str(uuid4()))
+
+        CourseGradeReport.generate(None, entry.id, self.course.id, None, 'graded')
+
+        entry = InstructorTask.objects.get(pk=entry.id)
+        self.assertEqual(entry.task_state, SUCCESS)
+        self.assertDictContainsSubset({'attempted': 3, 'succeeded': 3, 'failed': 0}, json.loads(entry.task_output))
+
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        report_files = [filename for filename, _ in report_store.links_for(self.course.id)]
+        self.assertEqual(len(report_files), 1)
+        rows = report_store.read_rows(self.course.id, report_files[0])
+        self.assertEqual([row[2] for row in rows[1:]], [student.username for student in students])
+
+    @override_settings(GRADES_DOWNLOAD_USERS_PER_SHARD=1)
+    @override_switch('instructor_task.sharded_grade_reports', active=True)
+    @patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task')
+    def test_sharded_grading_missing_shard(self, _mock_current_task):
+        """
+        Test that a sharded grade report is not uploaded, and its task
+        fails, if one of its shards fails.
+        """
+        for i in range(3):
+            self.create_student(u'student{}'.format(i), u'student{}@example.com'.format(i))
+        entry = InstructorTaskFactory.create(course_id=self.course.id, task_id=str(uuid4()))
+        grade_shard = CourseGradeReport._grade_shard  # pylint: disable=protected-access
+
+        def failing_grade_shard(report, context, entry_id, shard_index, user_ids):
+            if shard_index == 1:
+                raise TypeError('Cannot grade shard')
+            return grade_shard(report, context, entry_id, shard_index, user_ids)
+
+        with patch.object(CourseGradeReport, '_grade_shard', autospec=True, side_effect=failing_grade_shard):
+            CourseGradeReport.generate(None, entry.id, self.course.id, None, 'graded')
+
+        entry = InstructorTask.objects.get(pk=entry.id)
+        self.assertEqual(entry.task_state, FAILURE)
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        self.assertEqual(report_store.links_for(self.course.id), [])
+
     def test_cohort_data_in_grading(self):
         """
         Test that cohort data is included in grades csv if cohort configuration is enabled for course.
@@ -406,19 +461,30 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
             )
         _ = CreditCourseFactory(course_key=course.id)
 
-        num_users = 5
-        for _ in range(num_users):
-            user = UserFactory.create()
-            CourseEnrollment.enroll(user, course.id, mode='verified')
-            SoftwareSecurePhotoVerificationFactory.create(user=user, status='approved')
-
-        RequestCache.clear_request_cache()
+        def enroll_learners(num_users):
+            for _ in range(num_users):
+                user = UserFactory.create()
+                CourseEnrollment.enroll(user, course.id, mode='verified')
+                SoftwareSecurePhotoVerificationFactory.create(user=user, status='approved')
 
-        expected_query_count = 43
-        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
-            with check_mongo_calls(mongo_count):
-                with self.assertNumQueries(expected_query_count):
-                    CourseGradeReport.generate(None, None, course.id, None, 'graded')
+        def generate_report():
+            RequestCache.clear_request_cache()
+            with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+                CourseGradeReport.generate(None, None, course.id, None, 'graded')
+
+        enroll_learners(5)
+        with check_mongo_calls(mongo_count):
+            generate_report()
+
+        # Once their grades are persisted, the report reads the learners'
+        # data per batch, so the number of queries does not depend on the
+        # number of learners.
+        with CaptureQueriesContext(connection) as queries:
+            generate_report()
+        enroll_learners(5)
+        generate_report()
+        with self.assertNumQueries(len(queries)):
+            generate_report()
 
     def test_inactive_enrollments(self):
         """
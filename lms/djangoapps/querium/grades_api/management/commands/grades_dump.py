@@ -15,23 +15,73 @@
     cd edx-platform
     python manage.py lms grades_dump -c course-v1:KU+OS9471721_2955+Fall2020_Master_Shell_Weiland -u 091bacd864ee84f91e24611c54867a -a d79c1e0244ff4db180c7bdfce53d9dd8
 
+  Or dump the course grades of every enrolled learner as json lines, one learner per line:
+    python manage.py lms grades_dump -c course-v1:KU+OS9471721_2955+Fall2020_Master_Shell_Weiland --roster > grades.jsonl
+
+  Or export every learner x problem score of a course to a csv (or jsonl) file:
+    python manage.py lms grades_dump -c course-v1:KU+OS9471721_2955+Fall2020_Master_Shell_Weiland --export -o grades.csv
+
+  Or of every LTI course, one file per course, four courses at a time:
+    python manage.py lms grades_dump --export --all-lti-courses --format jsonl -o /tmp/grades/ --processes 4
+
+  Exports are written one page of learners at a time, so memory use does not grow with
+  the size of the course. Progress is reported on stderr.
+
 """
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
 # django stuff
-from django.core.management.base import BaseCommand
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.db import connections
+from rest_framework.utils.encoders import JSONEncoder
 
 # open edx stuff
 from opaque_keys.edx.keys import CourseKey
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 
 # rover stuff
-from lms.djangoapps.querium.grades_api.v1.views import SectionGradeViewUser
+from lms.djangoapps.querium.grades_api.v1.views import (
+    CourseRosterGradesView,
+    InternalLTICourses,
+    SectionGradeViewUser
+)
 
 
 User = get_user_model()
 
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# one row per learner x problem.
+EXPORT_FIELDS = [
+    'course_id',
+    'username',
+    'email',
+    'course_grade_percent',
+    'course_grade_letter',
+    'chapter_display_name',
+    'section_display_name',
+    'section_location',
+    'section_due_date',
+    'problem_usage_key',
+    'problem_raw_earned',
+    'problem_raw_possible',
+    'problem_earned',
+    'problem_possible',
+    'problem_weight',
+    'problem_grade_percentage',
+    'error',
+]
+
+
 class Command(BaseCommand):
-    help = u"Dump raw problem-level grade data to the console."
+    help = u"Dump raw problem-level grade data to the console, or export it to csv / jsonl files."
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -52,6 +102,45 @@ class Command(BaseCommand):
             type=str,
             help=u'Unique identifier of assignment key. Example: d79c1e0244ff4db180c7bdfce53d9dd8'
             )
+        parser.add_argument(
+            u'--roster',
+            action='store_true',
+            help=u'Stream the course grades of all enrolled learners to stdout as json lines.'
+            )
+        parser.add_argument(
+            u'--page-size',
+            type=int,
+            default=CourseRosterGradesView.default_page_size,
+            help=u'Number of learners graded per batch in --roster and --export modes.'
+            )
+        parser.add_argument(
+            u'--export',
+            action='store_true',
+            help=u'Export every learner x problem score of the course(s).'
+            )
+        parser.add_argument(
+            u'--all-lti-courses',
+            action='store_true',
+            help=u'Export all LTI courses rather than --course_id.'
+            )
+        parser.add_argument(
+            u'--format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help=u'Export file format.'
+            )
+        parser.add_argument(
+            u'-o',
+            u'--output',
+            type=str,
+            help=u'Export file. A directory with --all-lti-courses, one file per course. Default: stdout for one course.'
+            )
+        parser.add_argument(
+            u'--processes',
+            type=int,
+            default=1,
+            help=u'Number of courses to export in parallel worker processes.'
+            )
 
 
     def handle(self, *args, **kwargs):
@@ -60,6 +149,12 @@ class Command(BaseCommand):
         username = kwargs['username']
         assignment = kwargs['assignment']
 
+        if kwargs['export']:
+            return self.export(course_id, **kwargs)
+
+        if kwargs['roster']:
+            return self.dump_roster(course_id, kwargs['page_size'])
+
         course = None
         user = None
 
@@ -72,4 +167,189 @@ class Command(BaseCommand):
 
         grades = SectionGradeViewUser()
         grades_dict = grades.get(request=None, course_id=course_id, chapter_id=None, section_id=assignment, grade_user=username)
-        
\ No newline at end of file
+        self.stdout.write(json.dumps(grades_dict, cls=JSONEncoder, indent=4))
+
+    def dump_roster(self, course_id, page_size):
+        """
+        Same paging as the roster api endpoint: one batch of learners at a time, so
+        that memory use does not grow with the size of the course.
+        """
+        course_key = CourseKey.from_string(course_id)
+        view = CourseRosterGradesView()
+
+        for users in view.iter_roster_pages(course_key, page_size):
+            for line in view.iter_json_lines(course_id, users):
+                self.stdout.write(line, ending='')
+            self.stdout.flush()
+
+    def export(self, course_id, **kwargs):
+        """
+        Export one course to --output (or stdout), or every LTI course to one file
+        per course in the --output directory, --processes courses at a time.
+        """
+        fmt = kwargs['format']
+        output = kwargs['output']
+        page_size = kwargs['page_size']
+
+        if not kwargs['all_lti_courses']:
+            if not course_id:
+                raise CommandError('--export requires either --course_id or --all-lti-courses.')
+            if output:
+                export_course(course_id, output, fmt, page_size)
+            else:
+                write_course(course_id, self.stdout, fmt, page_size)
+            return
+
+        if not output:
+            raise CommandError('--all-lti-courses requires an --output directory.')
+        if not os.path.isdir(output):
+            os.makedirs(output)
+
+        course_ids = [course['course_id'] for course in InternalLTICourses().get(include_enrollments=False)]
+        jobs = [
+            (course_id, os.path.join(output, export_filename(course_id, fmt)), fmt, page_size)
+            for course_id in course_ids
+        ]
+        progress('exporting {n} LTI courses with {p} processes'.format(n=len(jobs), p=kwargs['processes']))
+
+        if kwargs['processes'] > 1:
+            # the worker processes are forked, so they must not share our database
+            # and cache connections. each worker opens its own.
+            close_connections()
+            pool = multiprocessing.Pool(processes=kwargs['processes'], initializer=close_connections)
+            try:
+                results = pool.imap_unordered(_export_course_worker, jobs)
+                self.report(results, len(jobs))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            self.report((_export_course_worker(job) for job in jobs), len(jobs))
+
+    def report(self, results, total):
+        failed = 0
+        for n, (course_id, learners, rows, err) in enumerate(results, start=1):
+            if err:
+                failed += 1
+                progress('[{n}/{total}] {course_id} failed: {err}'.format(n=n, total=total, course_id=course_id, err=err))
+            else:
+                progress('[{n}/{total}] {course_id} done: {learners} learners, {rows} rows'.format(
+                    n=n,
+                    total=total,
+                    course_id=course_id,
+                    learners=learners,
+                    rows=rows
+                ))
+        if failed:
+            raise CommandError('{failed} of {total} courses could not be exported.'.format(failed=failed, total=total))
+
+
+def export_course(course_id, path, fmt, page_size):
+    """
+    Export one course to path. The file is written under a temporary name and
+    renamed when complete, so a partial file is never mistaken for a finished export.
+    """
+    partial_path = path + '.part'
+    with open(partial_path, 'w', newline='') as f:
+        retval = write_course(course_id, f, fmt, page_size)
+    os.rename(partial_path, path)
+    return retval
+
+
+def write_course(course_id, f, fmt, page_size):
+    """
+    Write every learner x problem score of a course to the file object f, one page
+    of learners at a time. Returns (learners, rows).
+    """
+    course_key = CourseKey.from_string(course_id)
+    view = CourseRosterGradesView()
+    total = view.get_roster(course_key).count()
+
+    if fmt == 'csv':
+        writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        write_row = writer.writerow
+    else:
+        def write_row(row):
+            f.write(json.dumps(row, cls=JSONEncoder) + '\n')
+
+    learners = rows = 0
+    started = time.time()
+    for users in view.iter_roster_pages(course_key, page_size):
+        for course_dict in view.iter_course_dicts(course_id, users):
+            for row in problem_rows(course_dict):
+                write_row(row)
+                rows += 1
+        learners += len(users)
+        f.flush()
+        progress('{course_id}: {learners}/{total} learners, {rows} rows, {elapsed:.0f}s'.format(
+            course_id=course_id,
+            learners=learners,
+            total=total,
+            rows=rows,
+            elapsed=time.time() - started
+        ))
+
+    return learners, rows
+
+
+def problem_rows(course_dict):
+    """
+    Flatten the course dict of one learner into one row per problem. A learner
+    who could not be graded gets a single row with the error.
+    """
+    student = course_dict['student']
+    row = {
+        'course_id': course_dict['course_id'],
+        'username': student['username'],
+        'email': student['email'],
+    }
+    if 'error' in course_dict:
+        yield dict(row, error=course_dict['error'])
+        return
+
+    row['course_grade_percent'] = course_dict['course_grade']['course_grade_percent']
+    row['course_grade_letter'] = course_dict['course_grade']['course_grade_letter']
+    for chapter in course_dict['course_chapters'].values():
+        for section in chapter['chapter_sections'].values():
+            for problem_usage_key, problem in section['section_problems'].items():
+                problem_row = dict(
+                    row,
+                    chapter_display_name=chapter['chapter_display_name'],
+                    section_display_name=section['section_display_name'],
+                    section_location=section['section_location'],
+                    section_due_date=section['section_due_date'],
+                    problem_usage_key=problem_usage_key,
+                )
+                problem_row.update(problem)
+                yield problem_row
+
+
+def export_filename(course_id, fmt):
+    return '{course_id}.{fmt}'.format(
+        course_id=course_id.replace(':', '_').replace('+', '_').replace('/', '_'),
+        fmt=fmt
+    )
+
+
+def progress(msg):
+    sys.stderr.write('grades_dump [{pid}] {msg}\n'.format(pid=os.getpid(), msg=msg))
+    sys.stderr.flush()
+
+
+def close_connections():
+    connections.close_all()
+    for cache in caches.all():
+        cache.close()
+
+
+def _export_course_worker(job):
+    """
+    Pool worker. Never raises, so that one bad course does not stop the others.
+    """
+    course_id, path, fmt, page_size = job
+    try:
+        learners, rows = export_course(course_id, path, fmt, page_size)
+        return course_id, learners, rows, None
+    except Exception as err:  # pylint: disable=broad-except
+        return course_id, 0, 0, str(err)
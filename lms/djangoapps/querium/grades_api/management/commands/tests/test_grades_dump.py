@@ -0,0 +1,107 @@
+"""
+Tests for the --export mode of the grades_dump management command.
+"""
+
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from mock import MagicMock, patch
+from six import StringIO
+
+from lms.djangoapps.querium.grades_api.management.commands import grades_dump
+
+COURSE_ID = 'course-v1:ABC+OS9471721_9626+01'
+PROBLEM_1 = 'block-v1:ABC+OS9471721_9626+01+type@problem+block@1'
+PROBLEM_2 = 'block-v1:ABC+OS9471721_9626+01+type@problem+block@2'
+
+
+def course_dict(username):
+    """
+    The roster view's course dict of a learner with two problem scores.
+    """
+    return {
+        'course_id': COURSE_ID,
+        'student': {'username': username, 'email': '{}@example.com'.format(username)},
+        'course_grade': {'course_grade_percent': 0.5, 'course_grade_letter': 'Pass'},
+        'course_chapters': {
+            'chapter1': {
+                'chapter_display_name': 'Chapter 1',
+                'chapter_sections': {
+                    'section1': {
+                        'section_display_name': 'Homework 1',
+                        'section_location': 'block-v1:ABC+OS9471721_9626+01+type@sequential+block@1',
+                        'section_due_date': None,
+                        'section_problems': {
+                            PROBLEM_1: {'problem_earned': 1.0, 'problem_possible': 1.0},
+                            PROBLEM_2: {'problem_earned': 0.0, 'problem_possible': 1.0},
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+@patch.object(grades_dump, 'progress', MagicMock())
+@patch.object(grades_dump.CourseRosterGradesView, 'get_roster', MagicMock())
+@patch.object(
+    grades_dump.CourseRosterGradesView,
+    'iter_roster_pages',
+    MagicMock(return_value=[['student1', 'student2'], ['student3']]),
+)
+@patch.object(
+    grades_dump.CourseRosterGradesView,
+    'iter_course_dicts',
+    MagicMock(side_effect=lambda course_id, users: [course_dict(user) for user in users]),
+)
+class GradesDumpExportTest(TestCase):
+    """
+    Tests that --export writes one row per learner and problem, a page of
+    learners at a time.
+    """
+    def setUp(self):
+        super(GradesDumpExportTest, self).setUp()
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def test_csv_to_stdout(self):
+        out = StringIO()
+        call_command(grades_dump.Command(), '-c', COURSE_ID, '--export', stdout=out)
+
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(
+            [(row['username'], row['problem_usage_key']) for row in rows[:2]],
+            [('student1', PROBLEM_1), ('student1', PROBLEM_2)],
+        )
+        self.assertEqual(rows[0]['problem_earned'], '1.0')
+        self.assertEqual(rows[0]['section_display_name'], 'Homework 1')
+
+    def test_jsonl_to_file(self):
+        path = os.path.join(self.output_dir, 'grades.jsonl')
+        call_command(grades_dump.Command(), '-c', COURSE_ID, '--export', '--format', 'jsonl', '-o', path)
+
+        self.assertFalse(os.path.exists(path + '.part'))
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['username'] for row in rows], ['student1'] * 2 + ['student2'] * 2 + ['student3'] * 2)
+        self.assertEqual(rows[-1]['course_grade_letter'], 'Pass')
+
+    def test_error_row(self):
+        error_dict = {
+            'course_id': COURSE_ID,
+            'student': {'username': 'student1', 'email': 'student1@example.com'},
+            'error': 'no grade',
+        }
+        self.assertEqual(list(grades_dump.problem_rows(error_dict)), [{
+            'course_id': COURSE_ID,
+            'username': 'student1',
+            'email': 'student1@example.com',
+            'error': 'no grade',
+        }])
@@ -11,4 +11,163 @@
 - Enrollment Homework: 
     https://dev.roverbyopenstax.org/grades_api/v2/courses/course-v1:ABC+OS9471721_9626+01/c0a9afb73af311e98367b7d76f928163/02ecb4993af311e9816bb7d76f928163/
 
-"""
\ No newline at end of file
+"""
+
+import json
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from lms.djangoapps.courseware.tests.factories import GlobalStaffFactory
+from lms.djangoapps.grades.config.waffle import GRADE_SNAPSHOTS, waffle_flags
+from lms.djangoapps.grades.course_grade_factory import CourseGradeFactory
+from openedx.core.djangoapps.waffle_utils.testutils import override_waffle_flag
+from openedx.core.djangoapps.content.course_overviews.tests.factories import CourseOverviewFactory
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+from xmodule.modulestore.tests.django_utils import TEST_DATA_SPLIT_MODULESTORE, SharedModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+from .views import CourseRosterGradeSummariesView, CourseRosterGradesView
+
+
+class RosterGradesViewTestMixin(SharedModuleStoreTestCase):
+    """
+    A course with a graded sequential, and three enrolled learners.
+    """
+    MODULESTORE = TEST_DATA_SPLIT_MODULESTORE
+
+    @classmethod
+    def setUpClass(cls):
+        super(RosterGradesViewTestMixin, cls).setUpClass()
+        cls.course = CourseFactory.create(display_name='roster course')
+        CourseOverviewFactory.create(id=cls.course.id)
+        chapter = ItemFactory.create(category='chapter', parent_location=cls.course.location)
+        cls.sequential = ItemFactory.create(
+            category='sequential',
+            parent_location=chapter.location,
+            display_name='Homework 1',
+            format='Homework',
+            graded=True,
+        )
+        vertical = ItemFactory.create(category='vertical', parent_location=cls.sequential.location)
+        ItemFactory.create(category='problem', parent_location=vertical.location)
+        cls.course_id = str(cls.course.id)
+
+    def setUp(self):
+        super(RosterGradesViewTestMixin, self).setUp()
+        self.staff = GlobalStaffFactory.create()
+        self.students = [UserFactory() for _ in range(3)]
+        for student in self.students:
+            CourseEnrollmentFactory(course_id=self.course.id, user=student)
+
+    def get_response(self, user, **params):
+        """
+        Call the view under test as user, with the given query parameters.
+        """
+        path = '/rover_grades_api/v1/roster/courses/{}/'.format(self.course_id)
+        request = APIRequestFactory().get(path, params)
+        force_authenticate(request, user=user)
+        return self.view_class.as_view()(request, course_id=self.course_id)
+
+    def get_lines(self, response):
+        """
+        The json dicts of the ndjson lines of a streamed response.
+        """
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.endswith('\n'))
+        return [json.loads(line) for line in content.splitlines()]
+
+
+class CourseRosterGradesViewTest(RosterGradesViewTestMixin):
+    """
+    Tests for CourseRosterGradesView.
+    """
+    view_class = CourseRosterGradesView
+
+    def test_staff_only(self):
+        response = self.get_response(self.students[0])
+        self.assertEqual(response.status_code, 403)
+
+    def test_ndjson_lines(self):
+        response = self.get_response(self.staff)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertFalse(response.has_header('Link'))
+        lines = self.get_lines(response)
+        self.assertEqual(
+            [line['student']['username'] for line in lines],
+            [student.username for student in self.students],
+        )
+        for line in lines:
+            self.assertEqual(line['course_id'], self.course_id)
+            self.assertIn('course_grade', line)
+            self.assertIn('course_chapters', line)
+
+    def test_pagination(self):
+        response = self.get_response(self.staff, page_size=2)
+
+        self.assertEqual(
+            [line['student']['username'] for line in self.get_lines(response)],
+            [student.username for student in self.students[:2]],
+        )
+        self.assertIn('page_size=2&after={}'.format(self.students[1].id), response['Link'])
+        self.assertIn('rel="next"', response['Link'])
+
+        response = self.get_response(self.staff, page_size=2, after=self.students[1].id)
+        self.assertEqual(
+            [line['student']['username'] for line in self.get_lines(response)],
+            [self.students[2].username],
+        )
+        self.assertFalse(response.has_header('Link'))
+
+    def test_invalid_page(self):
+        response = self.get_response(self.staff, page_size='all')
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_course_key(self):
+        request = APIRequestFactory().get('/rover_grades_api/v1/roster/courses/not-a-course/')
+        force_authenticate(request, user=self.staff)
+        response = self.view_class.as_view()(request, course_id='not-a-course')
+        self.assertEqual(response.status_code, 404)
+
+
+class CourseRosterGradeSummariesViewTest(RosterGradesViewTestMixin):
+    """
+    Tests for CourseRosterGradeSummariesView.
+    """
+    view_class = CourseRosterGradeSummariesView
+
+    def test_staff_only(self):
+        response = self.get_response(self.students[0])
+        self.assertEqual(response.status_code, 403)
+
+    def test_section_summaries(self):
+        response = self.get_response(self.staff)
+
+        self.assertEqual(response.status_code, 200)
+        lines = self.get_lines(response)
+        self.assertEqual(
+            [line['student']['username'] for line in lines],
+            [student.username for student in self.students],
+        )
+        for line in lines:
+            self.assertEqual(line['course_url'], '{}://{}/courses/{}/courseware/'.format(
+                self.view_class.scheme, self.view_class.host, self.course_id,
+            ))
+            self.assertIn('course_grade', line)
+            self.assertNotIn('course_chapters', line)
+            self.assertEqual(list(line['course_sections']), [self.sequential.location.block_id])
+            section = line['course_sections'][self.sequential.location.block_id]
+            self.assertEqual(section['section_name'], 'Homework 1')
+            self.assertEqual(section['section_format'], 'Homework')
+            self.assertFalse(section['section_attempted'])
+
+    def test_section_summaries_from_snapshots(self):
+        expected_lines = self.get_lines(self.get_response(self.staff))
+
+        with override_waffle_flag(waffle_flags()[GRADE_SNAPSHOTS], active=True):
+            for student in self.students:
+                CourseGradeFactory().update(student, course_key=self.course.id)
+            lines = self.get_lines(self.get_response(self.staff))
+
+        self.assertEqual(lines, expected_lines)
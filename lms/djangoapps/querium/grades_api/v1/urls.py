@@ -3,6 +3,8 @@ from django.conf import settings
 from django.conf.urls import url
 
 from .views import CourseGradeView
+from .views import CourseRosterGradesView
+from .views import CourseRosterGradeSummariesView
 from .views import ChapterGradeView
 from .views import SectionGradeView
 from .views import SectionGradeViewUser
@@ -66,6 +68,22 @@ urlpatterns = [
         name='course_grades'
     ),
 
+    url(
+        r'^roster/courses/{course_id}/$'.format(
+            course_id=settings.COURSE_ID_PATTERN
+        ),
+        CourseRosterGradesView.as_view(),
+        name='course_grades_roster'
+    ),
+
+    url(
+        r'^roster/summary/courses/{course_id}/$'.format(
+            course_id=settings.COURSE_ID_PATTERN
+        ),
+        CourseRosterGradeSummariesView.as_view(),
+        name='course_grades_roster_summary'
+    ),
+
     url(
         r'^courses/{course_id}/{chapter_id}/$'.format(
             course_id=settings.COURSE_ID_PATTERN,
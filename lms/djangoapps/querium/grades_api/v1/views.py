@@ -38,6 +38,12 @@ from django.conf import settings
 from lms.djangoapps.grades.course_grade import CourseGrade
 from lms.djangoapps.grades.course_data import CourseData
 from lms.djangoapps.grades.subsection_grade_factory import SubsectionGradeFactory
+from lms.djangoapps.grades.api import clear_prefetched_course_grades, prefetch_course_and_subsection_grades
+from lms.djangoapps.grades.api import context as grades_context
+from lms.djangoapps.grades.api import snapshots as grades_snapshots
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from openedx.core.djangoapps.content.block_structure.api import get_block_structure_manager
 #from openedx.core.djangoapps.models.course_details import CourseDetails
 
 # LTI integration stuff
@@ -88,6 +94,8 @@ class AbstractGradesView(GenericAPIView, DeveloperErrorViewMixin):
     course_data = None
     course_grade = None
     course_url = None
+    _course_info = None
+    _subsection_grade_factory = None
 
 
     def get(self, request=None, course_id=None, chapter_id=None, section_id=None, grade_user=None):
@@ -188,12 +196,7 @@ class AbstractGradesView(GenericAPIView, DeveloperErrorViewMixin):
             )
 
 
-        self.course_url = u'{scheme}://{host}/{url_prefix}/{course_id}/courseware/'.format(
-                scheme = self.scheme,
-                host=self.host,
-                url_prefix='courses',
-                course_id=self.course_id
-                )
+        self.course_url = self.get_course_url()
 
         # use our validated user and course_key to create a CourseData object.
         # then use the CourseData object to create a CourseGrade object, which
@@ -204,6 +207,18 @@ class AbstractGradesView(GenericAPIView, DeveloperErrorViewMixin):
 
         return
 
+    def get_course_url(self):
+        """
+            the courseware url of self.course_id, to which the chapter and
+            section urls are appended.
+        """
+        return u'{scheme}://{host}/{url_prefix}/{course_id}/courseware/'.format(
+            scheme = self.scheme,
+            host=self.host,
+            url_prefix='courses',
+            course_id=self.course_id
+        )
+
     def _calc_grade_percentage(self, earned, possible):
         """
             calculate the floating point percentage grade score based on the
@@ -215,7 +230,7 @@ class AbstractGradesView(GenericAPIView, DeveloperErrorViewMixin):
         return f_grade
 
     def get_course_dict(self):
-        return {
+        course_dict = {
             'student': {
                 'username': self.grade_user.username,
                 'email': self.grade_user.email,
@@ -227,32 +242,49 @@ class AbstractGradesView(GenericAPIView, DeveloperErrorViewMixin):
                 'course_grade_percent': self.course_grade.percent,
                 'course_grade_letter': self.course_grade.letter_grade,
             },
+        }
+        course_dict.update(self.get_course_info_dict())
+        return course_dict
+
+    def get_course_info_dict(self):
+        """
+            course-level half of get_course_dict(). it is identical for every student
+            so it is only built once per course, which matters when we are iterating
+            the whole roster.
+        """
+        if self._course_info is not None and self._course_info[0] == self.course_key:
+            return self._course_info[1]
+
+        course_overview = CourseOverview.get_from_id(self.course_key)
+        course_info = {
             # course identifiers
             'course_id': self.course_id,
             'course': CourseKey.from_string(self.course_id).course,
             'organization': CourseKey.from_string(self.course_id).org,
             'course_run': CourseKey.from_string(self.course_id).run,
             'course_url': self.course_url,
-            'course_name': CourseOverview.get_from_id(self.course_key).display_name,
+            'course_name': course_overview.display_name,
 
             # course details
-            'course_version': CourseOverview.get_from_id(self.course_key).version,
-            'course_image_url': CourseOverview.get_from_id(self.course_key).course_image_url,
-            'course_start_date': CourseOverview.get_from_id(self.course_key).start,
-            'course_end': CourseOverview.get_from_id(self.course_key).end,
-            'course_has_started': CourseOverview.get_from_id(self.course_key).has_started(),
-            'course_has_ended': CourseOverview.get_from_id(self.course_key).has_ended(),
-            'course_lowest_passing_grade': CourseOverview.get_from_id(self.course_key).lowest_passing_grade,
-            'course_enrollment_start': CourseOverview.get_from_id(self.course_key).enrollment_start,
-            'course_enrollment_end': CourseOverview.get_from_id(self.course_key).enrollment_end,
-            'course_prerequisites': CourseOverview.get_from_id(self.course_key)._pre_requisite_courses_json,
-            'course_description': CourseOverview.get_from_id(self.course_key).short_description,
-            'course_effort': CourseOverview.get_from_id(self.course_key).effort,
-            'course_self_paced': CourseOverview.get_from_id(self.course_key).self_paced,
-            'course_marketing_url': CourseOverview.get_from_id(self.course_key).marketing_url,
-            'course_eligible_for_financial_aid': CourseOverview.get_from_id(self.course_key).eligible_for_financial_aid,
-            'course_language': CourseOverview.get_from_id(self.course_key).closest_released_language,
+            'course_version': course_overview.version,
+            'course_image_url': course_overview.course_image_url,
+            'course_start_date': course_overview.start,
+            'course_end': course_overview.end,
+            'course_has_started': course_overview.has_started(),
+            'course_has_ended': course_overview.has_ended(),
+            'course_lowest_passing_grade': course_overview.lowest_passing_grade,
+            'course_enrollment_start': course_overview.enrollment_start,
+            'course_enrollment_end': course_overview.enrollment_end,
+            'course_prerequisites': course_overview._pre_requisite_courses_json,
+            'course_description': course_overview.short_description,
+            'course_effort': course_overview.effort,
+            'course_self_paced': course_overview.self_paced,
+            'course_marketing_url': course_overview.marketing_url,
+            'course_eligible_for_financial_aid': course_overview.eligible_for_financial_aid,
+            'course_language': course_overview.closest_released_language,
             }
+        self._course_info = (self.course_key, course_info)
+        return course_info
 
     def get_chapter_dict(self, chapter):
         """
@@ -278,8 +310,7 @@ class AbstractGradesView(GenericAPIView, DeveloperErrorViewMixin):
 
             * note: subsections are identifyable as "Sections" in the LMS UI.
         """
-        grades_factory = SubsectionGradeFactory(student=self.grade_user, course=None, course_structure=None, course_data=self.course_data)
-        subsection_grades = grades_factory.create(subsection=section, read_only=True)
+        subsection_grades = self.get_subsection_grade_factory().create(subsection=section, read_only=True)
         problems = {}
         for problem_key_BlockUsageLocator, problem_ProblemScore in subsection_grades.problem_scores.items():
             problems[str(problem_key_BlockUsageLocator)] = self.get_problem_dict(
@@ -310,6 +341,20 @@ class AbstractGradesView(GenericAPIView, DeveloperErrorViewMixin):
                 },
             }
 
+    def get_subsection_grade_factory(self):
+        """
+            one SubsectionGradeFactory per student, so that the student's persisted
+            subsection grades are bulk-read once rather than once per section.
+        """
+        if self._subsection_grade_factory is None or self._subsection_grade_factory.student != self.grade_user:
+            self._subsection_grade_factory = SubsectionGradeFactory(
+                student=self.grade_user,
+                course=None,
+                course_structure=None,
+                course_data=self.course_data
+            )
+        return self._subsection_grade_factory
+
     def get_problem_dict(self, problem_key_BlockUsageLocator, problem_ProblemScore):
         """
             returns an array of tuples of the individual problem grade results from a subsection of a chapter.
@@ -333,25 +378,22 @@ class InternalLTICourses(AbstractGradesView):
     Returns:
         json dict of LTI-enabled courses
     """
-    def get(self):
-
+    def get(self, include_enrollments=True):
+        """
+         include_enrollments: set to False to skip the usernames of the enrolled
+         learners, which is one query per course.
+        """
         courses_list = []
         courses = LTIInternalCourse.objects.all()
         for course in courses:
-            course = course.course
-
             course_dict = {}
-            course_dict.course_id = str(course.course_id)
+            course_dict['course_id'] = str(course.course_id)
 
-            enrollments = CourseEnrollment.objects.filter(
-                course=course
-            )
+            if include_enrollments:
+                course_dict['enrollments'] = list(CourseEnrollment.objects.filter(
+                    course_id=course.course_id
+                ).values_list('user__username', flat=True))
 
-            courses_enrollments = []
-            for enrollment in enrollments:
-                courses_enrollments.append(enrollment.user.username)
-
-            course_dict.enrollments = courses_enrollments
             courses_list.append(course_dict)
 
         return courses_list
@@ -373,6 +415,220 @@ class InternalCourseGradeView(AbstractGradesView):
 
         return course_dict
 
+    def get_from_course_grade(self, course_id, grade_user, course_grade):
+        """
+         Bulk variation of get() for callers that have already read the CourseGrade,
+         typically via CourseGradeFactory().iter(), which shares one collected
+         block structure across all students in the course.
+
+         grade_user is a Django user model, and is assumed to be enrolled in course_id.
+         Returns the same json dict as get().
+        """
+        self.course_id = course_id
+        self.course_key = CourseKey.from_string(course_id)
+        self.grade_user = grade_user
+        self.course_grade = course_grade
+        self.course_data = course_grade.course_data
+        self.course_url = self.get_course_url()
+
+        chapters = {}
+        for chapter in self.course_grade.chapter_grades.values():
+            chapters[chapter['url_name']] = self.get_chapter_dict(chapter)
+
+        course_dict = self.get_course_dict()
+        course_dict['course_chapters'] = chapters
+
+        return course_dict
+
+class CourseRosterGradesView(InternalCourseGradeView):
+    """
+     api view - entire course, all enrolled learners.
+
+     Streams one json dict per line (the same dict that CourseGradeView returns for
+     one student) for a page of the course roster, ordered by user id. The course
+     structure is collected once for the page and the persisted course and subsection
+     grades of the whole page are prefetched in bulk, so a page costs a handful of
+     queries rather than a full grade read per student.
+
+     query parameters:
+        page_size: number of learners per page. default 100, max 1000.
+        after: user id of the last learner of the previous page.
+
+     The url of the next page, if any, is returned in the Link header.
+    """
+    # staff only. IsStaffOrOwner would let any learner read the whole roster.
+    permission_classes = (permissions.JWT_RESTRICTED_APPLICATION_OR_USER_ACCESS, permissions.IsStaff,)
+
+    default_page_size = 100
+    max_page_size = 1000
+    content_type = 'application/x-ndjson'
+
+    def get(self, request=None, course_id=None):
+        self.course_id = course_id
+
+        try:
+            self.course_key = CourseKey.from_string(self.course_id)
+        except InvalidKeyError:
+            raise self.api_error(
+                status_code=status.HTTP_404_NOT_FOUND,
+                developer_message='The provided course key cannot be parsed.',
+                error_code='invalid_course_key'
+            )
+
+        if not CourseOverview.get_from_id(self.course_key):
+            raise self.api_error(
+                status_code=status.HTTP_404_NOT_FOUND,
+                developer_message="Requested grades for unknown course {course}".format(course=self.course_id),
+                error_code='course_does_not_exist'
+            )
+
+        try:
+            page_size = min(int(request.GET.get('page_size', self.default_page_size)), self.max_page_size)
+            after = int(request.GET.get('after', 0))
+        except ValueError:
+            raise self.api_error(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                developer_message='page_size and after must be integers.',
+                error_code='invalid_page'
+            )
+        if page_size < 1:
+            page_size = self.default_page_size
+
+        # read one extra learner to find out whether there is a next page.
+        users = list(self.get_roster(self.course_key).filter(id__gt=after)[:page_size + 1])
+        next_page = len(users) > page_size
+        users = users[:page_size]
+
+        response = StreamingHttpResponse(self.iter_json_lines(self.course_id, users), content_type=self.content_type)
+        if next_page:
+            next_url = request.build_absolute_uri('{path}?page_size={page_size}&after={after}'.format(
+                path=request.path,
+                page_size=page_size,
+                after=users[-1].id
+            ))
+            response['Link'] = '<{url}>; rel="next"'.format(url=next_url)
+
+        return response
+
+    @staticmethod
+    def get_roster(course_key):
+        """
+         Queryset of the learners enrolled in course_key, ordered by user id so that
+         it can be paginated with a cursor.
+        """
+        return CourseEnrollment.objects.users_enrolled_in(course_key).order_by('id')
+
+    @classmethod
+    def iter_roster_pages(cls, course_key, page_size=None):
+        """
+         Yield the roster of course_key as lists of at most page_size learners,
+         so that callers can grade a large course in bounded memory.
+        """
+        page_size = page_size or cls.default_page_size
+        roster = cls.get_roster(course_key)
+        after = 0
+        while True:
+            users = list(roster.filter(id__gt=after)[:page_size])
+            if not users:
+                return
+            yield users
+            after = users[-1].id
+
+    def iter_course_dicts(self, course_id, users):
+        """
+         Yield the get() json dict of each user in users. A learner who cannot be graded
+         yields their student dict and an error message instead.
+
+         users should be a list, rather than a queryset, since it is iterated twice.
+        """
+        course_key = CourseKey.from_string(course_id)
+        collected_block_structure = get_block_structure_manager(course_key).get_collected()
+
+        prefetch_course_and_subsection_grades(course_key, users)
+        try:
+            for user, course_grade, err in CourseGradeFactory().iter(
+                users,
+                course_key=course_key,
+                collected_block_structure=collected_block_structure
+            ):
+                if course_grade is None:
+                    yield {
+                        'student': {
+                            'username': user.username,
+                            'email': user.email,
+                        },
+                        'course_id': course_id,
+                        'error': str(err),
+                    }
+                    continue
+
+                yield self.get_from_course_grade(course_id, user, course_grade)
+        finally:
+            # note: in models_api it is clear_prefetched_course_grades() that clears both.
+            clear_prefetched_course_grades(course_key)
+
+    def iter_json_lines(self, course_id, users):
+        for course_dict in self.iter_course_dicts(course_id, users):
+            yield json.dumps(course_dict, cls=JSONEncoder) + '\n'
+
+
+class CourseRosterGradeSummariesView(CourseRosterGradesView):
+    """
+     api view - entire course, all enrolled learners, graded sections only.
+
+     Streams one json dict per line, paginated like CourseRosterGradesView, with the
+     course grade of each learner and the earned and possible scores of each of the
+     graded sections of the course, but no chapter or problem detail. When grade
+     snapshots are enabled for the course the whole page is read from them in a
+     single query, without reading any subsection grade.
+    """
+    def iter_course_dicts(self, course_id, users):
+        course_key = CourseKey.from_string(course_id)
+        collected_block_structure = get_block_structure_manager(course_key).get_collected()
+        graded_subsections = list(grades_context.graded_subsections_for_course(collected_block_structure))
+
+        self.course_id = course_id
+        self.course_key = course_key
+        self.course_url = self.get_course_url()
+
+        for user, course_grade, err in grades_snapshots.iter_grades(
+            users,
+            course_key=course_key,
+            collected_block_structure=collected_block_structure
+        ):
+            if course_grade is None:
+                yield {
+                    'student': {
+                        'username': user.username,
+                        'email': user.email,
+                    },
+                    'course_id': course_id,
+                    'error': str(err),
+                }
+                continue
+
+            self.grade_user = user
+            self.course_grade = course_grade
+            course_dict = self.get_course_dict()
+            course_dict['course_sections'] = {
+                subsection.location.block_id: self.get_section_summary_dict(
+                    course_grade.subsection_grade(subsection.location)
+                )
+                for subsection in graded_subsections
+            }
+            yield course_dict
+
+    def get_section_summary_dict(self, subsection_grade):
+        return {
+            'section_name': subsection_grade.display_name,
+            'section_format': subsection_grade.format,
+            'section_attempted': subsection_grade.attempted_graded,
+            'section_earned': subsection_grade.graded_total.earned,
+            'section_possible': subsection_grade.graded_total.possible,
+            'section_percent': subsection_grade.percent_graded,
+        }
+
+
 class CourseGradeView(AbstractGradesView):
     """
      api view - entire course
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RoverEcommerceConfig(AppConfig):
     name = 'lms.djangoapps.querium.rover_ecommerce'
     verbose_name = 'Querium Rover E-commerce'
+
+    def ready(self):
+        from . import signals  # pylint: disable=unused-import
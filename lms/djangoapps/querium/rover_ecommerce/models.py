@@ -9,6 +9,22 @@ from django.utils.translation import ugettext as _
 from model_utils.models import TimeStampedModel
 from opaque_keys.edx.django.models import CourseKeyField
 
+class ConfigurationQuerySet(models.QuerySet):
+    """
+    QuerySet.update() sends no post_save signal, so evict the cached paywall
+    verdicts of the updated courses here, as signals.py does for save().
+    """
+    def update(self, **kwargs):
+        # utils imports this module.
+        from .utils import invalidate_paywall_course
+
+        course_ids = list(self.values_list('course_id', flat=True))
+        rows = super(ConfigurationQuerySet, self).update(**kwargs)
+        for course_id in course_ids:
+            invalidate_paywall_course(str(course_id))
+        return rows
+
+
 class Configuration(TimeStampedModel):
     """
     Course-level ecommerce configurations.
@@ -28,6 +44,8 @@ class Configuration(TimeStampedModel):
         blank=True,
         )
 
+    objects = ConfigurationQuerySet.as_manager()
+
     class Meta(object):
         verbose_name = "Rover E-Commerce Configuration"
         verbose_name_plural = verbose_name + "s"
@@ -0,0 +1,38 @@
+"""
+Signal handlers that evict cached paywall verdicts (see utils.PaywallDecision)
+when one of their inputs changes.  Configuration.objects.update(), which sends
+no signal, evicts them itself (see models.ConfigurationQuerySet).
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from student.models import CourseEnrollment
+
+from .models import Configuration, EOPWhitelist
+from .utils import invalidate_paywall_course, invalidate_paywall_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=CourseEnrollment)
+def invalidate_paywall_on_enrollment_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Enrollment mode changes, such as an upgrade to verified after payment, and
+    deleted enrollments.
+    """
+    invalidate_paywall_user(instance.user_id)
+
+
+@receiver(post_save, sender=EOPWhitelist)
+@receiver(post_delete, sender=EOPWhitelist)
+def invalidate_paywall_on_whitelist_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    for user_id in User.objects.filter(email=instance.user_email).values_list('id', flat=True):
+        invalidate_paywall_user(user_id)
+
+
+@receiver(post_save, sender=Configuration)
+@receiver(post_delete, sender=Configuration)
+def invalidate_paywall_on_configuration_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    invalidate_paywall_course(str(instance.course_id))
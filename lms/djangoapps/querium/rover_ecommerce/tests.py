@@ -0,0 +1,127 @@
+"""
+Tests for the cached Rover paywall decision.
+"""
+import datetime
+
+import pytz
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from edx_django_utils.cache import RequestCache
+from mock import patch
+from opaque_keys.edx.keys import CourseKey
+
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+
+from . import utils
+from .models import Configuration, EOPWhitelist
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rover_ecommerce_paywall',
+    },
+}
+UTC = pytz.UTC
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@patch.object(utils.PaywallDecision, '_should_render', return_value=True)
+class PaywallDecisionTestCase(TestCase):
+    """
+    Tests for utils.PaywallDecision and the receivers in signals.py.
+    """
+    def setUp(self):
+        super(PaywallDecisionTestCase, self).setUp()
+        utils.cache.clear()
+        RequestCache.clear_all_namespaces()
+        self.user = UserFactory()
+        self.course_key = CourseKey.from_string('course-v1:ABC+OS9471721_9626+01')
+        self.context = {'course_key': self.course_key}
+
+    def _new_request(self, user=None):
+        """
+        A request of its own, as the paywall is memoized per request.
+        """
+        RequestCache.clear_all_namespaces()
+        request = RequestFactory().get('/')
+        request.user = user or self.user
+        return request
+
+    def test_memoized_per_request(self, _should_render):
+        request = self._new_request()
+        self.assertTrue(utils.paywall_should_render(request, self.context))
+        self.assertTrue(utils.paywall_should_render(request, self.context))
+        self.assertFalse(utils.paywall_should_raise(request, self.context))
+
+        self.assertEqual(_should_render.call_count, 1)
+
+    def test_cached_across_requests(self, _should_render):
+        utils.paywall_should_render(self._new_request(), self.context)
+        utils.paywall_should_render(self._new_request(), self.context)
+        self.assertEqual(_should_render.call_count, 1)
+
+        # a different user, or a different course, is a cache miss.
+        utils.paywall_should_render(self._new_request(UserFactory()), self.context)
+        utils.paywall_should_render(
+            self._new_request(), {'course_key': CourseKey.from_string('course-v1:ABC+OS9471721_9626+02')}
+        )
+        self.assertEqual(_should_render.call_count, 3)
+
+    def test_enrollment_change_evicts_user(self, _should_render):
+        utils.paywall_should_render(self._new_request(), self.context)
+        CourseEnrollmentFactory(user=self.user, course_id=self.course_key)
+        utils.paywall_should_render(self._new_request(), self.context)
+
+        self.assertEqual(_should_render.call_count, 2)
+
+    def test_enrollment_delete_evicts_user(self, _should_render):
+        enrollment = CourseEnrollmentFactory(user=self.user, course_id=self.course_key)
+        utils.paywall_should_render(self._new_request(), self.context)
+        enrollment.delete()
+        utils.paywall_should_render(self._new_request(), self.context)
+
+        self.assertEqual(_should_render.call_count, 2)
+
+    def test_whitelist_change_evicts_user(self, _should_render):
+        utils.paywall_should_render(self._new_request(), self.context)
+        EOPWhitelist.objects.create(user_email=self.user.email)
+        utils.paywall_should_render(self._new_request(), self.context)
+
+        self.assertEqual(_should_render.call_count, 2)
+
+    def test_configuration_change_evicts_course(self, _should_render):
+        request = self._new_request()
+        self.assertFalse(utils.paywall_should_raise(request, self.context))
+
+        Configuration.objects.create(
+            course_id=self.course_key,
+            payment_deadline_date=UTC.localize(datetime.datetime.now() - datetime.timedelta(days=1)),
+        )
+        self.assertTrue(utils.paywall_should_raise(self._new_request(), self.context))
+        self.assertEqual(_should_render.call_count, 2)
+
+        Configuration.objects.filter(course_id=self.course_key).update(
+            payment_deadline_date=UTC.localize(datetime.datetime.now() + datetime.timedelta(days=1)),
+        )
+        # update() sends no signal, but evicts the course itself.
+        self.assertFalse(utils.paywall_should_raise(self._new_request(), self.context))
+        self.assertEqual(_should_render.call_count, 3)
+
+    def test_anonymous_user(self, _should_render):
+        Configuration.objects.create(
+            course_id=self.course_key,
+            payment_deadline_date=UTC.localize(datetime.datetime.now() - datetime.timedelta(days=1)),
+        )
+        request = self._new_request(AnonymousUser())
+
+        self.assertFalse(utils.paywall_should_render(request, self.context))
+        self.assertFalse(utils.paywall_should_raise(request, self.context))
+        self.assertFalse(_should_render.called)
+
+    def test_not_a_course(self, _should_render):
+        request = self._new_request()
+
+        self.assertFalse(utils.paywall_should_render(request, {}))
+        self.assertFalse(utils.paywall_should_raise(request, {}))
+        self.assertFalse(_should_render.called)
@@ -4,11 +4,14 @@ Utility methods called from Mako templates in Rover theme.
 # python  stuff
 import logging
 import datetime
+import uuid
 import pytz
 
 # django stuff
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from edx_django_utils.cache import RequestCache
 
 # open edx stuff
 from opaque_keys.edx.keys import CourseKey
@@ -23,6 +26,170 @@ log = logging.getLogger(__name__)
 DEBUG = settings.ROVER_DEBUG
 UTC = pytz.UTC
 
+# the paywall verdict of a user / course is cached for this many seconds, and
+# evicted sooner by the receivers in signals.py when enrollments, the EOP whitelist
+# or the course configuration change.
+PAYWALL_CACHE_TIMEOUT = getattr(settings, 'ROVER_ECOMMERCE_PAYWALL_CACHE_TIMEOUT', 60 * 5)
+PAYWALL_CACHE_KEY_PREFIX = 'rover_ecommerce.paywall'
+PAYWALL_REQUEST_CACHE_NAMESPACE = 'rover_ecommerce.paywall'
+
+
+class PaywallDecision(object):
+    """
+    The paywall verdict for the current user and the course of the current page.
+
+    paywall_should_render() and paywall_should_raise() are called from several
+    Mako templates per page, and the underlying tests cost several queries plus a
+    modulestore read. A decision is made once per request (RequestCache), and its
+    inputs are shared across requests via memcached for PAYWALL_CACHE_TIMEOUT seconds:
+
+        render:     the result of the paywall_should_render() tests.
+        deadline:   the payment deadline date of the course, from Configuration.
+
+    The deadline is cached rather than the paywall_should_raise() verdict itself,
+    since the latter depends on the current time.
+
+    The receivers in signals.py, and Configuration.objects.update(), evict the
+    cached inputs when they change.  Changes that bypass them, such as
+    CourseEnrollment or EOPWhitelist QuerySet.update() calls or raw SQL, are
+    only seen once the cached inputs expire, up to PAYWALL_CACHE_TIMEOUT
+    seconds later.
+    """
+    def __init__(self, request, context, course_id):
+        self.request = request
+        self.context = context
+        self.course_id = course_id
+        self.user = request.user
+        self._verdict = None
+
+    @classmethod
+    def for_request(cls, request, context):
+        """
+        The memoized decision for the current request, or None if the user is not
+        authenticated or the page does not belong to a course.
+        """
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+
+        course_id = get_course_id(request, context)
+        if course_id is None:
+            return None
+
+        request_cache = RequestCache(PAYWALL_REQUEST_CACHE_NAMESPACE)
+        key = '{user_id}.{course_id}'.format(user_id=user.id, course_id=course_id)
+        cached_response = request_cache.get_cached_response(key)
+        if cached_response.is_found:
+            return cached_response.value
+
+        decision = cls(request, context, course_id)
+        request_cache.set(key, decision)
+        return decision
+
+    @property
+    def should_render(self):
+        return self.verdict['render']
+
+    @property
+    def should_raise(self):
+        payment_deadline_date = self.verdict['deadline']
+        if payment_deadline_date is None:
+            return False
+
+        now = UTC.localize(datetime.datetime.now())
+        if now <= payment_deadline_date:
+            logger('Payment deadline is in the future, exiting.')
+            return False
+
+        logger('paywall_should_raise() - Ecommerce paywall being raised on user {}!'.format(self.user.email))
+        return True
+
+    @property
+    def verdict(self):
+        if self._verdict is None:
+            key = self._cache_key()
+            self._verdict = cache.get(key)
+            if self._verdict is None:
+                self._verdict = {
+                    'render': self._should_render(),
+                    'deadline': get_course_deadline_date(self.request, self.context),
+                }
+                cache.set(key, self._verdict, PAYWALL_CACHE_TIMEOUT)
+        return self._verdict
+
+    def _should_render(self):
+        """
+        A series of boolean tests to determine whether the paywall html
+        should be rendered an injected into the current page.
+        """
+        if is_faculty(self.user):
+            logger('paywall_should_render() - Faculty user - never block!, exiting.')
+            return False
+
+        if is_eop_student(self.request):
+            logger('paywall_should_render() - User is an EOP student, exiting.')
+            return False
+
+        course = get_course(self.request, self.context)
+        if course is None:
+            logger('paywall_should_render() - Not a course, exiting.')
+            return False
+
+        if not is_ecommerce_enabled(self.request, self.context):
+            logger('paywall_should_render() - Ecommerce is not enabled for this course, exiting.')
+            return False
+
+        return True
+
+    def _cache_key(self):
+        """
+        The key is versioned by a token per user and a token per course, so that
+        the receivers in signals.py can evict all of the entries of a user, or of a
+        course, with one cache.delete().
+        """
+        user_version_key = _version_key('user', self.user.id)
+        course_version_key = _version_key('course', self.course_id)
+        versions = cache.get_many([user_version_key, course_version_key])
+        for version_key in (user_version_key, course_version_key):
+            if version_key not in versions:
+                version = uuid.uuid4().hex
+                if not cache.add(version_key, version, None):
+                    version = cache.get(version_key, version)
+                versions[version_key] = version
+
+        return '{prefix}.{user_version}.{course_version}.{user_id}.{course_id}'.format(
+            prefix=PAYWALL_CACHE_KEY_PREFIX,
+            user_version=versions[user_version_key],
+            course_version=versions[course_version_key],
+            user_id=self.user.id,
+            course_id=self.course_id
+        )
+
+
+def invalidate_paywall_user(user_id):
+    """
+    Evict the cached paywall verdicts of a user, in all courses.
+    """
+    cache.delete(_version_key('user', user_id))
+    RequestCache(PAYWALL_REQUEST_CACHE_NAMESPACE).clear()
+
+
+def invalidate_paywall_course(course_id):
+    """
+    Evict the cached paywall verdicts of all users of a course.
+    """
+    cache.delete(_version_key('course', course_id))
+    RequestCache(PAYWALL_REQUEST_CACHE_NAMESPACE).clear()
+
+
+def _version_key(kind, identifier):
+    return '{prefix}.{kind}.{identifier}.version'.format(
+        prefix=PAYWALL_CACHE_KEY_PREFIX,
+        kind=kind,
+        identifier=identifier
+    )
+
+
 def paywall_should_render(request, context):
     """
     A series of boolean tests to determine whether the paywall html
@@ -35,34 +202,12 @@ def paywall_should_render(request, context):
     Returns:
         [boolean]: True if the Mako template should fully render all html.
     """
-    ## this code is moot if the user is not yet authenticated.
-    try:
-        user = get_user_by_username_or_email(request.user)
-    except:
-        return False
-
-    if not user.is_authenticated:
-        logger('paywall_should_render() - Not authenticated, exiting.')
-        return False
-
-    if is_faculty(user):
-        logger('paywall_should_render() - Faculty user - never block!, exiting.')
-        return False
-
-    if is_eop_student(request):
-        logger('paywall_should_render() - User is an EOP student, exiting.')
+    decision = PaywallDecision.for_request(request, context)
+    if decision is None:
+        logger('paywall_should_render() - Not authenticated, or not a course, exiting.')
         return False
 
-    course = get_course(request, context)
-    if course is None:
-        logger('paywall_should_render() - Not a course, exiting.')
-        return False
-
-    if not is_ecommerce_enabled(request, context):
-        logger('paywall_should_render() - Ecommerce is not enabled for this course, exiting.')
-        return False
-
-    return True
+    return decision.should_render
 
 def paywall_should_raise(request, context):
     """[summary]
@@ -73,20 +218,16 @@ def paywall_should_raise(request, context):
 
     Returns:
         [boolean]: True if the user has exceeded the payment deadline date
-        for the course in which the current page is being rendered.
+        for the course in which the current page is being rendered. Always
+        False for anonymous users and for pages that do not belong to a course,
+        for which there is no one to raise the paywall on.
     """
-    payment_deadline_date = get_course_deadline_date(request, context)
-    if payment_deadline_date is None:
-        return False
-
-    now = UTC.localize(datetime.datetime.now())
-    if now <= payment_deadline_date:
-        logger('Payment deadline is in the future, exiting.')
+    decision = PaywallDecision.for_request(request, context)
+    if decision is None:
+        logger('paywall_should_raise() - Not authenticated, or not a course, exiting.')
         return False
 
-    user = get_user_by_username_or_email(request.user)
-    logger('paywall_should_raise() - Ecommerce paywall being raised on user {}!'.format(user.email))
-    return True
+    return decision.should_raise
 
 def is_eop_student(request):
     """Looks for a record in EOPWhitelist with the email address
@@ -1007,6 +1007,15 @@ XBLOCK_SETTINGS = {}
 
 MODULESTORE_BRANCH = 'published-only'
 
+# Budget, in bytes, of the process-local cache of decoded split course structures,
+# which are immutable per version guid.  0 disables the cache.
+SPLIT_STRUCTURE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Budget, in bytes, of the process-local cache of the indexes of split course structures
+# used by get_items and the ancestry queries.  Each index keeps its structure's blocks, and
+# is accounted as the size of its structure.  0 disables the indexes.
+SPLIT_STRUCTURE_INDEX_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
 DOC_STORE_CONFIG = {
     'db': 'edxapp',
     'host': 'localhost',
@@ -2189,6 +2198,12 @@ BLOCK_STRUCTURES_SETTINGS = dict(
 
     # Backend storage options
     PRUNING_ACTIVE=False,
+
+    # Size of the process-local LRU cache of collected block structures,
+    # used when the block_structure.process_local_cache waffle switch is on.
+    # Bytes are the serialized (compressed) size of the cached structures.
+    LOCAL_CACHE_MAX_ENTRIES=20,
+    LOCAL_CACHE_MAX_BYTES=20 * 1024 * 1024,
 )
 
 ################################ Bulk Email ###################################
@@ -2869,6 +2884,10 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': None,
 }
 
+# Number of learners graded by each subtask of a sharded grade report, when
+# the instructor_task.sharded_grade_reports waffle switch is enabled.
+GRADES_DOWNLOAD_USERS_PER_SHARD = 2000
+
 FINANCIAL_REPORTS = {
     'STORAGE_TYPE': 'localfs',
     'BUCKET': None,
@@ -57,6 +57,20 @@ ROVER_ENABLE_SALESFORCE_API = ROVER_TOKENS.get('ROVER_ENABLE_SALESFORCE_API', Fa
 ROVER_ENABLE_TRAINING_WHEELS = ROVER_TOKENS.get('ROVER_ENABLE_TRAINING_WHEELS', False)
 ROVER_ENABLE_PAGE_TIPS = ROVER_TOKENS.get('ROVER_ENABLE_PAGE_TIPS', False)
 
+# LTI Grade Sync: seconds to hold back Willo grade posts so that repeat submissions
+# for the same assignment collapse into one post. 0 posts every submission immediately.
+ROVER_LTI_GRADESYNC_DEBOUNCE_SECONDS = ROVER_TOKENS.get('ROVER_LTI_GRADESYNC_DEBOUNCE_SECONDS', 0)
+ROVER_LTI_GRADESYNC_BATCH_SIZE = ROVER_TOKENS.get('ROVER_LTI_GRADESYNC_BATCH_SIZE', 50)
+ROVER_LTI_GRADESYNC_BULK_CHUNK_SIZE = ROVER_TOKENS.get('ROVER_LTI_GRADESYNC_BULK_CHUNK_SIZE', 50)
+
+# LTI Grade Sync: replay settings for grade posts parked in the outbox (outbox.py).
+ROVER_LTI_GRADESYNC_OUTBOX_MAX_ATTEMPTS = ROVER_TOKENS.get('ROVER_LTI_GRADESYNC_OUTBOX_MAX_ATTEMPTS', 5)
+ROVER_LTI_GRADESYNC_OUTBOX_BATCH_SIZE = ROVER_TOKENS.get('ROVER_LTI_GRADESYNC_OUTBOX_BATCH_SIZE', 50)
+ROVER_LTI_GRADESYNC_OUTBOX_POSTS_PER_SECOND = ROVER_TOKENS.get('ROVER_LTI_GRADESYNC_OUTBOX_POSTS_PER_SECOND', 2)
+
+# Rover e-commerce: seconds to cache the paywall verdict of a user / course.
+ROVER_ECOMMERCE_PAYWALL_CACHE_TIMEOUT = ROVER_TOKENS.get('ROVER_ECOMMERCE_PAYWALL_CACHE_TIMEOUT', 300)
+
 
 # mcdaniel jul-2019: tokenized some of the values in cms.env.json. this converts
 #       the values to the actual client code. Example:
@@ -203,6 +217,9 @@ STATICFILES_STORAGE = 'pipeline.storage.NonPackagingPipelineStorage'
 # Don't use compression during tests
 PIPELINE['JS_COMPRESSOR'] = None
 
+# Tests count the mongo calls made to read structures.
+SPLIT_STRUCTURE_CACHE_MAX_BYTES = 0
+
 update_module_store_settings(
     MODULESTORE,
     module_store_options={
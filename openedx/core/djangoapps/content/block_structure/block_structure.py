@@ -634,7 +634,7 @@ class BlockStructureBlockData(BlockStructure):
 
         # Remove block.
         self._block_relations.pop(usage_key, None)
-        self._block_data_map.pop(usage_key, None)
+        self._remove_block_data(usage_key)
 
         # Recreate the graph connections if descendants are to be kept.
         if keep_descendants:
@@ -753,6 +753,13 @@ class BlockStructureBlockData(BlockStructure):
             raise TransformerException(u'Version attributes are not set on transformer {0}.', transformer.name())
         self.set_transformer_data(transformer, TRANSFORMER_VERSION_KEY, transformer.WRITE_VERSION)
 
+    def _remove_block_data(self, usage_key):
+        """
+        Removes the BlockData associated with the given usage_key,
+        if any.
+        """
+        self._block_data_map.pop(usage_key, None)
+
     def _get_or_create_block(self, usage_key):
         """
         Returns the BlockData associated with the given usage_key.
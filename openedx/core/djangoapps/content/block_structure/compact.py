@@ -0,0 +1,909 @@
+"""
+Compact, array-backed representation of collected block structures, and its
+versioned binary serialization.
+
+A collected BlockStructureBlockData holds a _BlockRelations object and a
+BlockData object per block, keyed by usage key objects.  Pickling that graph is
+simple, but unpickling it for a large course costs tens of milliseconds and
+several MB on every request.  CompactBlockStructure holds the same data as:
+
+    * an interned key table, mapping each usage key to an integer id,
+    * CSR (compressed sparse row) arrays of children and parents ids,
+    * columnar xBlock field and transformer block field storage, one list
+      of values per field name, indexed by block id.
+
+It is a BlockStructureBlockData, so get_children, topological_traversal and
+the transformer APIs work unchanged.  Reads are served from the arrays.  The
+first mutation of the relations (for example remove_block) or of the block
+data (for example set_transformer_block_field) materializes the regular
+dicts of _BlockRelations and BlockData objects from the arrays, after which
+the structure behaves exactly like a BlockStructureBlockData.
+
+Each transformer's block data is a separate section, which is only
+decompressed and decoded when the transformer first reads it, so a request
+only pays for the transformers it runs.  report_lazy_loading reports what
+was loaded and what was skipped.
+
+The serialized format is a small header, a json directory of sections and
+the zlib-compressed sections themselves.  Values are stored as json, with
+tagged encodings for tuples, sets, dicts with non-string keys, dates and
+opaque keys.  Values of any other type are the only ones that are pickled,
+individually.
+"""
+
+
+import json
+import struct
+import sys
+import time
+import zlib
+from array import array
+from base64 import b64decode, b64encode
+from copy import deepcopy
+from datetime import date, datetime, timedelta
+from logging import getLogger
+
+import pytz
+import six
+from edx_django_utils.cache import RequestCache
+from edx_django_utils.monitoring import set_custom_metric
+from opaque_keys import OpaqueKey
+from opaque_keys.edx.keys import CourseKey, UsageKey
+from six.moves import cPickle as pickle
+
+from .block_structure import (
+    BlockData,
+    BlockStructureBlockData,
+    TransformerData,
+    TransformerDataMap,
+    _BlockRelations
+)
+from .exceptions import BlockStructureException
+
+logger = getLogger(__name__)  # pylint: disable=invalid-name
+
+# Leading bytes of a serialized compact block structure. A zlib stream, and
+# so a zpickled block structure, can never start with a null byte.
+MAGIC = b'\x00BSC'
+
+# Increment whenever the serialized format changes. Older versions are
+# rejected by deserialize, and then recollected.
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<4sHI')
+_RELATIONS_HEADER = struct.Struct('<IIII')
+_ID_TYPECODE = 'I'
+
+_TAG = '__bs__'
+
+KEYS_SECTION = 'keys'
+RELATIONS_SECTION = 'relations'
+BLOCK_DATA_SECTION = 'block_data'
+TRANSFORMER_DATA_SECTION = 'transformer_data'
+TRANSFORMER_BLOCK_DATA_SECTION_PREFIX = 'transformer_block_data:'
+
+_IMMUTABLE_TYPES = frozenset([
+    type(None), bool, int, float, six.text_type, six.binary_type, date, datetime, timedelta, frozenset,
+])
+
+
+class CompactFormatError(BlockStructureException):
+    """
+    Raised when serialized data is not a readable compact block structure.
+    """
+    pass
+
+
+class _Missing(object):
+    """
+    Marks a block that has no value for a field.
+    """
+    def __repr__(self):
+        return '<missing>'
+
+_MISSING = _Missing()
+
+
+class _FieldColumns(object):
+    """
+    Columnar storage of the fields of a set of blocks: one list of values per
+    field name, indexed by block id, with _MISSING for the blocks that do not
+    have the field, and the ids of the blocks that have a data object at all.
+    """
+    __slots__ = ('present', 'columns')
+
+    def __init__(self, present, columns):
+        # bytearray, indexed by block id.
+        self.present = present
+        # dict {string: list [any type]}
+        self.columns = columns
+
+    def get(self, block_id, field_name, default):
+        """
+        Returns the value of the given field for the given block id.
+        """
+        column = self.columns.get(field_name)
+        if column is None:
+            return default
+        value = column[block_id]
+        return default if value is _MISSING else _copy_value(value)
+
+    def fields_of(self, block_id):
+        """
+        Returns a new dict of all fields of the given block id.
+        """
+        return {
+            field_name: _copy_value(column[block_id])
+            for field_name, column in six.iteritems(self.columns)
+            if column[block_id] is not _MISSING
+        }
+
+
+class _CompactData(object):
+    """
+    The immutable, array-backed contents of a CompactBlockStructure.  Shared
+    by copies of the structure, so it must never be modified, other than by
+    loading its transformer sections.
+    """
+    __slots__ = (
+        'keys', 'ids', 'num_blocks',
+        'child_offsets', 'child_ids', 'parent_offsets', 'parent_ids',
+        'block_fields', 'transformer_sections', 'transformer_block_fields',
+    )
+
+    def __init__(self, keys, num_blocks, relations, block_fields, transformer_sections):
+        # Interned usage keys. The first num_blocks keys are the blocks of
+        # the structure, any others only have block data left over from
+        # pruning.
+        # list [UsageKey]
+        self.keys = keys
+        self.ids = {key: block_id for block_id, key in enumerate(keys)}
+        self.num_blocks = num_blocks
+
+        # CSR arrays: the children ids of block i are
+        # child_ids[child_offsets[i]:child_offsets[i + 1]].
+        self.child_offsets, self.child_ids, self.parent_offsets, self.parent_ids = relations
+
+        # _FieldColumns of the xBlock fields.
+        self.block_fields = block_fields
+
+        # Map of transformer name to the still compressed section of its
+        # block data.
+        # dict {string: bytes}
+        self.transformer_sections = transformer_sections
+
+        # Map of transformer name to the _FieldColumns of its block data,
+        # for the sections loaded so far.
+        # dict {string: _FieldColumns}
+        self.transformer_block_fields = {}
+
+    def related_keys(self, block_id, offsets, ids):
+        """
+        Returns a new list of the usage keys of the given block id's
+        children or parents.
+        """
+        keys = self.keys
+        return [keys[related_id] for related_id in ids[offsets[block_id]:offsets[block_id + 1]]]
+
+    def get_transformer_block_fields(self, transformer_name):
+        """
+        Returns the _FieldColumns of the given transformer's block data,
+        decompressing and decoding its section on first access, or None if
+        the transformer collected no block data.
+        """
+        field_columns = self.transformer_block_fields.get(transformer_name)
+        if field_columns is None:
+            section = self.transformer_sections.get(transformer_name)
+            if section is None:
+                return None
+            started = time.time()
+            try:
+                field_columns = _load_columns(zlib.decompress(section), len(self.keys))
+            except (KeyError, IndexError, TypeError, ValueError, zlib.error) as error:
+                raise CompactFormatError(u'Invalid compact block structure section {}: {!r}'.format(
+                    transformer_name, error,
+                ))
+            # Concurrent first loads by threads sharing this data are
+            # harmless: they produce equal columns.
+            self.transformer_block_fields[transformer_name] = field_columns
+            _record_section_load(len(section), time.time() - started)
+        return field_columns
+
+    def unloaded_transformer_bytes(self):
+        """
+        Returns the compressed size of the transformer sections that were
+        never loaded.
+        """
+        return sum(
+            len(section) for transformer_name, section in six.iteritems(self.transformer_sections)
+            if transformer_name not in self.transformer_block_fields
+        )
+
+
+class CompactBlockStructure(BlockStructureBlockData):
+    """
+    Subclass of BlockStructureBlockData that keeps its collected data in
+    compact arrays until it is first modified.
+    """
+    def __init__(self, root_block_usage_key, compact_data, transformer_data):
+        # _CompactData, shared with copies of this structure.
+        self._compact = compact_data
+        self._relations = None
+        self._data = None
+
+        super(CompactBlockStructure, self).__init__(root_block_usage_key)
+
+        # Map of a transformer's name to its non-block-specific data.
+        self.transformer_data = transformer_data
+
+        # The regular relations and block data maps, once materialized.
+        # The base class initialized them empty, so reset them.
+        self._relations = None
+        self._data = None
+
+        # Keys of the blocks removed before the block data was materialized.
+        # set(UsageKey)
+        self._removed_block_data = set()
+
+        # Names of the transformers whose block data was merged into the
+        # materialized block data.
+        # set(string)
+        self._merged_transformers = set()
+
+    @property
+    def _block_relations(self):
+        if self._relations is None:
+            self._relations = self._materialize_relations()
+        return self._relations
+
+    @_block_relations.setter
+    def _block_relations(self, block_relations):
+        self._relations = block_relations
+
+    @property
+    def _block_data_map(self):
+        if self._data is None:
+            self._data = self._materialize_block_data()
+        return self._data
+
+    @_block_data_map.setter
+    def _block_data_map(self, block_data_map):
+        self._data = block_data_map
+
+    def is_materialized(self):
+        """
+        Returns whether both the relations and the block data of this
+        structure have been converted back to the regular dicts.
+        """
+        return self._relations is not None and self._data is not None
+
+    def copy(self):
+        """
+        Returns a new instance of CompactBlockStructure that shares
+        this instance's arrays, with a deep-copy of anything already
+        materialized.
+        """
+        block_structure = CompactBlockStructure(
+            self.root_block_usage_key,
+            self._compact,
+            deepcopy(self.transformer_data),
+        )
+        if self._relations is not None:
+            block_structure._relations = deepcopy(self._relations)
+        if self._data is not None:
+            block_structure._data = deepcopy(self._data)
+        block_structure._removed_block_data = set(self._removed_block_data)
+        block_structure._merged_transformers = set(self._merged_transformers)
+        return block_structure
+
+    #--- Array-backed reads ---#
+
+    def __len__(self):
+        if self._relations is not None:
+            return super(CompactBlockStructure, self).__len__()
+        return self._compact.num_blocks
+
+    def __contains__(self, usage_key):
+        if self._relations is not None:
+            return super(CompactBlockStructure, self).__contains__(usage_key)
+        block_id = self._compact.ids.get(usage_key)
+        return block_id is not None and block_id < self._compact.num_blocks
+
+    def get_block_keys(self):
+        if self._relations is not None:
+            return super(CompactBlockStructure, self).get_block_keys()
+        return iter(self._compact.keys[:self._compact.num_blocks])
+
+    def get_parents(self, usage_key):
+        if self._relations is not None:
+            return super(CompactBlockStructure, self).get_parents(usage_key)
+        block_id = self._get_block_id(usage_key)
+        if block_id is None:
+            return []
+        compact = self._compact
+        return compact.related_keys(block_id, compact.parent_offsets, compact.parent_ids)
+
+    def get_children(self, usage_key):
+        if self._relations is not None:
+            return super(CompactBlockStructure, self).get_children(usage_key)
+        block_id = self._get_block_id(usage_key)
+        if block_id is None:
+            return []
+        compact = self._compact
+        return compact.related_keys(block_id, compact.child_offsets, compact.child_ids)
+
+    def get_xblock_field(self, usage_key, field_name, default=None):
+        if self._data is not None:
+            return super(CompactBlockStructure, self).get_xblock_field(usage_key, field_name, default)
+        block_id = self._get_data_id(usage_key)
+        if block_id is None:
+            return default
+        if field_name == 'location':
+            return usage_key
+        return self._compact.block_fields.get(block_id, field_name, default)
+
+    def get_transformer_block_field(self, usage_key, transformer, key, default=None):
+        if self._data is not None:
+            self._merge_transformer_block_data(_transformer_name(transformer))
+            return super(CompactBlockStructure, self).get_transformer_block_field(
+                usage_key, transformer, key, default,
+            )
+        block_id = self._get_data_id(usage_key)
+        if block_id is None:
+            return default
+        field_columns = self._compact.get_transformer_block_fields(_transformer_name(transformer))
+        if field_columns is None or not field_columns.present[block_id]:
+            return default
+        return field_columns.get(block_id, key, default)
+
+    #--- Block data reads and writes, once materialized ---#
+
+    def __getitem__(self, usage_key):
+        self._merge_all_transformer_block_data()
+        return super(CompactBlockStructure, self).__getitem__(usage_key)
+
+    def iteritems(self):
+        self._merge_all_transformer_block_data()
+        return super(CompactBlockStructure, self).iteritems()
+
+    def itervalues(self):
+        self._merge_all_transformer_block_data()
+        return super(CompactBlockStructure, self).itervalues()
+
+    def get_transformer_block_data(self, usage_key, transformer):
+        self._merge_transformer_block_data(_transformer_name(transformer))
+        return super(CompactBlockStructure, self).get_transformer_block_data(usage_key, transformer)
+
+    def set_transformer_block_field(self, usage_key, transformer, key, value):
+        self._merge_transformer_block_data(_transformer_name(transformer))
+        super(CompactBlockStructure, self).set_transformer_block_field(usage_key, transformer, key, value)
+
+    #--- Internal methods ---#
+
+    def _merge_transformer_block_data(self, transformer_name):
+        """
+        Materializes the block data, if needed, and adds the given
+        transformer's block data to it, once.  Block data is materialized
+        without any transformer block data, so that the sections of
+        transformers that are not used are never loaded.
+        """
+        block_data_map = self._block_data_map
+        if transformer_name in self._merged_transformers:
+            return
+        self._merged_transformers.add(transformer_name)
+
+        field_columns = self._compact.get_transformer_block_fields(transformer_name)
+        if field_columns is None:
+            return
+        ids = self._compact.ids
+        for usage_key, block_data in six.iteritems(block_data_map):
+            block_id = ids.get(usage_key)
+            if block_id is not None and field_columns.present[block_id]:
+                transformer_block_data = TransformerData()
+                transformer_block_data.fields.update(field_columns.fields_of(block_id))
+                block_data.transformer_data[transformer_name] = transformer_block_data
+
+    def _merge_all_transformer_block_data(self):
+        """
+        Merges the block data of every transformer, for callers that use
+        BlockData objects directly.
+        """
+        for transformer_name in self._compact.transformer_sections:
+            self._merge_transformer_block_data(transformer_name)
+
+    def _remove_block_data(self, usage_key):
+        if self._data is not None:
+            super(CompactBlockStructure, self)._remove_block_data(usage_key)
+        else:
+            self._removed_block_data.add(usage_key)
+
+    def _get_block_id(self, usage_key):
+        """
+        Returns the id of the given block if it is in the structure.
+        """
+        block_id = self._compact.ids.get(usage_key)
+        return block_id if block_id is not None and block_id < self._compact.num_blocks else None
+
+    def _get_data_id(self, usage_key):
+        """
+        Returns the id of the given block if it has block data.
+        """
+        block_id = self._compact.ids.get(usage_key)
+        if block_id is None or not self._compact.block_fields.present[block_id]:
+            return None
+        if usage_key in self._removed_block_data:
+            return None
+        return block_id
+
+    def _materialize_relations(self):
+        """
+        Returns a new relations map, as BlockStructure keeps it.
+        """
+        compact = self._compact
+        block_relations = {}
+        for block_id in range(compact.num_blocks):
+            relations = _BlockRelations()
+            relations.parents = compact.related_keys(block_id, compact.parent_offsets, compact.parent_ids)
+            relations.children = compact.related_keys(block_id, compact.child_offsets, compact.child_ids)
+            block_relations[compact.keys[block_id]] = relations
+        return block_relations
+
+    def _materialize_block_data(self):
+        """
+        Returns a new block data map, as BlockStructureBlockData keeps it,
+        but without transformer block data.  See _merge_transformer_block_data.
+        """
+        compact = self._compact
+        block_data_map = {}
+        for block_id, usage_key in enumerate(compact.keys):
+            if not compact.block_fields.present[block_id] or usage_key in self._removed_block_data:
+                continue
+            block_data = BlockData(usage_key)
+            block_data.fields.update(compact.block_fields.fields_of(block_id))
+            block_data_map[usage_key] = block_data
+        return block_data_map
+
+
+#--- Lazy loading statistics ---#
+
+LAZY_LOADING_NAMESPACE = u'block_structure.lazy_loading'
+
+# Totals of all transformer sections loaded by this process, used to
+# estimate the time saved by the sections that are not loaded.
+_process_load_totals = {'bytes': 0, 'seconds': 0.0}
+
+
+def _request_load_stats():
+    """
+    Returns this request's lazy loading statistics.
+    """
+    request_cache = RequestCache(LAZY_LOADING_NAMESPACE)
+    cached_response = request_cache.get_cached_response('stats')
+    if cached_response.is_found:
+        return cached_response.value
+    stats = {'bytes_loaded': 0, 'load_ms': 0.0, 'bytes_skipped': 0, 'ms_saved': 0.0}
+    request_cache.set('stats', stats)
+    return stats
+
+
+def _record_section_load(compressed_size, seconds):
+    _process_load_totals['bytes'] += compressed_size
+    _process_load_totals['seconds'] += seconds
+    stats = _request_load_stats()
+    stats['bytes_loaded'] += compressed_size
+    stats['load_ms'] += seconds * 1000
+
+
+def report_lazy_loading(block_structure):
+    """
+    Adds the transformer sections that the given block structure did not
+    need to this request's statistics, and reports the request's totals as
+    custom metrics: the compressed bytes of transformer sections loaded and
+    skipped, the time spent loading, and the time saved, estimated from
+    this process's average load time per byte.
+
+    When the structure is shared through the process-local cache, sections
+    loaded by an earlier request are neither loaded nor skipped again.
+    """
+    if not isinstance(block_structure, CompactBlockStructure):
+        return
+
+    stats = _request_load_stats()
+    bytes_skipped = block_structure._compact.unloaded_transformer_bytes()  # pylint: disable=protected-access
+    stats['bytes_skipped'] += bytes_skipped
+    if _process_load_totals['bytes']:
+        stats['ms_saved'] += bytes_skipped * _process_load_totals['seconds'] * 1000 / _process_load_totals['bytes']
+
+    for name, value in six.iteritems(stats):
+        set_custom_metric(u'block_structure_lazy_{}'.format(name), round(value, 2))
+    logger.debug(u"BlockStructure: Lazy loading of %s; %s", block_structure.root_block_usage_key, stats)
+
+
+def is_compact(serialized_data):
+    """
+    Returns whether the given serialized data is in the compact format.
+    """
+    return serialized_data[:len(MAGIC)] == MAGIC
+
+
+def serialize(block_structure):
+    """
+    Returns the compact binary serialization of the given block structure,
+    which may be any BlockStructureBlockData.
+    """
+    encoder = _ValueEncoder()
+    root_course_key = getattr(block_structure.root_block_usage_key, 'course_key', None)
+
+    # Intern the keys: the blocks of the structure first, in their
+    # iteration order, then any blocks that only have block data.
+    keys = list(block_structure.get_block_keys())
+    num_blocks = len(keys)
+    ids = {key: block_id for block_id, key in enumerate(keys)}
+    for usage_key, _ in block_structure.iteritems():
+        if usage_key not in ids:
+            ids[usage_key] = len(keys)
+            keys.append(usage_key)
+
+    sections = {
+        KEYS_SECTION: _dump_json({
+            'num_blocks': num_blocks,
+            'keys': [_encode_key(key, root_course_key, encoder) for key in keys],
+        }),
+        RELATIONS_SECTION: _dump_relations(block_structure, keys, num_blocks, ids),
+        TRANSFORMER_DATA_SECTION: _dump_json({
+            transformer_name: encoder.encode_column(transformer_data.fields)
+            for transformer_name, transformer_data in six.iteritems(block_structure.transformer_data)
+        }),
+    }
+
+    block_fields = _new_columns()
+    transformer_block_fields = {}
+    for usage_key, block_data in block_structure.iteritems():
+        block_id = ids[usage_key]
+        _add_to_columns(block_fields, block_id, block_data.fields)
+        for transformer_name, transformer_block_data in six.iteritems(block_data.transformer_data):
+            _add_to_columns(
+                transformer_block_fields.setdefault(transformer_name, _new_columns()),
+                block_id,
+                transformer_block_data.fields,
+            )
+    sections[BLOCK_DATA_SECTION] = _dump_json(_encode_columns(block_fields, encoder))
+    for transformer_name, columns in six.iteritems(transformer_block_fields):
+        sections[TRANSFORMER_BLOCK_DATA_SECTION_PREFIX + transformer_name] = _dump_json(
+            _encode_columns(columns, encoder)
+        )
+
+    if encoder.pickled_types:
+        logger.info(
+            u"BlockStructure: Compact serialization of %s pickled values of types %s.",
+            block_structure.root_block_usage_key,
+            sorted(encoder.pickled_types),
+        )
+    return _pack_sections(sections)
+
+
+def deserialize(serialized_data, root_block_usage_key):
+    """
+    Returns the CompactBlockStructure for the given serialized data.
+
+    Raises:
+        CompactFormatError if the data is not in a readable compact format.
+    """
+    sections = _unpack_sections(serialized_data)
+    transformer_sections = {
+        section_name[len(TRANSFORMER_BLOCK_DATA_SECTION_PREFIX):]: sections.pop(section_name)
+        for section_name in list(sections)
+        if section_name.startswith(TRANSFORMER_BLOCK_DATA_SECTION_PREFIX)
+    }
+    try:
+        sections = {section_name: zlib.decompress(section) for section_name, section in six.iteritems(sections)}
+        root_course_key = getattr(root_block_usage_key, 'course_key', None)
+
+        key_table = json.loads(sections[KEYS_SECTION])
+        keys = [_decode_key(key, root_course_key) for key in key_table['keys']]
+        num_keys = len(keys)
+
+        transformer_data = TransformerDataMap()
+        for transformer_name, encoded_fields in six.iteritems(json.loads(sections[TRANSFORMER_DATA_SECTION])):
+            transformer_data.get_or_create(transformer_name).fields.update(_decode_column(encoded_fields))
+
+        compact_data = _CompactData(
+            keys,
+            key_table['num_blocks'],
+            _load_relations(sections[RELATIONS_SECTION]),
+            _load_columns(sections[BLOCK_DATA_SECTION], num_keys),
+            transformer_sections,
+        )
+    except (KeyError, IndexError, TypeError, ValueError, struct.error, zlib.error) as error:
+        raise CompactFormatError(u'Invalid compact block structure: {!r}'.format(error))
+
+    return CompactBlockStructure(root_block_usage_key, compact_data, transformer_data)
+
+
+#--- Sections ---#
+
+def _pack_sections(sections):
+    """
+    Returns the header, the directory and the compressed sections.
+    """
+    directory = []
+    payload = []
+    offset = 0
+    for section_name in sorted(sections):
+        compressed = zlib.compress(sections[section_name])
+        directory.append([section_name, offset, len(compressed)])
+        payload.append(compressed)
+        offset += len(compressed)
+
+    encoded_directory = _dump_json(directory)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded_directory))
+    return b''.join([header, encoded_directory] + payload)
+
+
+def _unpack_sections(serialized_data):
+    """
+    Returns a dict of the compressed sections of the given data.
+    """
+    try:
+        magic, format_version, directory_length = _HEADER.unpack_from(serialized_data)
+    except struct.error:
+        raise CompactFormatError(u'Truncated compact block structure header.')
+    if magic != MAGIC:
+        raise CompactFormatError(u'Not a compact block structure.')
+    if format_version != FORMAT_VERSION:
+        raise CompactFormatError(u'Unsupported compact block structure format version {}.'.format(format_version))
+
+    payload_start = _HEADER.size + directory_length
+    try:
+        directory = json.loads(serialized_data[_HEADER.size:payload_start].decode('utf-8'))
+        return {
+            section_name: serialized_data[payload_start + offset:payload_start + offset + length]
+            for section_name, offset, length in directory
+        }
+    except (ValueError, TypeError) as error:
+        raise CompactFormatError(u'Invalid compact block structure sections: {!r}'.format(error))
+
+
+def _dump_json(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+#--- Relations ---#
+
+def _dump_relations(block_structure, keys, num_blocks, ids):
+    """
+    Returns the CSR arrays of the children and parents of the blocks.
+    """
+    child_offsets, child_ids = _csr(keys[:num_blocks], block_structure.get_children, ids)
+    parent_offsets, parent_ids = _csr(keys[:num_blocks], block_structure.get_parents, ids)
+    arrays = (child_offsets, child_ids, parent_offsets, parent_ids)
+    return _RELATIONS_HEADER.pack(*[len(ids_array) for ids_array in arrays]) + b''.join(
+        _to_little_endian(ids_array) for ids_array in arrays
+    )
+
+
+def _csr(keys, get_related, ids):
+    offsets = array(_ID_TYPECODE, [0])
+    related_ids = array(_ID_TYPECODE)
+    for usage_key in keys:
+        related_ids.extend(ids[related_key] for related_key in get_related(usage_key))
+        offsets.append(len(related_ids))
+    return offsets, related_ids
+
+
+def _load_relations(section):
+    lengths = _RELATIONS_HEADER.unpack_from(section)
+    arrays = []
+    start = _RELATIONS_HEADER.size
+    for length in lengths:
+        ids_array = array(_ID_TYPECODE)
+        end = start + length * ids_array.itemsize
+        ids_array.frombytes(section[start:end])
+        if sys.byteorder != 'little':
+            ids_array.byteswap()
+        arrays.append(ids_array)
+        start = end
+    return arrays
+
+
+def _to_little_endian(ids_array):
+    if sys.byteorder != 'little':
+        ids_array = array(_ID_TYPECODE, ids_array)
+        ids_array.byteswap()
+    return ids_array.tobytes()
+
+
+#--- Keys ---#
+
+def _encode_key(usage_key, root_course_key, encoder):
+    """
+    Keys of the root block's course are stored as [block_type, block_id],
+    and any other key as an encoded value.
+    """
+    if isinstance(usage_key, UsageKey) and root_course_key is not None and usage_key.course_key == root_course_key:
+        if root_course_key.make_usage_key(usage_key.block_type, usage_key.block_id) == usage_key:
+            return [usage_key.block_type, usage_key.block_id]
+    return encoder.encode(usage_key)
+
+
+def _decode_key(encoded_key, root_course_key):
+    if isinstance(encoded_key, list):
+        return root_course_key.make_usage_key(*encoded_key)
+    return _decode_value(encoded_key)
+
+
+#--- Columns ---#
+
+def _add_to_columns(columns, block_id, fields):
+    """
+    Adds the given block and its fields to the given sparse columns.
+    """
+    columns['present'].append(block_id)
+    for field_name, value in six.iteritems(fields):
+        block_ids, values = columns['fields'].setdefault(field_name, ([], []))
+        block_ids.append(block_id)
+        values.append(value)
+
+
+def _new_columns():
+    """
+    Returns empty sparse columns: the ids of the blocks that have a data
+    object, and for each field name, the ids of the blocks that have the
+    field and their values.
+    """
+    return {'present': [], 'fields': {}}
+
+
+def _encode_columns(columns, encoder):
+    return {
+        'present': columns['present'],
+        'fields': {
+            field_name: [block_ids, encoder.encode_column(values)]
+            for field_name, (block_ids, values) in six.iteritems(columns['fields'])
+        },
+    }
+
+
+def _load_columns(section, num_keys):
+    encoded_columns = json.loads(section)
+    present = bytearray(num_keys)
+    for block_id in encoded_columns['present']:
+        present[block_id] = 1
+    columns = {}
+    for field_name, (block_ids, encoded_values) in six.iteritems(encoded_columns['fields']):
+        column = [_MISSING] * num_keys
+        for block_id, value in zip(block_ids, _decode_column(encoded_values)):
+            column[block_id] = value
+        columns[field_name] = column
+    return _FieldColumns(present, columns)
+
+
+def _decode_column(encoded_column):
+    """
+    Columns are stored as [is_tagged, values]. Untagged columns are plain
+    json and need no further decoding.
+    """
+    is_tagged, values = encoded_column
+    return _decode_value(values) if is_tagged else values
+
+
+#--- Values ---#
+
+class _ValueEncoder(object):
+    """
+    Converts values to json-compatible values, tagging those that json
+    cannot represent.
+    """
+    def __init__(self):
+        self.tagged = False
+        self.pickled_types = set()
+
+    def encode_column(self, values):
+        """
+        Returns [is_tagged, encoded values] for the given list or dict of values.
+        """
+        self.tagged = False
+        encoded_values = self.encode(values)
+        return [self.tagged, encoded_values]
+
+    def encode(self, value):  # pylint: disable=too-many-return-statements
+        """
+        Returns the json-compatible form of value.
+        """
+        value_type = type(value)
+        if value_type in (six.text_type, int, float, bool) or value is None:
+            return value
+        if value_type is list:
+            return [self.encode(item) for item in value]
+        if value_type is dict:
+            if _TAG not in value and all(type(key) is six.text_type for key in value):
+                return {key: self.encode(item) for key, item in six.iteritems(value)}
+            return self._tag('dict', [[self.encode(key), self.encode(item)] for key, item in six.iteritems(value)])
+        if value_type is tuple:
+            return self._tag('tuple', [self.encode(item) for item in value])
+        if value_type in (set, frozenset):
+            return self._tag(value_type.__name__, [self.encode(item) for item in value])
+        if value_type is datetime:
+            offset = value.utcoffset()
+            return self._tag('datetime', [
+                value.year, value.month, value.day, value.hour, value.minute, value.second, value.microsecond,
+                None if offset is None else offset.days * 86400 + offset.seconds,
+            ])
+        if value_type is date:
+            return self._tag('date', [value.year, value.month, value.day])
+        if value_type is timedelta:
+            return self._tag('timedelta', [value.days, value.seconds, value.microseconds])
+        if value_type is six.binary_type:
+            return self._tag('bytes', b64encode(value).decode('ascii'))
+        if isinstance(value, UsageKey):
+            return self._tag('usage_key', six.text_type(value))
+        if isinstance(value, CourseKey):
+            return self._tag('course_key', six.text_type(value))
+
+        self.pickled_types.add(value_type.__name__)
+        return self._tag('pickle', b64encode(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).decode('ascii'))
+
+    def _tag(self, tag, value):
+        self.tagged = True
+        return {_TAG: tag, 'v': value}
+
+
+def _decode_value(value):
+    """
+    Returns the value for the given json-compatible form.
+    """
+    value_type = type(value)
+    if value_type is list:
+        return [_decode_value(item) for item in value]
+    if value_type is not dict:
+        return value
+    tag = value.get(_TAG)
+    if tag is None:
+        return {key: _decode_value(item) for key, item in six.iteritems(value)}
+    return _DECODERS[tag](value['v'])
+
+
+def _decode_datetime(parts):
+    offset = parts[7]
+    if offset is None:
+        tzinfo = None
+    elif offset == 0:
+        tzinfo = pytz.utc
+    else:
+        tzinfo = pytz.FixedOffset(offset // 60)
+    return datetime(*parts[:7], tzinfo=tzinfo)
+
+
+_DECODERS = {
+    'dict': lambda pairs: {_decode_value(key): _decode_value(item) for key, item in pairs},
+    'tuple': lambda items: tuple(_decode_value(item) for item in items),
+    'set': lambda items: set(_decode_value(item) for item in items),
+    'frozenset': lambda items: frozenset(_decode_value(item) for item in items),
+    'datetime': _decode_datetime,
+    'date': lambda parts: date(*parts),
+    'timedelta': lambda parts: timedelta(*parts),
+    'bytes': b64decode,
+    'usage_key': UsageKey.from_string,
+    'course_key': CourseKey.from_string,
+    'pickle': lambda encoded: pickle.loads(b64decode(encoded)),
+}
+
+
+def _transformer_name(transformer):
+    """
+    Like TransformerDataMap, accepts either a transformer class or its name.
+    """
+    try:
+        return transformer.name()
+    except AttributeError:
+        return transformer
+
+
+def _copy_value(value):
+    """
+    Column values are shared by all copies of a structure, so callers get
+    their own copy of anything mutable.
+    """
+    if type(value) in _IMMUTABLE_TYPES or isinstance(value, OpaqueKey):
+        return value
+    return deepcopy(value)
@@ -0,0 +1,114 @@
+"""
+Helpers for collecting a block structure incrementally.
+
+On publish, the whole course is otherwise re-collected by every
+transformer, even when a single block was edited.  Instead, the blocks
+whose xBlocks changed since the stored block structure was collected are
+found by comparing their edited_on dates and their children.  Only those
+blocks, their descendants (which may inherit their changes) and their
+ancestors (whose collected data the transformers merge down) are
+re-collected, and the data of the other blocks is copied from the stored
+block structure.
+"""
+
+
+from .block_structure import BlockStructureModulestoreData
+
+# pylint: disable=protected-access
+
+# The xBlock field collected for every block so that its edits can be
+# detected on the next collect.
+EDITED_ON_FIELD = u'edited_on'
+
+
+def get_blocks_to_collect(block_structure, collected_block_structure, transformers):
+    """
+    Returns the set of usage keys of the blocks in the given block
+    structure, freshly created from the modulestore, that need to be
+    re-collected, given the previously collected block structure.
+
+    Returns None if the collected data can't be reused, because a
+    transformer does not support incremental collection or its data was
+    collected with another version.
+    """
+    for transformer in transformers:
+        if not transformer.INCREMENTAL_COLLECT:
+            return None
+        if collected_block_structure._get_transformer_data_version(transformer) != transformer.WRITE_VERSION:
+            return None
+
+    changed_blocks = {
+        usage_key
+        for usage_key in block_structure.get_block_keys()
+        if _has_changed(usage_key, block_structure, collected_block_structure)
+    }
+
+    # Add the descendants of the changed blocks, in topological order so
+    # parents are visited before their children.
+    ordered_block_keys = list(block_structure.topological_traversal())
+    blocks_to_collect = set()
+    for usage_key in ordered_block_keys:
+        if usage_key in changed_blocks or any(
+                parent_key in blocks_to_collect for parent_key in block_structure.get_parents(usage_key)
+        ):
+            blocks_to_collect.add(usage_key)
+
+    # Add all of their ancestors, in reverse topological order so children
+    # are visited before their parents.  The root block is always
+    # re-collected, along with the non-block-specific transformer data.
+    blocks_to_collect.add(block_structure.root_block_usage_key)
+    for usage_key in reversed(ordered_block_keys):
+        if usage_key in blocks_to_collect:
+            blocks_to_collect.update(block_structure.get_parents(usage_key))
+
+    return blocks_to_collect
+
+
+def create_subset(block_structure, usage_keys):
+    """
+    Returns a new BlockStructureModulestoreData with the xBlocks of the
+    given blocks of the given block structure, and the relations between
+    them.  The given blocks must include the ancestors of each of them.
+
+    The xBlocks of the other children of the given blocks are added too,
+    without adding the children to the block structure: transformers such
+    as split_test read them when collecting their parent, but they are not
+    re-collected.
+    """
+    subset = BlockStructureModulestoreData(block_structure.root_block_usage_key)
+    for usage_key in block_structure.topological_traversal():
+        if usage_key not in usage_keys:
+            continue
+        subset._add_xblock(usage_key, block_structure.get_xblock(usage_key))
+        subset._add_block(subset._block_relations, usage_key)
+        for child_key in block_structure.get_children(usage_key):
+            if child_key in usage_keys:
+                subset._add_relation(usage_key, child_key)
+            else:
+                subset._add_xblock(child_key, block_structure.get_xblock(child_key))
+    return subset
+
+
+def merge_collected(block_structure, subset, collected_block_structure):
+    """
+    Sets the collected data of the given block structure: the data of the
+    blocks in the given re-collected subset, and the data of the other
+    blocks from the previously collected block structure.
+    """
+    for usage_key in block_structure.get_block_keys():
+        source = subset if usage_key in subset else collected_block_structure
+        block_structure._block_data_map[usage_key] = source[usage_key]
+    block_structure.transformer_data = subset.transformer_data
+
+
+def _has_changed(usage_key, block_structure, collected_block_structure):
+    """
+    Returns whether the given block was added or edited, or whether its
+    children changed, since the collected block structure was collected.
+    """
+    if usage_key not in collected_block_structure:
+        return True
+    edited_on = getattr(block_structure.get_xblock(usage_key), EDITED_ON_FIELD, None)
+    if edited_on is None or edited_on != collected_block_structure.get_xblock_field(usage_key, EDITED_ON_FIELD):
+        return True
+    return block_structure.get_children(usage_key) != collected_block_structure.get_children(usage_key)
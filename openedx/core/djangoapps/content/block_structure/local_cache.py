@@ -0,0 +1,139 @@
+"""
+Process-local, size-bounded LRU cache of collected block structures.
+
+BlockStructureStore.get() otherwise goes to memcached and then deserializes
+the structure on every call, even when the same worker process loaded the
+same course version a moment ago.  The LRU keeps the deserialized
+CompactBlockStructures of the hottest courses, keyed by the root usage key,
+a version of the stored data that changes whenever the course is
+recollected, and the versions of the registered transformers.
+
+The cached instances are shared by every request in the process, so they
+are never handed out: callers always get a copy().  A CompactBlockStructure
+copy shares the immutable arrays, and only materializes (copies) the
+relations and block data that a transformer actually modifies, so copying
+on every hit is cheap.  Pickled structures would need a deepcopy per hit,
+costing about as much as unpickling, so they bypass the LRU.
+"""
+
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from edx_django_utils.monitoring import set_custom_metric
+
+from .compact import CompactBlockStructure
+
+DEFAULT_MAX_ENTRIES = 20
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+class BlockStructureLRU(object):
+    """
+    A thread-safe LRU of CompactBlockStructures.  Its size is bounded by
+    the number of entries and by the total size of their serialized data,
+    which is a proxy for their memory use.
+    """
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns a copy of the block structure cached for the given key,
+        or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        _set_metric(u'hit' if entry else u'miss')
+        return entry[0].copy() if entry else None
+
+    def add(self, key, block_structure, size):
+        """
+        Caches the given block structure, of the given serialized size,
+        evicting the least recently used entries as needed.  Only
+        CompactBlockStructures are cached.  Returns whether the given
+        instance was cached, in which case the caller must not modify it.
+        """
+        if not isinstance(block_structure, CompactBlockStructure):
+            return False
+        if size > self.max_bytes or self.max_entries <= 0:
+            return False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._size -= previous[1]
+            self._entries[key] = (block_structure, size)
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+        return True
+
+    def discard(self, root_block_usage_key):
+        """
+        Removes every cached version of the given root block's structure.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == root_block_usage_key]:
+                self._size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """
+        Returns the hit, miss and eviction counts and the current size.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+
+def _set_metric(result):
+    set_custom_metric(u'block_structure_local_cache', result)
+
+
+_lru = None
+_lru_lock = threading.Lock()
+
+
+def get_lru():
+    """
+    Returns this process's BlockStructureLRU, sized by the
+    BLOCK_STRUCTURES_SETTINGS.
+    """
+    global _lru  # pylint: disable=global-statement
+    if _lru is None:
+        with _lru_lock:
+            if _lru is None:
+                _lru = BlockStructureLRU(
+                    max_entries=settings.BLOCK_STRUCTURES_SETTINGS.get('LOCAL_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+                    max_bytes=settings.BLOCK_STRUCTURES_SETTINGS.get('LOCAL_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+                )
+    return _lru
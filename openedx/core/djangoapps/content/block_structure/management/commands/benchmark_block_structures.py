@@ -0,0 +1,174 @@
+"""
+Command to compare the pickled and the compact representations of
+collected block structures.
+"""
+
+
+import time
+from uuid import uuid4
+
+import six
+from django.core.management.base import BaseCommand, CommandError
+from opaque_keys.edx.locator import CourseLocator
+
+from openedx.core.djangoapps.content.block_structure import compact
+from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
+from openedx.core.djangoapps.content.block_structure.block_structure import BlockStructureBlockData
+from openedx.core.lib.cache_utils import zpickle, zunpickle
+from openedx.core.lib.command_utils import parse_course_keys
+
+# pylint: disable=protected-access
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_block_structures --courses 'course-v1:edX+DemoX+Demo_Course' --settings=devstack
+        $ ./manage.py lms benchmark_block_structures --synthetic 3000 --iterations 20 --settings=devstack
+
+    For each structure, reports the serialized size, and the average time to
+    serialize, to deserialize, to traverse, to read every collected field,
+    and to copy and remove half of the blocks as a transformer would, in both
+    representations.
+    """
+    help = u'Benchmarks the pickled and the compact representations of collected block structures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--courses',
+            dest='courses',
+            nargs='+',
+            help=u'Benchmark the collected block structures of the list of courses provided.',
+        )
+        parser.add_argument(
+            '--synthetic',
+            help=u'Benchmark a generated block structure with this number of blocks.',
+            type=int,
+            default=0,
+        )
+        parser.add_argument(
+            '--iterations',
+            help=u'Number of times each operation is timed.',
+            type=int,
+            default=10,
+        )
+
+    def handle(self, *args, **options):
+        if not options['courses'] and not options['synthetic']:
+            raise CommandError(u'Either --courses or --synthetic is required.')
+
+        if options['courses']:
+            for course_key in parse_course_keys(options['courses']):
+                self._report(six.text_type(course_key), get_course_in_cache(course_key), options['iterations'])
+        if options['synthetic']:
+            self._report(
+                u'synthetic, {} blocks'.format(options['synthetic']),
+                create_synthetic_block_structure(options['synthetic']),
+                options['iterations'],
+            )
+
+    def _report(self, name, block_structure, iterations):
+        self.stdout.write(u'{} ({} blocks)'.format(name, len(block_structure)))
+        for label, result in benchmark(block_structure, iterations):
+            self.stdout.write(u'  {:<24}{:>14}{:>14}'.format(label, *result))
+
+
+def benchmark(block_structure, iterations):
+    """
+    Returns a list of (label, (pickled, compact)) results for the given
+    block structure.
+    """
+    root_key = block_structure.root_block_usage_key
+    data_to_pickle = (
+        block_structure._block_relations,
+        block_structure.transformer_data,
+        block_structure._block_data_map,
+    )
+    pickled_data = zpickle(data_to_pickle)
+    compact_data = compact.serialize(block_structure)
+
+    def load_pickled():
+        block_relations, transformer_data, block_data_map = zunpickle(pickled_data)
+        loaded = BlockStructureBlockData(root_key)
+        loaded._block_relations = block_relations
+        loaded.transformer_data = transformer_data
+        loaded._block_data_map = block_data_map
+        return loaded
+
+    def load_compact():
+        return compact.deserialize(compact_data, root_key)
+
+    pickled_structure = load_pickled()
+    compact_structure = load_compact()
+    field_names = sorted(set(
+        field_name for block_data in block_structure.itervalues() for field_name in block_data.fields
+    ))
+
+    def read_fields(structure):
+        for usage_key in structure.get_block_keys():
+            for field_name in field_names:
+                structure.get_xblock_field(usage_key, field_name)
+
+    def transform(structure):
+        transformed = structure.copy()
+        transformed.remove_block_traversal(
+            lambda usage_key: usage_key.block_type == 'problem' and hash(usage_key) % 2
+        )
+
+    def timed(func, *func_args):
+        started = time.time()
+        for _ in range(iterations):
+            func(*func_args)
+        return u'{:.2f} ms'.format((time.time() - started) * 1000 / iterations)
+
+    return [
+        (u'', (u'pickled', u'compact')),
+        (u'size', (u'{} bytes'.format(len(pickled_data)), u'{} bytes'.format(len(compact_data)))),
+        (u'serialize', (
+            timed(zpickle, data_to_pickle),
+            timed(compact.serialize, block_structure),
+        )),
+        (u'deserialize', (timed(load_pickled), timed(load_compact))),
+        (u'topological traversal', (
+            timed(lambda: list(pickled_structure.topological_traversal())),
+            timed(lambda: list(compact_structure.topological_traversal())),
+        )),
+        (u'read xblock fields', (timed(read_fields, pickled_structure), timed(read_fields, compact_structure))),
+        (u'copy and transform', (timed(transform, pickled_structure), timed(transform, compact_structure))),
+    ]
+
+
+def create_synthetic_block_structure(num_blocks):
+    """
+    Returns a collected block structure shaped like a course: chapters of
+    sequentials of verticals of problems, with typical xBlock and
+    transformer fields.
+    """
+    course_key = CourseLocator('org', 'benchmark', six.text_type(uuid4()))
+    root_key = course_key.make_usage_key('course', 'course')
+    block_structure = BlockStructureBlockData(root_key)
+
+    def add_block(parent, block_type):
+        usage_key = course_key.make_usage_key(block_type, uuid4().hex)
+        block_structure._add_relation(parent, usage_key)
+        return usage_key
+
+    chapters = [add_block(root_key, 'chapter') for _ in range(max(1, num_blocks // 300))]
+    sequentials = [add_block(chapter, 'sequential') for chapter in chapters for _ in range(5)]
+    verticals = [add_block(sequential, 'vertical') for sequential in sequentials for _ in range(3)]
+    for index in range(num_blocks - len(block_structure)):
+        add_block(verticals[index % len(verticals)], 'problem')
+
+    for usage_key in block_structure.get_block_keys():
+        block_data = block_structure._get_or_create_block(usage_key)
+        block_data.display_name = u'{} {}'.format(usage_key.block_type, usage_key.block_id[:6])
+        block_data.category = usage_key.block_type
+        block_data.graded = usage_key.block_type == 'sequential'
+        block_data.format = u'Homework' if block_data.graded else None
+        block_data.weight = 1.0
+        block_data.group_access = {}
+        block_data.visible_to_staff_only = False
+        block_structure.set_transformer_block_field(usage_key, 'grades', 'max_score', 1.0)
+        block_structure.set_transformer_block_field(usage_key, 'student_view', 'student_view_multi_device', True)
+    block_structure.set_transformer_data('grades', '_version', 4)
+    return block_structure
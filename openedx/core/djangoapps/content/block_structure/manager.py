@@ -8,7 +8,7 @@ from contextlib import contextmanager
 
 import six
 
-from . import config
+from . import compact, config
 from .exceptions import BlockStructureNotFound, TransformerDataIncompatible, UsageKeyNotInBlockStructure
 from .factory import BlockStructureFactory
 from .store import BlockStructureStore
@@ -78,6 +78,7 @@ class BlockStructureManager(object):
                 )
             block_structure.set_root_block(starting_block_usage_key)
         transformers.transform(block_structure)
+        compact.report_lazy_loading(block_structure)
         return block_structure
 
     def get_collected(self):
@@ -116,22 +117,38 @@ class BlockStructureManager(object):
         """
         with self._bulk_operations():
             if not self.store.is_up_to_date(self.root_block_usage_key, self.modulestore):
-                self._update_collected()
+                self._update_collected(incremental=config.waffle().is_enabled(config.INCREMENTAL_COLLECT))
 
-    def _update_collected(self):
+    def _update_collected(self, incremental=False):
         """
         The store is updated with newly collected transformers data from
         the modulestore.
+
+        Arguments:
+            incremental (bool) - Whether to re-collect only the blocks
+                that changed since the data in the store was collected.
         """
         with self._bulk_operations():
             block_structure = BlockStructureFactory.create_from_modulestore(
                 self.root_block_usage_key,
                 self.modulestore,
             )
-            BlockStructureTransformers.collect(block_structure)
+            if incremental:
+                BlockStructureTransformers.collect_incrementally(block_structure, self._get_stored())
+            else:
+                BlockStructureTransformers.collect(block_structure)
             self.store.add(block_structure)
             return block_structure
 
+    def _get_stored(self):
+        """
+        Returns the block structure in the store, or None if not found.
+        """
+        try:
+            return self.store.get(self.root_block_usage_key)
+        except BlockStructureNotFound:
+            return None
+
     def clear(self):
         """
         Removes data for the block structure associated with the given
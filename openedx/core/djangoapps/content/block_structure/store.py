@@ -5,13 +5,14 @@ Module for the Storage of BlockStructure objects.
 
 
 from logging import getLogger
+from uuid import uuid4
 
 import six
 
 from django.utils.encoding import python_2_unicode_compatible
 from openedx.core.lib.cache_utils import zpickle, zunpickle
 
-from . import config
+from . import compact, config, local_cache
 from .block_structure import BlockStructureBlockData
 from .exceptions import BlockStructureNotFound
 from .factory import BlockStructureFactory
@@ -68,6 +69,18 @@ class BlockStructureStore(object):
 
         bs_model = self._update_or_create_model(block_structure, serialized_data)
         self._add_to_cache(serialized_data, bs_model)
+        if not _is_storage_backing_enabled():
+            # Replace the version token after the data, so a new version is
+            # never read with the old data.
+            version_cache_key = self._encode_version_cache_key(bs_model)
+            if _is_local_cache_enabled():
+                self._cache.set(
+                    version_cache_key,
+                    self._new_version(block_structure),
+                    timeout=config.cache_timeout_in_seconds(),
+                )
+            else:
+                self._cache.delete(version_cache_key)
 
     def get(self, root_block_usage_key):
         """
@@ -88,13 +101,23 @@ class BlockStructureStore(object):
         """
         bs_model = self._get_model(root_block_usage_key)
 
+        local_cache_key = self._encode_local_cache_key(bs_model)
+        if local_cache_key:
+            block_structure = local_cache.get_lru().get(local_cache_key)
+            if block_structure is not None:
+                return block_structure
+
         try:
             serialized_data = self._get_from_cache(bs_model)
         except BlockStructureNotFound:
             serialized_data = self._get_from_store(bs_model)
             self._add_to_cache(serialized_data, bs_model)
 
-        return self._deserialize(serialized_data, root_block_usage_key)
+        block_structure = self._deserialize(serialized_data, root_block_usage_key)
+        if local_cache_key and local_cache.get_lru().add(local_cache_key, block_structure, len(serialized_data)):
+            # Copy on transform: the cached instance is shared by the process.
+            return block_structure.copy()
+        return block_structure
 
     def delete(self, root_block_usage_key):
         """
@@ -106,6 +129,9 @@ class BlockStructureStore(object):
         """
         bs_model = self._get_model(root_block_usage_key)
         self._cache.delete(self._encode_root_cache_key(bs_model))
+        if not _is_storage_backing_enabled():
+            self._cache.delete(self._encode_version_cache_key(bs_model))
+        local_cache.get_lru().discard(root_block_usage_key)
         bs_model.delete()
         logger.info(u"BlockStructure: Deleted from cache and store; %s.", bs_model)
 
@@ -189,6 +215,9 @@ class BlockStructureStore(object):
         """
         Serializes the data for the given block_structure.
         """
+        if _is_compact_serialization_enabled():
+            return compact.serialize(block_structure)
+
         data_to_cache = (
             block_structure._block_relations,
             block_structure.transformer_data,
@@ -202,6 +231,8 @@ class BlockStructureStore(object):
         """
 
         try:
+            if compact.is_compact(serialized_data):
+                return compact.deserialize(serialized_data, root_block_usage_key)
             block_relations, transformer_data, block_data_map = zunpickle(serialized_data)
         except Exception:
             # Somehow failed to de-serialized the data, assume it's corrupt.
@@ -231,6 +262,53 @@ class BlockStructureStore(object):
                 root_usage_key=six.text_type(bs_model.data_usage_key),
             )
 
+    def _encode_local_cache_key(self, bs_model):
+        """
+        Returns the process-local cache key to use for the given
+        BlockStructureModel or StubModel, or None if the process-local
+        cache is not to be used.
+
+        The key includes the version of the stored data: a model's version
+        fields and modification time, or without storage backing, a version
+        token that add() replaces in the cache whenever the structure is
+        recollected.
+        """
+        if not _is_local_cache_enabled():
+            return None
+
+        if _is_storage_backing_enabled():
+            version = u'{}, modified: {}'.format(bs_model, bs_model.modified)
+        else:
+            version_cache_key = self._encode_version_cache_key(bs_model)
+            version = self._cache.get(version_cache_key)
+            if version is None:
+                # Stored before version tokens existed, or the token was
+                # evicted. Any later add() will replace this token.
+                version = uuid4().hex
+                self._cache.add(version_cache_key, version, timeout=config.cache_timeout_in_seconds())
+                version = self._cache.get(version_cache_key)
+                if version is None:
+                    return None
+
+        return (bs_model.data_usage_key, version, TransformerRegistry.get_write_version_hash())
+
+    @classmethod
+    def _encode_version_cache_key(cls, bs_model):
+        """
+        Returns the cache key of the version token of the given StubModel.
+        """
+        return u'{}.version'.format(cls._encode_root_cache_key(bs_model))
+
+    @staticmethod
+    def _new_version(block_structure):
+        """
+        Returns a new version token for the given block structure.
+        """
+        return u'{}.{}'.format(
+            block_structure.get_xblock_field(block_structure.root_block_usage_key, 'course_version'),
+            uuid4().hex,
+        )
+
     @staticmethod
     def _version_data_of_block(root_block):
         """
@@ -260,3 +338,18 @@ def _is_storage_backing_enabled():
     Returns whether storage backing for Block Structures is enabled.
     """
     return config.waffle().is_enabled(config.STORAGE_BACKING_FOR_CACHE)
+
+
+def _is_compact_serialization_enabled():
+    """
+    Returns whether Block Structures are stored in the compact format.
+    Structures in either format are always readable.
+    """
+    return config.waffle().is_enabled(config.COMPACT_SERIALIZATION)
+
+
+def _is_local_cache_enabled():
+    """
+    Returns whether collected Block Structures are also cached in process.
+    """
+    return config.waffle().is_enabled(config.PROCESS_LOCAL_CACHE)
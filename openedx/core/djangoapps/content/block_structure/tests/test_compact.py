@@ -0,0 +1,151 @@
+"""
+Tests for compact.py
+"""
+
+
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import ddt
+import pytz
+from edx_django_utils.cache import RequestCache
+from mock import patch
+
+from .. import compact
+from ..block_structure import BlockStructureBlockData
+from .helpers import ChildrenMapTestMixin, MockTransformer, UsageKeyFactoryMixin
+
+
+@ddt.ddt
+class TestCompactBlockStructure(UsageKeyFactoryMixin, ChildrenMapTestMixin, TestCase):
+    """
+    Tests for CompactBlockStructure and its serialization
+    """
+    FIELD_VALUES = {
+        'display_name': u'Homework 1.1',
+        'due': datetime(2020, 12, 1, 23, 59, tzinfo=pytz.utc),
+        'start': datetime(2020, 9, 1),
+        'weight': 1.5,
+        'graded': True,
+        'group_access': {50: [1, 2]},
+        'grace_period': timedelta(hours=2),
+        'tags': (u'a', frozenset([1])),
+    }
+
+    def create_compact(self, children_map):
+        """
+        Returns the block structure for the given children_map, with test
+        xBlock and transformer fields, and its compact round trip.
+        """
+        block_structure = self.create_block_structure(children_map)
+        block_structure._add_transformer(MockTransformer)  # pylint: disable=protected-access
+        block_structure.set_transformer_data(MockTransformer, 'key_of_block', self.block_key_factory(1))
+        for block_id in range(len(children_map)):
+            usage_key = self.block_key_factory(block_id)
+            block_data = block_structure._get_or_create_block(usage_key)  # pylint: disable=protected-access
+            for field_name, value in self.FIELD_VALUES.items():
+                setattr(block_data, field_name, value)
+            block_structure.set_transformer_block_field(usage_key, MockTransformer, 'block_id', block_id)
+            block_structure.set_transformer_block_field(usage_key, 'other_transformer', 'block_id', -block_id)
+        return block_structure, compact.deserialize(compact.serialize(block_structure), self.block_key_factory(0))
+
+    @ddt.data(
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_round_trip(self, children_map):
+        block_structure, compact_structure = self.create_compact(children_map)
+
+        self.assert_block_structure(compact_structure, children_map)
+        self.assertEqual(list(compact_structure.topological_traversal()), list(block_structure.topological_traversal()))
+        self.assertEqual(len(compact_structure), len(block_structure))
+        self.assertEqual(compact_structure.get_transformer_data(MockTransformer, 'key_of_block'), self.block_key_factory(1))
+        for block_id in range(len(children_map)):
+            usage_key = self.block_key_factory(block_id)
+            for field_name, value in self.FIELD_VALUES.items():
+                self.assertEqual(compact_structure.get_xblock_field(usage_key, field_name), value)
+            self.assertEqual(compact_structure.get_transformer_block_field(usage_key, MockTransformer, 'block_id'), block_id)
+            self.assertIsNone(compact_structure.get_xblock_field(usage_key, 'not_collected'))
+
+        # the reads above were served from the arrays.
+        self.assertFalse(compact_structure.is_materialized())
+
+    def test_transform_copy(self):
+        _, compact_structure = self.create_compact(self.SIMPLE_CHILDREN_MAP)
+        transformed = compact_structure.copy()
+
+        transformed.remove_block(self.block_key_factory(1), keep_descendants=False)
+        transformed._prune_unreachable()  # pylint: disable=protected-access
+        transformed.set_transformer_block_field(self.block_key_factory(2), MockTransformer, 'block_id', 'changed')
+        transformed.get_xblock_field(self.block_key_factory(2), 'group_access')[50].append(3)
+
+        self.assert_block_structure(transformed, [[2], [], [], [], []], missing_blocks=[1, 3, 4])
+        self.assertIsNone(transformed.get_xblock_field(self.block_key_factory(1), 'display_name'))
+        self.assertEqual(
+            transformed.get_transformer_block_field(self.block_key_factory(2), MockTransformer, 'block_id'),
+            'changed',
+        )
+
+        # the shared arrays are unchanged.
+        self.assert_block_structure(compact_structure, self.SIMPLE_CHILDREN_MAP)
+        self.assertEqual(compact_structure.get_transformer_block_field(self.block_key_factory(2), MockTransformer, 'block_id'), 2)
+        self.assertEqual(compact_structure.get_xblock_field(self.block_key_factory(2), 'group_access'), {50: [1, 2]})
+        self.assertFalse(compact_structure.is_materialized())
+
+    def test_serialize_transformed(self):
+        _, compact_structure = self.create_compact(self.SIMPLE_CHILDREN_MAP)
+        compact_structure.remove_block(self.block_key_factory(2), keep_descendants=False)
+
+        reloaded = compact.deserialize(compact.serialize(compact_structure), self.block_key_factory(0))
+        self.assert_block_structure(reloaded, [[1], [3, 4], [], [], []], missing_blocks=[2])
+
+    def test_lazy_transformer_sections(self):
+        _, compact_structure = self.create_compact(self.SIMPLE_CHILDREN_MAP)
+        sections = compact_structure._compact  # pylint: disable=protected-access
+        self.assertEqual(sections.transformer_block_fields, {})
+
+        compact_structure.get_transformer_block_field(self.block_key_factory(1), MockTransformer, 'block_id')
+        self.assertEqual(set(sections.transformer_block_fields), {MockTransformer.name()})
+
+        # once the block data is materialized, other sections are merged on first use.
+        transformed = compact_structure.copy()
+        transformed.set_transformer_block_field(self.block_key_factory(1), MockTransformer, 'block_id', 'changed')
+        self.assertEqual(set(sections.transformer_block_fields), {MockTransformer.name()})
+        self.assertEqual(transformed.get_transformer_block_field(self.block_key_factory(1), 'other_transformer', 'block_id'), -1)
+        self.assertEqual(transformed[self.block_key_factory(2)].transformer_data['other_transformer'].block_id, -2)
+
+    @patch('openedx.core.djangoapps.content.block_structure.compact.set_custom_metric')
+    def test_report_lazy_loading(self, mock_set_custom_metric):
+        RequestCache.clear_all_namespaces()
+        _, compact_structure = self.create_compact(self.SIMPLE_CHILDREN_MAP)
+        compact_structure.get_transformer_block_field(self.block_key_factory(1), MockTransformer, 'block_id')
+
+        compact.report_lazy_loading(compact_structure)
+        metrics = {call[0][0]: call[0][1] for call in mock_set_custom_metric.call_args_list}
+        self.assertGreater(metrics['block_structure_lazy_bytes_loaded'], 0)
+        self.assertEqual(
+            metrics['block_structure_lazy_bytes_skipped'],
+            compact_structure._compact.unloaded_transformer_bytes(),  # pylint: disable=protected-access
+        )
+        self.assertGreater(metrics['block_structure_lazy_bytes_skipped'], 0)
+
+    def test_non_usage_keys(self):
+        block_structure = BlockStructureBlockData(root_block_usage_key=0)
+        block_structure._add_relation(0, 1)  # pylint: disable=protected-access
+        block_structure._add_relation(0, (2, u'b'))  # pylint: disable=protected-access
+
+        compact_structure = compact.deserialize(compact.serialize(block_structure), 0)
+        self.assertEqual(compact_structure.get_children(0), [1, (2, u'b')])
+        self.assertEqual(compact_structure.get_parents((2, u'b')), [0])
+
+    def test_format(self):
+        _, compact_structure = self.create_compact(self.SIMPLE_CHILDREN_MAP)
+        serialized_data = compact.serialize(compact_structure)
+
+        self.assertTrue(compact.is_compact(serialized_data))
+        self.assertFalse(compact.is_compact(b'x\x9c'))
+        with self.assertRaises(compact.CompactFormatError):
+            compact.deserialize(serialized_data[:3], self.block_key_factory(0))
+        with self.assertRaises(compact.CompactFormatError):
+            compact.deserialize(serialized_data[:4] + b'\xff\xff' + serialized_data[6:], self.block_key_factory(0))
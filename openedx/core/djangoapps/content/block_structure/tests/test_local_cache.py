@@ -0,0 +1,70 @@
+"""
+Tests for local_cache.py
+"""
+
+
+from unittest import TestCase
+
+from mock import patch
+
+from .. import compact
+from ..block_structure import BlockStructureBlockData
+from ..local_cache import BlockStructureLRU
+
+
+@patch('openedx.core.djangoapps.content.block_structure.local_cache.set_custom_metric')
+class TestBlockStructureLRU(TestCase):
+    """
+    Tests for BlockStructureLRU
+    """
+    def create_compact(self, root_block_usage_key=0):
+        """
+        Returns a CompactBlockStructure with a root and one child.
+        """
+        block_structure = BlockStructureBlockData(root_block_usage_key)
+        block_structure._add_relation(root_block_usage_key, 1)  # pylint: disable=protected-access
+        return compact.deserialize(compact.serialize(block_structure), root_block_usage_key)
+
+    def test_hit_returns_copy(self, mock_metric):
+        lru = BlockStructureLRU(max_entries=2, max_bytes=100)
+        cached = self.create_compact()
+        self.assertTrue(lru.add((0, 'v1'), cached, 10))
+
+        block_structure = lru.get((0, 'v1'))
+        self.assertIsNot(block_structure, cached)
+        block_structure.remove_block(1, keep_descendants=False)
+        self.assertEqual(lru.get((0, 'v1')).get_children(0), [1])
+
+        self.assertIsNone(lru.get((0, 'v2')))
+        self.assertEqual(lru.stats()['hits'], 2)
+        self.assertEqual(lru.stats()['misses'], 1)
+        mock_metric.assert_called_with(u'block_structure_local_cache', u'miss')
+
+    def test_bounds(self, _):
+        lru = BlockStructureLRU(max_entries=2, max_bytes=100)
+        lru.add((0, 'v1'), self.create_compact(), 10)
+        lru.add((0, 'v2'), self.create_compact(), 10)
+        lru.get((0, 'v1'))
+        lru.add((0, 'v3'), self.create_compact(), 10)
+
+        # the least recently used entry is evicted first.
+        self.assertIsNone(lru.get((0, 'v2')))
+        self.assertIsNotNone(lru.get((0, 'v1')))
+
+        lru.add((0, 'v4'), self.create_compact(), 95)
+        self.assertEqual(lru.stats()['entries'], 1)
+        self.assertEqual(lru.stats()['evictions'], 3)
+        self.assertFalse(lru.add((0, 'v5'), self.create_compact(), 101))
+
+    def test_only_compact_structures(self, _):
+        lru = BlockStructureLRU(max_entries=2, max_bytes=100)
+        self.assertFalse(lru.add((0, 'v1'), BlockStructureBlockData(0), 10))
+
+    def test_discard(self, _):
+        lru = BlockStructureLRU(max_entries=3, max_bytes=100)
+        lru.add((0, 'v1'), self.create_compact(), 10)
+        lru.add((0, 'v2'), self.create_compact(), 10)
+        lru.add((5, 'v1'), self.create_compact(5), 10)
+        lru.discard(0)
+        self.assertEqual(lru.stats()['entries'], 1)
+        self.assertEqual(lru.stats()['bytes'], 10)
@@ -6,9 +6,10 @@ Tests for manager.py
 import ddt
 import six
 from django.test import TestCase
+from mock import patch
 
 from ..block_structure import BlockStructureBlockData
-from ..config import RAISE_ERROR_WHEN_NOT_FOUND, STORAGE_BACKING_FOR_CACHE, waffle
+from ..config import INCREMENTAL_COLLECT, RAISE_ERROR_WHEN_NOT_FOUND, STORAGE_BACKING_FOR_CACHE, waffle
 from ..exceptions import BlockStructureNotFound, UsageKeyNotInBlockStructure
 from ..manager import BlockStructureManager
 from ..transformers import BlockStructureTransformers
@@ -30,6 +31,7 @@ class TestTransformer1(MockTransformer):
     collect_data_key = 't1.collect'
     transform_data_key = 't1.transform'
     collect_call_count = 0
+    collected_block_keys = None
 
     @classmethod
     def collect(cls, block_structure):
@@ -38,6 +40,7 @@ class TestTransformer1(MockTransformer):
         """
         cls._set_block_values(block_structure, cls.collect_data_key)
         cls.collect_call_count += 1
+        cls.collected_block_keys = set(block_structure.get_block_keys())
 
     def transform(self, usage_info, block_structure):
         """
@@ -198,6 +201,31 @@ class TestBlockStructureManager(UsageKeyFactoryMixin, ChildrenMapTestMixin, Test
 
                 self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
 
+    @ddt.data(True, False)
+    def test_update_collected_incrementally(self, incremental_collect_supported):
+        for xblock in self.modulestore.blocks.values():
+            xblock.field_map['edited_on'] = 1
+
+        with waffle().override(INCREMENTAL_COLLECT, active=True):
+            with mock_registered_transformers(self.registered_transformers):
+                with patch.object(TestTransformer1, 'INCREMENTAL_COLLECT', incremental_collect_supported):
+                    self.bs_manager.update_collected_if_needed()
+                    assert len(TestTransformer1.collected_block_keys) == len(self.children_map)
+
+                    # edit a leaf block; only it and its ancestors are re-collected.
+                    self.modulestore.blocks[self.block_key_factory(3)].field_map['edited_on'] = 2
+                    self.bs_manager.update_collected_if_needed()
+                    expected_blocks = [0, 1, 3] if incremental_collect_supported else range(len(self.children_map))
+                    assert TestTransformer1.collected_block_keys == {
+                        self.block_key_factory(block_id) for block_id in expected_blocks
+                    }
+
+                    # the data of the other blocks was copied from the stored block structure.
+                    self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
+                    block_structure = self.bs_manager.get_collected()
+                    assert block_structure.get_xblock_field(self.block_key_factory(3), 'edited_on') == 2
+                    assert block_structure.get_xblock_field(self.block_key_factory(4), 'edited_on') == 1
+
     def test_get_collected_transformer_version(self):
         self.collect_and_verify(expect_modulestore_called=True, expect_cache_updated=True)
 
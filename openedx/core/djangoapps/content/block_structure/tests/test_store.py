@@ -7,7 +7,9 @@ import ddt
 
 from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
 
-from ..config import STORAGE_BACKING_FOR_CACHE, waffle
+from .. import local_cache
+from ..compact import CompactBlockStructure
+from ..config import COMPACT_SERIALIZATION, PROCESS_LOCAL_CACHE, STORAGE_BACKING_FOR_CACHE, waffle
 from ..config.models import BlockStructureConfiguration
 from ..exceptions import BlockStructureNotFound
 from ..store import BlockStructureStore
@@ -30,6 +32,7 @@ class TestBlockStructureStore(UsageKeyFactoryMixin, ChildrenMapTestMixin, CacheI
 
         self.mock_cache = MockCache()
         self.store = BlockStructureStore(self.mock_cache)
+        local_cache.get_lru().clear()
 
     def add_transformers(self):
         """
@@ -67,6 +70,50 @@ class TestBlockStructureStore(UsageKeyFactoryMixin, ChildrenMapTestMixin, CacheI
             with self.assertRaises(BlockStructureNotFound):
                 self.store.get(self.block_structure.root_block_usage_key)
 
+    @ddt.data(True, False)
+    def test_compact_serialization(self, with_storage_backing):
+        with waffle().override(STORAGE_BACKING_FOR_CACHE, active=with_storage_backing):
+            with waffle().override(COMPACT_SERIALIZATION, active=True):
+                self.store.add(self.block_structure)
+                stored_value = self.store.get(self.block_structure.root_block_usage_key)
+            self.assertIsInstance(stored_value, CompactBlockStructure)
+            self.assert_block_structure(stored_value, self.children_map)
+            self.assertEqual(
+                stored_value.get_transformer_block_field(self.block_key_factory(0), MockTransformer, 'test'),
+                u'{} val'.format(MockTransformer.name()),
+            )
+
+            # structures stored in either format stay readable
+            self.store.add(self.block_structure)
+            with waffle().override(COMPACT_SERIALIZATION, active=True):
+                stored_value = self.store.get(self.block_structure.root_block_usage_key)
+            self.assertNotIsInstance(stored_value, CompactBlockStructure)
+            self.assert_block_structure(stored_value, self.children_map)
+
+    @ddt.data(True, False)
+    def test_local_cache(self, with_storage_backing):
+        with waffle().override(STORAGE_BACKING_FOR_CACHE, active=with_storage_backing):
+            with waffle().override(COMPACT_SERIALIZATION, active=True):
+                with waffle().override(PROCESS_LOCAL_CACHE, active=True):
+                    root_key = self.block_structure.root_block_usage_key
+                    self.store.add(self.block_structure)
+                    first = self.store.get(root_key)
+                    first.remove_block(self.block_key_factory(1), keep_descendants=False)
+
+                    # served without the cached data, and unaffected by
+                    # changes to the structure returned earlier.
+                    self.mock_cache.map.pop(self.store._encode_root_cache_key(self.store._get_model(root_key)))
+                    second = self.store.get(root_key)
+                    self.assert_block_structure(second, self.children_map)
+                    self.assertEqual(local_cache.get_lru().stats()['hits'], 1)
+
+                    # a new version of the structure is a miss.
+                    self.block_structure.remove_block(self.block_key_factory(2), keep_descendants=False)
+                    self.store.add(self.block_structure)
+                    third = self.store.get(root_key)
+                    self.assertNotIn(self.block_key_factory(2), third)
+                    self.assertEqual(local_cache.get_lru().stats()['misses'], 2)
+
     def test_uncached_without_storage(self):
         self.store.add(self.block_structure)
         self.mock_cache.map.clear()
@@ -57,6 +57,26 @@ class BlockStructureTransformer(object):
     WRITE_VERSION = 0
     READ_VERSION = 0
 
+    # Whether the transformer's collect method supports incremental
+    # collection, when enabled by the block_structure.incremental_collect
+    # waffle switch.  On publish, only the blocks that were edited, their
+    # descendants and their ancestors are then re-collected; the
+    # collected data of the other blocks is copied from the previously
+    # collected block structure.
+    #
+    # Set it to True only if the data the transformer collects for a
+    # block depends on nothing but the block's own xBlock and the
+    # collected data of its ancestors, as with the merged fields
+    # percolated down to descendants.  The xBlocks of the children of a
+    # re-collected block can be read, as split_test does, but the
+    # children themselves are not re-collected.  Data aggregated from a
+    # block's descendants, or non-block-specific data aggregated across
+    # blocks, would be computed from an incomplete block structure.
+    #
+    # Incremental collection is used only when every registered
+    # transformer supports it.
+    INCREMENTAL_COLLECT = False
+
     @classmethod
     def name(cls):
         """
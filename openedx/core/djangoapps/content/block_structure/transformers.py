@@ -6,6 +6,7 @@ Module for a collection of BlockStructureTransformers.
 import functools
 from logging import getLogger
 
+from . import incremental
 from .exceptions import TransformerDataIncompatible, TransformerException
 from .transformer import FilteringTransformerMixin
 from .transformer_registry import TransformerRegistry
@@ -83,6 +84,46 @@ class BlockStructureTransformers(object):
         # Collect all fields that were requested by the transformers.
         block_structure._collect_requested_xblock_fields()  # pylint: disable=protected-access
 
+    @classmethod
+    def collect_incrementally(cls, block_structure, collected_block_structure):
+        """
+        Collects data for each registered transformer, re-collecting only
+        the blocks that changed since the given previously collected
+        block structure was collected, and copying the collected data of
+        the other blocks from it.
+
+        Collects all blocks when there is no previously collected block
+        structure, or when it can't be reused.
+
+        Returns the number of blocks that were collected.
+        """
+        blocks_to_collect = None
+        if collected_block_structure is not None:
+            blocks_to_collect = incremental.get_blocks_to_collect(
+                block_structure,
+                collected_block_structure,
+                TransformerRegistry.get_registered_transformers(),
+            )
+
+        if blocks_to_collect is None or len(blocks_to_collect) == len(block_structure):
+            block_structure.request_xblock_fields(incremental.EDITED_ON_FIELD)
+            cls.collect(block_structure)
+            num_collected = len(block_structure)
+        else:
+            subset = incremental.create_subset(block_structure, blocks_to_collect)
+            subset.request_xblock_fields(incremental.EDITED_ON_FIELD)
+            cls.collect(subset)
+            incremental.merge_collected(block_structure, subset, collected_block_structure)
+            num_collected = len(subset)
+
+        logger.info(
+            u'BlockStructure: Collected %d of %d blocks of %s.',
+            num_collected,
+            len(block_structure),
+            block_structure.root_block_usage_key,
+        )
+        return num_collected
+
     @classmethod
     def verify_versions(cls, block_structure):
         """